@@ -1,3 +1,5 @@
+import base64
+import copy
 import io
 import hmac
 import hashlib
@@ -8,31 +10,36 @@ import os
 import re
 import secrets
 import shutil
-import smtplib
 import sqlite3
+import tempfile
 import threading
 import time
 import uuid
 import zipfile
-import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from datetime import date, datetime, timedelta
-from email.mime.text import MIMEText
+from types import MappingProxyType, SimpleNamespace
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, NamedTuple
 from urllib.parse import quote
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from docx import Document
+from docx.table import _Cell
 from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, Request, Response, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 try:
     from reportlab.lib.pagesizes import A4
     from reportlab.pdfbase import pdfmetrics
@@ -55,12 +62,14 @@ except Exception:
     UnicodeCIDFont = None
     canvas = None
     HAS_REPORTLAB = False
-from sqlalchemy import extract, func, inspect, or_, text
-from sqlalchemy.orm import Session
+from sqlalchemy import String, and_, extract, func, insert, inspect, or_, text, type_coerce
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, load_only
 
 from .db import SessionLocal, engine, get_db, init_db
 from .models import (
     Attachment,
+    DashboardBucket,
     DeleteRequest,
     AuthSession,
     KnowledgeDocument,
@@ -95,6 +104,7 @@ from .schemas import (
     WorkflowConfigUpdate,
 )
 from .services.reporting import (
+    ReportDataError,
     export_expert_review_docx,
     export_expert_review_merged_docx,
     export_grading_report_docx,
@@ -109,6 +119,42 @@ from .services.reporting import (
     parse_grading_report_docx,
     sanitize_template_docx_content,
 )
+from .services.backup_engine import (
+    BACKUP_FORMAT,
+    DB_ARCNAME,
+    BackupChainError,
+    consolidate_backup,
+    is_incremental,
+    materialize_uploads,
+    pick_backup_base,
+    read_manifest,
+    resolve_base_chain,
+    write_backup,
+)
+from .services.blob_store import acquire_blob, release_blob, store_blob
+from .services.job_queue import ACTIVE_STATUSES, JobContext, JobQueue, JobQueueBusy, JobQueueFull, purge_finished_jobs
+from .services.reminder_dispatch import (
+    ReminderScheduler,
+    SmtpConnectionPool,
+    in_app_log_rows,
+    insert_reminder_logs,
+    send_reminder_digests,
+    unsendable_log_rows,
+)
+from .services.docx_document import DOCX_PARSE_CACHE, parse_docx_document
+from .services.dashboard_stats import (
+    dashboard_buckets_ready,
+    ensure_dashboard_buckets,
+    rebuild_dashboard_buckets,
+    refresh_buckets_for_inserted,
+)
+from .services.search_index import SEARCH_ENTITY_TYPES, ensure_search_index, index_inserted_rows, search_entities
+from .services.tabular_export import ZipChunkSink, iter_csv, iter_xlsx
+from .services.tabular_import import ImportReport, iter_sheet_chunks
+from .services.preview_cache import TokenCache
+from .services.json_delta import apply_delta, changed_top_level_keys, diff_json
+from .services.report_blocks import acquire_blocks, load_blocks, release_blocks
+from .services.report_diff import build_content_manifest, content_hash, diff_section, section_key
 from .validators import (
     is_placeholder_value,
     validate_credit_code_format_only,
@@ -119,6 +165,7 @@ from .validators import (
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 UPLOAD_DIR = BASE_DIR / "uploads"
+BLOB_DIR = UPLOAD_DIR / "blobs"
 EXPORT_DIR = BASE_DIR / "exports"
 BACKUP_DIR = EXPORT_DIR / "backups"
 LOCAL_OFFICIAL_TEMPLATE_DIR = BASE_DIR / "template_docs"
@@ -128,8 +175,19 @@ DESKTOP_FILING_TEMPLATE_PATH = Path(
 MAX_ORG_ATTACHMENT = 100 * 1024 * 1024
 MAX_SYS_ATTACHMENT = 200 * 1024 * 1024
 MAX_KNOWLEDGE_FILE = 300 * 1024 * 1024
+# 上传按块落盘，单请求内存占用与文件大小无关
+UPLOAD_CHUNK_SIZE = max(64 * 1024, int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024))))
+UPLOAD_PART_SUFFIX = ".part"
 MAX_BACKUP_FILE = 1024 * 1024 * 1024
 MAX_BACKUP_ZIP_ENTRIES = max(1, int(os.getenv("MAX_BACKUP_ZIP_ENTRIES", "5000")))
+# 增量备份链长度：每 N 份备份做一次全量
+BACKUP_FULL_EVERY = max(1, int(os.getenv("BACKUP_FULL_EVERY", "7")))
+# 后台任务：工作线程数、排队上限、结果保留时长（小时）
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+JOB_MAX_PENDING = max(1, int(os.getenv("JOB_MAX_PENDING", "20")))
+JOB_RESULT_TTL_HOURS = max(1, int(os.getenv("JOB_RESULT_TTL_HOURS", "24")))
+JOB_RESULT_DIR = EXPORT_DIR / "jobs"
+JOB_QUEUE = JobQueue(JOB_WORKERS, JOB_MAX_PENDING)
 MAX_BACKUP_UNCOMPRESSED = max(
     MAX_BACKUP_FILE,
     int(os.getenv("MAX_BACKUP_UNCOMPRESSED", str(MAX_BACKUP_FILE * 2))),
@@ -194,6 +252,12 @@ def parse_optional_bool(value: Any, field_name: str) -> bool | None:
 
 SMTP_TLS = env_to_bool(os.getenv("SMTP_TLS"), False)
 SMTP_SSL = env_to_bool(os.getenv("SMTP_SSL"), False)
+# 所有提醒邮件复用同一条 SMTP 连接
+SMTP_POOL = SmtpConnectionPool(SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_FROM, SMTP_SSL, SMTP_TLS)
+# 定时流程提醒：间隔分钟（0 为关闭）、渠道、同一节点重复提醒的最短间隔（小时）
+WORKFLOW_REMINDER_INTERVAL_MINUTES = max(0, int(os.getenv("WORKFLOW_REMINDER_INTERVAL_MINUTES", "0")))
+WORKFLOW_REMINDER_CHANNEL = (os.getenv("WORKFLOW_REMINDER_CHANNEL") or "email").strip().lower()
+WORKFLOW_REMINDER_RESEND_HOURS = max(1, int(os.getenv("WORKFLOW_REMINDER_RESEND_HOURS", "24")))
 
 
 APP_ENV = os.getenv("APP_ENV", "development").strip().lower()
@@ -209,6 +273,31 @@ WORKFLOW_EMAIL_DEFAULT_TO = (os.getenv("WORKFLOW_EMAIL_DEFAULT_TO") or "").strip
 SCRIPT_TAG_RE = re.compile(r"<\s*/?\s*[a-zA-Z!]|on\w+\s*=|javascript\s*:", re.IGNORECASE)
 LOGIN_ATTEMPTS: dict[str, dict[str, Any]] = {}
 LOGIN_ATTEMPTS_LOCK = threading.Lock()
+AUTH_CACHE_TTL_SECONDS = max(0, int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60")))
+AUTH_CACHE_MAX_ENTRIES = max(1, int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "2048")))
+AUTH_PRINCIPAL_CACHE: "OrderedDict[str, dict[str, Any]]" = OrderedDict()
+AUTH_PRINCIPAL_CACHE_LOCK = threading.Lock()
+LIST_COUNT_CACHE_SECONDS = max(0, int(os.getenv("LIST_COUNT_CACHE_SECONDS", "30")))
+LIST_COUNT_CACHE: dict[tuple[Any, ...], tuple[float, int]] = {}
+LIST_COUNT_CACHE_LOCK = threading.Lock()
+LIST_TOTAL_MODES = {"exact", "approx", "none"}
+FILING_TEMPLATE_TABLES = range(1, 7)
+FILING_TEMPLATE_CACHE: dict[str, dict[str, Any]] = {}
+FILING_TEMPLATE_CACHE_LOCK = threading.Lock()
+BULK_EXPORT_WORKERS = max(1, int(os.getenv("BULK_EXPORT_WORKERS", str(min(4, os.cpu_count() or 1)))))
+BULK_EXPORT_MAX_SYSTEMS = max(1, int(os.getenv("BULK_EXPORT_MAX_SYSTEMS", "500")))
+REPORT_BATCH_MAX_SYSTEMS = max(1, int(os.getenv("REPORT_BATCH_MAX_SYSTEMS", "500")))
+BULK_EXPORT_POOL_MIN_ITEMS = 4
+EXPORT_CHUNK_ROWS = max(1, int(os.getenv("EXPORT_CHUNK_ROWS", "1000")))
+IMPORT_CHUNK_ROWS = max(1, int(os.getenv("IMPORT_CHUNK_ROWS", "500")))
+DOCX_PARSE_CACHE.max_entries = max(1, int(os.getenv("DOCX_PARSE_CACHE_SIZE", "32")))
+EXCEL_IMPORT_PREVIEW_CACHE = TokenCache(
+    max_entries=max(1, int(os.getenv("EXCEL_IMPORT_PREVIEW_CACHE_SIZE", "64"))),
+    ttl_seconds=max(1, int(os.getenv("EXCEL_IMPORT_PREVIEW_TTL_SECONDS", "900"))),
+)
+HISTORY_KEYFRAME_INTERVAL = max(1, int(os.getenv("HISTORY_KEYFRAME_INTERVAL", "20")))
+BULK_EXPORT_POOL: ProcessPoolExecutor | None = None
+BULK_EXPORT_POOL_LOCK = threading.Lock()
 DEFAULT_BOOTSTRAP_ACCOUNTS = (
     ("admin", "DEFAULT_ADMIN_PASSWORD", "admin", "admin123"),
     ("tester", "DEFAULT_TESTER_PASSWORD", "evaluator", "tester123"),
@@ -269,7 +358,13 @@ def _cleanup_export_file(path: Path) -> None:
 @asynccontextmanager
 async def app_lifespan(_: FastAPI):
     run_startup_tasks()
+    if WORKFLOW_REMINDER_INTERVAL_MINUTES:
+        REMINDER_SCHEDULER.start()
     yield
+    shutdown_bulk_export_pool()
+    REMINDER_SCHEDULER.stop()
+    JOB_QUEUE.shutdown()
+    SMTP_POOL.close()
 
 
 app = FastAPI(
@@ -314,11 +409,13 @@ if APP_LITE_MODE:
 def ensure_dirs() -> None:
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     (UPLOAD_DIR / "attachments").mkdir(parents=True, exist_ok=True)
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
     (UPLOAD_DIR / "knowledge").mkdir(parents=True, exist_ok=True)
     (UPLOAD_DIR / "templates").mkdir(parents=True, exist_ok=True)
     LOCAL_OFFICIAL_TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
     EXPORT_DIR.mkdir(parents=True, exist_ok=True)
     BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+    JOB_RESULT_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def resolve_sqlite_db_file() -> Path:
@@ -342,7 +439,7 @@ def assert_safe_backup_file_name(file_name: str) -> str:
     return clean
 
 
-def safe_extract_zip(zf: zipfile.ZipFile, target_dir: Path) -> None:
+def validate_backup_zip(zf: zipfile.ZipFile) -> None:
     file_count = 0
     total_uncompressed = 0
     for member in zf.infolist():
@@ -360,6 +457,10 @@ def safe_extract_zip(zf: zipfile.ZipFile, target_dir: Path) -> None:
         total_uncompressed += file_size
         if total_uncompressed > MAX_BACKUP_UNCOMPRESSED:
             raise HTTPException(status_code=400, detail="备份压缩包解压后总大小超限，拒绝解压。")
+
+
+def safe_extract_zip(zf: zipfile.ZipFile, target_dir: Path) -> None:
+    validate_backup_zip(zf)
     zf.extractall(target_dir)
 
 
@@ -383,7 +484,7 @@ def create_backup_archive(actor: str, trigger: str) -> Path:
         src_conn.close()
         dst_conn.close()
 
-    manifest = {
+    meta = {
         "created_at": now.isoformat(),
         "actor": actor,
         "trigger": trigger,
@@ -391,16 +492,13 @@ def create_backup_archive(actor: str, trigger: str) -> Path:
         "app_version": app.version,
     }
 
+    # 只写入上一份备份链中没有的文件内容，每 BACKUP_FULL_EVERY 份做一次全量
+    base_path = pick_backup_base(BACKUP_DIR, BACKUP_FULL_EVERY)
     try:
-        with zipfile.ZipFile(backup_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-            zf.write(temp_db, arcname="data/app.db")
-            if UPLOAD_DIR.exists():
-                for file_path in UPLOAD_DIR.rglob("*"):
-                    if not file_path.is_file():
-                        continue
-                    arcname = (Path("uploads") / file_path.relative_to(UPLOAD_DIR)).as_posix()
-                    zf.write(file_path, arcname=arcname)
-            zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+        write_backup(backup_path, temp_db, UPLOAD_DIR, meta, base_path, UPLOAD_PART_SUFFIX)
+    except BaseException:
+        backup_path.unlink(missing_ok=True)
+        raise
     finally:
         if temp_db.exists():
             temp_db.unlink()
@@ -565,12 +663,64 @@ def ensure_filing_workspace_schema() -> None:
                 conn.execute(text("ALTER TABLE systems ADD COLUMN filing_detail JSON NULL"))
 
 
+def ensure_upload_hash_schema() -> None:
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    with engine.begin() as conn:
+        for table in ("attachments", "knowledge_documents"):
+            if table not in tables:
+                continue
+            cols = {c["name"] for c in insp.get_columns(table)}
+            if "sha256" not in cols:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN sha256 VARCHAR(64) NULL"))
+            # 与模型的 index=True 同名，按哈希去重查找不走全表扫描；MySQL 不支持 CREATE INDEX IF NOT EXISTS
+            if f"ix_{table}_sha256" not in {ix["name"] for ix in insp.get_indexes(table)}:
+                conn.execute(text(f"CREATE INDEX ix_{table}_sha256 ON {table} (sha256)"))
+
+
+def ensure_history_delta_schema() -> None:
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    with engine.begin() as conn:
+        for table in ("organization_histories", "system_histories"):
+            if table not in tables:
+                continue
+            cols = {c["name"] for c in insp.get_columns(table)}
+            if "delta" not in cols:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN delta JSON NULL"))
+            if "changed_fields" not in cols:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN changed_fields JSON NULL"))
+
+
+def ensure_report_manifest_schema() -> None:
+    insp = inspect(engine)
+    if "reports" not in set(insp.get_table_names()):
+        return
+    cols = {c["name"] for c in insp.get_columns("reports")}
+    if "content_manifest" not in cols:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE reports ADD COLUMN content_manifest JSON NULL"))
+
+
+def ensure_schema_upgrades() -> None:
+    """create_all 不会给已有表加列：启动和恢复备份后都要补齐新增列。"""
+    ensure_user_account_schema()
+    ensure_filing_workspace_schema()
+    ensure_upload_hash_schema()
+    ensure_history_delta_schema()
+    ensure_report_manifest_schema()
+
+
 def run_startup_tasks() -> None:
     ensure_dirs()
     init_db()
-    ensure_user_account_schema()
-    ensure_filing_workspace_schema()
+    ensure_schema_upgrades()
+    ensure_search_index(engine)
+    ensure_dashboard_buckets(engine)
     ensure_default_accounts()
+    ensure_workflow_defaults()
+    JOB_QUEUE.recover_interrupted(engine)
+    purge_finished_jobs(engine, timedelta(hours=JOB_RESULT_TTL_HOURS))
 
 
 def obj_to_dict(obj: Any, fields: list[str]) -> dict[str, Any]:
@@ -586,6 +736,75 @@ def obj_to_dict(obj: Any, fields: list[str]) -> dict[str, Any]:
     return {f: _normalize(getattr(obj, f)) for f in fields}
 
 
+def parse_list_fields(fields: str | None, allowed: list[str]) -> list[str]:
+    """解析 fields= 列投影参数；id 与 created_at 始终返回（游标分页依赖）。"""
+    if not fields or not fields.strip():
+        return list(allowed)
+    picked = ["id", "created_at"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise HTTPException(status_code=400, detail=f"fields 包含不支持的字段：{name}。")
+        if name not in picked:
+            picked.append(name)
+    return picked
+
+
+def encode_list_cursor(created_at_raw: Any, row_id: int) -> str:
+    raw = json.dumps([str(created_at_raw), int(row_id)], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_list_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at_raw, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return str(created_at_raw), int(row_id)
+    except Exception as ex:
+        raise HTTPException(status_code=400, detail="cursor 无效或已损坏。") from ex
+
+
+def fetch_keyset_page(query: Any, model: Any, cursor: str | None, limit: int) -> tuple[list[Any], str | None]:
+    """按 (created_at, id) 倒序做游标分页；直接比较库中原始时间文本，可走 created_at 索引。"""
+    created_at_raw = type_coerce(model.created_at, String)
+    if cursor:
+        cursor_ts, cursor_id = decode_list_cursor(cursor)
+        query = query.filter(
+            or_(created_at_raw < cursor_ts, and_(created_at_raw == cursor_ts, model.id < cursor_id))
+        )
+    rows = (
+        query.add_columns(created_at_raw.label("_cursor_ts"))
+        .order_by(model.created_at.desc(), model.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_list_cursor(rows[-1]._cursor_ts, rows[-1].id)
+    return rows, next_cursor
+
+
+def count_list_query(query: Any, cache_key: tuple[Any, ...], total_mode: str) -> int | None:
+    """exact 每次 COUNT；approx 在 LIST_COUNT_CACHE_SECONDS 内复用上次计数；none 不计数。"""
+    if total_mode == "none":
+        return None
+    if total_mode == "approx" and LIST_COUNT_CACHE_SECONDS > 0:
+        now_mono = time.monotonic()
+        with LIST_COUNT_CACHE_LOCK:
+            cached = LIST_COUNT_CACHE.get(cache_key)
+        if cached and now_mono - cached[0] <= LIST_COUNT_CACHE_SECONDS:
+            return cached[1]
+    total = query.order_by(None).count()
+    with LIST_COUNT_CACHE_LOCK:
+        if len(LIST_COUNT_CACHE) > 1024:
+            LIST_COUNT_CACHE.clear()
+        LIST_COUNT_CACHE[cache_key] = (time.monotonic(), total)
+    return total
+
+
 def template_snapshot(tpl: ReportTemplate) -> dict[str, Any]:
     return {
         "template_name": tpl.template_name,
@@ -643,6 +862,95 @@ def get_user_by_token(db: Session, token: str) -> UserAccount | None:
     return user
 
 
+def _auth_cache_get(token: str) -> dict[str, Any] | None:
+    if AUTH_CACHE_TTL_SECONDS <= 0:
+        return None
+    now_mono = time.monotonic()
+    with AUTH_PRINCIPAL_CACHE_LOCK:
+        item = AUTH_PRINCIPAL_CACHE.get(token)
+        if not item:
+            return None
+        if now_mono - item["cached_at"] > AUTH_CACHE_TTL_SECONDS or datetime.now() >= item["expires_at"]:
+            AUTH_PRINCIPAL_CACHE.pop(token, None)
+            return None
+        AUTH_PRINCIPAL_CACHE.move_to_end(token)
+        return item
+
+
+def _auth_cache_put(token: str, principal: dict[str, Any]) -> None:
+    if AUTH_CACHE_TTL_SECONDS <= 0:
+        return
+    with AUTH_PRINCIPAL_CACHE_LOCK:
+        AUTH_PRINCIPAL_CACHE[token] = principal
+        AUTH_PRINCIPAL_CACHE.move_to_end(token)
+        while len(AUTH_PRINCIPAL_CACHE) > AUTH_CACHE_MAX_ENTRIES:
+            AUTH_PRINCIPAL_CACHE.popitem(last=False)
+
+
+def invalidate_auth_cache(*, token: str | None = None, user_id: int | None = None) -> None:
+    """令牌注销、改密、停用账号后清理登录主体缓存；不带参数时清空全部。"""
+    with AUTH_PRINCIPAL_CACHE_LOCK:
+        if token is None and user_id is None:
+            AUTH_PRINCIPAL_CACHE.clear()
+            return
+        if token is not None:
+            AUTH_PRINCIPAL_CACHE.pop(token, None)
+        if user_id is not None:
+            stale = [key for key, item in AUTH_PRINCIPAL_CACHE.items() if item["user_id"] == user_id]
+            for key in stale:
+                AUTH_PRINCIPAL_CACHE.pop(key, None)
+
+
+def load_auth_principal(db: Session, token: str) -> dict[str, Any] | None:
+    if not token:
+        return None
+    cached = _auth_cache_get(token)
+    if cached:
+        return cached
+    now = datetime.now()
+    row = (
+        db.query(AuthSession.expires_at, UserAccount.id, UserAccount.username, UserAccount.role, UserAccount.must_change_password)
+        .join(UserAccount, UserAccount.id == AuthSession.user_id)
+        .filter(AuthSession.token == token, AuthSession.expires_at > now, UserAccount.enabled.is_(True))
+        .first()
+    )
+    if not row:
+        return None
+    expires_at, user_id, username, role, must_change_password = row
+    principal = {
+        "user_id": user_id,
+        "username": username,
+        "role": role or "",
+        "must_change_password": bool(must_change_password),
+        "expires_at": expires_at,
+        "cached_at": time.monotonic(),
+    }
+    _auth_cache_put(token, principal)
+    return principal
+
+
+def get_request_principal(request: Request, db: Session | None = None) -> dict[str, Any] | None:
+    """解析当前请求的登录主体；同一请求内只解析一次，结果挂在 request.state 上。"""
+    token = get_auth_token_from_request(request)
+    if not token:
+        return None
+    resolved = getattr(request.state, "auth_principal_resolved", None)
+    if resolved is not None and resolved[0] == token:
+        return resolved[1]
+    if db is not None:
+        principal = load_auth_principal(db, token)
+    else:
+        principal = _auth_cache_get(token)
+        if principal is None:
+            own_db = SessionLocal()
+            try:
+                principal = load_auth_principal(own_db, token)
+            finally:
+                own_db.close()
+    request.state.auth_principal_resolved = (token, principal)
+    return principal
+
+
 def _is_api_auth_exempt(path: str) -> bool:
     if not path.startswith("/api/"):
         return True
@@ -684,32 +992,24 @@ async def security_middleware(request: Request, call_next):  # type: ignore[over
             token = get_auth_token_from_request(request)
             if not token:
                 return JSONResponse(status_code=401, content={"detail": "未登录或令牌缺失。"})
-            db = SessionLocal()
-            try:
-                user = get_user_by_token(db, token)
-                if not user:
-                    return JSONResponse(status_code=401, content={"detail": "登录令牌无效或已过期。"})
-                if bool(getattr(user, "must_change_password", False)) and not _is_password_change_exempt(path):
-                    return JSONResponse(status_code=403, content={"detail": "当前账号需先修改密码后再继续操作。"})
-                request.state.current_user = user.username
-                request.state.current_user_role = getattr(user, "role", "")
-                request.state.current_user_must_change_password = bool(getattr(user, "must_change_password", False))
-            finally:
-                db.close()
+            principal = get_request_principal(request)
+            if not principal:
+                return JSONResponse(status_code=401, content={"detail": "登录令牌无效或已过期。"})
+            if principal["must_change_password"] and not _is_password_change_exempt(path):
+                return JSONResponse(status_code=403, content={"detail": "当前账号需先修改密码后再继续操作。"})
+            request.state.current_user = principal["username"]
+            request.state.current_user_role = principal["role"]
+            request.state.current_user_must_change_password = principal["must_change_password"]
         if not _is_web_auth_exempt(path):
             token = get_auth_token_from_request(request)
             if not token:
                 return RedirectResponse(url=f"/login?next={quote(path)}", status_code=307)
-            db = SessionLocal()
-            try:
-                user = get_user_by_token(db, token)
-                if not user:
-                    return RedirectResponse(url=f"/login?next={quote(path)}", status_code=307)
-                request.state.current_user = user.username
-                request.state.current_user_role = getattr(user, "role", "")
-                request.state.current_user_must_change_password = bool(getattr(user, "must_change_password", False))
-            finally:
-                db.close()
+            principal = get_request_principal(request)
+            if not principal:
+                return RedirectResponse(url=f"/login?next={quote(path)}", status_code=307)
+            request.state.current_user = principal["username"]
+            request.state.current_user_role = principal["role"]
+            request.state.current_user_must_change_password = principal["must_change_password"]
 
     response = await call_next(request)
     response.headers["X-Frame-Options"] = "DENY"
@@ -787,13 +1087,13 @@ def require_roles(
     allowed_roles: set[str],
     legacy_admin: bool = False,
 ) -> tuple[str, str]:
-    user = get_current_user_optional(request, db)
-    if user:
-        if bool(getattr(user, "must_change_password", False)) and not _is_password_change_exempt(request.url.path):
+    principal = get_request_principal(request, db)
+    if principal:
+        if principal["must_change_password"] and not _is_password_change_exempt(request.url.path):
             raise HTTPException(status_code=403, detail="当前账号需先修改密码后再继续操作。")
-        if user.role not in allowed_roles:
+        if principal["role"] not in allowed_roles:
             raise HTTPException(status_code=403, detail="当前账号无权限执行此操作。")
-        return user.username, user.role
+        return principal["username"], principal["role"]
     if legacy_admin and "admin" in allowed_roles and not STRICT_AUTH and (APP_LITE_MODE or not API_AUTH_REQUIRED):
         return "legacy_admin", "admin"
     if STRICT_AUTH or allowed_roles:
@@ -802,9 +1102,9 @@ def require_roles(
 
 
 def resolve_effective_actor_name(request: Request, db: Session, fallback: str | None = None) -> str:
-    user = get_current_user_optional(request, db)
-    if user and getattr(user, "username", ""):
-        return str(user.username).strip()
+    principal = get_request_principal(request, db)
+    if principal and principal["username"]:
+        return str(principal["username"]).strip()
     text = str(fallback or "").strip()
     return text or "system"
 
@@ -1269,27 +1569,46 @@ def default_system_filing_detail() -> dict[str, Any]:
     }
 
 
+# 默认值树只构建一次，只读；合并时按结构复制出新树，调用方可随意修改返回值
+ORG_FILING_DETAIL_DEFAULTS = default_org_filing_detail()
+SYSTEM_FILING_DETAIL_DEFAULTS = default_system_filing_detail()
+
+
 def merged_org_filing_detail(org: Organization | None) -> dict[str, Any]:
-    data = default_org_filing_detail()
-    if org and isinstance(org.filing_detail, dict):
-        data = deep_merge_dicts(data, org.filing_detail)
-    return data
+    override = org.filing_detail if org and isinstance(org.filing_detail, dict) else {}
+    return deep_merge_dicts(ORG_FILING_DETAIL_DEFAULTS, override)
 
 
 def merged_system_filing_detail(system: SystemInfo | None) -> dict[str, Any]:
-    data = default_system_filing_detail()
-    if system and isinstance(system.filing_detail, dict):
-        data = deep_merge_dicts(data, system.filing_detail)
-    return data
+    override = system.filing_detail if system and isinstance(system.filing_detail, dict) else {}
+    return deep_merge_dicts(SYSTEM_FILING_DETAIL_DEFAULTS, override)
+
+
+def copy_json_tree(value: Any) -> Any:
+    """复制 JSON 结构（dict/list），标量直接共享；比 deep_copy_json 的序列化往返快得多。"""
+    if isinstance(value, dict):
+        return {key: copy_json_tree(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [copy_json_tree(item) for item in value]
+    return value
 
 
 def deep_merge_dicts(base: dict[str, Any], override: dict[str, Any]) -> dict[str, Any]:
-    merged = deep_copy_json(base)
-    for key, value in (override or {}).items():
-        if isinstance(value, dict) and isinstance(merged.get(key), dict):
-            merged[key] = deep_merge_dicts(merged[key], value)
+    """单次遍历合并：base 与 override 都不被修改，返回全新的树。"""
+    override = override or {}
+    merged: dict[str, Any] = {}
+    for key, value in base.items():
+        if key not in override:
+            merged[key] = copy_json_tree(value)
             continue
-        merged[key] = deep_copy_json(value)
+        incoming = override[key]
+        if isinstance(incoming, dict) and isinstance(value, dict):
+            merged[key] = deep_merge_dicts(value, incoming)
+        else:
+            merged[key] = copy_json_tree(incoming)
+    for key, incoming in override.items():
+        if key not in merged:
+            merged[key] = copy_json_tree(incoming)
     return merged
 
 
@@ -1380,29 +1699,56 @@ def recycle_meta(deleted_at: datetime | None) -> dict[str, Any]:
 
 
 def send_workflow_email(to_email: str, subject: str, body: str) -> tuple[bool, str]:
-    if not SMTP_HOST:
-        return False, "SMTP_HOST 未配置"
-    sender = SMTP_FROM or SMTP_USER
-    if not sender:
-        return False, "SMTP_FROM/SMTP_USER 未配置"
-    msg = MIMEText(body, _subtype="plain", _charset="utf-8")
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = to_email
+    return SMTP_POOL.send(to_email, subject, body)
+
+
+def _stage_upload_stream(source: Any, target_dir: Path, limit: int, too_large_detail: str) -> SimpleNamespace:
+    target_dir.mkdir(parents=True, exist_ok=True)
+    part_path = target_dir / f".{uuid.uuid4().hex}{UPLOAD_PART_SUFFIX}"
+    digest = hashlib.sha256()
+    size = 0
     try:
-        if SMTP_SSL:
-            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=10)
-        else:
-            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10)
-        with server:
-            if SMTP_TLS and not SMTP_SSL:
-                server.starttls()
-            if SMTP_USER:
-                server.login(SMTP_USER, SMTP_PASS)
-            server.sendmail(sender, [to_email], msg.as_string())
-        return True, "ok"
-    except Exception as exc:
-        return False, str(exc)
+        with part_path.open("wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=400, detail=too_large_detail)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+    return SimpleNamespace(path=part_path, size=size, sha256=digest.hexdigest())
+
+
+async def stage_upload(file: UploadFile, limit: int, too_large_detail: str) -> SimpleNamespace:
+    """把上传分块写入文件库目录下的临时文件，边写边算 SHA-256，超限立即中止。
+
+    返回 path/size/sha256；调用方用 store_staged_upload 原子改名收入文件库，失败时 discard_staged_upload。
+    """
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=400, detail=too_large_detail)
+    await file.seek(0)
+    return await run_in_threadpool(_stage_upload_stream, file.file, BLOB_DIR, limit, too_large_detail)
+
+
+def store_staged_upload(db: Session, staged: SimpleNamespace) -> Path:
+    """临时文件与文件库同目录，os.replace 原子落位；内容已存在时只增加引用数。"""
+    return store_blob(db, BLOB_DIR, staged.path, staged.sha256, staged.size)
+
+
+def release_stored_file(db: Session, sha256: str | None, file_path: str | None) -> None:
+    """释放附件/文档对文件的引用；旧式 uuid_文件名 文件直接删除。"""
+    if not release_blob(db, sha256, file_path):
+        safe_delete_uploaded_file(file_path)
+
+
+def discard_staged_upload(staged: SimpleNamespace | None) -> None:
+    if staged is not None:
+        staged.path.unlink(missing_ok=True)
 
 
 def save_attachment_row(
@@ -1412,22 +1758,19 @@ def save_attachment_row(
     entity_id: int,
     actor: str,
     file_name: str,
-    content: bytes,
+    staged: SimpleNamespace,
 ) -> Attachment:
     ext = Path(file_name).suffix.lower().lstrip(".")
     safe_name = Path(file_name).name
-    save_name = f"{uuid.uuid4().hex}_{safe_name}"
-    target_dir = UPLOAD_DIR / "attachments" / entity_type
-    target_dir.mkdir(parents=True, exist_ok=True)
-    target_path = target_dir / save_name
-    target_path.write_bytes(content)
+    target_path = store_staged_upload(db, staged)
     row = Attachment(
         entity_type=entity_type,
         entity_id=entity_id,
         file_name=safe_name,
         file_path=str(target_path),
         file_ext=ext,
-        file_size=len(content),
+        file_size=staged.size,
+        sha256=staged.sha256,
         uploaded_by=actor,
     )
     db.add(row)
@@ -1458,6 +1801,50 @@ def assert_system_deletable(db: Session, system: SystemInfo, is_admin: bool) ->
         raise HTTPException(status_code=400, detail=f"系统已有关联报告({related_reports})，暂不可删除。")
 
 
+def copy_entity_attachments(db: Session, entity_type: str, source_id: int, target_id: int, actor: str) -> dict[int, int]:
+    """为目标实体复制附件记录，只增加文件库引用不复制文件；返回 旧附件 id -> 新附件 id。"""
+    rows = (
+        db.query(Attachment)
+        .filter(Attachment.entity_type == entity_type, Attachment.entity_id == source_id)
+        .order_by(Attachment.id.asc())
+        .all()
+    )
+    mapping: dict[int, int] = {}
+    for row in rows:
+        if not acquire_blob(db, row.sha256, row.file_path):
+            continue
+        clone = Attachment(
+            entity_type=entity_type,
+            entity_id=target_id,
+            file_name=row.file_name,
+            file_path=row.file_path,
+            file_ext=row.file_ext,
+            file_size=row.file_size,
+            sha256=row.sha256,
+            uploaded_by=actor,
+        )
+        db.add(clone)
+        db.flush()
+        mapping[row.id] = clone.id
+    return mapping
+
+
+def remap_attachment_refs(value: Any, mapping: dict[int, int]) -> Any:
+    """递归替换备案详情中各 attachment_ids 的附件 id。"""
+    if isinstance(value, dict):
+        return {
+            key: (
+                [mapping.get(ref, ref) for ref in normalize_attachment_refs(item)]
+                if key == "attachment_ids"
+                else remap_attachment_refs(item, mapping)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [remap_attachment_refs(item, mapping) for item in value]
+    return value
+
+
 def purge_entity_attachments(db: Session, entity_type: str, entity_id: int) -> int:
     rows = (
         db.query(Attachment)
@@ -1465,7 +1852,7 @@ def purge_entity_attachments(db: Session, entity_type: str, entity_id: int) -> i
         .all()
     )
     for row in rows:
-        safe_delete_uploaded_file(row.file_path)
+        release_stored_file(db, row.sha256, row.file_path)
         db.delete(row)
     return len(rows)
 
@@ -1483,6 +1870,8 @@ def purge_system_cascade(db: Session, system: SystemInfo) -> dict[str, int]:
     workflow_instances_deleted = 0
 
     if report_ids:
+        for report in db.query(Report).filter(Report.id.in_(report_ids)).all():
+            release_blocks(db, report_block_refs(report))
         review_records_deleted = (
             db.query(ReviewRecord)
             .filter(ReviewRecord.report_id.in_(report_ids))
@@ -1595,6 +1984,81 @@ def purge_organization_cascade(db: Session, org: Organization) -> dict[str, int]
     return totals
 
 
+def _history_fk(model: Any) -> Any:
+    return model.organization_id if model is OrganizationHistory else model.system_id
+
+
+def reconstruct_history_version(db: Session, model: Any, entity_id: int, history_id: int | None = None) -> Any:
+    """还原某条历史记录之后的完整快照：取不晚于它的最近关键帧，再按顺序重放其后的增量。
+
+    history_id 为空时还原最新版本；没有任何历史记录时返回 None。
+    """
+    fk = _history_fk(model)
+    keyframe_query = db.query(model.id, model.after_data).filter(fk == entity_id, model.delta.is_(None))
+    if history_id is not None:
+        keyframe_query = keyframe_query.filter(model.id <= history_id)
+    keyframe = keyframe_query.order_by(model.id.desc()).first()
+    delta_query = db.query(model.delta).filter(fk == entity_id, model.delta.is_not(None))
+    if keyframe is not None:
+        delta_query = delta_query.filter(model.id > keyframe.id)
+    if history_id is not None:
+        delta_query = delta_query.filter(model.id <= history_id)
+    state = keyframe.after_data if keyframe is not None else None
+    for (delta,) in delta_query.order_by(model.id.asc()).all():
+        state = apply_delta(state, delta)
+    return state
+
+
+def _history_diverged(previous: Any, before_data: dict[str, Any]) -> bool:
+    # updated_at 每次写入都会变，只看业务字段
+    if not isinstance(previous, dict):
+        return True
+    return any(op["path"] != "/updated_at" for op in diff_json(previous, before_data))
+
+
+def record_entity_history(
+    db: Session,
+    model: Any,
+    entity_id: int,
+    changed_by: str,
+    change_type: str,
+    before_data: dict[str, Any] | None,
+    after_data: dict[str, Any] | None,
+) -> None:
+    """写一条历史：与上一版本比较只存 JSON Patch 增量，每 HISTORY_KEYFRAME_INTERVAL 个版本存一次完整快照。"""
+    fk = _history_fk(model)
+    db.flush()
+    last_keyframe_id = (
+        db.query(func.max(model.id)).filter(fk == entity_id, model.delta.is_(None)).scalar()
+    )
+    row = model(changed_by=changed_by, change_type=change_type)
+    setattr(row, fk.key, entity_id)
+    if last_keyframe_id is None:
+        # 首条历史：没有上一版本可供比较，保留调用方给出的 before_data
+        row.before_data = before_data
+        row.after_data = after_data
+    else:
+        since_keyframe = (
+            db.query(func.count(model.id)).filter(fk == entity_id, model.id > last_keyframe_id).scalar() or 0
+        )
+        previous = reconstruct_history_version(db, model, entity_id)
+        if before_data is not None and _history_diverged(previous, before_data):
+            # 上一版本之后有未记历史的写入（如备案表 Excel 导入）：存关键帧并保留 before_data，
+            # 否则重建出的修改前快照不对，这些改动会被算到本次修改人头上
+            row.changed_fields = changed_top_level_keys(diff_json(before_data, after_data))
+            row.before_data = before_data
+            row.after_data = after_data
+            db.add(row)
+            return
+        delta = diff_json(previous, after_data)
+        row.changed_fields = changed_top_level_keys(delta)
+        if since_keyframe + 1 >= HISTORY_KEYFRAME_INTERVAL:
+            row.after_data = after_data
+        else:
+            row.delta = delta
+    db.add(row)
+
+
 def record_org_history(
     db: Session,
     organization_id: int,
@@ -1603,15 +2067,7 @@ def record_org_history(
     before_data: dict[str, Any] | None,
     after_data: dict[str, Any] | None,
 ) -> None:
-    db.add(
-        OrganizationHistory(
-            organization_id=organization_id,
-            changed_by=changed_by,
-            change_type=change_type,
-            before_data=before_data,
-            after_data=after_data,
-        )
-    )
+    record_entity_history(db, OrganizationHistory, organization_id, changed_by, change_type, before_data, after_data)
 
 
 def record_system_history(
@@ -1622,15 +2078,69 @@ def record_system_history(
     before_data: dict[str, Any] | None,
     after_data: dict[str, Any] | None,
 ) -> None:
-    db.add(
-        SystemHistory(
-            system_id=system_id,
-            changed_by=changed_by,
-            change_type=change_type,
-            before_data=before_data,
-            after_data=after_data,
+    record_entity_history(db, SystemHistory, system_id, changed_by, change_type, before_data, after_data)
+
+
+def history_summary_page(db: Session, model: Any, entity_id: int, page: int, page_size: int) -> dict[str, Any]:
+    """历史摘要分页：只读元数据与 changed_fields，不加载快照与增量。"""
+    fk = _history_fk(model)
+    total = db.query(func.count(model.id)).filter(fk == entity_id).scalar() or 0
+    rows = (
+        db.query(
+            model.id,
+            model.changed_by,
+            model.change_type,
+            model.changed_at,
+            model.changed_fields,
+            model.delta.is_(None).label("keyframe"),
         )
+        .filter(fk == entity_id)
+        .order_by(model.changed_at.desc(), model.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "items": [
+            {
+                "id": r.id,
+                "changed_by": r.changed_by,
+                "change_type": r.change_type,
+                "changed_at": r.changed_at,
+                "changed_fields": r.changed_fields,
+                "keyframe": bool(r.keyframe),
+            }
+            for r in rows
+        ],
+    }
+
+
+def history_version_detail(db: Session, model: Any, entity_id: int, history_id: int) -> dict[str, Any]:
+    fk = _history_fk(model)
+    row = (
+        db.query(model.id, model.changed_by, model.change_type, model.changed_at, model.changed_fields, model.before_data)
+        .filter(fk == entity_id, model.id == history_id)
+        .one_or_none()
     )
+    if row is None:
+        raise HTTPException(status_code=404, detail="历史版本不存在。")
+    before_data = row.before_data
+    if before_data is None:
+        previous_id = db.query(func.max(model.id)).filter(fk == entity_id, model.id < history_id).scalar()
+        if previous_id is not None:
+            before_data = reconstruct_history_version(db, model, entity_id, previous_id)
+    return {
+        "id": row.id,
+        "changed_by": row.changed_by,
+        "change_type": row.change_type,
+        "changed_at": row.changed_at,
+        "changed_fields": row.changed_fields,
+        "before_data": before_data,
+        "after_data": reconstruct_history_version(db, model, entity_id, history_id),
+    }
 
 
 def parse_workspace_date(raw_value: Any) -> date | None:
@@ -1664,7 +2174,7 @@ def summarize_table6_item(item: dict[str, Any]) -> dict[str, Any]:
 
 
 def hydrate_workspace_attachments(db: Session, detail: dict[str, Any]) -> dict[str, Any]:
-    data = deep_copy_json(detail)
+    data = copy_json_tree(detail)
     table3 = data.get("table3") if isinstance(data.get("table3"), dict) else {}
     for slot in ("grading_report", "expert_review", "supervisor_review"):
         slot_data = table3.get(slot)
@@ -1830,24 +2340,56 @@ def sync_system_from_workspace(system: SystemInfo, payload: dict[str, Any]) -> t
     return before, obj_to_dict(system, SYSTEM_FIELDS)
 
 
-def build_filing_overview_item(org: Organization, systems: list[SystemInfo]) -> dict[str, Any]:
-    org_detail = merged_org_filing_detail(org)
+# 工作台列表用到的列；summary 视图只加载这些列，filing_detail 等 JSON/长文本列延迟不读
+FILING_OVERVIEW_ORG_COLUMNS = (
+    Organization.id,
+    Organization.name,
+    Organization.credit_code,
+    Organization.legal_representative,
+    Organization.address,
+    Organization.mobile_phone,
+    Organization.email,
+    Organization.industry,
+    Organization.organization_type,
+    Organization.filing_region,
+    Organization.archived,
+    Organization.locked,
+)
+FILING_OVERVIEW_SYSTEM_COLUMNS = (
+    SystemInfo.id,
+    SystemInfo.organization_id,
+    SystemInfo.system_name,
+    SystemInfo.system_code,
+    SystemInfo.proposed_level,
+    SystemInfo.business_description,
+    SystemInfo.system_type,
+    SystemInfo.deployment_mode,
+    SystemInfo.archived,
+    SystemInfo.locked,
+    SystemInfo.go_live_date,
+    SystemInfo.updated_at,
+)
+
+
+def build_filing_overview_item(org: Organization, systems: list[SystemInfo], include_detail: bool = True) -> dict[str, Any]:
+    organization = {
+        "id": org.id,
+        "name": org.name,
+        "credit_code": org.credit_code,
+        "legal_representative": org.legal_representative,
+        "address": org.address,
+        "mobile_phone": org.mobile_phone,
+        "email": org.email,
+        "industry": org.industry,
+        "organization_type": org.organization_type,
+        "filing_region": org.filing_region,
+        "archived": org.archived,
+        "locked": org.locked,
+    }
+    if include_detail:
+        organization["filing_detail"] = merged_org_filing_detail(org)
     return {
-        "organization": {
-            "id": org.id,
-            "name": org.name,
-            "credit_code": org.credit_code,
-            "legal_representative": org.legal_representative,
-            "address": org.address,
-            "mobile_phone": org.mobile_phone,
-            "email": org.email,
-            "industry": org.industry,
-            "organization_type": org.organization_type,
-            "filing_region": org.filing_region,
-            "archived": org.archived,
-            "locked": org.locked,
-            "filing_detail": org_detail,
-        },
+        "organization": organization,
         "system_count": len(systems),
         "systems": [
             {
@@ -2083,31 +2625,69 @@ def _build_excel_import_current_snapshot(db: Session, org: Organization, system:
     }
 
 
-def _diff_excel_import_candidate(current_snapshot: dict[str, Any], candidate: dict[str, Any]) -> tuple[list[dict[str, Any]], list[str]]:
-    conflicts: list[dict[str, Any]] = []
-    direct_update_keys: list[str] = []
+class ExcelImportChange(NamedTuple):
+    key: str
+    incoming_value: Any
+    current_norm: str
+    incoming_norm: str
+
+
+class ExcelImportPreview(NamedTuple):
+    """预检结果：候选值与当前值不同的字段，应用时只按这些路径写入。"""
+
+    system_id: int
+    changes: tuple[ExcelImportChange, ...]
+
+
+def _current_import_compare_value(current_snapshot: dict[str, Any], key: str) -> str:
+    current_value = _get_nested_path_value(current_snapshot, key)
+    return "" if _is_effectively_empty_import_value(key, current_value) else _normalize_import_compare_value(current_value)
+
+
+def _collect_excel_import_changes(current_snapshot: dict[str, Any], candidate: dict[str, Any]) -> list[ExcelImportChange]:
+    changes: list[ExcelImportChange] = []
     for key, incoming_value in _flatten_import_candidate(candidate).items():
         incoming_norm = _normalize_import_compare_value(incoming_value)
         if not incoming_norm:
             continue
-        current_value = _get_nested_path_value(current_snapshot, key)
-        current_norm = "" if _is_effectively_empty_import_value(key, current_value) else _normalize_import_compare_value(current_value)
-        if current_norm == incoming_norm:
-            continue
-        if not current_norm:
-            direct_update_keys.append(key)
+        current_norm = _current_import_compare_value(current_snapshot, key)
+        if current_norm != incoming_norm:
+            changes.append(ExcelImportChange(key, incoming_value, current_norm, incoming_norm))
+    return changes
+
+
+def _split_excel_import_changes(changes: list[ExcelImportChange] | tuple[ExcelImportChange, ...]) -> tuple[list[dict[str, Any]], list[str]]:
+    conflicts: list[dict[str, Any]] = []
+    direct_update_keys: list[str] = []
+    for change in changes:
+        if not change.current_norm:
+            direct_update_keys.append(change.key)
             continue
         conflicts.append(
             {
-                "key": key,
-                "label": FILING_EXCEL_IMPORT_LABELS.get(key, key),
-                "current_value": current_norm,
-                "incoming_value": incoming_norm,
+                "key": change.key,
+                "label": FILING_EXCEL_IMPORT_LABELS.get(change.key, change.key),
+                "current_value": change.current_norm,
+                "incoming_value": change.incoming_norm,
             }
         )
     return conflicts, direct_update_keys
 
 
+def _select_excel_import_changes(
+    changes: tuple[ExcelImportChange, ...], override_keys: set[str]
+) -> tuple[dict[str, Any], list[str]]:
+    """空字段直接写入，有冲突的字段仅在勾选覆盖时写入。"""
+    selected: dict[str, Any] = {}
+    applied_keys: list[str] = []
+    for change in changes:
+        if change.current_norm and change.key not in override_keys:
+            continue
+        _set_nested_path_value(selected, change.key, change.incoming_value)
+        applied_keys.append(change.key)
+    return selected, applied_keys
+
+
 def _select_excel_import_candidate_values(
     current_snapshot: dict[str, Any],
     candidate: dict[str, Any],
@@ -2127,17 +2707,94 @@ def _select_excel_import_candidate_values(
         applied_keys.append(key)
     return selected, applied_keys
 
-def get_workflow_config(db: Session) -> WorkflowConfig:
+class WorkflowRuleSnapshot(NamedTuple):
+    step_name: str
+    owner: str
+    time_limit_hours: int
+    enabled: bool
+    updated_by: str
+    updated_at: Any
+
+
+class WorkflowSnapshot(NamedTuple):
+    """流程配置与节点规则的只读快照；仅在配置/规则变更提交后整体替换。"""
+
+    version: int
+    name: str
+    steps: tuple[str, ...]
+    updated_by: str
+    updated_at: Any
+    rules: "MappingProxyType[str, WorkflowRuleSnapshot]"
+
+    @property
+    def steps_json(self) -> list[str]:
+        return list(self.steps)
+
+
+WORKFLOW_SNAPSHOT: WorkflowSnapshot | None = None
+WORKFLOW_SNAPSHOT_VERSION = 0
+WORKFLOW_SNAPSHOT_LOCK = threading.Lock()
+
+
+def get_workflow_config_row(db: Session) -> WorkflowConfig:
+    """取可写的默认流程配置行（不存在时创建，由调用方提交）。"""
     config = db.query(WorkflowConfig).filter(WorkflowConfig.name == "default").first()
     if config:
         return config
     config = WorkflowConfig(name="default", steps_json=DEFAULT_WORKFLOW_STEPS, updated_by="system")
     db.add(config)
-    db.commit()
-    db.refresh(config)
+    db.flush()
     return config
 
 
+def build_workflow_snapshot(db: Session) -> WorkflowSnapshot:
+    """只读地从库中构建快照；缺失的配置或节点规则按默认值补齐，不写库。"""
+    global WORKFLOW_SNAPSHOT_VERSION
+    config = db.query(WorkflowConfig).filter(WorkflowConfig.name == "default").first()
+    name = config.name if config else "default"
+    steps = tuple(config.steps_json if config else DEFAULT_WORKFLOW_STEPS)
+    rules: dict[str, WorkflowRuleSnapshot] = {}
+    # 同一节点有多条规则时以最新一条为准
+    for row in (
+        db.query(WorkflowStepRule)
+        .filter(WorkflowStepRule.config_name == name)
+        .order_by(WorkflowStepRule.id.desc())
+        .all()
+    ):
+        if row.step_name not in rules:
+            rules[row.step_name] = WorkflowRuleSnapshot(
+                row.step_name, row.owner, row.time_limit_hours, bool(row.enabled), row.updated_by, row.updated_at
+            )
+    for step in steps:
+        rules.setdefault(step, WorkflowRuleSnapshot(step, "system", 24, True, "system", None))
+    with WORKFLOW_SNAPSHOT_LOCK:
+        WORKFLOW_SNAPSHOT_VERSION += 1
+        version = WORKFLOW_SNAPSHOT_VERSION
+    return WorkflowSnapshot(
+        version=version,
+        name=name,
+        steps=steps,
+        updated_by=config.updated_by if config else "system",
+        updated_at=config.updated_at if config else None,
+        rules=MappingProxyType(rules),
+    )
+
+
+def publish_workflow_snapshot(snapshot: WorkflowSnapshot) -> WorkflowSnapshot:
+    global WORKFLOW_SNAPSHOT
+    with WORKFLOW_SNAPSHOT_LOCK:
+        if WORKFLOW_SNAPSHOT is None or WORKFLOW_SNAPSHOT.version < snapshot.version:
+            WORKFLOW_SNAPSHOT = snapshot
+        return WORKFLOW_SNAPSHOT
+
+
+def get_workflow_config(db: Session) -> WorkflowSnapshot:
+    snapshot = WORKFLOW_SNAPSHOT
+    if snapshot is None:
+        snapshot = publish_workflow_snapshot(build_workflow_snapshot(db))
+    return snapshot
+
+
 def get_system_or_404(db: Session, system_id: int) -> SystemInfo:
     system = db.query(SystemInfo).filter(SystemInfo.id == system_id, SystemInfo.deleted_at.is_(None)).first()
     if not system:
@@ -2152,15 +2809,29 @@ def get_org_or_404(db: Session, org_id: int) -> Organization:
     return org
 
 
-def generate_system_code(db: Session) -> str:
+def generate_system_codes(db: Session, count: int) -> list[str]:
+    """一次生成 count 个互不重复的系统编号，每轮只用一条 IN 查询排除已占用的编号。"""
+    codes: list[str] = []
     for _ in range(8):
-        candidate = f"SYS-{datetime.now():%Y%m%d%H%M%S%f}-{secrets.token_hex(2).upper()}"
-        exists = db.query(SystemInfo.id).filter(SystemInfo.system_code == candidate).first()
-        if not exists:
-            return candidate
+        if len(codes) >= count:
+            return codes[:count]
+        candidates = {
+            f"SYS-{datetime.now():%Y%m%d%H%M%S%f}-{secrets.token_hex(2).upper()}"
+            for _ in range(count - len(codes))
+        } - set(codes)
+        taken = {
+            code for (code,) in db.query(SystemInfo.system_code).filter(SystemInfo.system_code.in_(candidates)).all()
+        }
+        codes.extend(sorted(candidates - taken))
+    if len(codes) >= count:
+        return codes[:count]
     raise HTTPException(status_code=500, detail="系统编号生成失败，请重试。")
 
 
+def generate_system_code(db: Session) -> str:
+    return generate_system_codes(db, 1)[0]
+
+
 def build_report_title(report_type: str, system_name: str, version: int) -> str:
     title_map = {
         "filing_form": "定级备案表",
@@ -2335,83 +3006,29 @@ def parse_docx_key_values(content: bytes) -> dict[str, str]:
             "行政区划代码",
         }
 
-    def parse_with_python_docx() -> bool:
-        doc = Document(io.BytesIO(content))
-        for para in doc.paragraphs:
-            parse_line(para.text)
-        for table in doc.tables:
-            for row in table.rows:
-                cells = row.cells
-                row_values = dedup_texts([cell.text for cell in cells])
-                if len(row_values) >= 2:
-                    parse_table_pair(row_values[0], row_values[1])
-                    lead = row_values[0]
-                    idx = 1
-                    while idx + 1 < len(row_values):
-                        if is_cell_label(row_values[idx]):
-                            parse_table_pair(f"{lead}{row_values[idx]}", row_values[idx + 1])
-                            idx += 2
-                            continue
-                        idx += 1
-                for cell in cells:
-                    lines = [line.strip() for line in (cell.text or "").splitlines() if line.strip()]
-                    for line in lines:
-                        parse_line(line)
-        return True
-
-    def parse_with_raw_xml_fallback() -> bool:
-        try:
-            zf = zipfile.ZipFile(io.BytesIO(content), mode="r")
-        except zipfile.BadZipFile:
-            return False
-        with zf:
-            if "word/document.xml" not in zf.namelist():
-                return False
-            try:
-                root = ET.fromstring(zf.read("word/document.xml"))
-            except Exception:
-                return False
-        ns = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
-        tag_p = ns + "p"
-        tag_tbl = ns + "tbl"
-        tag_tr = ns + "tr"
-        tag_tc = ns + "tc"
-        tag_t = ns + "t"
-        tag_body = ns + "body"
-        body = root.find(tag_body)
-        if body is None:
-            return False
-
-        def node_text(node: ET.Element) -> str:
-            return "".join((t.text or "") for t in node.iter(tag_t)).strip()
-
-        for child in list(body):
-            if child.tag == tag_p:
-                parse_line(node_text(child))
-            elif child.tag == tag_tbl:
-                for tr in child.findall(".//" + tag_tr):
-                    cells = tr.findall(tag_tc)
-                    row_values = dedup_texts([node_text(tc) for tc in cells])
-                    if len(row_values) >= 2:
-                        parse_table_pair(row_values[0], row_values[1])
-                        lead = row_values[0]
-                        idx = 1
-                        while idx + 1 < len(row_values):
-                            if is_cell_label(row_values[idx]):
-                                parse_table_pair(f"{lead}{row_values[idx]}", row_values[idx + 1])
-                                idx += 2
-                                continue
-                            idx += 1
-                    for tc in cells:
-                        for p in tc.findall(".//" + tag_p):
-                            parse_line(node_text(p))
-        return True
+    def parse_row(row_values: list[str], lines: Any) -> None:
+        row_values = dedup_texts(row_values)
+        if len(row_values) >= 2:
+            parse_table_pair(row_values[0], row_values[1])
+            lead = row_values[0]
+            idx = 1
+            while idx + 1 < len(row_values):
+                if is_cell_label(row_values[idx]):
+                    parse_table_pair(f"{lead}{row_values[idx]}", row_values[idx + 1])
+                    idx += 2
+                    continue
+                idx += 1
+        for line in lines:
+            parse_line(line)
 
     try:
-        parse_with_python_docx()
-    except Exception:
-        if not parse_with_raw_xml_fallback():
-            raise HTTPException(status_code=400, detail="Word文件无法解析，请确认使用 .docx 且文件未损坏。")
+        parsed = parse_docx_document(content)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail="Word文件无法解析，请确认使用 .docx 且文件未损坏。") from exc
+    for text in parsed.paragraphs:
+        parse_line(text)
+    for row_values, lines in zip(parsed.grid_rows, parsed.row_lines):
+        parse_row(list(row_values), lines)
     return result
 
 
@@ -2497,45 +3114,56 @@ def safe_delete_uploaded_file(path_value: str | None) -> None:
         path.unlink()
 
 
-def get_or_create_workflow_step_rules(db: Session, config: WorkflowConfig) -> dict[str, WorkflowStepRule]:
+def normalize_workflow_rules(db: Session, config: WorkflowConfig) -> bool:
+    """清理同一节点的重复规则（保留最新一条）并为缺失节点补默认规则；返回是否有改动，由调用方提交。"""
     rows = (
         db.query(WorkflowStepRule)
         .filter(WorkflowStepRule.config_name == config.name)
         .order_by(WorkflowStepRule.id.desc())
         .all()
     )
-    rule_map: dict[str, WorkflowStepRule] = {}
-    duplicate_rows: list[WorkflowStepRule] = []
+    seen: set[str] = set()
+    changed = False
     for row in rows:
         # 同一节点可能因历史缺陷出现多条配置，保留最新一条并清理旧数据。
-        if row.step_name in rule_map:
-            duplicate_rows.append(row)
+        if row.step_name in seen:
+            db.delete(row)
+            changed = True
             continue
-        rule_map[row.step_name] = row
-    changed = False
-    for dup in duplicate_rows:
-        db.delete(dup)
-        changed = True
+        seen.add(row.step_name)
     for step in config.steps_json:
-        if step not in rule_map:
-            row = WorkflowStepRule(
-                config_name=config.name,
-                step_name=step,
-                owner="system",
-                time_limit_hours=24,
-                enabled=True,
-                updated_by="system",
+        if step not in seen:
+            db.add(
+                WorkflowStepRule(
+                    config_name=config.name,
+                    step_name=step,
+                    owner="system",
+                    time_limit_hours=24,
+                    enabled=True,
+                    updated_by="system",
+                )
             )
-            db.add(row)
-            db.flush()
-            rule_map[step] = row
+            seen.add(step)
             changed = True
     if changed:
         db.flush()
-    return rule_map
+    return changed
+
+
+def ensure_workflow_defaults() -> WorkflowSnapshot:
+    """启动及恢复备份后：补齐默认配置与节点规则，并重新加载快照。"""
+    with SessionLocal() as db:
+        normalize_workflow_rules(db, get_workflow_config_row(db))
+        db.commit()
+        return publish_workflow_snapshot(build_workflow_snapshot(db))
+
 
+def get_or_create_workflow_step_rules(db: Session, config: WorkflowSnapshot) -> "MappingProxyType[str, WorkflowRuleSnapshot]":
+    """返回快照中的节点规则表（只读，不再查库或写库）。"""
+    return config.rules if isinstance(config, WorkflowSnapshot) else get_workflow_config(db).rules
 
-def recalc_workflow_due_at(db: Session, instance: WorkflowInstance, config: WorkflowConfig) -> None:
+
+def recalc_workflow_due_at(db: Session, instance: WorkflowInstance, config: WorkflowSnapshot) -> None:
     steps = config.steps_json or []
     if instance.status != "in_progress":
         instance.due_at = None
@@ -2553,9 +3181,9 @@ def recalc_workflow_due_at(db: Session, instance: WorkflowInstance, config: Work
 
 def get_workflow_step_owner(
     db: Session,
-    config: WorkflowConfig,
+    config: WorkflowSnapshot,
     step_index: int,
-    rule_map: dict[str, WorkflowStepRule] | None = None,
+    rule_map: "MappingProxyType[str, WorkflowRuleSnapshot] | None" = None,
 ) -> str:
     steps = config.steps_json or []
     if step_index < 0 or step_index >= len(steps):
@@ -2580,10 +3208,20 @@ def knowledge_snapshot(doc: KnowledgeDocument) -> dict[str, Any]:
         "file_name": doc.file_name,
         "file_path": doc.file_path,
         "file_size": doc.file_size,
+        "sha256": doc.sha256,
         "uploaded_by": doc.uploaded_by,
     }
 
 
+def knowledge_file_refs(db: Session, doc: KnowledgeDocument) -> set[tuple[str | None, str]]:
+    """文档当前与历史版本用到的文件 {(sha256, 路径)}：文档对其中每个文件库文件各持有一个引用，回滚时直接复用。"""
+    refs = {(doc.sha256, doc.file_path)} if doc.file_path else set()
+    for (snapshot,) in db.query(KnowledgeDocumentVersion.snapshot).filter(KnowledgeDocumentVersion.document_id == doc.id):
+        if isinstance(snapshot, dict) and snapshot.get("file_path"):
+            refs.add((snapshot.get("sha256"), snapshot["file_path"]))
+    return refs
+
+
 def log_knowledge_version(db: Session, doc: KnowledgeDocument, action: str, changed_by: str) -> None:
     db.add(
         KnowledgeDocumentVersion(
@@ -2780,38 +3418,162 @@ def list_backups(request: Request, db: Session = Depends(get_db)) -> dict[str, A
         if not path.is_file():
             continue
         stat = path.stat()
+        try:
+            manifest = read_manifest(path)
+        except zipfile.BadZipFile:
+            manifest = {}
         items.append(
             {
                 "file_name": path.name,
                 "file_size": stat.st_size,
                 "updated_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "kind": manifest.get("kind") or "full",
+                "base": manifest.get("base"),
             }
         )
     items.sort(key=lambda x: x["updated_at"], reverse=True)
     return {"items": items, "total": len(items)}
 
 
-@app.post("/api/backup/create")
-def create_backup(request: Request, db: Session = Depends(get_db)) -> dict[str, Any]:
-    actor, _ = require_roles(request, db, {"admin"})
-    backup_path = create_backup_archive(actor=actor, trigger="manual")
+def describe_created_backup(backup_path: Path) -> dict[str, Any]:
     stat = backup_path.stat()
     return {
         "message": "备份创建成功",
         "file_name": backup_path.name,
         "file_size": stat.st_size,
-        "download_url": f"/api/backup/download/{quote(backup_path.name)}",
+        "download_url": f"/api/backup/download/{quote(backup_path.name)}?full=true",
     }
 
 
+@app.post("/api/backup/create")
+def create_backup(
+    request: Request,
+    async_mode: bool = Query(False, alias="async"),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    actor, _ = require_roles(request, db, {"admin"})
+    if async_mode:
+        return submit_background_job(
+            "backup_create", actor, lambda job: describe_created_backup(create_backup_archive(actor=actor, trigger="manual"))
+        )
+    return describe_created_backup(create_backup_archive(actor=actor, trigger="manual"))
+
+
 @app.get("/api/backup/download/{file_name}")
-def download_backup(file_name: str, request: Request, db: Session = Depends(get_db)) -> FileResponse:
+def download_backup(
+    file_name: str,
+    request: Request,
+    full: bool = Query(False),
+    db: Session = Depends(get_db),
+) -> FileResponse:
     require_roles(request, db, {"admin"})
     clean_name = assert_safe_backup_file_name(file_name)
     backup_path = BACKUP_DIR / clean_name
     if not backup_path.exists() or not backup_path.is_file():
         raise HTTPException(status_code=404, detail="备份文件不存在。")
-    return FileResponse(path=backup_path, filename=backup_path.name, media_type="application/zip")
+    manifest = read_manifest(backup_path)
+    if not full or not is_incremental(manifest):
+        return FileResponse(path=backup_path, filename=backup_path.name, media_type="application/zip")
+    # 增量备份单独下载无法在别处恢复，full=true 时合并基础链生成独立全量包
+    full_path = EXPORT_DIR / f"backup_full_{uuid.uuid4().hex}.zip"
+    try:
+        consolidate_backup([backup_path, *resolve_base_chain(manifest, BACKUP_DIR)], full_path)
+    except BackupChainError as exc:
+        full_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return FileResponse(
+        path=full_path,
+        filename=f"{backup_path.stem}_full.zip",
+        media_type="application/zip",
+        background=BackgroundTask(_cleanup_export_file, full_path),
+    )
+
+
+def receive_backup_upload(file: UploadFile, target: Path) -> None:
+    upload_size = 0
+    with target.open("wb") as out:
+        while True:
+            chunk = file.file.read(1024 * 1024)
+            if not chunk:
+                break
+            upload_size += len(chunk)
+            if upload_size > MAX_BACKUP_FILE:
+                raise HTTPException(status_code=400, detail="备份文件过大，已超过系统限制。")
+            out.write(chunk)
+
+
+def restore_backup_archive(uploaded_zip: Path, payload_dir: Path, actor: str, job: JobContext | None = None) -> dict[str, Any]:
+    """用已落盘的备份包替换数据库与 uploads；调用方需先关闭自己的会话。"""
+    try:
+        with zipfile.ZipFile(uploaded_zip, mode="r") as zf:
+            manifest = read_manifest(uploaded_zip)
+            if manifest.get("format") == BACKUP_FORMAT:
+                validate_backup_zip(zf)
+                if DB_ARCNAME in zf.namelist():
+                    zf.extract(DB_ARCNAME, payload_dir)
+            else:
+                safe_extract_zip(zf, payload_dir)
+        if manifest.get("format") == BACKUP_FORMAT:
+            # 增量备份：沿基础链（本机备份目录）取回全部文件，重建完整快照
+            materialize_uploads([uploaded_zip, *resolve_base_chain(manifest, BACKUP_DIR)], payload_dir)
+            (payload_dir / "uploads").mkdir(parents=True, exist_ok=True)
+    except zipfile.BadZipFile as ex:
+        raise HTTPException(status_code=400, detail="备份压缩包损坏或格式非法。") from ex
+    except BackupChainError as ex:
+        raise HTTPException(status_code=400, detail=f"{ex}请上传完整备份（下载时选择 full=true）。") from ex
+
+    incoming_db = payload_dir / "data" / "app.db"
+    if not incoming_db.exists() or not incoming_db.is_file():
+        raise HTTPException(status_code=400, detail="备份包缺少 data/app.db，无法恢复。")
+    incoming_uploads = payload_dir / "uploads"
+    if job:
+        job.progress(0.3, "正在创建恢复前备份")
+
+    pre_restore = create_backup_archive(actor=actor, trigger="pre_restore")
+    if job:
+        # 此后开始替换数据，不再响应取消
+        job.progress(0.6, "正在恢复数据")
+
+    db_file = resolve_sqlite_db_file()
+    engine.dispose()
+
+    db_file.parent.mkdir(parents=True, exist_ok=True)
+    # 先复制到同目录临时文件再原子替换，不在原文件上原地覆盖
+    staging_db = db_file.with_name(f"{db_file.name}.restoring-{uuid.uuid4().hex[:8]}")
+    try:
+        shutil.copy2(incoming_db, staging_db)
+        os.replace(staging_db, db_file)
+    finally:
+        staging_db.unlink(missing_ok=True)
+    invalidate_auth_cache()
+
+    moved_old_uploads = False
+    old_uploads_dir = BACKUP_DIR / f"_uploads_before_restore_{uuid.uuid4().hex[:8]}"
+    if incoming_uploads.exists() and incoming_uploads.is_dir():
+        if UPLOAD_DIR.exists():
+            UPLOAD_DIR.rename(old_uploads_dir)
+            moved_old_uploads = True
+        try:
+            shutil.copytree(incoming_uploads, UPLOAD_DIR)
+            if moved_old_uploads and old_uploads_dir.exists():
+                shutil.rmtree(old_uploads_dir, ignore_errors=True)
+        except Exception:
+            if UPLOAD_DIR.exists():
+                shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+            if moved_old_uploads and old_uploads_dir.exists():
+                old_uploads_dir.rename(UPLOAD_DIR)
+            raise
+
+    ensure_dirs()
+    init_db()
+    ensure_schema_upgrades()
+    ensure_search_index(engine)
+    ensure_dashboard_buckets(engine)
+    ensure_workflow_defaults()
+    return {
+        "message": "恢复成功",
+        "pre_restore_backup": pre_restore.name,
+    }
 
 
 @app.post("/api/backup/restore")
@@ -2819,6 +3581,7 @@ def restore_backup(
     request: Request,
     file: UploadFile = File(...),
     confirm: bool = Form(False),
+    async_mode: bool = Query(False, alias="async"),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
     actor, _ = require_roles(request, db, {"admin"})
@@ -2831,69 +3594,100 @@ def restore_backup(
 
     ensure_dirs()
     temp_root = BACKUP_DIR / f"_restore_{uuid.uuid4().hex}"
-    payload_dir = temp_root / "payload"
     uploaded_zip = temp_root / "uploaded.zip"
     temp_root.mkdir(parents=True, exist_ok=True)
-
-    upload_size = 0
+    handed_off = False
     try:
-        with uploaded_zip.open("wb") as out:
-            while True:
-                chunk = file.file.read(1024 * 1024)
-                if not chunk:
-                    break
-                upload_size += len(chunk)
-                if upload_size > MAX_BACKUP_FILE:
-                    raise HTTPException(status_code=400, detail="备份文件过大，已超过系统限制。")
-                out.write(chunk)
+        receive_backup_upload(file, uploaded_zip)
+        if async_mode:
+
+            def run_restore(job: JobContext) -> dict[str, Any]:
+                try:
+                    return restore_backup_archive(uploaded_zip, temp_root / "payload", actor, job)
+                finally:
+                    shutil.rmtree(temp_root, ignore_errors=True)
+
+            # 恢复会替换数据库文件：要求没有其他后台任务，且恢复期间不接受新任务
+            accepted = submit_background_job("backup_restore", actor, run_restore, exclusive=True)
+            handed_off = True
+            return accepted
+        owner = f"sync-restore-{uuid.uuid4().hex}"
         try:
-            with zipfile.ZipFile(uploaded_zip, mode="r") as zf:
-                safe_extract_zip(zf, payload_dir)
-        except zipfile.BadZipFile as ex:
-            raise HTTPException(status_code=400, detail="备份压缩包损坏或格式非法。") from ex
+            JOB_QUEUE.begin_exclusive(owner)
+        except JobQueueBusy as ex:
+            raise HTTPException(status_code=409, detail="仍有后台任务在执行，请等待其完成后再恢复备份。") from ex
+        try:
+            db.close()
+            return restore_backup_archive(uploaded_zip, temp_root / "payload", actor)
+        finally:
+            JOB_QUEUE.end_exclusive(owner)
+    finally:
+        file.file.close()
+        if not handed_off and temp_root.exists():
+            shutil.rmtree(temp_root, ignore_errors=True)
 
-        incoming_db = payload_dir / "data" / "app.db"
-        if not incoming_db.exists() or not incoming_db.is_file():
-            raise HTTPException(status_code=400, detail="备份包缺少 data/app.db，无法恢复。")
-        incoming_uploads = payload_dir / "uploads"
 
-        pre_restore = create_backup_archive(actor=actor, trigger="pre_restore")
+def submit_background_job(kind: str, actor: str, func: Any, exclusive: bool = False) -> dict[str, Any]:
+    try:
+        job_id = JOB_QUEUE.submit(engine, kind, actor, func, exclusive=exclusive)
+    except JobQueueBusy as ex:
+        if exclusive:
+            raise HTTPException(status_code=409, detail="仍有后台任务在执行，请等待其完成后再恢复备份。") from ex
+        raise HTTPException(status_code=409, detail="正在恢复备份，请稍后再提交任务。") from ex
+    except JobQueueFull as ex:
+        raise HTTPException(status_code=429, detail="后台任务过多，请稍后再试。") from ex
+    return {"message": "任务已提交", "job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
 
-        db_file = resolve_sqlite_db_file()
-        db.close()
-        engine.dispose()
 
-        db_file.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(incoming_db, db_file)
+def job_result_file(job: JobContext, suffix: str) -> Path:
+    JOB_RESULT_DIR.mkdir(parents=True, exist_ok=True)
+    return JOB_RESULT_DIR / f"{job.job_id}{suffix}"
 
-        moved_old_uploads = False
-        old_uploads_dir = BACKUP_DIR / f"_uploads_before_restore_{uuid.uuid4().hex[:8]}"
-        if incoming_uploads.exists() and incoming_uploads.is_dir():
-            if UPLOAD_DIR.exists():
-                UPLOAD_DIR.rename(old_uploads_dir)
-                moved_old_uploads = True
-            try:
-                shutil.copytree(incoming_uploads, UPLOAD_DIR)
-                if moved_old_uploads and old_uploads_dir.exists():
-                    shutil.rmtree(old_uploads_dir, ignore_errors=True)
-            except Exception:
-                if UPLOAD_DIR.exists():
-                    shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
-                if moved_old_uploads and old_uploads_dir.exists():
-                    old_uploads_dir.rename(UPLOAD_DIR)
-                raise
-
-        ensure_dirs()
-        init_db()
-    finally:
-        file.file.close()
-        if temp_root.exists():
-            shutil.rmtree(temp_root, ignore_errors=True)
 
-    return {
-        "message": "恢复成功",
-        "pre_restore_backup": pre_restore.name,
-    }
+def serialize_job(item: dict[str, Any]) -> dict[str, Any]:
+    data = {k: v for k, v in item.items() if k != "result_path"}
+    data["download_url"] = f"/api/jobs/{item['id']}/download" if item.get("result_path") else None
+    return data
+
+
+def get_job_or_404(request: Request, db: Session, job_id: str) -> dict[str, Any]:
+    actor, role = require_roles(request, db, {"admin", "reviewer", "evaluator"}, legacy_admin=True)
+    item = JOB_QUEUE.get(engine, job_id)
+    # 非管理员只能查看自己提交的任务
+    if not item or (role != "admin" and item.get("created_by") != actor):
+        raise HTTPException(status_code=404, detail="任务不存在。")
+    return item
+
+
+@app.get("/api/jobs")
+def list_jobs(request: Request, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)) -> dict[str, Any]:
+    actor, role = require_roles(request, db, {"admin", "reviewer", "evaluator"}, legacy_admin=True)
+    items = JOB_QUEUE.list_jobs(engine, None if role == "admin" else actor, limit)
+    return {"items": [serialize_job(item) for item in items]}
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(request: Request, job_id: str, db: Session = Depends(get_db)) -> dict[str, Any]:
+    return serialize_job(get_job_or_404(request, db, job_id))
+
+
+@app.get("/api/jobs/{job_id}/download")
+def download_job_result(request: Request, job_id: str, db: Session = Depends(get_db)) -> FileResponse:
+    item = get_job_or_404(request, db, job_id)
+    if item["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail="任务尚未完成。")
+    result_path = Path(item.get("result_path") or "")
+    if not item.get("result_path") or not result_path.is_file():
+        raise HTTPException(status_code=404, detail="任务没有可下载的结果或结果已过期。")
+    return FileResponse(path=str(result_path), filename=item.get("result_name") or result_path.name)
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(request: Request, job_id: str, db: Session = Depends(get_db)) -> dict[str, Any]:
+    item = get_job_or_404(request, db, job_id)
+    if item["status"] not in ACTIVE_STATUSES or not JOB_QUEUE.cancel(engine, job_id):
+        raise HTTPException(status_code=409, detail="任务已结束，无法取消。")
+    return serialize_job(JOB_QUEUE.get(engine, job_id) or item)
 
 
 @app.post("/api/auth/login")
@@ -2955,6 +3749,7 @@ def auth_logout(request: Request, db: Session = Depends(get_db)) -> JSONResponse
     if row:
         db.delete(row)
         db.commit()
+    invalidate_auth_cache(token=token)
     return response
 
 
@@ -3055,6 +3850,7 @@ def change_password(request: Request, payload: dict[str, Any], db: Session = Dep
     user.password_updated_at = datetime.now()
     db.query(AuthSession).filter(AuthSession.user_id == user.id).delete(synchronize_session=False)
     db.commit()
+    invalidate_auth_cache(user_id=user.id)
     return {"message": "密码修改成功，请使用新密码登录。"}
 
 
@@ -3072,6 +3868,7 @@ def reset_user_password(request: Request, user_id: int, payload: dict[str, Any],
     user.password_updated_at = None
     db.query(AuthSession).filter(AuthSession.user_id == user.id).delete(synchronize_session=False)
     db.commit()
+    invalidate_auth_cache(user_id=user.id)
     return {
         "message": "密码重置成功，用户下次登录需修改密码。",
         "data": {
@@ -3091,6 +3888,7 @@ def toggle_user(request: Request, user_id: int, enabled: bool = Query(True), db:
         raise HTTPException(status_code=404, detail="用户不存在。")
     user.enabled = enabled
     db.commit()
+    invalidate_auth_cache(user_id=user.id)
     return {"message": "状态更新成功", "enabled": enabled}
 
 
@@ -3546,9 +4344,17 @@ def list_organizations(
     filing_region: str | None = None,
     created_by: str | None = None,
     include_deleted: bool = False,
+    fields: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    total_mode: str = Query("exact"),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
-    query = db.query(Organization)
+    total_mode = total_mode.strip().lower()
+    if total_mode not in LIST_TOTAL_MODES:
+        raise HTTPException(status_code=400, detail="total_mode 仅支持 exact/approx/none。")
+    columns = parse_list_fields(fields, ORG_FIELDS)
+    query = db.query(*[getattr(Organization, f) for f in columns])
     if not include_deleted:
         query = query.filter(Organization.deleted_at.is_(None))
     if name:
@@ -3561,8 +4367,18 @@ def list_organizations(
         query = query.filter(Organization.filing_region.like(f"%{escape_like(filing_region)}%"))
     if created_by:
         query = query.filter(Organization.created_by.like(f"%{escape_like(created_by)}%"))
-    items = query.order_by(Organization.created_at.desc()).all()
-    return {"total": len(items), "items": [obj_to_dict(i, ORG_FIELDS) for i in items]}
+    if limit is None and not cursor:
+        rows = query.order_by(Organization.created_at.desc(), Organization.id.desc()).all()
+        return {"total": len(rows), "items": [obj_to_dict(r, columns) for r in rows]}
+    cache_key = ("organizations", name, credit_code, industry, filing_region, created_by, include_deleted)
+    total = count_list_query(query, cache_key, total_mode)
+    rows, next_cursor = fetch_keyset_page(query, Organization, cursor, limit or 50)
+    return {
+        "total": total,
+        "total_mode": total_mode,
+        "next_cursor": next_cursor,
+        "items": [obj_to_dict(r, columns) for r in rows],
+    }
 
 
 @app.post("/api/organizations/collection-links")
@@ -3819,49 +4635,225 @@ def cleanup_organization_recycle_bin(
     return {"message": "单位回收站清理完成", "purged": purged, "skipped": skipped, "actor": actor_name}
 
 
+ORGANIZATION_EXPORT_HEADERS = [
+    "单位名称",
+    "统一社会信用代码",
+    "单位负责人",
+    "单位地址",
+    "办公电话",
+    "移动电话",
+    "邮箱",
+    "所属行业",
+    "单位类型",
+    "备案地区",
+]
+SYSTEM_EXPORT_HEADERS = ["系统名称", "系统编号", "单位ID", "拟定等级", "部署方式", "系统类型", "上线时间", "录入人"]
+TABULAR_EXPORT_MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def iter_export_rows(columns: list[Any], model: Any, row_mapper: Callable[[Any], list[Any]] | None = None):
+    """独立会话按 id 顺序分批读取未删除记录，只取导出所需列。"""
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(*columns)
+            .filter(model.deleted_at.is_(None))
+            .order_by(model.id.asc())
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+        for row in query:
+            yield row_mapper(row) if row_mapper else list(row)
+    finally:
+        db.close()
+
+
+def stream_tabular_export(file_format: str, base_name: str, sheet_title: str, headers: list[str], rows) -> StreamingResponse:
+    if file_format == "csv":
+        body = iter_csv(headers, rows, flush_rows=EXPORT_CHUNK_ROWS)
+    else:
+        body = iter_xlsx(sheet_title, headers, rows, flush_rows=EXPORT_CHUNK_ROWS)
+    file_name = f"{base_name}_{datetime.now():%Y%m%d%H%M%S}.{file_format}"
+    return StreamingResponse(
+        body,
+        media_type=TABULAR_EXPORT_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(file_name)}"},
+    )
+
+
+def normalize_tabular_export_format(file_format: str) -> str:
+    value = (file_format or "xlsx").strip().lower()
+    if value not in TABULAR_EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="导出格式仅支持 xlsx 或 csv")
+    return value
+
+
 @app.get("/api/organizations/export/excel")
-def export_organizations_excel(request: Request, db: Session = Depends(get_db)) -> FileResponse:
+def export_organizations_excel(
+    request: Request,
+    file_format: str = Query("xlsx", alias="format"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
     require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
-    rows = db.query(Organization).filter(Organization.deleted_at.is_(None)).all()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "单位信息"
-    headers = [
-        "单位名称",
-        "统一社会信用代码",
-        "单位负责人",
-        "单位地址",
-        "办公电话",
-        "移动电话",
-        "邮箱",
-        "所属行业",
-        "单位类型",
-        "备案地区",
+    file_format = normalize_tabular_export_format(file_format)
+    columns = [
+        Organization.name,
+        Organization.credit_code,
+        Organization.legal_representative,
+        Organization.address,
+        Organization.office_phone,
+        Organization.mobile_phone,
+        Organization.email,
+        Organization.industry,
+        Organization.organization_type,
+        Organization.filing_region,
     ]
-    ws.append(headers)
-    for i in rows:
-        ws.append(
-            [
-                i.name,
-                i.credit_code,
-                i.legal_representative,
-                i.address,
-                i.office_phone,
-                i.mobile_phone,
-                i.email,
-                i.industry,
-                i.organization_type,
-                i.filing_region,
-            ]
+    rows = iter_export_rows(columns, Organization)
+    return stream_tabular_export(file_format, "organizations", "单位信息", ORGANIZATION_EXPORT_HEADERS, rows)
+
+
+def load_credit_code_index(db: Session) -> dict[str, tuple[int, bool]]:
+    """统一社会信用代码 -> (单位ID, 是否在回收站)，导入前一次性加载。"""
+    rows = db.query(Organization.credit_code, Organization.id, Organization.deleted_at).all()
+    return {code: (org_id, deleted_at is not None) for code, org_id, deleted_at in rows}
+
+
+def check_credit_code_index(index: dict[str, tuple[int, bool]], credit_code: str) -> None:
+    hit = index.get(credit_code)
+    if hit is None:
+        return
+    org_id, deleted = hit
+    if deleted:
+        raise HTTPException(
+            status_code=409,
+            detail=f"统一社会信用代码已存在于回收站(ID={org_id})，请先恢复该单位。",
         )
-    path = EXPORT_DIR / f"organizations_{datetime.now():%Y%m%d%H%M%S}.xlsx"
-    wb.save(path)
-    return FileResponse(path=str(path), filename=path.name, background=BackgroundTask(_cleanup_export_file, path))
+    raise HTTPException(status_code=409, detail="统一社会信用代码已存在。")
+
+
+def parse_organization_import_row(row: tuple[Any, ...], actor: str) -> dict[str, Any]:
+    data = {
+        "name": str(row[0] or "").strip(),
+        "credit_code": str(row[1] or "").strip().upper(),
+        "legal_representative": str(row[2] or "").strip(),
+        "address": str(row[3] or "").strip(),
+        "office_phone": str(row[4]).strip() if row[4] else None,
+        "mobile_phone": str(row[5] or "").strip(),
+        "email": str(row[6] or "").strip(),
+        "industry": str(row[7] or "").strip(),
+        "organization_type": str(row[8] or "").strip(),
+        "filing_region": str(row[9] or "").strip(),
+        "created_by": actor,
+    }
+    normalize_org_payload(data)
+    validate_org_payload(data)
+    return data
+
+
+def insert_returning_rows(db: Session, model: Any, rows: list[dict[str, Any]]) -> list[Any]:
+    """整批插入并按输入顺序返回 ORM 对象。
+
+    方言支持 executemany RETURNING 时一条语句完成；否则（如 MySQL）交给 ORM 批量 INSERT，
+    flush 后主键已回填，再用一条查询加载服务端默认值，避免逐行刷新。
+    """
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.scalars(insert(model).returning(model, sort_by_parameter_order=True), rows).all())
+    objs = [model(**row) for row in rows]
+    db.add_all(objs)
+    db.flush()
+    db.query(model).filter(model.id.in_([obj.id for obj in objs])).populate_existing().all()
+    return objs
+
+
+def insert_organization_batch(db: Session, rows: list[dict[str, Any]], actor: str) -> list[Organization]:
+    """一条 INSERT ... RETURNING 写入整批单位，再批量写导入历史，并补登检索索引与看板分桶。"""
+    orgs = insert_returning_rows(db, Organization, rows)
+    db.execute(
+        insert(OrganizationHistory),
+        [
+            {
+                "organization_id": org.id,
+                "changed_by": actor,
+                "change_type": "import",
+                "before_data": None,
+                "after_data": obj_to_dict(org, ORG_FIELDS),
+            }
+            for org in orgs
+        ],
+    )
+    index_inserted_rows(db, "organizations", orgs)
+    refresh_buckets_for_inserted(db, "organization", orgs)
+    return orgs
+
+
+def write_import_batch(
+    db: Session,
+    prepared: list[tuple[int, dict[str, Any]]],
+    writer: Callable[[Session, list[dict[str, Any]], str], list[Any]],
+    actor: str,
+    report: ImportReport,
+) -> None:
+    """整批写入；批内有行违反约束时回滚该批，逐行重写以定位出错行。"""
+    if not prepared:
+        return
+    try:
+        with db.begin_nested():
+            report.imported += len(writer(db, [data for _, data in prepared], actor))
+        return
+    except SQLAlchemyError:
+        pass
+    for row_no, data in prepared:
+        try:
+            with db.begin_nested():
+                report.imported += len(writer(db, [data], actor))
+        except Exception as exc:
+            report.fail(row_no, exc)
+
+
+def import_organization_rows(db: Session, content: bytes, actor: str, job: JobContext | None = None) -> dict[str, Any]:
+    report = ImportReport()
+    credit_codes = load_credit_code_index(db)
+    for chunk, read_ratio in iter_sheet_chunks(content, IMPORT_CHUNK_ROWS):
+        prepared: list[tuple[int, dict[str, Any]]] = []
+        for idx, row in chunk:
+            if not row or not row[0]:
+                continue
+            if len(row) < 10:
+                report.fail(idx, "列数不足（需要至少10列）")
+                continue
+            try:
+                data = parse_organization_import_row(row, actor)
+                check_credit_code_index(credit_codes, data["credit_code"])
+            except Exception as exc:
+                report.fail(idx, exc)
+                continue
+            # 同一文件内重复的信用代码按已存在处理
+            credit_codes[data["credit_code"]] = (0, False)
+            prepared.append((idx, data))
+        write_import_batch(db, prepared, insert_organization_batch, actor, report)
+        if job:
+            job.progress(read_ratio)
+    db.commit()
+    return report.as_dict()
+
+
+def run_import_job(importer: Any, content: bytes, actor: str) -> Any:
+    def run(job: JobContext) -> dict[str, Any]:
+        # 取消时未提交的导入整体回滚
+        with SessionLocal() as job_db:
+            return importer(job_db, content, actor, job)
+
+    return run
 
 
 @app.post("/api/organizations/import/excel")
 async def import_organizations_excel(
-    request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)
+    request: Request,
+    file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
+    db: Session = Depends(get_db),
 ) -> dict[str, Any]:
     actor, _ = require_roles(request, db, {"admin"}, legacy_admin=True)
     if not file.filename or not file.filename.lower().endswith(".xlsx"):
@@ -3870,43 +4862,9 @@ async def import_organizations_excel(
     # 限制导入文件大小，防止恶意上传超大文件
     if len(content) > 50 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="导入文件过大，请限制在50MB以内。")
-    wb = load_workbook(io.BytesIO(content))
-    ws = wb.active
-    imported = 0
-    skipped: list[str] = []
-    for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        if not row or not row[0]:
-            continue
-        if len(row) < 10:
-            skipped.append(f"第{idx}行：列数不足（需要至少10列）")
-            continue
-        data = {
-            "name": str(row[0] or "").strip(),
-            "credit_code": str(row[1] or "").strip().upper(),
-            "legal_representative": str(row[2] or "").strip(),
-            "address": str(row[3] or "").strip(),
-            "office_phone": str(row[4]).strip() if row[4] else None,
-            "mobile_phone": str(row[5] or "").strip(),
-            "email": str(row[6] or "").strip(),
-            "industry": str(row[7] or "").strip(),
-            "organization_type": str(row[8] or "").strip(),
-            "filing_region": str(row[9] or "").strip(),
-            "created_by": actor,
-        }
-        try:
-            with db.begin_nested():
-                normalize_org_payload(data)
-                validate_org_payload(data)
-                assert_credit_code_available(db, data["credit_code"])
-                org = Organization(**data)
-                db.add(org)
-                db.flush()
-                record_org_history(db, org.id, actor, "import", None, obj_to_dict(org, ORG_FIELDS))
-            imported += 1
-        except Exception as exc:
-            skipped.append(f"第{idx}行：{exc}")
-    db.commit()
-    return {"message": "导入完成", "imported": imported, "skipped": skipped}
+    if async_mode:
+        return submit_background_job("organization_import", actor, run_import_job(import_organization_rows, content, actor))
+    return import_organization_rows(db, content, actor)
 
 
 @app.post("/api/organizations/import/word")
@@ -4022,27 +4980,20 @@ def update_organization(
 
 
 @app.get("/api/organizations/{org_id}/history")
-def organization_history(org_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
+def organization_history(
+    org_id: int,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
     get_org_or_404(db, org_id)
-    rows = (
-        db.query(OrganizationHistory)
-        .filter(OrganizationHistory.organization_id == org_id)
-        .order_by(OrganizationHistory.changed_at.desc())
-        .all()
-    )
-    return {
-        "total": len(rows),
-        "items": [
-            {
-                "changed_by": r.changed_by,
-                "change_type": r.change_type,
-                "before_data": r.before_data,
-                "after_data": r.after_data,
-                "changed_at": r.changed_at,
-            }
-            for r in rows
-        ],
-    }
+    return history_summary_page(db, OrganizationHistory, org_id, page, page_size)
+
+
+@app.get("/api/organizations/{org_id}/history/{history_id}")
+def organization_history_version(org_id: int, history_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
+    get_org_or_404(db, org_id)
+    return history_version_detail(db, OrganizationHistory, org_id, history_id)
 
 
 @app.post("/api/organizations/{org_id}/archive")
@@ -4067,10 +5018,11 @@ def unlock_organization(
 ) -> dict[str, Any]:
     actor_name, _ = require_roles(request, db, {"admin"}, legacy_admin=True)
     org = get_org_or_404(db, org_id)
+    before = obj_to_dict(org, ORG_FIELDS)
     org.locked = False
     db.flush()
     db.refresh(org)
-    record_org_history(db, org.id, actor_name, "unlock", None, {"locked": False})
+    record_org_history(db, org.id, actor_name, "unlock", before, obj_to_dict(org, ORG_FIELDS))
     db.commit()
     return {"message": "解锁成功", "data": obj_to_dict(org, ORG_FIELDS)}
 
@@ -4232,11 +5184,21 @@ def list_systems(
     deployment_mode: str | None = None,
     created_by: str | None = None,
     include_deleted: bool = False,
+    fields: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    total_mode: str = Query("exact"),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
-    query = db.query(SystemInfo, Organization.name.label("organization_name")).join(
-        Organization, Organization.id == SystemInfo.organization_id
-    )
+    total_mode = total_mode.strip().lower()
+    if total_mode not in LIST_TOTAL_MODES:
+        raise HTTPException(status_code=400, detail="total_mode 仅支持 exact/approx/none。")
+    columns = parse_list_fields(fields, SYSTEM_FIELDS + ["organization_name"])
+    selected = [
+        Organization.name.label("organization_name") if f == "organization_name" else getattr(SystemInfo, f)
+        for f in columns
+    ]
+    query = db.query(*selected).select_from(SystemInfo).join(Organization, Organization.id == SystemInfo.organization_id)
     if not include_deleted:
         query = query.filter(SystemInfo.deleted_at.is_(None))
     if system_name:
@@ -4251,21 +5213,77 @@ def list_systems(
         query = query.filter(SystemInfo.deployment_mode.like(f"%{escape_like(deployment_mode)}%"))
     if created_by:
         query = query.filter(SystemInfo.created_by.like(f"%{escape_like(created_by)}%"))
-    rows = query.order_by(SystemInfo.created_at.desc()).all()
-    items = []
-    for system, org_name in rows:
-        data = obj_to_dict(system, SYSTEM_FIELDS)
-        data["organization_name"] = org_name
-        items.append(data)
+    if limit is None and not cursor:
+        rows = query.order_by(SystemInfo.created_at.desc(), SystemInfo.id.desc()).all()
+        return {"total": len(rows), "items": [obj_to_dict(r, columns) for r in rows]}
+    cache_key = (
+        "systems", system_name, system_code, organization_name, proposed_level, deployment_mode, created_by, include_deleted
+    )
+    total = count_list_query(query, cache_key, total_mode)
+    rows, next_cursor = fetch_keyset_page(query, SystemInfo, cursor, limit or 50)
+    return {
+        "total": total,
+        "total_mode": total_mode,
+        "next_cursor": next_cursor,
+        "items": [obj_to_dict(r, columns) for r in rows],
+    }
+
+
+@app.get("/api/search")
+def search_all(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    assert_safe_text(q, "q")
+    entity_types = set(SEARCH_ENTITY_TYPES)
+    if types and types.strip():
+        entity_types = {t.strip().lower() for t in types.split(",") if t.strip()}
+        unknown = entity_types - set(SEARCH_ENTITY_TYPES)
+        if unknown:
+            raise HTTPException(status_code=400, detail="types 仅支持 organization/system/knowledge。")
+    if APP_LITE_MODE:
+        entity_types.discard("knowledge")
+    items = search_entities(db, q, entity_types, limit)
     return {"total": len(items), "items": items}
 
 
+def payload_etag(payload: Any) -> str:
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match") or ""
+    candidates = {item.strip().removeprefix("W/") for item in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def conditional_json_response(request: Request, payload: Any) -> Response:
+    """带 ETag 的 JSON 响应；If-None-Match 命中时返回 304，不再传输正文。"""
+    etag = payload_etag(payload)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jsonable_encoder(payload), headers=headers)
+
+
 @app.get("/api/filing-workspace/overview")
 def filing_workspace_overview(
+    request: Request,
     keyword: str | None = None,
     include_archived: bool = False,
+    view: str = Query("full"),
+    page: int | None = Query(None, ge=1),
+    page_size: int | None = Query(None, ge=1, le=500),
     db: Session = Depends(get_db),
-) -> dict[str, Any]:
+) -> Response:
+    view = view.strip().lower()
+    if view not in {"full", "summary"}:
+        raise HTTPException(status_code=400, detail="view 仅支持 full/summary。")
+    include_detail = view == "full"
+    org_columns = FILING_OVERVIEW_ORG_COLUMNS + ((Organization.filing_detail,) if include_detail else ())
     org_query = db.query(Organization).filter(Organization.deleted_at.is_(None))
     if keyword:
         token = f"%{escape_like(keyword.strip())}%"
@@ -4278,18 +5296,30 @@ def filing_workspace_overview(
         )
     if not include_archived:
         org_query = org_query.filter(Organization.archived.is_(False))
-    organizations = org_query.order_by(Organization.archived.asc(), Organization.updated_at.desc()).all()
+    total = org_query.with_entities(func.count(Organization.id)).scalar() or 0
+    org_query = org_query.options(load_only(*org_columns)).order_by(
+        Organization.archived.asc(), Organization.updated_at.desc(), Organization.id.desc()
+    )
+    if page is not None or page_size is not None:
+        effective_page = page or 1
+        effective_page_size = page_size or 50
+        org_query = org_query.offset((effective_page - 1) * effective_page_size).limit(effective_page_size)
+    organizations = org_query.all()
     org_ids = [org.id for org in organizations]
     systems_by_org: dict[int, list[SystemInfo]] = {org_id: [] for org_id in org_ids}
     if org_ids:
-        sys_query = db.query(SystemInfo).filter(SystemInfo.organization_id.in_(org_ids), SystemInfo.deleted_at.is_(None))
+        sys_query = (
+            db.query(SystemInfo)
+            .options(load_only(*FILING_OVERVIEW_SYSTEM_COLUMNS))
+            .filter(SystemInfo.organization_id.in_(org_ids), SystemInfo.deleted_at.is_(None))
+        )
         if not include_archived:
             sys_query = sys_query.filter(SystemInfo.archived.is_(False))
         rows = sys_query.order_by(SystemInfo.archived.asc(), SystemInfo.updated_at.desc()).all()
         for row in rows:
             systems_by_org.setdefault(row.organization_id, []).append(row)
-    items = [build_filing_overview_item(org, systems_by_org.get(org.id, [])) for org in organizations]
-    return {"total": len(items), "items": items}
+    items = [build_filing_overview_item(org, systems_by_org.get(org.id, []), include_detail) for org in organizations]
+    return conditional_json_response(request, {"total": total, "items": items})
 
 
 @app.get("/api/filing-workspace/systems/{system_id}")
@@ -4359,7 +5389,9 @@ async def preview_filing_workspace_excel_import(
         ),
     }
     current_snapshot = _build_excel_import_current_snapshot(db, org, system)
-    conflicts, direct_update_keys = _diff_excel_import_candidate(current_snapshot, candidate)
+    changes = tuple(_collect_excel_import_changes(current_snapshot, candidate))
+    conflicts, direct_update_keys = _split_excel_import_changes(changes)
+    preview_token = EXCEL_IMPORT_PREVIEW_CACHE.put(ExcelImportPreview(system_id=system.id, changes=changes))
     return {
         "message": "预检完成",
         "data": {
@@ -4367,6 +5399,8 @@ async def preview_filing_workspace_excel_import(
             "conflicts": conflicts,
             "direct_update_keys": direct_update_keys,
             "unmapped_fields": [],
+            "preview_token": preview_token,
+            "expires_in": int(EXCEL_IMPORT_PREVIEW_CACHE.ttl_seconds),
         },
     }
 
@@ -4387,14 +5421,6 @@ def apply_filing_workspace_excel_import(
     if not isinstance(payload, dict):
         raise HTTPException(status_code=400, detail="payload 必须为对象。")
 
-    raw_candidate = payload.get("candidate") if isinstance(payload.get("candidate"), dict) else {}
-    candidate = {
-        "organization": deep_copy_json(raw_candidate.get("organization") if isinstance(raw_candidate.get("organization"), dict) else {}),
-        "system": deep_copy_json(raw_candidate.get("system") if isinstance(raw_candidate.get("system"), dict) else {}),
-        "grading_report_content": deep_copy_json(
-            raw_candidate.get("grading_report_content") if isinstance(raw_candidate.get("grading_report_content"), dict) else {}
-        ),
-    }
     override_keys = {
         str(item).strip()
         for item in (payload.get("override_keys") if isinstance(payload.get("override_keys"), list) else [])
@@ -4402,7 +5428,25 @@ def apply_filing_workspace_excel_import(
     }
 
     current_snapshot = _build_excel_import_current_snapshot(db, org, system)
-    selected, applied_keys = _select_excel_import_candidate_values(current_snapshot, candidate, override_keys)
+    preview_token = str(payload.get("preview_token") or "").strip()
+    if preview_token:
+        # 复用预检时的差异，只核对将要写入的路径在预检后未被改动
+        preview = EXCEL_IMPORT_PREVIEW_CACHE.get(preview_token)
+        if preview is None or preview.system_id != system_id:
+            raise HTTPException(status_code=404, detail="预检结果不存在或已过期，请重新上传 Excel。")
+        if any(_current_import_compare_value(current_snapshot, c.key) != c.current_norm for c in preview.changes):
+            raise HTTPException(status_code=409, detail="预检后数据已被修改，请重新上传 Excel 预检。")
+        selected, applied_keys = _select_excel_import_changes(preview.changes, override_keys)
+    else:
+        raw_candidate = payload.get("candidate") if isinstance(payload.get("candidate"), dict) else {}
+        candidate = {
+            "organization": deep_copy_json(raw_candidate.get("organization") if isinstance(raw_candidate.get("organization"), dict) else {}),
+            "system": deep_copy_json(raw_candidate.get("system") if isinstance(raw_candidate.get("system"), dict) else {}),
+            "grading_report_content": deep_copy_json(
+                raw_candidate.get("grading_report_content") if isinstance(raw_candidate.get("grading_report_content"), dict) else {}
+            ),
+        }
+        selected, applied_keys = _select_excel_import_candidate_values(current_snapshot, candidate, override_keys)
 
     org_payload = selected.get("organization") if isinstance(selected.get("organization"), dict) else {}
     system_payload = selected.get("system") if isinstance(selected.get("system"), dict) else {}
@@ -4424,6 +5468,8 @@ def apply_filing_workspace_excel_import(
         row.updated_by = actor or "system"
 
     db.commit()
+    if preview_token:
+        EXCEL_IMPORT_PREVIEW_CACHE.discard(preview_token)
     db.refresh(org)
     db.refresh(system)
     if report_content is None:
@@ -4481,16 +5527,14 @@ async def upload_filing_workspace_attachment(
 ) -> dict[str, Any]:
     actor, _ = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
     system = get_system_or_404(db, system_id)
-    content = await file.read()
-    if len(content) > MAX_SYS_ATTACHMENT:
-        raise HTTPException(status_code=400, detail=f"文件大小超过限制({MAX_SYS_ATTACHMENT // 1024 // 1024}MB)。")
+    staged = await stage_upload(file, MAX_SYS_ATTACHMENT, f"文件大小超过限制({MAX_SYS_ATTACHMENT // 1024 // 1024}MB)。")
     row = save_attachment_row(
         db,
         entity_type="system",
         entity_id=system_id,
         actor=actor,
         file_name=file.filename,
-        content=content,
+        staged=staged,
     )
     detail = merged_system_filing_detail(system)
     slot_key = slot_key.strip()
@@ -4583,36 +5627,138 @@ def cleanup_system_recycle_bin(
     return {"message": "系统回收站清理完成", "purged": purged, "skipped": skipped, "actor": actor_name}
 
 
+def _system_export_row(row: Any) -> list[Any]:
+    values = list(row)
+    values[6] = values[6].isoformat() if values[6] else ""
+    return values
+
+
 @app.get("/api/systems/export/excel")
-def export_systems_excel(request: Request, db: Session = Depends(get_db)) -> FileResponse:
+def export_systems_excel(
+    request: Request,
+    file_format: str = Query("xlsx", alias="format"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
     require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
-    rows = db.query(SystemInfo).filter(SystemInfo.deleted_at.is_(None)).all()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "系统信息"
-    headers = ["系统名称", "系统编号", "单位ID", "拟定等级", "部署方式", "系统类型", "上线时间", "录入人"]
-    ws.append(headers)
-    for i in rows:
-        ws.append(
-            [
-                i.system_name,
-                i.system_code,
-                i.organization_id,
-                i.proposed_level,
-                i.deployment_mode,
-                i.system_type,
-                i.go_live_date.isoformat() if i.go_live_date else "",
-                i.created_by,
-            ]
-        )
-    path = EXPORT_DIR / f"systems_{datetime.now():%Y%m%d%H%M%S}.xlsx"
-    wb.save(path)
-    return FileResponse(path=str(path), filename=path.name, background=BackgroundTask(_cleanup_export_file, path))
+    file_format = normalize_tabular_export_format(file_format)
+    columns = [
+        SystemInfo.system_name,
+        SystemInfo.system_code,
+        SystemInfo.organization_id,
+        SystemInfo.proposed_level,
+        SystemInfo.deployment_mode,
+        SystemInfo.system_type,
+        SystemInfo.go_live_date,
+        SystemInfo.created_by,
+    ]
+    rows = iter_export_rows(columns, SystemInfo, _system_export_row)
+    return stream_tabular_export(file_format, "systems", "系统信息", SYSTEM_EXPORT_HEADERS, rows)
+
+
+def insert_system_batch(db: Session, rows: list[dict[str, Any]], actor: str) -> list[SystemInfo]:
+    """整批写入系统、流程实例与导入历史；新实例的到期时间按当前首节点时限统一计算。"""
+    systems = insert_returning_rows(db, SystemInfo, rows)
+    probe = WorkflowInstance(current_step_index=0, status="in_progress")
+    recalc_workflow_due_at(db, probe, get_workflow_config(db))
+    db.execute(
+        insert(WorkflowInstance),
+        [
+            {"system_id": system.id, "current_step_index": 0, "status": "in_progress", "due_at": probe.due_at}
+            for system in systems
+        ],
+    )
+    db.execute(
+        insert(SystemHistory),
+        [
+            {
+                "system_id": system.id,
+                "changed_by": actor,
+                "change_type": "import",
+                "before_data": None,
+                "after_data": obj_to_dict(system, SYSTEM_FIELDS),
+            }
+            for system in systems
+        ],
+    )
+    index_inserted_rows(db, "systems", systems)
+    refresh_buckets_for_inserted(db, "system", systems)
+    return systems
+
+
+def load_import_organizations(db: Session, org_ids: set[int], cache: dict[int, bool]) -> None:
+    """批量查询本批引用的单位，缓存 单位ID -> 是否归档锁定；不存在的单位不入缓存。"""
+    missing = org_ids - cache.keys()
+    if not missing:
+        return
+    rows = (
+        db.query(Organization.id, Organization.archived, Organization.locked)
+        .filter(Organization.id.in_(missing), Organization.deleted_at.is_(None))
+        .all()
+    )
+    cache.update({org_id: bool(archived and locked) for org_id, archived, locked in rows})
+
+
+def import_system_rows(db: Session, content: bytes, actor: str, job: JobContext | None = None) -> dict[str, Any]:
+    report = ImportReport()
+    org_locked: dict[int, bool] = {}
+    for chunk, read_ratio in iter_sheet_chunks(content, IMPORT_CHUNK_ROWS):
+        org_ids: set[int] = set()
+        for _, row in chunk:
+            try:
+                org_ids.add(int(row[2]))
+            except (IndexError, TypeError, ValueError):
+                pass
+        load_import_organizations(db, org_ids, org_locked)
+        prepared: list[tuple[int, dict[str, Any]]] = []
+        for idx, row in chunk:
+            if not row or not row[0]:
+                continue
+            if len(row) < 7:
+                report.fail(idx, "列数不足（需要至少7列）")
+                continue
+            try:
+                org_id = int(row[2])
+                if org_id not in org_locked:
+                    raise HTTPException(status_code=404, detail="单位不存在。")
+                if org_locked[org_id]:
+                    report.fail(idx, "单位已归档锁定")
+                    continue
+                data = {
+                    "organization_id": org_id,
+                    "system_name": str(row[0] or "").strip(),
+                    "proposed_level": parse_proposed_level(row[3]),
+                    "deployment_mode": str(row[4]).strip() if row[4] else None,
+                    "system_type": str(row[5]).strip() if row[5] else None,
+                    "go_live_date": parse_optional_go_live_date(row[6]),
+                    "created_by": actor,
+                }
+            except Exception as exc:
+                report.fail(idx, exc)
+                continue
+            prepared.append((idx, data))
+        if prepared:
+            try:
+                codes = generate_system_codes(db, len(prepared))
+            except HTTPException as exc:
+                for idx, _ in prepared:
+                    report.fail(idx, exc)
+                prepared = []
+            else:
+                for (_, data), code in zip(prepared, codes):
+                    data["system_code"] = code
+        write_import_batch(db, prepared, insert_system_batch, actor, report)
+        if job:
+            job.progress(read_ratio)
+    db.commit()
+    return report.as_dict()
 
 
 @app.post("/api/systems/import/excel")
 async def import_systems_excel(
-    request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)
+    request: Request,
+    file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
+    db: Session = Depends(get_db),
 ) -> dict[str, Any]:
     actor, _ = require_roles(request, db, {"admin"}, legacy_admin=True)
     if not file.filename or not file.filename.lower().endswith(".xlsx"):
@@ -4621,44 +5767,9 @@ async def import_systems_excel(
     # 限制导入文件大小，防止恶意上传超大文件
     if len(content) > 50 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="导入文件过大，请限制在50MB以内。")
-    wb = load_workbook(io.BytesIO(content))
-    ws = wb.active
-    imported = 0
-    skipped: list[str] = []
-    for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        if not row or not row[0]:
-            continue
-        if len(row) < 7:
-            skipped.append(f"第{idx}行：列数不足（需要至少7列）")
-            continue
-        try:
-            with db.begin_nested():
-                org_id = int(row[2])
-                org = get_org_or_404(db, org_id)
-                if org.archived and org.locked:
-                    skipped.append(f"第{idx}行：单位已归档锁定")
-                    continue
-                sys = SystemInfo(
-                    organization_id=org_id,
-                    system_name=str(row[0] or "").strip(),
-                    system_code=generate_system_code(db),
-                    proposed_level=parse_proposed_level(row[3]),
-                    deployment_mode=str(row[4]).strip() if row[4] else None,
-                    system_type=str(row[5]).strip() if row[5] else None,
-                    go_live_date=parse_optional_go_live_date(row[6]),
-                    created_by=actor,
-                )
-                db.add(sys)
-                db.flush()
-                instance = WorkflowInstance(system_id=sys.id, current_step_index=0, status="in_progress")
-                db.add(instance)
-                recalc_workflow_due_at(db, instance, get_workflow_config(db))
-                record_system_history(db, sys.id, actor, "import", None, obj_to_dict(sys, SYSTEM_FIELDS))
-            imported += 1
-        except Exception as exc:
-            skipped.append(f"第{idx}行：{exc}")
-    db.commit()
-    return {"message": "导入完成", "imported": imported, "skipped": skipped}
+    if async_mode:
+        return submit_background_job("system_import", actor, run_import_job(import_system_rows, content, actor))
+    return import_system_rows(db, content, actor)
 
 
 @app.post("/api/systems/import/word")
@@ -4769,22 +5880,20 @@ def update_system(
 
 
 @app.get("/api/systems/{system_id}/history")
-def system_history(system_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
+def system_history(
+    system_id: int,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
     get_system_or_404(db, system_id)
-    rows = db.query(SystemHistory).filter(SystemHistory.system_id == system_id).order_by(SystemHistory.changed_at.desc()).all()
-    return {
-        "total": len(rows),
-        "items": [
-            {
-                "changed_by": r.changed_by,
-                "change_type": r.change_type,
-                "before_data": r.before_data,
-                "after_data": r.after_data,
-                "changed_at": r.changed_at,
-            }
-            for r in rows
-        ],
-    }
+    return history_summary_page(db, SystemHistory, system_id, page, page_size)
+
+
+@app.get("/api/systems/{system_id}/history/{history_id}")
+def system_history_version(system_id: int, history_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
+    get_system_or_404(db, system_id)
+    return history_version_detail(db, SystemHistory, system_id, history_id)
 
 
 @app.post("/api/systems/{system_id}/copy")
@@ -4803,6 +5912,10 @@ def copy_system(request: Request, system_id: int, db: Session = Depends(get_db))
     copied = SystemInfo(**data)
     db.add(copied)
     db.flush()
+    attachment_map = copy_entity_attachments(db, "system", source.id, copied.id, actor)
+    if attachment_map and isinstance(copied.filing_detail, dict):
+        copied.filing_detail = remap_attachment_refs(copied.filing_detail, attachment_map)
+        db.flush()
     record_system_history(db, copied.id, actor, "copy", None, obj_to_dict(copied, SYSTEM_FIELDS))
     instance = WorkflowInstance(system_id=copied.id, current_step_index=0, status="in_progress")
     db.add(instance)
@@ -4834,10 +5947,11 @@ def unlock_system(
 ) -> dict[str, Any]:
     actor_name, _ = require_roles(request, db, {"admin"}, legacy_admin=True)
     system = get_system_or_404(db, system_id)
+    before = obj_to_dict(system, SYSTEM_FIELDS)
     system.locked = False
     db.flush()
     db.refresh(system)
-    record_system_history(db, system.id, actor_name, "unlock", None, {"locked": False})
+    record_system_history(db, system.id, actor_name, "unlock", before, obj_to_dict(system, SYSTEM_FIELDS))
     db.commit()
     return {"message": "解锁成功", "data": obj_to_dict(system, SYSTEM_FIELDS)}
 
@@ -4959,7 +6073,7 @@ def list_delete_requests(
 ) -> dict[str, Any]:
     reconcile_pending_delete_requests(db)
     backfill_delete_request_review_comments(db)
-    current_user = get_current_user_optional(request, db)
+    principal = get_request_principal(request, db)
     q = db.query(DeleteRequest)
     if entity_type:
         q = q.filter(DeleteRequest.entity_type == entity_type.strip().lower())
@@ -4967,8 +6081,8 @@ def list_delete_requests(
         q = q.filter(DeleteRequest.status == status.strip().lower())
     if requested_by:
         q = q.filter(DeleteRequest.requested_by.like(f"%{escape_like(requested_by)}%"))
-    if current_user and current_user.role != "admin":
-        q = q.filter(DeleteRequest.requested_by == current_user.username)
+    if principal and principal["role"] != "admin":
+        q = q.filter(DeleteRequest.requested_by == principal["username"])
     rows = q.order_by(DeleteRequest.requested_at.desc()).all()
     return {
         "total": len(rows),
@@ -5580,7 +6694,56 @@ def _fill_t6_flow_units(cell: Any, values: list[str]) -> None:
                     runs[1].text = f"{num}_____________________"
 
 
-def fill_filing_template_document(doc: Document, org: Organization, system: SystemInfo) -> None:
+def compile_filing_template(path: Path) -> dict[str, Any]:
+    """解析备案表模板并缓存（按路径 + mtime + 大小失效），同时记录表一至表六每个网格单元格对应的 tr/tc 位置。"""
+    stat = path.stat()
+    key = str(path.resolve())
+    with FILING_TEMPLATE_CACHE_LOCK:
+        cached = FILING_TEMPLATE_CACHE.get(key)
+    if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+        return cached
+    doc = Document(str(path))
+    anchors: dict[int, list[list[tuple[int, int]]]] = {}
+    tables = doc.tables
+    for index in FILING_TEMPLATE_TABLES:
+        if index >= len(tables):
+            break
+        table = tables[index]
+        trs = table._tbl.tr_lst  # 持有 tr 代理对象，保证 getparent() 返回同一对象，id() 可比
+        tr_positions = {id(tr): i for i, tr in enumerate(trs)}
+        grid: list[list[tuple[int, int]]] = []
+        for row in table.rows:
+            row_anchors: list[tuple[int, int]] = []
+            for cell in row.cells:
+                tr = cell._tc.getparent()
+                row_anchors.append((tr_positions[id(tr)], tr.tc_lst.index(cell._tc)))
+            grid.append(row_anchors)
+        anchors[index] = grid
+    compiled = {"path": key, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "doc": doc, "anchors": anchors}
+    with FILING_TEMPLATE_CACHE_LOCK:
+        FILING_TEMPLATE_CACHE[key] = compiled
+    return compiled
+
+
+def instantiate_filing_template(compiled: dict[str, Any]) -> tuple[Document, dict[int, list[list[Any]]]]:
+    """深拷贝缓存的模板文档，并按预存位置直接取回单元格，避免逐次 rows[i].cells 重建整表网格。"""
+    doc = copy.deepcopy(compiled["doc"])
+    tables = doc.tables
+    cells: dict[int, list[list[Any]]] = {}
+    for index, grid in compiled["anchors"].items():
+        table = tables[index]
+        row_tcs = [tr.tc_lst for tr in table._tbl.tr_lst]
+        cells[index] = [[_Cell(row_tcs[r][c], table) for r, c in row_anchors] for row_anchors in grid]
+    return doc, cells
+
+
+def fill_filing_template_document(
+    doc: Document,
+    org: Organization,
+    system: SystemInfo,
+    cells: dict[int, list[list[Any]]] | None = None,
+) -> None:
+    """cells 为表一至表六预解析的单元格网格（见 instantiate_filing_template），缺省时现场解析。"""
     ctx = extract_workspace_export_context(org, system)
     table1 = ctx["table1"]
     table2 = ctx["table2"]
@@ -5609,44 +6772,46 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
 
     if len(doc.tables) < 7:
         raise HTTPException(status_code=500, detail="备案模板结构不完整。")
+    if cells is None:
+        cells = {index: [list(row.cells) for row in doc.tables[index].rows] for index in FILING_TEMPLATE_TABLES}
 
     # ============ 表一 单位基本情况 ============
-    t1 = doc.tables[1]
-    replace_cell_preserve_symbols(t1.rows[0].cells[1], str(org.name or ""))
-    replace_cell_preserve_symbols(t1.rows[1].cells[1], str(org.credit_code or ""))
+    t1_cells = cells[1]
+    replace_cell_preserve_symbols(t1_cells[0][1], str(org.name or ""))
+    replace_cell_preserve_symbols(t1_cells[1][1], str(org.credit_code or ""))
     # R2 地址 —— 4 段仿宋 run：[省, 市, 区县, 详细地址]
-    set_fangsong_run_values(t1.rows[2].cells[1], [
+    set_fangsong_run_values(t1_cells[2][1], [
         str(address_parts.get("province") or "").strip(),
         str(address_parts.get("city") or "").strip(),
         str(address_parts.get("district") or "").strip(),
         str(address_parts.get("detail") or org.address or "").strip(),
     ])
-    set_first_fangsong_run(t1.rows[3].cells[1], str(table1.get("postal_code") or ""))
-    set_first_fangsong_run(t1.rows[3].cells[6], str(table1.get("district_code") or ""))
-    set_first_fangsong_run(t1.rows[4].cells[2], str(responsible_person.get("name") or org.legal_representative or ""))
-    set_first_fangsong_run(t1.rows[4].cells[6], str(responsible_person.get("title") or ""))
-    set_first_fangsong_run(t1.rows[5].cells[2], str(responsible_person.get("office_phone") or org.office_phone or "/"))
-    set_first_fangsong_run(t1.rows[5].cells[6], str(responsible_person.get("email") or org.email or "/"))
-    replace_cell_preserve_symbols(t1.rows[6].cells[1], str(org.cybersecurity_dept or ""))
-    set_first_fangsong_run(t1.rows[7].cells[2], str(org.cybersecurity_owner_name or ""))
-    set_first_fangsong_run(t1.rows[7].cells[6], str(org.cybersecurity_owner_title or ""))
-    set_first_fangsong_run(t1.rows[8].cells[2], str(org.cybersecurity_owner_phone or "/"))
-    set_first_fangsong_run(t1.rows[8].cells[6], str(org.cybersecurity_owner_email or "/"))
-    set_first_fangsong_run(t1.rows[9].cells[2], str(org.mobile_phone or "/"))
-    set_first_fangsong_run(t1.rows[9].cells[6], str(org.cybersecurity_owner_email or org.email or "/"))
-    replace_cell_preserve_symbols(t1.rows[10].cells[1], str(org.data_security_dept or ""))
-    set_first_fangsong_run(t1.rows[11].cells[2], str(org.data_security_owner_name or ""))
-    set_first_fangsong_run(t1.rows[11].cells[6], str(org.data_security_owner_title or ""))
-    set_first_fangsong_run(t1.rows[12].cells[2], str(org.data_security_owner_phone or "/"))
-    set_first_fangsong_run(t1.rows[12].cells[6], str(org.data_security_owner_email or "/"))
-    set_first_fangsong_run(t1.rows[13].cells[2], str(org.mobile_phone or "/"))
-    set_first_fangsong_run(t1.rows[13].cells[6], str(org.data_security_owner_email or org.email or "/"))
+    set_first_fangsong_run(t1_cells[3][1], str(table1.get("postal_code") or ""))
+    set_first_fangsong_run(t1_cells[3][6], str(table1.get("district_code") or ""))
+    set_first_fangsong_run(t1_cells[4][2], str(responsible_person.get("name") or org.legal_representative or ""))
+    set_first_fangsong_run(t1_cells[4][6], str(responsible_person.get("title") or ""))
+    set_first_fangsong_run(t1_cells[5][2], str(responsible_person.get("office_phone") or org.office_phone or "/"))
+    set_first_fangsong_run(t1_cells[5][6], str(responsible_person.get("email") or org.email or "/"))
+    replace_cell_preserve_symbols(t1_cells[6][1], str(org.cybersecurity_dept or ""))
+    set_first_fangsong_run(t1_cells[7][2], str(org.cybersecurity_owner_name or ""))
+    set_first_fangsong_run(t1_cells[7][6], str(org.cybersecurity_owner_title or ""))
+    set_first_fangsong_run(t1_cells[8][2], str(org.cybersecurity_owner_phone or "/"))
+    set_first_fangsong_run(t1_cells[8][6], str(org.cybersecurity_owner_email or "/"))
+    set_first_fangsong_run(t1_cells[9][2], str(org.mobile_phone or "/"))
+    set_first_fangsong_run(t1_cells[9][6], str(org.cybersecurity_owner_email or org.email or "/"))
+    replace_cell_preserve_symbols(t1_cells[10][1], str(org.data_security_dept or ""))
+    set_first_fangsong_run(t1_cells[11][2], str(org.data_security_owner_name or ""))
+    set_first_fangsong_run(t1_cells[11][6], str(org.data_security_owner_title or ""))
+    set_first_fangsong_run(t1_cells[12][2], str(org.data_security_owner_phone or "/"))
+    set_first_fangsong_run(t1_cells[12][6], str(org.data_security_owner_email or "/"))
+    set_first_fangsong_run(t1_cells[13][2], str(org.mobile_phone or "/"))
+    set_first_fangsong_run(t1_cells[13][6], str(org.data_security_owner_email or org.email or "/"))
 
     # R14-R16 选项字段：只改 Wingdings 勾选状态
     AFFILIATION_OPTIONS = ["中央", "省(自治区、直辖市)", "地(区、市、州、盟)", "县（区、市、旗）", "其他"]
-    set_cell_check_by_index(t1.rows[14].cells[1], labels_to_indices(affiliation.get("label"), AFFILIATION_OPTIONS))
+    set_cell_check_by_index(t1_cells[14][1], labels_to_indices(affiliation.get("label"), AFFILIATION_OPTIONS))
     ORG_TYPE_OPTIONS = ["党委机关", "政府机关", "事业单位", "企业", "其他"]
-    set_cell_check_by_index(t1.rows[15].cells[1], labels_to_indices(org_type.get("label") or org.organization_type, ORG_TYPE_OPTIONS))
+    set_cell_check_by_index(t1_cells[15][1], labels_to_indices(org_type.get("label") or org.organization_type, ORG_TYPE_OPTIONS))
     INDUSTRY_OPTIONS = [
         "海关", "税务", "市场监督管理", "广播电视", "体育", "统计",
         "国际发展合作", "医疗保障", "参事", "机关事务管理", "外交", "国防科技工业",
@@ -5657,7 +6822,7 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
         "铁路", "电信", "经营性公众互联网", "保险", "证券", "气象",
         "民航", "电力", "能源", "邮政", "宣传", "数据管理", "电子政务", "其他",
     ]
-    set_cell_check_by_index(t1.rows[16].cells[1], labels_to_indices(industry.get("label") or org.industry, INDUSTRY_OPTIONS))
+    set_cell_check_by_index(t1_cells[16][1], labels_to_indices(industry.get("label") or org.industry, INDUSTRY_OPTIONS))
 
     # R17-R21 数量矩阵
     current_total = to_int_or_zero(current_counts.get("total")) or sum(
@@ -5666,24 +6831,24 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
     total_total = to_int_or_zero(total_counts.get("total")) or sum(
         to_int_or_zero(total_counts.get(key)) for key in ("1", "2", "3", "4", "5")
     )
-    _set_numeric_count_run(t1.rows[17].cells[1], current_total)
-    _set_numeric_count_run(t1.rows[17].cells[3], to_int_or_zero(current_counts.get("2")))
-    _set_numeric_count_run(t1.rows[17].cells[7], to_int_or_zero(current_counts.get("3")))
-    _set_numeric_count_run(t1.rows[18].cells[3], to_int_or_zero(current_counts.get("4")))
-    _set_numeric_count_run(t1.rows[18].cells[7], to_int_or_zero(current_counts.get("5")))
-    _set_numeric_count_run(t1.rows[19].cells[1], total_total)
-    _set_numeric_count_run(t1.rows[19].cells[3], to_int_or_zero(total_counts.get("1")))
-    _set_numeric_count_run(t1.rows[19].cells[7], to_int_or_zero(total_counts.get("2")))
-    _set_numeric_count_run(t1.rows[20].cells[3], to_int_or_zero(total_counts.get("3")))
-    _set_numeric_count_run(t1.rows[20].cells[7], to_int_or_zero(total_counts.get("4")))
-    _set_numeric_count_run(t1.rows[21].cells[3], to_int_or_zero(total_counts.get("5")))
+    _set_numeric_count_run(t1_cells[17][1], current_total)
+    _set_numeric_count_run(t1_cells[17][3], to_int_or_zero(current_counts.get("2")))
+    _set_numeric_count_run(t1_cells[17][7], to_int_or_zero(current_counts.get("3")))
+    _set_numeric_count_run(t1_cells[18][3], to_int_or_zero(current_counts.get("4")))
+    _set_numeric_count_run(t1_cells[18][7], to_int_or_zero(current_counts.get("5")))
+    _set_numeric_count_run(t1_cells[19][1], total_total)
+    _set_numeric_count_run(t1_cells[19][3], to_int_or_zero(total_counts.get("1")))
+    _set_numeric_count_run(t1_cells[19][7], to_int_or_zero(total_counts.get("2")))
+    _set_numeric_count_run(t1_cells[20][3], to_int_or_zero(total_counts.get("3")))
+    _set_numeric_count_run(t1_cells[20][7], to_int_or_zero(total_counts.get("4")))
+    _set_numeric_count_run(t1_cells[21][3], to_int_or_zero(total_counts.get("5")))
 
     # ============ 表二 定级对象情况 ============
-    t2 = doc.tables[2]
-    replace_cell_preserve_symbols(t2.rows[0].cells[2], str(system.system_name or ""))
+    t2_cells = cells[2]
+    replace_cell_preserve_symbols(t2_cells[0][2], str(system.system_name or ""))
     # 定级对象编号：5 位，由公安机关填，全部留空（或前 2 位填当前年份后两位）
     for cell_index in (4, 5, 6, 7, 8):
-        replace_cell_preserve_symbols(t2.rows[0].cells[cell_index], "")
+        replace_cell_preserve_symbols(t2_cells[0][cell_index], "")
 
     # R1 定级对象类型 + 技术类型（模板 sym 顺序：通信网络、信息系统、5技术、9其他、数据资源）
     OBJECT_TYPE_SYMS = {"通信网络设施": 0, "信息系统": 1, "数据资源": 8}
@@ -5701,16 +6866,16 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
             combined_r1.add(TECHNOLOGY_SYMS[key])
     if str(table2.get("technology_other") or "").strip():
         combined_r1.add(7)
-    set_cell_check_by_index(t2.rows[1].cells[2], combined_r1)
+    set_cell_check_by_index(t2_cells[1][2], combined_r1)
 
     # R2 业务类型
     BUSINESS_TYPES = ["生产作业", "指挥调度", "内部办公", "公众服务", "其他"]
     biz_idx = labels_to_indices(table2.get("business_types"), BUSINESS_TYPES)
     if str(table2.get("business_other") or "").strip():
         biz_idx.add(4)
-    set_cell_check_by_index(t2.rows[2].cells[2], biz_idx)
+    set_cell_check_by_index(t2_cells[2][2], biz_idx)
 
-    replace_cell_preserve_symbols(t2.rows[3].cells[2], str(table2.get("business_description") or system.business_description or ""))
+    replace_cell_preserve_symbols(t2_cells[3][2], str(table2.get("business_description") or system.business_description or ""))
 
     network_service = table2.get("network_service") if isinstance(table2.get("network_service"), dict) else {}
     network_platform = table2.get("network_platform") if isinstance(table2.get("network_platform"), dict) else {}
@@ -5719,19 +6884,19 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
     SCOPE_CODES = ["10", "11", "20", "21", "30", "99"]
     scope_code = str(network_service.get("scope_code") or "").strip()
     scope_indices: set[int] = {SCOPE_CODES.index(scope_code)} if scope_code in SCOPE_CODES else set()
-    set_cell_check_by_index(t2.rows[4].cells[2], scope_indices)
+    set_cell_check_by_index(t2_cells[4][2], scope_indices)
     # 填跨省/跨地数量（如果有）
     if scope_code == "11":
-        _replace_keyword_suffix(t2.rows[4].cells[2], "跨省", str(network_service.get("cross_province_count") or ""))
+        _replace_keyword_suffix(t2_cells[4][2], "跨省", str(network_service.get("cross_province_count") or ""))
     if scope_code == "21":
-        _replace_keyword_suffix(t2.rows[4].cells[2], "跨地", str(network_service.get("cross_city_count") or ""))
+        _replace_keyword_suffix(t2_cells[4][2], "跨地", str(network_service.get("cross_city_count") or ""))
 
     # R5 服务对象
     SERVICE_TARGETS = ["单位内部人员", "社会公众人员", "两者均包括", "其他"]
     service_targets_idx = labels_to_indices(network_service.get("service_targets"), SERVICE_TARGETS)
     if str(network_service.get("service_target_other") or "").strip():
         service_targets_idx.add(3)
-    set_cell_check_by_index(t2.rows[5].cells[2], service_targets_idx)
+    set_cell_check_by_index(t2_cells[5][2], service_targets_idx)
 
     # R6 部署范围
     COVERAGE_OPTIONS = ["局域网", "城域网", "广域网", "其他"]
@@ -5739,7 +6904,7 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
     cov_idx = labels_to_indices(coverage.get("label") or coverage.get("code"), COVERAGE_OPTIONS)
     if str(coverage.get("other") or "").strip():
         cov_idx.add(3)
-    set_cell_check_by_index(t2.rows[6].cells[2], cov_idx)
+    set_cell_check_by_index(t2_cells[6][2], cov_idx)
 
     # R7 网络性质（业务专网/互联网/其他）+ IP/域名/端口
     network_nature = network_platform.get("network_nature") if isinstance(network_platform.get("network_nature"), dict) else {}
@@ -5751,11 +6916,11 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
         nature_indices = {1}
     elif code == "9":
         nature_indices = {2}
-    set_cell_check_by_index(t2.rows[7].cells[2], nature_indices)
+    set_cell_check_by_index(t2_cells[7][2], nature_indices)
     if code == "2":
-        _replace_keyword_suffix(t2.rows[7].cells[2], "地址范围", str(network_nature.get("source_ip_range") or ""))
-        _replace_keyword_suffix(t2.rows[7].cells[2], "域名", str(network_nature.get("domain") or ""))
-        _replace_keyword_suffix(t2.rows[7].cells[2], "端口", str(network_nature.get("protocol_ports") or ""))
+        _replace_keyword_suffix(t2_cells[7][2], "地址范围", str(network_nature.get("source_ip_range") or ""))
+        _replace_keyword_suffix(t2_cells[7][2], "域名", str(network_nature.get("domain") or ""))
+        _replace_keyword_suffix(t2_cells[7][2], "端口", str(network_nature.get("protocol_ports") or ""))
 
     # R8 网络互联
     INTERCONNECTION_OPTIONS = ["与其他行业系统连接", "与本行业其他单位系统连接", "与本单位其他系统连接", "其他"]
@@ -5763,88 +6928,88 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
     ic_idx = labels_to_indices(interconnection.get("items"), INTERCONNECTION_OPTIONS)
     if str(interconnection.get("other") or "").strip():
         ic_idx.add(3)
-    set_cell_check_by_index(t2.rows[8].cells[2], ic_idx)
+    set_cell_check_by_index(t2_cells[8][2], ic_idx)
 
     # R9 投入运行日期（年月日分 runs）
-    replace_date_runs_in_cell(t2.rows[9].cells[2], table2.get("go_live_date") or system.go_live_date)
+    replace_date_runs_in_cell(t2_cells[9][2], table2.get("go_live_date") or system.go_live_date)
 
     # R10 是否分系统
     is_sub = coerce_bool(table2.get("is_sub_system"))
-    set_cell_check_by_index(t2.rows[10].cells[2], {0 if is_sub else 1})
-    replace_cell_preserve_symbols(t2.rows[11].cells[2], str(table2.get("parent_system_name") or ("" if is_sub else "无")))
-    replace_cell_preserve_symbols(t2.rows[12].cells[2], str(table2.get("parent_organization_name") or ""))
+    set_cell_check_by_index(t2_cells[10][2], {0 if is_sub else 1})
+    replace_cell_preserve_symbols(t2_cells[11][2], str(table2.get("parent_system_name") or ("" if is_sub else "无")))
+    replace_cell_preserve_symbols(t2_cells[12][2], str(table2.get("parent_organization_name") or ""))
 
     # ============ 表三 定级情况 ============
-    t3 = doc.tables[3]
+    t3_cells = cells[3]
     business_items = {str(item).strip() for item in table3.get("business_security_damage_items", []) if str(item).strip()}
     service_items = {str(item).strip() for item in table3.get("service_security_damage_items", []) if str(item).strip()}
     # R1-R5 业务信息损害
     for row_idx in range(1, 6):
-        label = t3.rows[row_idx].cells[1].text.replace("\n", " / ").strip()
+        label = t3_cells[row_idx][1].text.replace("\n", " / ").strip()
         selected = damage_level_row_selected(label, business_items)
-        set_cell_check_by_index(t3.rows[row_idx].cells[1], {0} if selected else set())
-        set_cell_check_by_index(t3.rows[row_idx].cells[4], {0} if selected else set())
+        set_cell_check_by_index(t3_cells[row_idx][1], {0} if selected else set())
+        set_cell_check_by_index(t3_cells[row_idx][4], {0} if selected else set())
     # R6-R10 系统服务损害
     for row_idx in range(6, 11):
-        label = t3.rows[row_idx].cells[1].text.replace("\n", " / ").strip()
+        label = t3_cells[row_idx][1].text.replace("\n", " / ").strip()
         selected = damage_level_row_selected(label, service_items)
-        set_cell_check_by_index(t3.rows[row_idx].cells[1], {0} if selected else set())
-        set_cell_check_by_index(t3.rows[row_idx].cells[4], {0} if selected else set())
+        set_cell_check_by_index(t3_cells[row_idx][1], {0} if selected else set())
+        set_cell_check_by_index(t3_cells[row_idx][4], {0} if selected else set())
     # R11 最终级别（模板选项用中文数字：第二级/第三级/第四级/第五级）
     LEVEL_OPTIONS = ["第二级", "第三级", "第四级", "第五级"]
     CN_LEVEL_NUMS = {2: "二", 3: "三", 4: "四", 5: "五"}
     final_level = to_int_or_zero(table3.get("final_level")) or system.proposed_level or 0
     level_label = f"第{CN_LEVEL_NUMS[final_level]}级" if final_level in CN_LEVEL_NUMS else ""
-    set_cell_check_by_index(t3.rows[11].cells[2], labels_to_indices(level_label, LEVEL_OPTIONS))
+    set_cell_check_by_index(t3_cells[11][2], labels_to_indices(level_label, LEVEL_OPTIONS))
     # R12 定级时间
-    replace_date_runs_in_cell(t3.rows[12].cells[2], table3.get("grading_date"))
+    replace_date_runs_in_cell(t3_cells[12][2], table3.get("grading_date"))
     # R13 定级报告
     grading_report = table3.get("grading_report") if isinstance(table3.get("grading_report"), dict) else {}
     has_grading = coerce_bool(grading_report.get("has_file"))
-    set_cell_check_by_index(t3.rows[13].cells[2], {0 if has_grading else 1})
+    set_cell_check_by_index(t3_cells[13][2], {0 if has_grading else 1})
     grading_name = _resolve_attachment_name(grading_report.get("file_name"), attachment_prefix, "系统定级报告") if has_grading else ""
-    replace_attachment_name_in_cell(t3.rows[13].cells[2], grading_name)
+    replace_attachment_name_in_cell(t3_cells[13][2], grading_name)
     # R14 专家评审
     expert_review = table3.get("expert_review") if isinstance(table3.get("expert_review"), dict) else {}
     reviewed = str(expert_review.get("status") or "unreviewed") == "reviewed"
-    set_cell_check_by_index(t3.rows[14].cells[2], {0 if reviewed else 1})
+    set_cell_check_by_index(t3_cells[14][2], {0 if reviewed else 1})
     expert_name = _resolve_attachment_name(expert_review.get("file_name"), attachment_prefix, "专家评审意见表") if reviewed else ""
-    replace_attachment_name_in_cell(t3.rows[14].cells[2], expert_name)
+    replace_attachment_name_in_cell(t3_cells[14][2], expert_name)
     # R15 是否有上级行业主管部门
     has_supervisor = coerce_bool(table3.get("has_supervisor"))
-    set_cell_check_by_index(t3.rows[15].cells[2], {0 if has_supervisor else 1})
-    replace_cell_preserve_symbols(t3.rows[16].cells[2], str(table3.get("supervisor_name") or ("" if has_supervisor else "无")))
+    set_cell_check_by_index(t3_cells[15][2], {0 if has_supervisor else 1})
+    replace_cell_preserve_symbols(t3_cells[16][2], str(table3.get("supervisor_name") or ("" if has_supervisor else "无")))
     # R17 上级审核
     supervisor_review = table3.get("supervisor_review") if isinstance(table3.get("supervisor_review"), dict) else {}
     if has_supervisor:
         sup_reviewed = str(supervisor_review.get("status") or "unreviewed") == "reviewed"
-        set_cell_check_by_index(t3.rows[17].cells[2], {0 if sup_reviewed else 1})
+        set_cell_check_by_index(t3_cells[17][2], {0 if sup_reviewed else 1})
         sup_name = _resolve_attachment_name(supervisor_review.get("file_name"), attachment_prefix, "上级主管定级审核文件") if sup_reviewed else ""
-        replace_attachment_name_in_cell(t3.rows[17].cells[2], sup_name)
+        replace_attachment_name_in_cell(t3_cells[17][2], sup_name)
     else:
-        clear_cell_checks(t3.rows[17].cells[2])
-        replace_attachment_name_in_cell(t3.rows[17].cells[2], "")
+        clear_cell_checks(t3_cells[17][2])
+        replace_attachment_name_in_cell(t3_cells[17][2], "")
     # R18 填表人/日期
-    _set_filler_name(t3.rows[18].cells[0], str(table3.get("filler_name") or "").strip())
-    replace_date_runs_in_cell(t3.rows[18].cells[3], table3.get("filled_date"))
+    _set_filler_name(t3_cells[18][0], str(table3.get("filler_name") or "").strip())
+    replace_date_runs_in_cell(t3_cells[18][3], table3.get("filled_date"))
 
     # ============ 表四 新技术应用场景 ============
-    t4 = doc.tables[4]
+    t4_cells = cells[4]
     cloud = table4.get("cloud") if isinstance(table4.get("cloud"), dict) else {}
     cloud_enabled = coerce_bool(cloud.get("enabled"))
-    set_cell_check_by_index(t4.rows[0].cells[2], {0 if cloud_enabled else 1})
+    set_cell_check_by_index(t4_cells[0][2], {0 if cloud_enabled else 1})
     cloud_roles = {str(item).strip() for item in cloud.get("responsibility_types", []) if str(item).strip()}
     role_indices: set[int] = set()
     if "云服务商" in cloud_roles:
         role_indices.add(0)
     if "云服务客户" in cloud_roles:
         role_indices.add(1)
-    set_cell_check_by_index(t4.rows[1].cells[2], role_indices)
+    set_cell_check_by_index(t4_cells[1][2], role_indices)
     SERVICE_MODES = ["基础设施即服务IaaS", "平台即服务PaaS", "软件即服务SaaS", "其他"]
     sm_idx = labels_to_indices(cloud.get("service_modes"), SERVICE_MODES)
     if str(cloud.get("service_mode_other") or "").strip():
         sm_idx.add(3)
-    set_cell_check_by_index(t4.rows[2].cells[2], sm_idx)
+    set_cell_check_by_index(t4_cells[2][2], sm_idx)
     # R3 部署模式：4 选（私有/公有/混合/其他）政务云填在"其他"后
     deploy_list = {str(x).strip() for x in (cloud.get("deployment_modes") or [])}
     deploy_idx: set[int] = set()
@@ -5857,51 +7022,51 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
     deploy_other = str(cloud.get("deployment_mode_other") or "").strip() or ("政务云" if "政务云" in deploy_list else "")
     if deploy_other:
         deploy_idx.add(3)
-    set_cell_check_by_index(t4.rows[3].cells[2], deploy_idx)
+    set_cell_check_by_index(t4_cells[3][2], deploy_idx)
     if deploy_other:
-        _replace_keyword_suffix(t4.rows[3].cells[2], "其他", deploy_other)
+        _replace_keyword_suffix(t4_cells[3][2], "其他", deploy_other)
     # 云服务商侧字段
     if "云服务商" in cloud_roles:
-        _replace_keyword_suffix(t4.rows[5].cells[2], "客户数量", str(cloud.get("customer_count") or ""))
-        replace_cell_preserve_symbols(t4.rows[6].cells[2], str(cloud.get("infra_location") or ""))
-        replace_cell_preserve_symbols(t4.rows[7].cells[2], str(cloud.get("ops_location") or ""))
+        _replace_keyword_suffix(t4_cells[5][2], "客户数量", str(cloud.get("customer_count") or ""))
+        replace_cell_preserve_symbols(t4_cells[6][2], str(cloud.get("infra_location") or ""))
+        replace_cell_preserve_symbols(t4_cells[7][2], str(cloud.get("ops_location") or ""))
     # 云服务客户侧字段
     if "云服务客户" in cloud_roles:
-        _replace_keyword_suffix(t4.rows[9].cells[2], "云服务商为", str(cloud.get("provider_name") or ""))
-        _replace_keyword_suffix(t4.rows[9].cells[2], "平台安全等级", str(cloud.get("provider_level") or ""))
-        _replace_keyword_suffix(t4.rows[9].cells[2], "平台名称", str(cloud.get("provider_platform_name") or ""))
-        _replace_keyword_suffix(t4.rows[9].cells[2], "平台备案编号", str(cloud.get("provider_record_no") or ""))
-        replace_cell_preserve_symbols(t4.rows[10].cells[2], str(cloud.get("customer_ops_location") or ""))
+        _replace_keyword_suffix(t4_cells[9][2], "云服务商为", str(cloud.get("provider_name") or ""))
+        _replace_keyword_suffix(t4_cells[9][2], "平台安全等级", str(cloud.get("provider_level") or ""))
+        _replace_keyword_suffix(t4_cells[9][2], "平台名称", str(cloud.get("provider_platform_name") or ""))
+        _replace_keyword_suffix(t4_cells[9][2], "平台备案编号", str(cloud.get("provider_record_no") or ""))
+        replace_cell_preserve_symbols(t4_cells[10][2], str(cloud.get("customer_ops_location") or ""))
         record_name = table4_record_export_name(cloud, attachment_prefix, "云平台备案证明") if cloud_enabled else ""
-        replace_attachment_name_in_cell(t4.rows[11].cells[2], record_name)
+        replace_attachment_name_in_cell(t4_cells[11][2], record_name)
     else:
-        replace_attachment_name_in_cell(t4.rows[11].cells[2], "")
+        replace_attachment_name_in_cell(t4_cells[11][2], "")
     # R12-R15 移动
     mobile = table4.get("mobile") if isinstance(table4.get("mobile"), dict) else {}
-    set_cell_check_by_index(t4.rows[12].cells[2], {0 if coerce_bool(mobile.get("enabled")) else 1})
-    replace_cell_preserve_symbols(t4.rows[13].cells[2], str(mobile.get("app_name") or ""))
+    set_cell_check_by_index(t4_cells[12][2], {0 if coerce_bool(mobile.get("enabled")) else 1})
+    replace_cell_preserve_symbols(t4_cells[13][2], str(mobile.get("app_name") or ""))
     WIFI_OPTIONS = ["公共WIFI", "专用WIFI", "移动通信网"]
-    set_cell_check_by_index(t4.rows[14].cells[2], labels_to_indices(mobile.get("wireless_channels"), WIFI_OPTIONS))
+    set_cell_check_by_index(t4_cells[14][2], labels_to_indices(mobile.get("wireless_channels"), WIFI_OPTIONS))
     TERMINAL_OPTIONS = ["通用终端", "专用终端"]
-    set_cell_check_by_index(t4.rows[15].cells[2], labels_to_indices(mobile.get("terminal_types"), TERMINAL_OPTIONS))
+    set_cell_check_by_index(t4_cells[15][2], labels_to_indices(mobile.get("terminal_types"), TERMINAL_OPTIONS))
     # R16-R18 物联网
     iot = table4.get("iot") if isinstance(table4.get("iot"), dict) else {}
-    set_cell_check_by_index(t4.rows[16].cells[2], {0 if coerce_bool(iot.get("enabled")) else 1})
+    set_cell_check_by_index(t4_cells[16][2], {0 if coerce_bool(iot.get("enabled")) else 1})
     PERCEPTION_OPTIONS = ["感知节点", "感知网关", "RFID标签", "RFID读写器", "其他"]
     pi_idx = labels_to_indices(iot.get("perception_layers"), PERCEPTION_OPTIONS)
     if str(iot.get("perception_other") or "").strip():
         pi_idx.add(4)
-    set_cell_check_by_index(t4.rows[17].cells[2], pi_idx)
+    set_cell_check_by_index(t4_cells[17][2], pi_idx)
     TRANSPORT_OPTIONS = ["互联网", "专用网", "移动通信网", "其他"]
     tr_idx = labels_to_indices(iot.get("transport_layers"), TRANSPORT_OPTIONS)
     if str(iot.get("transport_other") or "").strip():
         tr_idx.add(3)
-    set_cell_check_by_index(t4.rows[18].cells[2], tr_idx)
+    set_cell_check_by_index(t4_cells[18][2], tr_idx)
     # R19-R21 工控
     industrial = table4.get("industrial_control") if isinstance(table4.get("industrial_control"), dict) else {}
-    set_cell_check_by_index(t4.rows[19].cells[2], {0 if coerce_bool(industrial.get("enabled")) else 1})
+    set_cell_check_by_index(t4_cells[19][2], {0 if coerce_bool(industrial.get("enabled")) else 1})
     FUNC_LAYERS = ["生产管理层", "过程监控层", "现场控制层", "现场设备层"]
-    set_cell_check_by_index(t4.rows[20].cells[2], labels_to_indices(industrial.get("function_layers"), FUNC_LAYERS))
+    set_cell_check_by_index(t4_cells[20][2], labels_to_indices(industrial.get("function_layers"), FUNC_LAYERS))
     COMPONENT_OPTIONS = [
         "数据采集与监视控制系统（SCADA）", "分布式控制系统（DCS）", "可编程逻辑控制器（PLC）",
         "远程终端单元（RTU）", "主终端单元（MTU）", "上位机（SC）", "其他",
@@ -5909,31 +7074,31 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
     cp_idx = labels_to_indices(industrial.get("components"), COMPONENT_OPTIONS)
     if str(industrial.get("component_other") or "").strip():
         cp_idx.add(6)
-    set_cell_check_by_index(t4.rows[21].cells[2], cp_idx)
+    set_cell_check_by_index(t4_cells[21][2], cp_idx)
     # R22-R31 大数据
     big_data = table4.get("big_data") if isinstance(table4.get("big_data"), dict) else {}
     big_enabled = coerce_bool(big_data.get("enabled"))
-    set_cell_check_by_index(t4.rows[22].cells[2], {0 if big_enabled else 1})
+    set_cell_check_by_index(t4_cells[22][2], {0 if big_enabled else 1})
     BIG_COMPONENTS = ["大数据平台", "大数据应用", "大数据资源"]
     bd_components = {str(item).strip() for item in big_data.get("system_components", []) if str(item).strip()}
-    set_cell_check_by_index(t4.rows[23].cells[2], labels_to_indices(list(bd_components), BIG_COMPONENTS))
+    set_cell_check_by_index(t4_cells[23][2], labels_to_indices(list(bd_components), BIG_COMPONENTS))
     CROSS_BORDER = ["无出境需求", "有出境需求"]
-    set_cell_check_by_index(t4.rows[24].cells[2], labels_to_indices(big_data.get("cross_border_status"), CROSS_BORDER))
+    set_cell_check_by_index(t4_cells[24][2], labels_to_indices(big_data.get("cross_border_status"), CROSS_BORDER))
     if "大数据平台" in bd_components:
-        _replace_keyword_suffix(t4.rows[26].cells[2], "应用数量", str(big_data.get("application_count") or ""))
-        replace_cell_preserve_symbols(t4.rows[27].cells[2], str(big_data.get("infra_location") or ""))
-        replace_cell_preserve_symbols(t4.rows[28].cells[2], str(big_data.get("ops_location") or ""))
+        _replace_keyword_suffix(t4_cells[26][2], "应用数量", str(big_data.get("application_count") or ""))
+        replace_cell_preserve_symbols(t4_cells[27][2], str(big_data.get("infra_location") or ""))
+        replace_cell_preserve_symbols(t4_cells[28][2], str(big_data.get("ops_location") or ""))
     if "大数据应用" in bd_components or "大数据资源" in bd_components:
-        _replace_keyword_suffix(t4.rows[30].cells[2], "服务商", str(big_data.get("provider_name") or ""))
-        _replace_keyword_suffix(t4.rows[30].cells[2], "平台安全等级", str(big_data.get("provider_level") or ""))
-        _replace_keyword_suffix(t4.rows[30].cells[2], "平台名称", str(big_data.get("provider_platform_name") or ""))
-        _replace_keyword_suffix(t4.rows[30].cells[2], "平台备案编号", str(big_data.get("provider_record_no") or ""))
-        replace_attachment_name_in_cell(t4.rows[31].cells[2], table4_record_export_name(big_data, attachment_prefix, "大数据平台备案证明"))
+        _replace_keyword_suffix(t4_cells[30][2], "服务商", str(big_data.get("provider_name") or ""))
+        _replace_keyword_suffix(t4_cells[30][2], "平台安全等级", str(big_data.get("provider_level") or ""))
+        _replace_keyword_suffix(t4_cells[30][2], "平台名称", str(big_data.get("provider_platform_name") or ""))
+        _replace_keyword_suffix(t4_cells[30][2], "平台备案编号", str(big_data.get("provider_record_no") or ""))
+        replace_attachment_name_in_cell(t4_cells[31][2], table4_record_export_name(big_data, attachment_prefix, "大数据平台备案证明"))
     else:
-        replace_attachment_name_in_cell(t4.rows[31].cells[2], "")
+        replace_attachment_name_in_cell(t4_cells[31][2], "")
 
     # ============ 表五 提交材料 ============
-    t5 = doc.tables[5]
+    t5_cells = cells[5]
     T5_SLOTS = [
         ("network_topology", "系统拓扑结构及说明", 0),
         ("security_org_and_rules", "系统安全组织机构及管理制度", 1),
@@ -5946,16 +7111,16 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
         slot = table5.get(slot_name) if isinstance(table5.get(slot_name), dict) else {}
         status = str(slot.get("status") or "none").strip()
         has = (status == "has")
-        set_cell_check_by_index(t5.rows[row_index].cells[1], {0 if has else 1})
+        set_cell_check_by_index(t5_cells[row_index][1], {0 if has else 1})
         file_name = _resolve_attachment_name(slot.get("file_name"), attachment_prefix, default_suffix) if has else ""
-        replace_attachment_name_in_cell(t5.rows[row_index].cells[1], file_name)
+        replace_attachment_name_in_cell(t5_cells[row_index][1], file_name)
 
     # ============ 表六 数据摸底 ============
-    t6 = doc.tables[6]
+    t6_cells = cells[6]
     items = table6.get("items") if isinstance(table6.get("items"), list) else []
     if items and isinstance(items[0], dict):
         item = items[0]
-        replace_cell_preserve_symbols(t6.rows[0].cells[1], str(item.get("data_name") or ""))
+        replace_cell_preserve_symbols(t6_cells[0][1], str(item.get("data_name") or ""))
         # R0 C3 数据级别（一般/重要及以上）
         data_level_code = str(item.get("data_level_code") or "").strip()
         if not data_level_code:
@@ -5966,10 +7131,10 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
             dl_indices = {0}
         elif data_level_code == "2":
             dl_indices = {1}
-        set_cell_check_by_index(t6.rows[0].cells[3], dl_indices)
-        replace_cell_preserve_symbols(t6.rows[1].cells[1], str(item.get("data_category") or ""))
-        replace_cell_preserve_symbols(t6.rows[2].cells[1], str(item.get("data_security_dept") or ""))
-        replace_cell_preserve_symbols(t6.rows[2].cells[3], str(item.get("data_security_owner") or ""))
+        set_cell_check_by_index(t6_cells[0][3], dl_indices)
+        replace_cell_preserve_symbols(t6_cells[1][1], str(item.get("data_category") or ""))
+        replace_cell_preserve_symbols(t6_cells[2][1], str(item.get("data_security_dept") or ""))
+        replace_cell_preserve_symbols(t6_cells[2][3], str(item.get("data_security_owner") or ""))
         # R3 个人信息涉及情况
         PI_OPTIONS = ["涉及敏感个人信息", "涉及未成年人的个人信息", "涉及一般个人信息", "不涉及"]
         pi_values = item.get("personal_info_flags")
@@ -5977,18 +7142,18 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
             pi_values = [_normalize_person_info_value(v) for v in pi_values]
         else:
             pi_values = _normalize_person_info_value(pi_values)
-        set_cell_check_by_index(t6.rows[3].cells[1], labels_to_indices(pi_values, PI_OPTIONS))
+        set_cell_check_by_index(t6_cells[3][1], labels_to_indices(pi_values, PI_OPTIONS))
         # R4 数据总量（保留下划线占位与双段结构）
-        set_cell_check_by_index(t6.rows[4].cells[1], table6_data_total_check_indices(item))
+        set_cell_check_by_index(t6_cells[4][1], table6_data_total_check_indices(item))
         _fill_t6_data_total(
-            t6.rows[4].cells[1],
+            t6_cells[4][1],
             str(item.get("data_total_gb") or "").strip(),
             str(item.get("data_total_tb") or "").strip(),
             str(item.get("data_total_records") or "").strip(),
         )
         # R5 月增长（保留下划线占位）
         _fill_t6_monthly_growth(
-            t6.rows[5].cells[1],
+            t6_cells[5][1],
             str(item.get("monthly_growth_gb") or "").strip(),
             str(item.get("monthly_growth_tb") or "").strip(),
         )
@@ -5997,14 +7162,14 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
         ds_idx = labels_to_indices(item.get("data_sources"), DATA_SOURCES)
         if str(item.get("data_source_other") or "").strip():
             ds_idx.add(5)
-        set_cell_check_by_index(t6.rows[6].cells[1], ds_idx)
+        set_cell_check_by_index(t6_cells[6][1], ds_idx)
         # R7/R8 数据流转单位（保留 3 段结构与下划线占位）
-        _fill_t6_flow_units(t6.rows[7].cells[1], [
+        _fill_t6_flow_units(t6_cells[7][1], [
             str(item.get("source_unit_1") or "").strip(),
             str(item.get("source_unit_2") or "").strip(),
             str(item.get("source_unit_3") or "").strip(),
         ])
-        _fill_t6_flow_units(t6.rows[8].cells[1], [
+        _fill_t6_flow_units(t6_cells[8][1], [
             str(item.get("target_unit_1") or "").strip(),
             str(item.get("target_unit_2") or "").strip(),
             str(item.get("target_unit_3") or "").strip(),
@@ -6020,35 +7185,258 @@ def fill_filing_template_document(doc: Document, org: Organization, system: Syst
                     break
         if not it_indices:
             it_indices = {3}
-        set_cell_check_by_index(t6.rows[9].cells[1], it_indices)
+        set_cell_check_by_index(t6_cells[9][1], it_indices)
         # R10-R12 存储
         STORAGE_CLOUD = ["1", "2", "3", "4", "5"]
         cloud_type = str(item.get("storage_cloud_type") or "").strip()
-        set_cell_check_by_index(t6.rows[10].cells[1], {STORAGE_CLOUD.index(cloud_type)} if cloud_type in STORAGE_CLOUD else set())
+        set_cell_check_by_index(t6_cells[10][1], {STORAGE_CLOUD.index(cloud_type)} if cloud_type in STORAGE_CLOUD else set())
         STORAGE_ROOM = ["1", "2", "3"]
         room_type = str(item.get("storage_room_type") or "").strip()
-        set_cell_check_by_index(t6.rows[11].cells[1], {STORAGE_ROOM.index(room_type)} if room_type in STORAGE_ROOM else set())
+        set_cell_check_by_index(t6_cells[11][1], {STORAGE_ROOM.index(room_type)} if room_type in STORAGE_ROOM else set())
         STORAGE_REGION = ["1", "2"]
         region_type = str(item.get("storage_region_type") or "").strip()
-        set_cell_check_by_index(t6.rows[12].cells[1], {STORAGE_REGION.index(region_type)} if region_type in STORAGE_REGION else set())
+        set_cell_check_by_index(t6_cells[12][1], {STORAGE_REGION.index(region_type)} if region_type in STORAGE_REGION else set())
 
 
-@app.get("/api/systems/{system_id}/export/word")
-def export_system_word(request: Request, system_id: int, db: Session = Depends(get_db)) -> FileResponse:
-    require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
-    system = get_system_or_404(db, system_id)
-    org = get_org_or_404(db, system.organization_id)
+def resolve_filing_template_path() -> Path:
     template_path = DESKTOP_FILING_TEMPLATE_PATH if DESKTOP_FILING_TEMPLATE_PATH.exists() else find_latest_docx_by_pattern("01-*.docx")
     if not template_path or not Path(template_path).exists():
         raise HTTPException(status_code=404, detail="备案表模板不存在，无法导出。")
+    return Path(template_path)
+
+
+def filing_form_file_stem(org: Any, system: Any) -> str:
     safe_org = sanitize_filename_component(org.name, fallback=f"org{org.id}")
     safe_sys = sanitize_filename_component(system.system_name, fallback=f"system{system.id}")
-    base_name = f"{safe_org}-{safe_sys}-网络安全等级保护定级备案表"
+    return f"{safe_org}-{safe_sys}-网络安全等级保护定级备案表"
+
+
+def render_filing_form_bytes(template_path: str, org_data: dict[str, Any], system_data: dict[str, Any]) -> bytes:
+    """渲染单份备案表并返回 docx 字节；参数均为可 pickle 的普通数据，供进程池调用。"""
+    doc, cells = instantiate_filing_template(compile_filing_template(Path(template_path)))
+    fill_filing_template_document(doc, SimpleNamespace(**org_data), SimpleNamespace(**system_data), cells)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _render_filing_form_task(template_path: str, org_data: dict[str, Any], system_data: dict[str, Any]) -> bytes:
+    try:
+        return render_filing_form_bytes(template_path, org_data, system_data)
+    except HTTPException as ex:
+        # HTTPException 无法跨进程反序列化，会导致进程池整体失效
+        raise RuntimeError(str(ex.detail)) from None
+
+
+def get_bulk_export_pool() -> ProcessPoolExecutor:
+    global BULK_EXPORT_POOL
+    with BULK_EXPORT_POOL_LOCK:
+        if BULK_EXPORT_POOL is None:
+            BULK_EXPORT_POOL = ProcessPoolExecutor(max_workers=BULK_EXPORT_WORKERS)
+        return BULK_EXPORT_POOL
+
+
+def shutdown_bulk_export_pool() -> None:
+    global BULK_EXPORT_POOL
+    with BULK_EXPORT_POOL_LOCK:
+        pool, BULK_EXPORT_POOL = BULK_EXPORT_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _describe_export_error(ex: BaseException) -> str:
+    return str(getattr(ex, "detail", "") or ex or ex.__class__.__name__)
+
+
+def iter_pooled_renders(jobs: list[tuple[str, Callable[..., bytes], tuple[Any, ...]]]):
+    """按完成顺序 yield (条目名, 渲染结果字节 | None, 错误信息)；数量较少时直接在当前线程渲染。
+
+    jobs 中的函数须为模块级函数、参数可 pickle，才能交给进程池。
+    """
+    if len(jobs) < BULK_EXPORT_POOL_MIN_ITEMS or BULK_EXPORT_WORKERS <= 1:
+        for entry_name, func, args in jobs:
+            try:
+                yield entry_name, func(*args), ""
+            except Exception as ex:
+                yield entry_name, None, _describe_export_error(ex)
+        return
+
+    pool = get_bulk_export_pool()
+    queue = list(reversed(jobs))
+    pending: dict[Future, str] = {}
+    try:
+        while queue or pending:
+            # 在途任务限制为 worker 数的两倍，避免一次性把全部结果堆在内存里
+            while queue and len(pending) < BULK_EXPORT_WORKERS * 2:
+                entry_name, func, args = queue.pop()
+                try:
+                    pending[pool.submit(func, *args)] = entry_name
+                except BrokenProcessPool as ex:
+                    yield entry_name, None, _describe_export_error(ex)
+            if not pending:
+                continue
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                entry_name = pending.pop(future)
+                try:
+                    yield entry_name, future.result(), ""
+                except Exception as ex:
+                    if isinstance(ex, BrokenProcessPool):
+                        shutdown_bulk_export_pool()
+                    yield entry_name, None, _describe_export_error(ex)
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_rendered_filing_forms(template_path: str, jobs: list[tuple[str, dict[str, Any], dict[str, Any]]]):
+    return iter_pooled_renders(
+        [(entry_name, _render_filing_form_task, (template_path, org_data, system_data)) for entry_name, org_data, system_data in jobs]
+    )
+
+
+def iter_rendered_zip(rendered: Any):
+    """把 (条目名, 字节 | None, 错误信息) 逐个写入 zip 并分段产出，失败条目汇总到导出失败清单.txt。"""
+    sink = ZipChunkSink()
+    failures: list[str] = []
+    # docx/pdf 本身已压缩，ZIP_STORED 避免重复压缩
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for entry_name, content, error in rendered:
+            if content is None:
+                failures.append(f"{entry_name}：{error}")
+                continue
+            zf.writestr(entry_name, content)
+            yield sink.drain()
+        if failures:
+            zf.writestr("导出失败清单.txt", "\n".join(failures))
+    yield sink.drain()
+
+
+def iter_filing_forms_zip(template_path: str, jobs: list[tuple[str, dict[str, Any], dict[str, Any]]]):
+    return iter_rendered_zip(iter_rendered_filing_forms(template_path, jobs))
+
+
+def select_batch_systems(db: Session, payload: dict[str, Any], max_systems: int, verb: str) -> list[SystemInfo]:
+    """按 system_ids 和/或 organization_id 取未删除的系统；system_ids 中有不存在的 ID 时 404。"""
+    raw_ids = payload.get("system_ids") or []
+    if not isinstance(raw_ids, list):
+        raise HTTPException(status_code=400, detail="system_ids 必须为数组。")
+    try:
+        system_ids = list(dict.fromkeys(int(value) for value in raw_ids))
+    except (TypeError, ValueError) as ex:
+        raise HTTPException(status_code=400, detail="system_ids 包含非法 ID。") from ex
+    organization_id = payload.get("organization_id")
+
+    query = db.query(SystemInfo).filter(SystemInfo.deleted_at.is_(None))
+    if organization_id not in (None, ""):
+        try:
+            organization_id = int(organization_id)
+        except (TypeError, ValueError) as ex:
+            raise HTTPException(status_code=400, detail="organization_id 非法。") from ex
+        org = get_org_or_404(db, organization_id)
+        query = query.filter(SystemInfo.organization_id == org.id)
+        if system_ids:
+            query = query.filter(SystemInfo.id.in_(system_ids))
+    elif system_ids:
+        query = query.filter(SystemInfo.id.in_(system_ids))
+    else:
+        raise HTTPException(status_code=400, detail="请提供 system_ids 或 organization_id。")
+    systems = query.order_by(SystemInfo.organization_id.asc(), SystemInfo.id.asc()).all()
+    if not systems:
+        raise HTTPException(status_code=404, detail=f"未找到可{verb}的系统。")
+    if system_ids and organization_id in (None, ""):
+        missing = sorted(set(system_ids) - {s.id for s in systems})
+        if missing:
+            raise HTTPException(status_code=404, detail=f"系统不存在：{', '.join(str(i) for i in missing)}。")
+    if len(systems) > max_systems:
+        raise HTTPException(status_code=400, detail=f"单次最多{verb} {max_systems} 个系统。")
+    return systems
+
+
+def _column_snapshot(obj: Any) -> dict[str, Any]:
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+@app.post("/api/systems/export/word-batch")
+def export_systems_word_batch(
+    request: Request,
+    payload: dict[str, Any],
+    async_mode: bool = Query(False, alias="async"),
+    db: Session = Depends(get_db),
+) -> Any:
+    actor, _ = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
+    systems = select_batch_systems(db, payload, BULK_EXPORT_MAX_SYSTEMS, "导出")
+    template_path = resolve_filing_template_path()
+
+    orgs = {
+        org.id: org
+        for org in db.query(Organization)
+        .filter(Organization.id.in_({s.organization_id for s in systems}), Organization.deleted_at.is_(None))
+        .all()
+    }
+    jobs: list[tuple[str, dict[str, Any], dict[str, Any]]] = []
+    used_names: set[str] = set()
+    for system in systems:
+        org = orgs.get(system.organization_id)
+        if not org:
+            continue
+        stem = filing_form_file_stem(org, system)
+        entry_name = f"{stem}.docx"
+        if entry_name in used_names:
+            entry_name = f"{stem}_{system.id}.docx"
+        used_names.add(entry_name)
+        jobs.append((entry_name, _column_snapshot(org), _column_snapshot(system)))
+    if not jobs:
+        raise HTTPException(status_code=404, detail="未找到可导出的系统。")
+
+    zip_name = f"网络安全等级保护定级备案表_{datetime.now():%Y%m%d%H%M%S}.zip"
+    if async_mode:
+
+        def run(job: JobContext) -> dict[str, Any]:
+            zip_path = job_result_file(job, ".zip")
+            with zip_path.open("wb") as out:
+                # 每渲染完一份备案表产出一段数据
+                for n, chunk in enumerate(iter_filing_forms_zip(str(template_path), jobs), start=1):
+                    out.write(chunk)
+                    job.progress(n / (len(jobs) + 1))
+            job.set_result_file(zip_path, zip_name)
+            return {"systems": len(jobs)}
+
+        return submit_background_job("filing_form_batch_export", actor, run)
+    return StreamingResponse(
+        iter_filing_forms_zip(str(template_path), jobs),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(zip_name)}"},
+    )
+
+
+@app.get("/api/systems/{system_id}/export/word")
+def export_system_word(
+    request: Request,
+    system_id: int,
+    async_mode: bool = Query(False, alias="async"),
+    db: Session = Depends(get_db),
+) -> Any:
+    actor, _ = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
+    system = get_system_or_404(db, system_id)
+    org = get_org_or_404(db, system.organization_id)
+    template_path = resolve_filing_template_path()
+    base_name = filing_form_file_stem(org, system)
+    if async_mode:
+        org_data, system_data = _column_snapshot(org), _column_snapshot(system)
+
+        def run(job: JobContext) -> dict[str, Any]:
+            result_path = job_result_file(job, ".docx")
+            result_path.write_bytes(render_filing_form_bytes(str(template_path), org_data, system_data))
+            job.set_result_file(result_path, f"{base_name}.docx")
+            return {"system_id": system_id}
+
+        return submit_background_job("filing_form_export", actor, run)
     path = EXPORT_DIR / f"{base_name}.docx"
     if path.exists():
         path = EXPORT_DIR / f"{base_name}_{datetime.now():%Y%m%d%H%M%S}.docx"
-    doc = Document(str(template_path))
-    fill_filing_template_document(doc, org, system)
+    doc, cells = instantiate_filing_template(compile_filing_template(Path(template_path)))
+    fill_filing_template_document(doc, org, system, cells)
     doc.save(path)
     return FileResponse(path=str(path), filename=path.name, background=BackgroundTask(_cleanup_export_file, path))
 
@@ -6143,7 +7531,7 @@ def _get_or_create_grading_report(db: Session, system_id: int) -> GradingReport:
 
 
 def _merge_default_content(defaults: dict[str, Any], saved: Any) -> dict[str, Any]:
-    merged = deep_copy_json(defaults)
+    merged = copy_json_tree(defaults)
     if isinstance(saved, dict):
         for k, v in saved.items():
             merged[k] = v
@@ -6545,16 +7933,14 @@ async def upload_attachment(
     ext = Path(file.filename).suffix.lower().lstrip(".")
     if ext not in allowed:
         raise HTTPException(status_code=400, detail=f"不支持的附件格式: {ext}")
-    content = await file.read()
-    if len(content) > limit:
-        raise HTTPException(status_code=400, detail=f"文件大小超过限制({limit // 1024 // 1024}MB)。")
+    staged = await stage_upload(file, limit, f"文件大小超过限制({limit // 1024 // 1024}MB)。")
     row = save_attachment_row(
         db,
         entity_type=entity_type,
         entity_id=entity_id,
         actor=actor,
         file_name=file.filename,
-        content=content,
+        staged=staged,
     )
     db.commit()
     db.refresh(row)
@@ -6590,9 +7976,10 @@ async def upload_attachment_batch(
         if ext not in allowed:
             skipped.append(f"{f.filename}: 不支持的附件格式 {ext}")
             continue
-        content = await f.read()
-        if len(content) > limit:
-            skipped.append(f"{f.filename}: 文件大小超过限制({limit // 1024 // 1024}MB)")
+        try:
+            staged = await stage_upload(f, limit, f"文件大小超过限制({limit // 1024 // 1024}MB)")
+        except HTTPException as exc:
+            skipped.append(f"{f.filename}: {exc.detail}")
             continue
         save_attachment_row(
             db,
@@ -6600,7 +7987,7 @@ async def upload_attachment_batch(
             entity_id=entity_id,
             actor=actor,
             file_name=f.filename,
-            content=content,
+            staged=staged,
         )
         uploaded += 1
     db.commit()
@@ -6661,12 +8048,24 @@ def delete_attachment(request: Request, attachment_id: int, db: Session = Depend
     row = db.query(Attachment).filter(Attachment.id == attachment_id).first()
     if not row:
         raise HTTPException(status_code=404, detail="附件不存在。")
-    safe_delete_uploaded_file(row.file_path)
+    release_stored_file(db, row.sha256, row.file_path)
     db.delete(row)
     db.commit()
     return {"message": "附件已删除。"}
 
 
+def build_report_content(report_type: str, org: Any, system: Any, template: ReportTemplate | None) -> dict[str, Any]:
+    """生成报告内容并套用模板配置；数据不完整时抛 ReportDataError。"""
+    content = generate_report_payload(report_type, org, system)
+    content = apply_template_config_to_payload(content, template)
+    if "签章" not in content:
+        content["签章"] = {"公司签章": "", "测评师签章": "", "签章日期": ""}
+    if template and report_type == "expert_review_form":
+        content["模板信息"] = content.get("模板信息", {})
+        content["模板信息"]["匹配说明"] = f"按地市[{org.filing_region}]匹配模板"
+    return content
+
+
 @app.post("/api/reports/generate")
 def generate_report(
     request: Request,
@@ -6688,14 +8087,8 @@ def generate_report(
         or 0
     )
     version = max_version + 1
-    content = generate_report_payload(report_type, org, system)
     template = choose_report_template(db, report_type, org.filing_region or "", system.proposed_level, template_id=template_id)
-    content = apply_template_config_to_payload(content, template)
-    if "签章" not in content:
-        content["签章"] = {"公司签章": "", "测评师签章": "", "签章日期": ""}
-    if template and report_type == "expert_review_form":
-        content["模板信息"] = content.get("模板信息", {})
-        content["模板信息"]["匹配说明"] = f"按地市[{org.filing_region}]匹配模板"
+    content = build_report_content(report_type, org, system, template)
     report = Report(
         organization_id=org.id,
         system_id=system.id,
@@ -6703,9 +8096,10 @@ def generate_report(
         version_no=version,
         title=build_report_title(report_type, system.system_name, version),
         status="draft",
-        content=content,
+        content={},
         generated_by=actor,
     )
+    store_report_content(db, report, content)
     db.add(report)
     db.commit()
     db.refresh(report)
@@ -6717,13 +8111,119 @@ def generate_report(
             "report_type": report.report_type,
             "version_no": report.version_no,
             "status": report.status,
-            "content": report.content,
+            "content": content,
             "template_id": template.id if template else None,
             "template_name": template.template_name if template else None,
         },
     }
 
 
+@app.post("/api/reports/generate-batch")
+def generate_reports_batch(request: Request, payload: dict[str, Any], db: Session = Depends(get_db)) -> dict[str, Any]:
+    """为单位下全部系统或指定系统批量生成报告，一次事务写入；render=word/pdf 时提交后台渲染任务。"""
+    actor, _ = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
+    report_type = str(payload.get("report_type") or "grading_report").lower()
+    if report_type not in VALID_REPORT_TYPES:
+        raise HTTPException(status_code=400, detail="report_type 无效。")
+    render = str(payload.get("render") or "").lower()
+    if render not in {"", "word", "pdf"}:
+        raise HTTPException(status_code=400, detail="render 仅支持 word/pdf。")
+    systems = select_batch_systems(db, payload, REPORT_BATCH_MAX_SYSTEMS, "生成报告")
+    orgs = {
+        org.id: org
+        for org in db.query(Organization)
+        .filter(Organization.id.in_({s.organization_id for s in systems}), Organization.deleted_at.is_(None))
+        .all()
+    }
+    max_versions = dict(
+        db.query(Report.system_id, func.max(Report.version_no))
+        .filter(Report.system_id.in_([s.id for s in systems]), Report.report_type == report_type)
+        .group_by(Report.system_id)
+        .all()
+    )
+
+    # 同一 (地市, 等级) 只匹配一次模板
+    templates: dict[tuple[str, Any], ReportTemplate | None] = {}
+    items: list[dict[str, Any]] = []
+    created: list[tuple[Report, dict[str, Any], Any, Any, ReportTemplate | None]] = []
+    blocks: list[tuple[str, Any]] = []
+    for system in systems:
+        org = orgs.get(system.organization_id)
+        if not org:
+            items.append({"system_id": system.id, "ok": False, "error": "所属单位不存在。"})
+            continue
+        key = (org.filing_region or "", system.proposed_level)
+        if key not in templates:
+            templates[key] = choose_report_template(db, report_type, key[0], key[1])
+        template = templates[key]
+        try:
+            content = build_report_content(report_type, org, system, template)
+        except ReportDataError as ex:
+            items.append({"system_id": system.id, "ok": False, "error": str(ex)})
+            continue
+        version = (max_versions.get(system.id) or 0) + 1
+        report = Report(
+            organization_id=org.id,
+            system_id=system.id,
+            report_type=report_type,
+            version_no=version,
+            title=build_report_title(report_type, system.system_name, version),
+            status="draft",
+            content={},
+            generated_by=actor,
+        )
+        blocks.extend(assign_report_content(report, content))
+        created.append((report, content, org, system, template))
+        items.append({"system_id": system.id, "ok": True})
+
+    render_jobs: list[tuple[str, Callable[..., bytes], tuple[Any, ...]]] = []
+    if created:
+        acquire_blocks(db, blocks)
+        db.add_all([report for report, *_ in created])
+        db.flush()
+        by_system = {report.system_id: report for report, *_ in created}
+        used_names: set[str] = set()
+        suffix = ".pdf" if render == "pdf" else ".docx"
+        for item in items:
+            report = by_system.get(item["system_id"])
+            if report is not None:
+                item.update({"report_id": report.id, "title": report.title, "version_no": report.version_no})
+        for report, content, org, system, template in created if render else []:
+            export_content = prepare_export_content(content)
+            template_file = template.file_path if template and template.file_path and Path(template.file_path).exists() else ""
+            field_map = report_template_field_map(report, export_content, org, system) if template_file else {}
+            stem = sanitize_filename_component(report.title, f"report_{report.id}")
+            entry_name = f"{stem}{suffix}"
+            if entry_name in used_names:
+                entry_name = f"{stem}_{report.id}{suffix}"
+            used_names.add(entry_name)
+            render_jobs.append((entry_name, _render_report_task, (render, report.title, export_content, template_file, field_map)))
+        db.commit()
+
+    render_job = None
+    if render_jobs:
+        zip_name = f"批量报告_{datetime.now():%Y%m%d%H%M%S}.zip"
+
+        def run(job: JobContext) -> dict[str, Any]:
+            zip_path = job_result_file(job, ".zip")
+            with zip_path.open("wb") as out:
+                for n, chunk in enumerate(iter_rendered_zip(iter_pooled_renders(render_jobs)), start=1):
+                    out.write(chunk)
+                    job.progress(n / (len(render_jobs) + 1))
+            job.set_result_file(zip_path, zip_name)
+            return {"reports": len(render_jobs)}
+
+        render_job = submit_background_job("report_batch_render", actor, run)
+    succeeded = len(created)
+    return {
+        "message": "批量生成完成",
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "items": items,
+        "render_job": render_job,
+    }
+
+
 @app.get("/api/reports")
 def list_reports(
     system_id: int | None = None,
@@ -6767,7 +8267,7 @@ def get_report(report_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
         "report_type": report.report_type,
         "version_no": report.version_no,
         "status": report.status,
-        "content": report.content,
+        "content": load_report_content(db, report),
         "generated_by": report.generated_by,
         "generated_at": report.generated_at,
     }
@@ -6790,7 +8290,7 @@ def edit_report(
     effective_is_admin = role == "admin"
     if report.status in {"submitted", "approved"} and not effective_is_admin:
         raise HTTPException(status_code=403, detail="当前状态不可编辑。")
-    report.content = payload.content
+    store_report_content(db, report, payload.content)
     if payload.title:
         report.title = payload.title
     db.add(
@@ -6825,7 +8325,7 @@ def add_report_section(
 ) -> dict[str, Any]:
     actor, role = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
     report = _editable_report_or_403(db, report_id, role == "admin")
-    content = dict(report.content or {})
+    content = load_report_content(db, report)
     sections = list(content.get("章节") or [])
     name = str(payload.get("name") or "").strip()
     if not name:
@@ -6841,7 +8341,7 @@ def add_report_section(
     else:
         sections.insert(index, new_section)
     content["章节"] = sections
-    report.content = content
+    store_report_content(db, report, content)
     db.add(
         ReviewRecord(
             report_id=report.id,
@@ -6863,13 +8363,13 @@ def delete_report_section(
 ) -> dict[str, Any]:
     actor, role = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
     report = _editable_report_or_403(db, report_id, role == "admin")
-    content = dict(report.content or {})
+    content = load_report_content(db, report)
     sections = list(content.get("章节") or [])
     if section_index < 0 or section_index >= len(sections):
         raise HTTPException(status_code=400, detail="section_index 超出范围。")
     removed = sections.pop(section_index)
     content["章节"] = sections
-    report.content = content
+    store_report_content(db, report, content)
     db.add(
         ReviewRecord(
             report_id=report.id,
@@ -6892,14 +8392,14 @@ def reorder_report_section(
 ) -> dict[str, Any]:
     actor_name, role = require_roles(request, db, {"admin", "reviewer", "evaluator"}, legacy_admin=True)
     report = _editable_report_or_403(db, report_id, role == "admin")
-    content = dict(report.content or {})
+    content = load_report_content(db, report)
     sections = list(content.get("章节") or [])
     if from_index >= len(sections) or to_index >= len(sections):
         raise HTTPException(status_code=400, detail="索引超出范围。")
     section = sections.pop(from_index)
     sections.insert(to_index, section)
     content["章节"] = sections
-    report.content = content
+    store_report_content(db, report, content)
     db.add(
         ReviewRecord(
             report_id=report.id,
@@ -6922,7 +8422,7 @@ def set_report_signature(
     actor_name, role = require_roles(request, db, {"admin", "reviewer", "evaluator"}, legacy_admin=True)
     assert_safe_payload(payload, "payload")
     report = _editable_report_or_403(db, report_id, role == "admin")
-    content = dict(report.content or {})
+    content = load_report_content(db, report)
     sign = content.get("签章")
     if not isinstance(sign, dict):
         sign = {}
@@ -6930,7 +8430,7 @@ def set_report_signature(
         if key in payload:
             sign[key] = payload[key]
     content["签章"] = sign
-    report.content = content
+    store_report_content(db, report, content)
     db.add(
         ReviewRecord(
             report_id=report.id,
@@ -7039,22 +8539,93 @@ def list_report_versions(report_id: int, db: Session = Depends(get_db)) -> dict[
     }
 
 
-def _normalize_for_diff(value: Any) -> str:
-    if isinstance(value, (dict, list)):
-        return json.dumps(value, ensure_ascii=False, sort_keys=True)
-    return "" if value is None else str(value)
+# 有内容清单的报告里，章节行用该键保存章节内容的哈希
+REPORT_SECTION_REF = "内容_sha256"
 
 
-def _section_name_map(content: dict[str, Any]) -> dict[str, Any]:
-    items = list(content.get("章节") or [])
-    result: dict[str, Any] = {}
-    for idx, row in enumerate(items):
-        if not isinstance(row, dict):
-            result[f"#{idx}"] = row
+def _compact_report_content(content: dict[str, Any]) -> tuple[dict[str, Any], list[tuple[str, Any]]]:
+    """把章节内容换成哈希引用，返回 (精简后的 content, [(哈希, 章节内容)])。"""
+    blocks: list[tuple[str, Any]] = []
+    compact: dict[str, Any] = {}
+    for key, value in content.items():
+        if key != "章节" or not isinstance(value, list):
+            compact[key] = value
             continue
-        name = str(row.get("名称") or f"#{idx}")
-        result[name] = row.get("内容")
-    return result
+        rows = []
+        for row in value:
+            if not isinstance(row, dict) or "内容" not in row:
+                rows.append(row)
+                continue
+            sha256 = content_hash(row["内容"])
+            blocks.append((sha256, row["内容"]))
+            rows.append({(REPORT_SECTION_REF if k == "内容" else k): (sha256 if k == "内容" else v) for k, v in row.items()})
+        compact[key] = rows
+    return compact, blocks
+
+
+def report_block_refs(report: Report) -> list[str]:
+    if report.content_manifest is None:
+        return []
+    rows = (report.content or {}).get("章节")
+    if not isinstance(rows, list):
+        return []
+    return [row[REPORT_SECTION_REF] for row in rows if isinstance(row, dict) and REPORT_SECTION_REF in row]
+
+
+def assign_report_content(report: Report, content: dict[str, Any]) -> list[tuple[str, Any]]:
+    """把精简内容与内容清单写到 report 上，返回需要登记引用的 [(哈希, 章节内容)]。"""
+    content = dict(content or {})
+    compact, blocks = _compact_report_content(content)
+    report.content = compact
+    report.content_manifest = build_content_manifest(content)
+    return blocks
+
+
+def store_report_content(db: Session, report: Report, content: dict[str, Any]) -> None:
+    """保存报告内容：章节正文按哈希共享存储，同时记下各字段与各章节的内容哈希。"""
+    previous_refs = report_block_refs(report)
+    acquire_blocks(db, assign_report_content(report, content))
+    release_blocks(db, previous_refs)
+
+
+def _expand_report_rows(rows: list[Any], bodies: dict[str, Any]) -> list[Any]:
+    return [
+        {("内容" if k == REPORT_SECTION_REF else k): (bodies.get(v) if k == REPORT_SECTION_REF else v) for k, v in row.items()}
+        if isinstance(row, dict) and REPORT_SECTION_REF in row
+        else row
+        for row in rows
+    ]
+
+
+def load_report_content(db: Session, report: Report) -> dict[str, Any]:
+    """还原完整报告内容；旧数据（无内容清单）原样返回副本。"""
+    content = dict(report.content or {})
+    rows = content.get("章节")
+    if report.content_manifest is None or not isinstance(rows, list):
+        return content
+    content["章节"] = _expand_report_rows(rows, load_blocks(db, report_block_refs(report)))
+    return content
+
+
+def _report_manifest(report: Report) -> dict[str, Any]:
+    if report.content_manifest is not None:
+        return report.content_manifest
+    return build_content_manifest(dict(report.content or {}))
+
+
+def _report_section_bodies(db: Session, report: Report, names: list[str]) -> dict[str, Any]:
+    """只取指定章节的内容；同名章节以后出现者为准。"""
+    wanted = set(names)
+    picked: dict[str, Any] = {}
+    for idx, row in enumerate((report.content or {}).get("章节") or []):
+        name = section_key(row, idx)
+        if name in wanted:
+            picked[name] = row
+    rows = list(picked.values())
+    if report.content_manifest is not None:
+        refs = [row[REPORT_SECTION_REF] for row in rows if isinstance(row, dict) and REPORT_SECTION_REF in row]
+        rows = _expand_report_rows(rows, load_blocks(db, refs))
+    return {name: (row.get("内容") if isinstance(row, dict) else row) for name, row in zip(picked, rows)}
 
 
 @app.get("/api/reports/{report_id}/compare/{target_id}")
@@ -7065,25 +8636,31 @@ def compare_report_versions(report_id: int, target_id: int, db: Session = Depend
         raise HTTPException(status_code=404, detail="报告不存在。")
     if left.system_id != right.system_id or left.report_type != right.report_type:
         raise HTTPException(status_code=400, detail="仅可对比同系统同类型报告。")
-    left_content = dict(left.content or {})
-    right_content = dict(right.content or {})
-    fields = sorted(set(left_content.keys()) | set(right_content.keys()))
+    left_manifest = _report_manifest(left)
+    right_manifest = _report_manifest(right)
+    left_fields = left_manifest["fields"]
+    right_fields = right_manifest["fields"]
+    left_sections = left_manifest["sections"]
+    right_sections = right_manifest["sections"]
+    left_content = left.content or {}
+    right_content = right.content or {}
     field_changes = []
-    for key in fields:
-        lv = left_content.get(key)
-        rv = right_content.get(key)
-        if _normalize_for_diff(lv) != _normalize_for_diff(rv):
-            field_changes.append({"field": key, "from": lv, "to": rv})
-
-    left_sections = _section_name_map(left_content)
-    right_sections = _section_name_map(right_content)
-    left_names = set(left_sections.keys())
-    right_names = set(right_sections.keys())
+    for key in sorted(set(left_fields) | set(right_fields)):
+        if left_fields.get(key) == right_fields.get(key):
+            continue
+        if key == "章节":
+            # 章节正文的差异见 section_diffs，这里只给出章节名单
+            field_changes.append({"field": key, "from": list(left_sections), "to": list(right_sections)})
+        else:
+            field_changes.append({"field": key, "from": left_content.get(key), "to": right_content.get(key)})
+
+    left_names = set(left_sections)
+    right_names = set(right_sections)
     section_added = sorted(right_names - left_names)
     section_removed = sorted(left_names - right_names)
-    section_changed = sorted(
-        [name for name in (left_names & right_names) if _normalize_for_diff(left_sections[name]) != _normalize_for_diff(right_sections[name])]
-    )
+    section_changed = sorted(name for name in left_names & right_names if left_sections[name] != right_sections[name])
+    left_bodies = _report_section_bodies(db, left, section_changed)
+    right_bodies = _report_section_bodies(db, right, section_changed)
     return {
         "left": {"id": left.id, "version_no": left.version_no, "title": left.title},
         "right": {"id": right.id, "version_no": right.version_no, "title": right.title},
@@ -7097,6 +8674,9 @@ def compare_report_versions(report_id: int, target_id: int, db: Session = Depend
         "section_added": section_added,
         "section_removed": section_removed,
         "section_changed": section_changed,
+        "section_diffs": {
+            name: diff_section(left_bodies.get(name), right_bodies.get(name)) for name in section_changed
+        },
     }
 
 
@@ -7124,9 +8704,10 @@ def restore_report_version(
         version_no=max_version + 1,
         title=f"{current.title}-恢复V{max_version + 1}",
         status="draft",
-        content=target.content,
+        content={},
         generated_by=actor,
     )
+    store_report_content(db, new_report, load_report_content(db, target))
     db.add(new_report)
     db.commit()
     db.refresh(new_report)
@@ -7162,9 +8743,13 @@ def prepare_export_content(content: dict[str, Any]) -> dict[str, Any]:
 
 
 def build_report_template_field_map(report: Report, content: dict[str, Any], db: Session) -> dict[str, str]:
-    field_map: dict[str, str] = {}
     org = db.query(Organization).filter(Organization.id == report.organization_id).first()
     system = db.query(SystemInfo).filter(SystemInfo.id == report.system_id).first()
+    return report_template_field_map(report, content, org, system)
+
+
+def report_template_field_map(report: Report, content: dict[str, Any], org: Any, system: Any) -> dict[str, str]:
+    field_map: dict[str, str] = {}
     if org:
         field_map.update(
             {
@@ -7211,14 +8796,39 @@ def build_report_template_field_map(report: Report, content: dict[str, Any], db:
     return field_map
 
 
+def _render_report_task(fmt: str, title: str, content: dict[str, Any], template_file: str, field_map: dict[str, str]) -> bytes:
+    """在进程池中把一份报告渲染为 Word/PDF 字节；模板渲染失败时回退普通 Word 导出。"""
+    suffix = ".pdf" if fmt == "pdf" else ".docx"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"report{suffix}"
+        if fmt == "pdf":
+            export_report_pdf(title, content, path)
+        else:
+            rendered = False
+            if template_file:
+                try:
+                    export_report_docx_with_template(Path(template_file), field_map, path)
+                    rendered = True
+                except Exception as exc:
+                    logger.warning("模板导出失败，已回退普通导出。title=%s error=%s", title, exc)
+            if not rendered:
+                export_report_docx(title, content, path)
+        return path.read_bytes()
+
+
 @app.get("/api/reports/{report_id}/export/word")
-def export_report_word(request: Request, report_id: int, db: Session = Depends(get_db)) -> FileResponse:
-    require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
+def export_report_word(
+    request: Request,
+    report_id: int,
+    async_mode: bool = Query(False, alias="async"),
+    db: Session = Depends(get_db),
+) -> Any:
+    actor, _ = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
     report = db.query(Report).filter(Report.id == report_id).first()
     if not report:
         raise HTTPException(status_code=404, detail="报告不存在。")
     path = EXPORT_DIR / f"report_{report.id}_{datetime.now():%Y%m%d%H%M%S}.docx"
-    export_content = prepare_export_content(report.content)
+    export_content = prepare_export_content(load_report_content(db, report))
     tpl_info = export_content.get("模板信息")
     template_id = None
     if isinstance(tpl_info, dict):
@@ -7226,6 +8836,22 @@ def export_report_word(request: Request, report_id: int, db: Session = Depends(g
             template_id = int(tpl_info.get("template_id")) if tpl_info.get("template_id") is not None else None
         except Exception:
             template_id = None
+    if async_mode:
+        template_file, field_map = "", {}
+        if template_id:
+            tpl = db.query(ReportTemplate).filter(ReportTemplate.id == template_id, ReportTemplate.status == "enabled").first()
+            if tpl and tpl.file_path and Path(tpl.file_path).exists():
+                template_file = tpl.file_path
+                field_map = build_report_template_field_map(report, export_content, db)
+        title = report.title
+
+        def run(job: JobContext) -> dict[str, Any]:
+            result_path = job_result_file(job, ".docx")
+            result_path.write_bytes(_render_report_task("word", title, export_content, template_file, field_map))
+            job.set_result_file(result_path, path.name)
+            return {"report_id": report_id}
+
+        return submit_background_job("report_word_export", actor, run)
     if template_id:
         tpl = db.query(ReportTemplate).filter(ReportTemplate.id == template_id, ReportTemplate.status == "enabled").first()
         if tpl and tpl.file_path and Path(tpl.file_path).exists():
@@ -7244,14 +8870,25 @@ def export_report_pdf_file(
     request: Request,
     report_id: int,
     password: str | None = Query(None, min_length=4, max_length=64),
+    async_mode: bool = Query(False, alias="async"),
     db: Session = Depends(get_db),
-) -> FileResponse:
-    require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
+) -> Any:
+    actor, _ = require_roles(request, db, {"admin", "evaluator"}, legacy_admin=True)
     report = db.query(Report).filter(Report.id == report_id).first()
     if not report:
         raise HTTPException(status_code=404, detail="报告不存在。")
     path = EXPORT_DIR / f"report_{report.id}_{datetime.now():%Y%m%d%H%M%S}.pdf"
-    export_report_pdf(report.title, prepare_export_content(report.content), path, password=password)
+    title, content = report.title, prepare_export_content(load_report_content(db, report))
+    if async_mode:
+
+        def run(job: JobContext) -> dict[str, Any]:
+            result_path = job_result_file(job, ".pdf")
+            export_report_pdf(title, content, result_path, password=password)
+            job.set_result_file(result_path, path.name)
+            return {"report_id": report_id}
+
+        return submit_background_job("report_pdf_export", actor, run)
+    export_report_pdf(title, content, path, password=password)
     return FileResponse(path=str(path), filename=path.name, background=BackgroundTask(_cleanup_export_file, path))
 
 
@@ -7268,26 +8905,33 @@ def update_workflow(request: Request, payload: WorkflowConfigUpdate, db: Session
         raise HTTPException(status_code=400, detail="流程步骤不能为空。")
     for step in payload.steps:
         assert_safe_text(step, "workflow.step")
-    config = get_workflow_config(db)
+    config = get_workflow_config_row(db)
     config.steps_json = payload.steps
     config.updated_by = resolve_effective_actor_name(request, db, payload.updated_by or actor)
-    get_or_create_workflow_step_rules(db, config)
+    normalize_workflow_rules(db, config)
+    db.flush()
+    snapshot = build_workflow_snapshot(db)
     in_progress_rows = db.query(WorkflowInstance).filter(WorkflowInstance.status == "in_progress").all()
     for row in in_progress_rows:
-        if row.current_step_index >= len(config.steps_json):
-            row.current_step_index = max(0, len(config.steps_json) - 1)
-        recalc_workflow_due_at(db, row, config)
+        if row.current_step_index >= len(snapshot.steps):
+            row.current_step_index = max(0, len(snapshot.steps) - 1)
+        recalc_workflow_due_at(db, row, snapshot)
     db.commit()
-    db.refresh(config)
-    return {"message": "流程配置更新成功", "steps": config.steps_json}
+    publish_workflow_snapshot(snapshot)
+    return {"message": "流程配置更新成功", "steps": snapshot.steps_json}
 
 
 @app.get("/api/workflow/rules")
 def list_workflow_rules(db: Session = Depends(get_db)) -> dict[str, Any]:
-    config = get_workflow_config(db)
-    rule_map = get_or_create_workflow_step_rules(db, config)
+    # 规则管理页以库为准：顺带修复重复/缺失的规则行并刷新快照
+    if normalize_workflow_rules(db, get_workflow_config_row(db)):
+        db.commit()
+        config = publish_workflow_snapshot(build_workflow_snapshot(db))
+    else:
+        config = get_workflow_config(db)
+    rule_map = config.rules
     rows = []
-    for step in config.steps_json:
+    for step in config.steps:
         r = rule_map[step]
         rows.append(
             {
@@ -7299,14 +8943,13 @@ def list_workflow_rules(db: Session = Depends(get_db)) -> dict[str, Any]:
                 "updated_at": r.updated_at,
             }
         )
-    db.commit()
     return {"config_name": config.name, "rules": rows}
 
 
 @app.put("/api/workflow/rules")
 def update_workflow_rules(request: Request, payload: dict[str, Any], db: Session = Depends(get_db)) -> dict[str, Any]:
     actor, _ = require_roles(request, db, {"admin"}, legacy_admin=(not STRICT_AUTH))
-    config = get_workflow_config(db)
+    config = get_workflow_config_row(db)
     rules = payload.get("rules") or []
     updated_by = resolve_effective_actor_name(request, db, str(payload.get("updated_by") or actor or "admin"))
     assert_safe_text(updated_by, "updated_by")
@@ -7351,10 +8994,13 @@ def update_workflow_rules(request: Request, payload: dict[str, Any], db: Session
             row.time_limit_hours = max(1, limit)
             row.enabled = enabled
             row.updated_by = updated_by
+    db.flush()
+    snapshot = build_workflow_snapshot(db)
     in_progress_rows = db.query(WorkflowInstance).filter(WorkflowInstance.status == "in_progress").all()
     for row in in_progress_rows:
-        recalc_workflow_due_at(db, row, config)
+        recalc_workflow_due_at(db, row, snapshot)
     db.commit()
+    publish_workflow_snapshot(snapshot)
     return {"message": "流程规则更新成功"}
 
 
@@ -7392,20 +9038,10 @@ def workflow_extend_due(
     return {"message": "已延长时限", "due_at": instance.due_at}
 
 
-@app.get("/api/workflow/reminders")
-def workflow_reminders(
-    mode: str = Query("all"),
-    within_hours: int = Query(4, ge=1, le=72),
-    send: bool = Query(False),
-    channel: str = Query("in_app"),
-    db: Session = Depends(get_db),
-) -> dict[str, Any]:
-    mode = mode.lower()
-    if mode not in {"all", "due", "overdue"}:
-        raise HTTPException(status_code=400, detail="mode 仅支持 all/due/overdue。")
-    channel = (channel or "in_app").strip().lower()
-    if channel not in {"in_app", "email", "both"}:
-        raise HTTPException(status_code=400, detail="channel 仅支持 in_app/email/both。")
+def collect_workflow_reminders(
+    db: Session, mode: str, within_hours: int
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """返回 (接口展示项, 投递条目)，两者一一对应。"""
     config = get_workflow_config(db)
     rule_map = get_or_create_workflow_step_rules(db, config)
     query = (
@@ -7414,21 +9050,8 @@ def workflow_reminders(
         .filter(WorkflowInstance.status == "in_progress", WorkflowInstance.due_at.is_not(None))
     )
     rows = query.order_by(WorkflowInstance.due_at.asc()).all()
-    owner_email_map: dict[str, str] = {}
-    if send and channel in {"email", "both"}:
-        owner_candidates: set[str] = set()
-        for instance, _ in rows:
-            owner_name = get_workflow_step_owner(db, config, instance.current_step_index, rule_map=rule_map)
-            if owner_name and "@" not in owner_name:
-                owner_candidates.add(owner_name)
-        if owner_candidates:
-            users = db.query(UserAccount).filter(UserAccount.username.in_(owner_candidates)).all()
-            owner_email_map = {
-                user.username: user.username
-                for user in users
-                if user.username and "@" in user.username
-            }
     items: list[dict[str, Any]] = []
+    entries: list[dict[str, Any]] = []
     now = datetime.now()
     for instance, system_name in rows:
         remaining_seconds = int((instance.due_at - now).total_seconds())
@@ -7452,51 +9075,113 @@ def workflow_reminders(
             "status": "overdue" if is_overdue else "due_soon",
         }
         items.append(item)
-        if send:
-            msg = f"系统[{system_name}]节点[{step_name}]将于{instance.due_at}到期，请及时处理。"
-            if is_overdue:
-                msg = f"系统[{system_name}]节点[{step_name}]已超时，请立即处理。"
-            if channel in {"in_app", "both"}:
-                db.add(
-                    WorkflowReminder(
-                        instance_id=instance.id,
-                        step_name=step_name or "未知节点",
-                        receiver=owner or "system",
-                        reminder_type=item["status"],
-                        channel="in_app",
-                        content=msg,
-                    )
-                )
-            if channel in {"email", "both"}:
-                to_email = ""
-                if owner and "@" in owner:
-                    to_email = owner
-                else:
-                    to_email = owner_email_map.get(owner or "", "")
-                if not to_email:
-                    to_email = WORKFLOW_EMAIL_DEFAULT_TO
-                ok = False
-                err = "无可用邮箱地址"
-                if to_email:
-                    ok, err = send_workflow_email(
-                        to_email=to_email,
-                        subject=f"[流程提醒]{system_name}-{step_name or '未知节点'}",
-                        body=msg,
-                    )
-                log_msg = msg if ok else f"{msg} (邮件发送失败: {err})"
-                db.add(
-                    WorkflowReminder(
-                        instance_id=instance.id,
-                        step_name=step_name or "未知节点",
-                        receiver=to_email or (owner or "system"),
-                        reminder_type=item["status"],
-                        channel="email",
-                        content=log_msg,
-                    )
-                )
-    if send and items:
-        db.commit()
-    return {"total": len(items), "items": items}
+        msg = f"系统[{system_name}]节点[{step_name}]将于{instance.due_at}到期，请及时处理。"
+        if is_overdue:
+            msg = f"系统[{system_name}]节点[{step_name}]已超时，请立即处理。"
+        entries.append(
+            {
+                "instance_id": instance.id,
+                "system_name": system_name,
+                "step_name": step_name,
+                "status": item["status"],
+                "owner": owner,
+                "message": msg,
+            }
+        )
+    return items, entries
+
+
+def resolve_reminder_recipients(db: Session, entries: list[dict[str, Any]]) -> None:
+    owner_candidates = {e["owner"] for e in entries if e["owner"] and "@" not in e["owner"]}
+    owner_email_map: dict[str, str] = {}
+    if owner_candidates:
+        users = db.query(UserAccount).filter(UserAccount.username.in_(owner_candidates)).all()
+        owner_email_map = {
+            user.username: user.username
+            for user in users
+            if user.username and "@" in user.username
+        }
+    for entry in entries:
+        owner = entry["owner"] or ""
+        entry["recipient"] = (owner if "@" in owner else owner_email_map.get(owner, "")) or WORKFLOW_EMAIL_DEFAULT_TO
+
+
+def deliver_reminder_emails(entries: list[dict[str, Any]]) -> dict[str, Any]:
+    """按收件人合并发送并批量写日志（后台任务/定时线程中执行）。"""
+    rows = send_reminder_digests(send_workflow_email, entries)
+    with SessionLocal() as log_db:
+        insert_reminder_logs(log_db, rows)
+        log_db.commit()
+    failed = sum(1 for row in rows if "(邮件发送失败:" in row["content"])
+    return {"recipients": len({row["receiver"] for row in rows}), "reminders": len(rows), "failed": failed}
+
+
+def dispatch_workflow_reminders(
+    db: Session, entries: list[dict[str, Any]], channel: str, actor: str, background: bool = True
+) -> str | None:
+    """写站内提醒日志；邮件按收件人合并，background 时交给后台任务发送并返回任务 ID。"""
+    rows = in_app_log_rows(entries) if channel in {"in_app", "both"} else []
+    email_entries: list[dict[str, Any]] = []
+    if channel in {"email", "both"}:
+        resolve_reminder_recipients(db, entries)
+        config_error = SMTP_POOL.config_error()
+        if config_error:
+            rows += unsendable_log_rows(entries, config_error)
+        else:
+            rows += unsendable_log_rows([e for e in entries if not e["recipient"]])
+            email_entries = [e for e in entries if e["recipient"]]
+    insert_reminder_logs(db, rows)
+    db.commit()
+    if not email_entries:
+        return None
+    if not background:
+        deliver_reminder_emails(email_entries)
+        return None
+    return submit_background_job("workflow_reminder_email", actor, lambda job: deliver_reminder_emails(email_entries))["job_id"]
+
+
+def run_scheduled_workflow_reminders() -> int:
+    """定时提醒：跳过 WORKFLOW_REMINDER_RESEND_HOURS 内已按同一类型提醒过的节点。"""
+    with SessionLocal() as db:
+        _, entries = collect_workflow_reminders(db, "all", 4)
+        # created_at 由 insert_reminder_logs 按应用本地时间写入，这里用同一时钟
+        since = datetime.now() - timedelta(hours=WORKFLOW_REMINDER_RESEND_HOURS)
+        recent = {
+            (row.instance_id, row.reminder_type)
+            for row in db.query(WorkflowReminder.instance_id, WorkflowReminder.reminder_type)
+            .filter(WorkflowReminder.created_at >= since)
+            .distinct()
+        }
+        entries = [e for e in entries if (e["instance_id"], e["status"]) not in recent]
+        if entries:
+            dispatch_workflow_reminders(db, entries, WORKFLOW_REMINDER_CHANNEL, "system", background=False)
+        return len(entries)
+
+
+REMINDER_SCHEDULER = ReminderScheduler(WORKFLOW_REMINDER_INTERVAL_MINUTES * 60, run_scheduled_workflow_reminders)
+
+
+@app.get("/api/workflow/reminders")
+def workflow_reminders(
+    request: Request,
+    mode: str = Query("all"),
+    within_hours: int = Query(4, ge=1, le=72),
+    send: bool = Query(False),
+    channel: str = Query("in_app"),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    mode = mode.lower()
+    if mode not in {"all", "due", "overdue"}:
+        raise HTTPException(status_code=400, detail="mode 仅支持 all/due/overdue。")
+    channel = (channel or "in_app").strip().lower()
+    if channel not in {"in_app", "email", "both"}:
+        raise HTTPException(status_code=400, detail="channel 仅支持 in_app/email/both。")
+    items, entries = collect_workflow_reminders(db, mode, within_hours)
+    result: dict[str, Any] = {"total": len(items), "items": items}
+    if send and entries:
+        actor = resolve_effective_actor_name(request, db, "system")
+        result["email_job_id"] = dispatch_workflow_reminders(db, entries, channel, actor)
+    return result
 
 
 @app.get("/api/workflow/reminder-logs")
@@ -7523,7 +9208,6 @@ def workflow_reminder_logs(db: Session = Depends(get_db)) -> dict[str, Any]:
 def workflow_instance(system_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
     get_system_or_404(db, system_id)
     config = get_workflow_config(db)
-    get_or_create_workflow_step_rules(db, config)
     instance = db.query(WorkflowInstance).filter(WorkflowInstance.system_id == system_id).first()
     if not instance:
         instance = WorkflowInstance(system_id=system_id, current_step_index=0, status="in_progress")
@@ -7538,7 +9222,7 @@ def workflow_instance(system_id: int, db: Session = Depends(get_db)) -> dict[str
     step_name = ""
     if 0 <= instance.current_step_index < len(config.steps_json):
         step_name = config.steps_json[instance.current_step_index]
-    owner = get_workflow_step_owner(db, config, instance.current_step_index)
+    owner = get_workflow_step_owner(db, config, instance.current_step_index, rule_map=config.rules)
     remaining_seconds = None
     overdue = False
     if instance.due_at:
@@ -7574,6 +9258,107 @@ def workflow_instance(system_id: int, db: Session = Depends(get_db)) -> dict[str
     }
 
 
+WORKFLOW_ACTIONS = {"complete", "approve", "reject", "abnormal", "reset"}
+WORKFLOW_BATCH_MAX = 500
+
+
+def apply_workflow_action(instance: WorkflowInstance, steps: list[str], action: str) -> str:
+    """按动作推进流程实例，返回动作发生时所在节点名。"""
+    current_idx = instance.current_step_index
+    current_name = steps[current_idx] if current_idx < len(steps) else "已完成"
+    if action in {"complete", "approve"}:
+        if current_idx + 1 >= len(steps):
+            instance.status = "completed"
+        else:
+            instance.current_step_index = current_idx + 1
+            instance.status = "in_progress"
+    elif action in {"reject", "abnormal"}:
+        instance.status = "abnormal"
+    elif action == "reset":
+        instance.current_step_index = 0
+        instance.status = "in_progress"
+    return current_name
+
+
+def workflow_step_label(steps: list[str], index: int) -> str:
+    return steps[index] if index < len(steps) else "已完成"
+
+
+@app.post("/api/workflow/instances/batch-advance")
+def workflow_batch_advance(request: Request, payload: dict[str, Any], db: Session = Depends(get_db)) -> dict[str, Any]:
+    actor_name, _ = require_roles(request, db, {"admin", "reviewer", "evaluator"}, legacy_admin=True)
+    action = str(payload.get("action") or "complete").lower()
+    if action not in WORKFLOW_ACTIONS:
+        raise HTTPException(status_code=400, detail="action 仅支持 complete/approve/reject/abnormal/reset。")
+    comment = str(payload.get("comment") or "")
+    assert_safe_text(comment, "comment")
+    raw_ids = payload.get("system_ids")
+    if not isinstance(raw_ids, list) or not raw_ids:
+        raise HTTPException(status_code=400, detail="system_ids 必须为非空数组。")
+    try:
+        system_ids = list(dict.fromkeys(int(value) for value in raw_ids))
+    except (TypeError, ValueError) as ex:
+        raise HTTPException(status_code=400, detail="system_ids 包含非法 ID。") from ex
+    if len(system_ids) > WORKFLOW_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"单次最多处理 {WORKFLOW_BATCH_MAX} 个系统。")
+    config = get_workflow_config(db)
+    steps = config.steps_json
+    if not steps:
+        raise HTTPException(status_code=400, detail="流程步骤为空。")
+
+    existing = {
+        row.id
+        for row in db.query(SystemInfo.id).filter(SystemInfo.id.in_(system_ids), SystemInfo.deleted_at.is_(None))
+    }
+    instances: dict[int, WorkflowInstance] = {}
+    if existing:
+        instances = {
+            row.system_id: row
+            for row in db.query(WorkflowInstance).filter(WorkflowInstance.system_id.in_(existing)).all()
+        }
+    created = [
+        WorkflowInstance(system_id=system_id, current_step_index=0, status="in_progress")
+        for system_id in system_ids
+        if system_id in existing and system_id not in instances
+    ]
+    if created:
+        db.add_all(created)
+        db.flush()
+        instances.update({row.system_id: row for row in created})
+
+    results: list[dict[str, Any]] = []
+    action_rows: list[dict[str, Any]] = []
+    for system_id in system_ids:
+        instance = instances.get(system_id)
+        if instance is None:
+            results.append({"system_id": system_id, "ok": False, "detail": "系统不存在。"})
+            continue
+        step_name = apply_workflow_action(instance, steps, action)
+        recalc_workflow_due_at(db, instance, config)
+        action_rows.append(
+            {"instance_id": instance.id, "step_name": step_name, "actor": actor_name, "action": action, "comment": comment}
+        )
+        results.append(
+            {
+                "system_id": system_id,
+                "ok": True,
+                "status": instance.status,
+                "current_step_index": instance.current_step_index,
+                "current_step_name": workflow_step_label(steps, instance.current_step_index),
+            }
+        )
+    if action_rows:
+        db.execute(insert(WorkflowAction), action_rows)
+    db.commit()
+    succeeded = len(action_rows)
+    return {
+        "message": "批量流转完成",
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "items": results,
+    }
+
+
 @app.post("/api/workflow/instances/{system_id}/advance")
 def workflow_advance(
     request: Request,
@@ -7594,22 +9379,10 @@ def workflow_advance(
     steps = config.steps_json
     if not steps:
         raise HTTPException(status_code=400, detail="流程步骤为空。")
-    current_idx = instance.current_step_index
-    current_name = steps[current_idx] if current_idx < len(steps) else "已完成"
     action = action.lower()
-    if action in {"complete", "approve"}:
-        if current_idx + 1 >= len(steps):
-            instance.status = "completed"
-        else:
-            instance.current_step_index = current_idx + 1
-            instance.status = "in_progress"
-    elif action in {"reject", "abnormal"}:
-        instance.status = "abnormal"
-    elif action == "reset":
-        instance.current_step_index = 0
-        instance.status = "in_progress"
-    else:
+    if action not in WORKFLOW_ACTIONS:
         raise HTTPException(status_code=400, detail="action 仅支持 complete/approve/reject/abnormal/reset。")
+    current_name = apply_workflow_action(instance, steps, action)
     db.add(
         WorkflowAction(
             instance_id=instance.id,
@@ -7626,12 +9399,60 @@ def workflow_advance(
         "message": "流程已更新",
         "status": instance.status,
         "current_step_index": instance.current_step_index,
-        "current_step_name": steps[instance.current_step_index]
-        if instance.current_step_index < len(steps)
-        else "已完成",
+        "current_step_name": workflow_step_label(steps, instance.current_step_index),
     }
 
 
+def dashboard_bucket_month_range(start_date: date | None, end_date: date | None) -> tuple[str | None, str | None] | None:
+    """日期筛选按整月对齐时返回聚合表月份区间；跨月中间日期无法由月桶回答，返回 None。"""
+    if start_date and start_date.day != 1:
+        return None
+    if end_date and (end_date + timedelta(days=1)).day != 1:
+        return None
+    return (
+        start_date.strftime("%Y-%m") if start_date else None,
+        end_date.strftime("%Y-%m") if end_date else None,
+    )
+
+
+def dashboard_bucket_query(
+    db: Session,
+    entity: str,
+    month_range: tuple[str | None, str | None],
+    *,
+    industry: str | None = None,
+    city: str | None = None,
+    evaluator: str | None = None,
+    level: int | None = None,
+    role: str = "",
+    username: str = "",
+):
+    q = db.query(DashboardBucket).filter(DashboardBucket.entity == entity)
+    if month_range[0]:
+        q = q.filter(DashboardBucket.month >= month_range[0])
+    if month_range[1]:
+        q = q.filter(DashboardBucket.month <= month_range[1])
+    if industry:
+        q = q.filter(DashboardBucket.industry == industry)
+    if city:
+        q = q.filter(DashboardBucket.filing_region.like(f"%{escape_like(city)}%"))
+    if evaluator:
+        q = q.filter(DashboardBucket.created_by.like(f"%{escape_like(evaluator)}%"))
+    if level:
+        q = q.filter(DashboardBucket.level == level)
+    if role == "evaluator":
+        q = q.filter(DashboardBucket.created_by == username)
+    return q
+
+
+@app.post("/api/dashboard/rebuild")
+def rebuild_dashboard(request: Request, db: Session = Depends(get_db)) -> dict[str, Any]:
+    require_roles(request, db, {"admin"}, legacy_admin=True)
+    result = rebuild_dashboard_buckets(db.connection())
+    db.commit()
+    return {"message": "看板聚合重建完成", "data": result}
+
+
 @app.get("/api/dashboard/summary")
 def dashboard_summary(
     request: Request,
@@ -7644,9 +9465,9 @@ def dashboard_summary(
     project_status: str | None = None,
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
-    current_user = get_current_user_optional(request, db)
-    role = current_user.role if current_user else ""
-    username = current_user.username if current_user else ""
+    principal = get_request_principal(request, db)
+    role = principal["role"] if principal else ""
+    username = principal["username"] if principal else ""
     org_q = db.query(Organization).filter(Organization.deleted_at.is_(None))
     if start_date:
         org_q = org_q.filter(Organization.created_at >= datetime.combine(start_date, datetime.min.time()))
@@ -7684,13 +9505,6 @@ def dashboard_summary(
             WorkflowInstance.status == project_status
         )
 
-    region_stats = (
-        org_q.with_entities(Organization.filing_region, func.count(Organization.id)).group_by(Organization.filing_region).all()
-    )
-    industry_stats = (
-        org_q.with_entities(Organization.industry, func.count(Organization.id)).group_by(Organization.industry).all()
-    )
-    level_stats = sys_q.with_entities(SystemInfo.proposed_level, func.count(SystemInfo.id)).group_by(SystemInfo.proposed_level).all()
     system_ids_query = sys_q.with_entities(SystemInfo.id).distinct()
     pending_reports = (
         db.query(Report)
@@ -7702,12 +9516,58 @@ def dashboard_summary(
         .filter(WorkflowInstance.status == "in_progress", WorkflowInstance.system_id.in_(system_ids_query))
         .count()
     )
-    archived_system_count = sys_q.filter(SystemInfo.archived.is_(True)).count()
+    month_range = dashboard_bucket_month_range(start_date, end_date)
+    if project_status is None and month_range is not None and dashboard_buckets_ready(db.get_bind()):
+        bucket_filters = {"industry": industry, "city": city, "evaluator": evaluator, "role": role, "username": username}
+        org_rows = (
+            dashboard_bucket_query(db, "organization", month_range, **bucket_filters)
+            .with_entities(
+                DashboardBucket.filing_region, DashboardBucket.industry, DashboardBucket.archived, func.sum(DashboardBucket.total)
+            )
+            .group_by(DashboardBucket.filing_region, DashboardBucket.industry, DashboardBucket.archived)
+            .all()
+        )
+        sys_rows = (
+            dashboard_bucket_query(db, "system", month_range, level=level, **bucket_filters)
+            .with_entities(DashboardBucket.level, DashboardBucket.archived, func.sum(DashboardBucket.total))
+            .group_by(DashboardBucket.level, DashboardBucket.archived)
+            .all()
+        )
+        region_counts: dict[str, int] = {}
+        industry_counts: dict[str, int] = {}
+        level_counts: dict[int, int] = {}
+        organization_count = archived_organization_count = system_count = archived_system_count = 0
+        for region, industry_name, archived, total in org_rows:
+            total = int(total or 0)
+            organization_count += total
+            archived_organization_count += total if archived else 0
+            region_counts[region] = region_counts.get(region, 0) + total
+            industry_counts[industry_name] = industry_counts.get(industry_name, 0) + total
+        for level_value, archived, total in sys_rows:
+            total = int(total or 0)
+            system_count += total
+            archived_system_count += total if archived else 0
+            level_counts[level_value] = level_counts.get(level_value, 0) + total
+        region_stats = sorted(region_counts.items(), key=lambda kv: kv[0])
+        industry_stats = sorted(industry_counts.items(), key=lambda kv: kv[0])
+        level_stats = sorted(level_counts.items(), key=lambda kv: kv[0])
+    else:
+        region_stats = (
+            org_q.with_entities(Organization.filing_region, func.count(Organization.id)).group_by(Organization.filing_region).all()
+        )
+        industry_stats = (
+            org_q.with_entities(Organization.industry, func.count(Organization.id)).group_by(Organization.industry).all()
+        )
+        level_stats = sys_q.with_entities(SystemInfo.proposed_level, func.count(SystemInfo.id)).group_by(SystemInfo.proposed_level).all()
+        organization_count = org_q.count()
+        system_count = sys_q.count()
+        archived_organization_count = org_q.filter(Organization.archived.is_(True)).count()
+        archived_system_count = sys_q.filter(SystemInfo.archived.is_(True)).count()
     return {
         "totals": {
-            "organization_count": org_q.count(),
-            "system_count": sys_q.count(),
-            "archived_organization_count": org_q.filter(Organization.archived.is_(True)).count(),
+            "organization_count": organization_count,
+            "system_count": system_count,
+            "archived_organization_count": archived_organization_count,
             "archived_system_count": archived_system_count,
             "pending_review_reports": pending_reports,
             "in_progress_projects": in_progress_projects,
@@ -7720,9 +9580,9 @@ def dashboard_summary(
 
 @app.get("/api/alerts/summary")
 def alerts_summary(request: Request, db: Session = Depends(get_db)) -> dict[str, Any]:
-    current_user = get_current_user_optional(request, db)
-    role = current_user.role if current_user else ""
-    username = current_user.username if current_user else ""
+    principal = get_request_principal(request, db)
+    role = principal["role"] if principal else ""
+    username = principal["username"] if principal else ""
 
     delete_query = db.query(DeleteRequest).filter(DeleteRequest.status == "pending")
     if role == "evaluator":
@@ -7795,9 +9655,9 @@ def dashboard_drilldown(
     value: str = Query(""),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
-    current_user = get_current_user_optional(request, db)
-    role = current_user.role if current_user else ""
-    username = current_user.username if current_user else ""
+    principal = get_request_principal(request, db)
+    role = principal["role"] if principal else ""
+    username = principal["username"] if principal else ""
     dimension = dimension.lower()
     if dimension not in {"region", "industry", "level"}:
         raise HTTPException(status_code=400, detail="dimension 仅支持 region/industry/level。")
@@ -7823,9 +9683,27 @@ def dashboard_drilldown(
 
     org_items = org_query.order_by(Organization.created_at.desc()).limit(500).all()
     sys_items = sys_query.order_by(SystemInfo.created_at.desc()).limit(500).all()
+    if dashboard_buckets_ready(db.get_bind()):
+        org_bucket_q = dashboard_bucket_query(db, "organization", (None, None), role=role, username=username)
+        sys_bucket_q = dashboard_bucket_query(db, "system", (None, None), role=role, username=username)
+        if dimension == "region":
+            org_bucket_q = org_bucket_q.filter(DashboardBucket.filing_region.like(f"%{escape_like(value)}%"))
+            sys_bucket_q = sys_bucket_q.filter(DashboardBucket.filing_region.like(f"%{escape_like(value)}%"))
+        elif dimension == "industry":
+            org_bucket_q = org_bucket_q.filter(DashboardBucket.industry.like(f"%{escape_like(value)}%"))
+            sys_bucket_q = sys_bucket_q.filter(DashboardBucket.industry.like(f"%{escape_like(value)}%"))
+        else:
+            sys_bucket_q = sys_bucket_q.filter(DashboardBucket.level == level)
+        organization_total = int(org_bucket_q.with_entities(func.sum(DashboardBucket.total)).scalar() or 0)
+        system_total = int(sys_bucket_q.with_entities(func.sum(DashboardBucket.total)).scalar() or 0)
+    else:
+        organization_total = org_query.count()
+        system_total = sys_query.count()
     return {
         "dimension": dimension,
         "value": value,
+        "organization_total": organization_total,
+        "system_total": system_total,
         "organizations": [
             {
                 "id": o.id,
@@ -7849,29 +9727,16 @@ def dashboard_drilldown(
     }
 
 
-@app.get("/api/dashboard/trend")
-def dashboard_trend(
-    request: Request,
-    months: int = Query(12, ge=1, le=60),
-    industry: str | None = None,
-    city: str | None = None,
-    level: int | None = None,
-    db: Session = Depends(get_db),
-) -> dict[str, Any]:
-    """按月统计备案数量变化趋势，返回最近N个月的组织和系统新增数量。"""
-    current_user = get_current_user_optional(request, db)
-    role = current_user.role if current_user else ""
-    username = current_user.username if current_user else ""
-
-    # 计算起始时间
-    now = datetime.now()
-    start_year = now.year
-    start_month = now.month - (months - 1)
-    while start_month <= 0:
-        start_month += 12
-        start_year -= 1
-    start_dt = datetime(start_year, start_month, 1)
-
+def _dashboard_trend_live(
+    db: Session,
+    start_dt: datetime,
+    industry: str | None,
+    city: str | None,
+    level: int | None,
+    role: str,
+    username: str,
+) -> tuple[dict[str, int], dict[str, int]]:
+    """聚合表未就绪时直接按月扫描业务表。"""
     org_year = extract("year", Organization.created_at)
     org_month = extract("month", Organization.created_at)
     org_q = db.query(
@@ -7920,6 +9785,48 @@ def dashboard_trend(
     for row in sys_q.all():
         label = f"{int(row.year):04d}-{int(row.month):02d}"
         sys_by_month[label] = int(row.count)
+    return org_by_month, sys_by_month
+
+
+@app.get("/api/dashboard/trend")
+def dashboard_trend(
+    request: Request,
+    months: int = Query(12, ge=1, le=60),
+    industry: str | None = None,
+    city: str | None = None,
+    level: int | None = None,
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    """按月统计备案数量变化趋势，返回最近N个月的组织和系统新增数量。"""
+    principal = get_request_principal(request, db)
+    role = principal["role"] if principal else ""
+    username = principal["username"] if principal else ""
+
+    # 计算起始时间
+    now = datetime.now()
+    start_year = now.year
+    start_month = now.month - (months - 1)
+    while start_month <= 0:
+        start_month += 12
+        start_year -= 1
+    start_dt = datetime(start_year, start_month, 1)
+
+    org_by_month: dict[str, int] = {}
+    sys_by_month: dict[str, int] = {}
+    if dashboard_buckets_ready(db.get_bind()):
+        bucket_filters = {"industry": industry, "city": city, "role": role, "username": username}
+        month_range = (start_dt.strftime("%Y-%m"), None)
+        for entity, target in (("organization", org_by_month), ("system", sys_by_month)):
+            rows = (
+                dashboard_bucket_query(db, entity, month_range, level=level if entity == "system" else None, **bucket_filters)
+                .with_entities(DashboardBucket.month, func.sum(DashboardBucket.total))
+                .group_by(DashboardBucket.month)
+                .all()
+            )
+            for label, total in rows:
+                target[label] = int(total or 0)
+    else:
+        org_by_month, sys_by_month = _dashboard_trend_live(db, start_dt, industry, city, level, role, username)
 
     # 生成连续月份列表
     result = []
@@ -8075,17 +9982,13 @@ async def upload_knowledge(
     assert_safe_text(district, "district")
     assert_safe_text(keywords, "keywords")
     assert_safe_text(protection_level, "protection_level")
-    content = await file.read()
-    if len(content) > MAX_KNOWLEDGE_FILE:
-        raise HTTPException(status_code=400, detail="文件过大。")
+    staged = await stage_upload(file, MAX_KNOWLEDGE_FILE, "文件过大。")
     safe_name = Path(file.filename).name
-    save_name = f"{uuid.uuid4().hex}_{safe_name}"
-    path = UPLOAD_DIR / "knowledge" / save_name
-    path.parent.mkdir(parents=True, exist_ok=True)
     final_version = version_no
     if source_doc_id:
         source = db.query(KnowledgeDocument).filter(KnowledgeDocument.id == source_doc_id).first()
         if not source:
+            discard_staged_upload(staged)
             raise HTTPException(status_code=404, detail="source_doc_id 对应文档不存在。")
         title = title or source.title
         doc_type = doc_type or source.doc_type
@@ -8094,7 +9997,7 @@ async def upload_knowledge(
         keywords = keywords or source.keywords or ""
         protection_level = protection_level or source.protection_level or ""
         final_version = max(source.version_no + 1, version_no)
-    path.write_bytes(content)
+    path = store_staged_upload(db, staged)
     row = KnowledgeDocument(
         title=title,
         keywords=keywords,
@@ -8106,7 +10009,8 @@ async def upload_knowledge(
         status="enabled",
         file_name=safe_name,
         file_path=str(path),
-        file_size=len(content),
+        file_size=staged.size,
+        sha256=staged.sha256,
         uploaded_by=actor_name,
     )
     db.add(row)
@@ -8216,12 +10120,30 @@ def knowledge_download_logs(request: Request, db: Session = Depends(get_db)) ->
     }
 
 
+def write_knowledge_zip(
+    db: Session, rows: list[Any], actor_name: str, zip_path: Path, job: JobContext | None = None
+) -> int:
+    written = 0
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for n, doc in enumerate(rows, start=1):
+            src = Path(doc.file_path)
+            if src.exists():
+                zf.write(src, arcname=doc.file_name)
+                db.add(KnowledgeDownloadLog(document_id=doc.id, download_by=actor_name))
+                written += 1
+            if job:
+                job.progress(n / len(rows))
+    db.commit()
+    return written
+
+
 @app.post("/api/knowledge/batch-download")
 def batch_download_knowledge(
     request: Request,
     doc_ids: list[int],
+    async_mode: bool = Query(False, alias="async"),
     db: Session = Depends(get_db),
-) -> FileResponse:
+) -> Any:
     # 批量下载知识库文档（打包为zip）
     actor_name, _ = require_roles(request, db, {"admin", "reviewer", "evaluator"})
     if not doc_ids:
@@ -8232,14 +10154,21 @@ def batch_download_knowledge(
     disabled = [row.id for row in rows if row.status != "enabled"]
     if disabled:
         raise HTTPException(status_code=403, detail=f"包含已下架文档，禁止下载: {disabled}")
-    zip_path = EXPORT_DIR / f"knowledge_batch_{datetime.now():%Y%m%d%H%M%S}.zip"
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        for doc in rows:
-            src = Path(doc.file_path)
-            if src.exists():
-                zf.write(src, arcname=doc.file_name)
-                db.add(KnowledgeDownloadLog(document_id=doc.id, download_by=actor_name))
-    db.commit()
+    zip_name = f"knowledge_batch_{datetime.now():%Y%m%d%H%M%S}.zip"
+    if async_mode:
+        row_ids = [row.id for row in rows]
+
+        def run(job: JobContext) -> dict[str, Any]:
+            zip_path = job_result_file(job, ".zip")
+            with SessionLocal() as job_db:
+                job_rows = job_db.query(KnowledgeDocument).filter(KnowledgeDocument.id.in_(row_ids)).all()
+                written = write_knowledge_zip(job_db, job_rows, actor_name, zip_path, job)
+            job.set_result_file(zip_path, zip_name)
+            return {"documents": written}
+
+        return submit_background_job("knowledge_batch_download", actor_name, run)
+    zip_path = EXPORT_DIR / zip_name
+    write_knowledge_zip(db, rows, actor_name, zip_path)
     return FileResponse(path=str(zip_path), filename=zip_path.name, background=BackgroundTask(_cleanup_export_file, zip_path))
 
 
@@ -8286,18 +10215,18 @@ async def new_knowledge_version(
     doc = db.query(KnowledgeDocument).filter(KnowledgeDocument.id == doc_id).first()
     if not doc:
         raise HTTPException(status_code=404, detail="文档不存在。")
-    content = await file.read()
-    if len(content) > MAX_KNOWLEDGE_FILE:
-        raise HTTPException(status_code=400, detail="文件过大。")
+    staged = await stage_upload(file, MAX_KNOWLEDGE_FILE, "文件过大。")
+    held = knowledge_file_refs(db, doc)
     log_knowledge_version(db, doc, "new_version_before", actor_name)
     safe_name = Path(file.filename).name
-    save_name = f"{uuid.uuid4().hex}_{safe_name}"
-    path = UPLOAD_DIR / "knowledge" / save_name
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_bytes(content)
+    path = store_staged_upload(db, staged)
+    if (staged.sha256, str(path)) in held:
+        # 与某个旧版本内容相同：文档已持有该文件的引用，不重复计数
+        release_blob(db, staged.sha256, str(path))
     doc.file_name = safe_name
     doc.file_path = str(path)
-    doc.file_size = len(content)
+    doc.file_size = staged.size
+    doc.sha256 = staged.sha256
     doc.version_no = int(doc.version_no or 0) + 1
     doc.uploaded_by = actor_name
     db.commit()
@@ -8353,7 +10282,7 @@ def rollback_knowledge(
         raise HTTPException(status_code=400, detail="版本快照为空。")
     target_file = ensure_file_exists(snap.get("file_path"), "版本文件不存在，无法回滚。")
     log_knowledge_version(db, doc, "rollback_before", actor_name)
-    for key in ["title", "keywords", "city", "district", "doc_type", "protection_level", "status", "file_name", "file_path", "file_size"]:
+    for key in ["title", "keywords", "city", "district", "doc_type", "protection_level", "status", "file_name", "file_path", "file_size", "sha256"]:
         if key in snap:
             setattr(doc, key, snap[key])
     doc.version_no = int(doc.version_no or 0) + 1
@@ -8421,7 +10350,12 @@ def delete_knowledge(request: Request, doc_id: int, db: Session = Depends(get_db
     if not doc:
         raise HTTPException(status_code=404, detail="文档不存在。")
     log_knowledge_version(db, doc, "delete_before", actor_name)
-    safe_delete_uploaded_file(doc.file_path)
+    blob_root = BLOB_DIR.resolve()
+    for sha256, file_path in knowledge_file_refs(db, doc):
+        # 旧快照没有 sha256 时无法确认是否为文件库里的共享文件，不按旧方式直接删除
+        if not sha256 and Path(file_path).resolve().is_relative_to(blob_root):
+            continue
+        release_stored_file(db, sha256, file_path)
     pin = db.query(KnowledgePin).filter(KnowledgePin.document_id == doc_id).first()
     if pin:
         db.delete(pin)
@@ -64,8 +64,11 @@ class OrganizationHistory(Base):
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False, index=True)
     changed_by = Column(String(100), nullable=False)
     change_type = Column(String(32), nullable=False)
+    # 关键帧存完整 after_data；其余版本只存相对上一版本的 JSON Patch（delta），after_data 为空
     before_data = Column(JSON, nullable=True)
     after_data = Column(JSON, nullable=True)
+    delta = Column(JSON, nullable=True)
+    changed_fields = Column(JSON, nullable=True)
     changed_at = Column(DateTime, server_default=func.now(), nullable=False)
 
 
@@ -125,8 +128,11 @@ class SystemHistory(Base):
     system_id = Column(Integer, ForeignKey("systems.id"), nullable=False, index=True)
     changed_by = Column(String(100), nullable=False)
     change_type = Column(String(32), nullable=False)
+    # 关键帧存完整 after_data；其余版本只存相对上一版本的 JSON Patch（delta），after_data 为空
     before_data = Column(JSON, nullable=True)
     after_data = Column(JSON, nullable=True)
+    delta = Column(JSON, nullable=True)
+    changed_fields = Column(JSON, nullable=True)
     changed_at = Column(DateTime, server_default=func.now(), nullable=False)
 
 
@@ -140,6 +146,7 @@ class Attachment(Base):
     file_path = Column(String(400), nullable=False)
     file_ext = Column(String(16), nullable=False)
     file_size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=True, index=True)
     uploaded_by = Column(String(100), nullable=False, default="system")
     uploaded_at = Column(DateTime, server_default=func.now(), nullable=False)
 
@@ -154,7 +161,9 @@ class Report(Base):
     version_no = Column(Integer, nullable=False, default=1)
     title = Column(String(255), nullable=False)
     status = Column(String(32), nullable=False, default="draft", index=True)
+    # 有 content_manifest 时 content 中各章节只存内容哈希（内容_sha256），正文在 report_section_blocks
     content = Column(JSON, nullable=False)
+    content_manifest = Column(JSON, nullable=True)
     generated_by = Column(String(100), nullable=False, default="system")
     generated_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -269,6 +278,7 @@ class KnowledgeDocument(Base):
     file_name = Column(String(255), nullable=False)
     file_path = Column(String(400), nullable=False)
     file_size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=True, index=True)
     uploaded_by = Column(String(100), nullable=False, default="admin")
     uploaded_at = Column(DateTime, server_default=func.now(), nullable=False)
 
@@ -399,3 +409,63 @@ class DeleteRequest(Base):
     reviewed_by = Column(String(100), nullable=True)
     reviewed_at = Column(DateTime, nullable=True)
     review_comment = Column(Text, nullable=True)
+
+
+class DashboardBucket(Base):
+    """看板聚合物化表：按 实体/月份/地区/行业/级别/创建人/归档 分桶计数。"""
+
+    __tablename__ = "dashboard_buckets"
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(32), nullable=False, index=True)
+    month = Column(String(7), nullable=False, index=True)
+    filing_region = Column(String(120), nullable=False, default="")
+    industry = Column(String(100), nullable=False, default="")
+    level = Column(Integer, nullable=False, default=0)
+    created_by = Column(String(100), nullable=False, default="")
+    archived = Column(Boolean, nullable=False, default=False)
+    total = Column(Integer, nullable=False, default=0)
+
+
+class FileBlob(Base):
+    """内容寻址文件库：同一内容（sha256）只存一份，ref_count 为引用它的附件/文档数。"""
+
+    __tablename__ = "file_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    file_path = Column(String(400), nullable=False)
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class ReportSectionBlock(Base):
+    """报告章节内容库：同一章节内容（sha256）只存一份，ref_count 为引用它的报告章节数。"""
+
+    __tablename__ = "report_section_blocks"
+
+    sha256 = Column(String(64), primary_key=True)
+    content = Column(JSON, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class BackgroundJob(Base):
+    """后台任务：备份、恢复、导入、批量导出等耗时操作异步执行时的状态与结果。"""
+
+    __tablename__ = "background_jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    progress = Column(Float, nullable=False, default=0)
+    message = Column(String(255), nullable=True)
+    created_by = Column(String(100), nullable=True, index=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    result = Column(JSON, nullable=True)
+    result_path = Column(String(400), nullable=True)
+    result_name = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
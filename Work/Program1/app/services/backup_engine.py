@@ -0,0 +1,230 @@
+# UTF-8
+"""增量、去重的备份包格式（format 2）。
+
+备份包仍是 .zip：data/app.db 每次完整保存；uploads 下的文件记在 manifest.files 中
+（相对路径 -> sha256/size/mtime_ns），内容按 sha256 存为 objects/<sha256>，
+且只写入基础备份链里还没有的内容。恢复时沿 base 链取回对象，重建完整快照。
+PDF、图片、Office 文档等已压缩的内容原样存储，不再二次 deflate。
+"""
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any
+
+BACKUP_FORMAT = 2
+MANIFEST_NAME = "manifest.json"
+DB_ARCNAME = "data/app.db"
+MAX_CHAIN_DEPTH = 64
+
+_OBJECT_PREFIX = "objects/"
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_COMPRESSED_SUFFIXES = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".zip", ".gz", ".7z", ".rar",
+    ".docx", ".xlsx", ".pptx", ".vsdx",
+}
+_COMPRESSED_MAGIC = (b"%PDF", b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"PK\x03\x04", b"\x1f\x8b", b"7z\xbc\xaf", b"Rar!")
+
+
+class BackupChainError(ValueError):
+    """增量备份依赖的基础备份缺失或内容不完整。"""
+
+
+def _manifest_of(zf: zipfile.ZipFile) -> dict[str, Any]:
+    try:
+        data = json.loads(zf.read(MANIFEST_NAME).decode("utf-8"))
+    except (KeyError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def read_manifest(path: Path) -> dict[str, Any]:
+    with zipfile.ZipFile(path, "r") as zf:
+        return _manifest_of(zf)
+
+
+def is_incremental(manifest: dict[str, Any]) -> bool:
+    return manifest.get("format") == BACKUP_FORMAT and bool(manifest.get("base"))
+
+
+def _is_precompressed(path: Path) -> bool:
+    if path.suffix.lower() in _COMPRESSED_SUFFIXES:
+        return True
+    with path.open("rb") as fh:
+        return fh.read(8).startswith(_COMPRESSED_MAGIC)
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_upload_files(upload_dir: Path, previous: dict[str, Any], skip_suffix: str) -> dict[str, dict[str, Any]]:
+    """列出 uploads 下的文件及其 sha256：大小与修改时间未变的沿用上次结果，文件库 blob 的文件名即哈希。"""
+    files: dict[str, dict[str, Any]] = {}
+    if not upload_dir.exists():
+        return files
+    for path in sorted(upload_dir.rglob("*")):
+        if not path.is_file() or path.name.endswith(skip_suffix):
+            continue
+        rel_path = path.relative_to(upload_dir)
+        rel = (Path("uploads") / rel_path).as_posix()
+        stat = path.stat()
+        prev = previous.get(rel)
+        if prev and prev.get("size") == stat.st_size and prev.get("mtime_ns") == stat.st_mtime_ns:
+            sha256 = prev["sha256"]
+        elif rel_path.parts[0] == "blobs" and _SHA256_RE.match(path.name):
+            sha256 = path.name
+        else:
+            sha256 = _file_sha256(path)
+        files[rel] = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return files
+
+
+def resolve_base_chain(manifest: dict[str, Any], backup_dir: Path) -> list[Path]:
+    """沿 base 逐级找到基础备份（由近到远）；缺失或格式不符时抛 BackupChainError。"""
+    chain: list[Path] = []
+    base = manifest.get("base") if manifest.get("format") == BACKUP_FORMAT else None
+    while base:
+        if len(chain) >= MAX_CHAIN_DEPTH:
+            raise BackupChainError("增量备份链过长或存在循环。")
+        path = backup_dir / Path(str(base)).name
+        if not path.is_file():
+            raise BackupChainError(f"增量备份依赖的基础备份 {base} 不存在。")
+        try:
+            base_manifest = read_manifest(path)
+        except zipfile.BadZipFile as exc:
+            raise BackupChainError(f"基础备份 {base} 已损坏。") from exc
+        if base_manifest.get("format") != BACKUP_FORMAT:
+            raise BackupChainError(f"基础备份 {base} 不是增量格式。")
+        chain.append(path)
+        base = base_manifest.get("base")
+    return chain
+
+
+def pick_backup_base(backup_dir: Path, full_every: int) -> Path | None:
+    """取最近一份备份作为基础；不是增量格式、链不完整或链长已达 full_every 时返回 None（做全量）。"""
+    candidates = [p for p in backup_dir.glob("*.zip") if p.is_file()]
+    if not candidates or full_every <= 1:
+        return None
+    latest = max(candidates, key=lambda p: p.stat().st_mtime_ns)
+    try:
+        manifest = read_manifest(latest)
+        if manifest.get("format") != BACKUP_FORMAT or int(manifest.get("chain_depth") or 0) + 1 >= full_every:
+            return None
+        resolve_base_chain(manifest, backup_dir)
+    except (zipfile.BadZipFile, BackupChainError, OSError):
+        return None
+    return latest
+
+
+def write_backup(
+    backup_path: Path,
+    db_snapshot: Path,
+    upload_dir: Path,
+    meta: dict[str, Any],
+    base_path: Path | None = None,
+    skip_suffix: str = ".part",
+) -> dict[str, Any]:
+    """写一份备份包：有 base_path 时只写入基础链中没有的文件内容。返回 manifest。"""
+    base_manifest = read_manifest(base_path) if base_path else {}
+    previous = base_manifest.get("files") or {}
+    files = scan_upload_files(upload_dir, previous, skip_suffix)
+    known = {item["sha256"] for item in previous.values()}
+    written: set[str] = set()
+    with zipfile.ZipFile(backup_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.write(db_snapshot, arcname=DB_ARCNAME)
+        for rel, item in files.items():
+            sha256 = item["sha256"]
+            if sha256 in known or sha256 in written:
+                continue
+            source = upload_dir / Path(rel).relative_to("uploads")
+            compress_type = zipfile.ZIP_STORED if _is_precompressed(source) else zipfile.ZIP_DEFLATED
+            zf.write(source, arcname=_OBJECT_PREFIX + sha256, compress_type=compress_type)
+            written.add(sha256)
+        manifest = {
+            **meta,
+            "format": BACKUP_FORMAT,
+            "kind": "incremental" if base_path else "full",
+            "base": base_path.name if base_path else None,
+            "chain_depth": int(base_manifest.get("chain_depth") or 0) + 1 if base_path else 0,
+            "files": files,
+            "objects": sorted(written),
+        }
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
+def _object_index(archives: list[zipfile.ZipFile]) -> dict[str, zipfile.ZipFile]:
+    index: dict[str, zipfile.ZipFile] = {}
+    for zf in archives:
+        for name in zf.namelist():
+            if name.startswith(_OBJECT_PREFIX):
+                index.setdefault(name[len(_OBJECT_PREFIX):], zf)
+    return index
+
+
+def _checked_rel_path(rel: str) -> Path:
+    rel_path = Path(rel)
+    if rel_path.is_absolute() or ".." in rel_path.parts or rel_path.parts[:1] != ("uploads",):
+        raise BackupChainError("备份清单包含非法路径。")
+    return rel_path
+
+
+def materialize_uploads(chain: list[Path], target_root: Path) -> int:
+    """按 chain[0] 的清单，从整条备份链取回文件写到 target_root/uploads，返回文件数。"""
+    with contextlib.ExitStack() as stack:
+        archives = [stack.enter_context(zipfile.ZipFile(path, "r")) for path in chain]
+        manifest = _manifest_of(archives[0])
+        index = _object_index(archives)
+        files = manifest.get("files") or {}
+        for rel, item in files.items():
+            target = target_root / _checked_rel_path(rel)
+            zf = index.get(str(item.get("sha256")))
+            if zf is None:
+                raise BackupChainError(f"备份链中缺少文件内容：{rel}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(_OBJECT_PREFIX + item["sha256"]) as src, target.open("wb") as out:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+            mtime_ns = int(item.get("mtime_ns") or 0)
+            if mtime_ns:
+                os.utime(target, ns=(mtime_ns, mtime_ns))
+    return len(files)
+
+
+def consolidate_backup(chain: list[Path], output_path: Path) -> dict[str, Any]:
+    """把增量备份及其基础链合并成一份独立的全量备份包。"""
+    with contextlib.ExitStack() as stack:
+        archives = [stack.enter_context(zipfile.ZipFile(path, "r")) for path in chain]
+        head = archives[0]
+        manifest = _manifest_of(head)
+        index = _object_index(archives)
+        files = manifest.get("files") or {}
+        written: set[str] = set()
+        with zipfile.ZipFile(output_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zout:
+            members = [(head, head.getinfo(DB_ARCNAME))]
+            for rel, item in files.items():
+                sha256 = str(item.get("sha256"))
+                if sha256 in written:
+                    continue
+                zf = index.get(sha256)
+                if zf is None:
+                    raise BackupChainError(f"备份链中缺少文件内容：{rel}")
+                members.append((zf, zf.getinfo(_OBJECT_PREFIX + sha256)))
+                written.add(sha256)
+            for zf, info in members:
+                out_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                out_info.compress_type = info.compress_type
+                with zf.open(info) as src, zout.open(out_info, "w", force_zip64=info.file_size > 0x7FFFFFFF) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            full_manifest = {**manifest, "kind": "full", "base": None, "chain_depth": 0, "objects": sorted(written)}
+            zout.writestr(MANIFEST_NAME, json.dumps(full_manifest, ensure_ascii=False, indent=2))
+    return full_manifest
@@ -0,0 +1,179 @@
+# UTF-8
+"""附件与知识库文件的内容寻址存储。
+
+文件按 SHA-256 存到 blobs/ab/cd/<sha256>，相同内容只落盘一份；
+file_blobs 表记录引用数，最后一个引用释放且事务提交后才删除文件。
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.orm import Session
+
+from .sql_upsert import upsert_add_counter
+
+logger = logging.getLogger(__name__)
+
+BLOB_TABLE = "file_blobs"
+_PENDING_UNLINK = "blob_store_pending_unlink"
+
+
+def blob_path(root: Path, sha256: str) -> Path:
+    return root / sha256[:2] / sha256[2:4] / sha256
+
+
+def store_blob(db: Session, root: Path, source: Path, sha256: str, size: int) -> Path:
+    """把已写好的临时文件收入文件库并引用数 +1，返回 blob 路径；内容已存在时丢弃临时文件。"""
+    target = blob_path(root, sha256)
+    # 先登记引用（拿到写锁），再处理文件：否则并发释放可能在提交后删掉我们以为已存在的文件
+    upsert_add_counter(
+        db,
+        BLOB_TABLE,
+        "sha256",
+        "ref_count",
+        [{"sha256": sha256, "file_path": str(target), "file_size": size, "ref_count": 1}],
+    )
+    if target.exists():
+        source.unlink(missing_ok=True)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, target)
+    # 同一事务内刚释放到 0 的 blob 又被引用时，不能在提交后删掉
+    db.info.get(_PENDING_UNLINK, set()).discard(str(target))
+    return target
+
+
+def _blob_row(db: Session, sha256: str | None, file_path: str | None) -> Any:
+    if not sha256 or not file_path:
+        return None
+    row = db.execute(
+        text(f"SELECT file_path, ref_count FROM {BLOB_TABLE} WHERE sha256 = :sha256"),
+        {"sha256": sha256},
+    ).first()
+    if row is None or Path(row[0]) != Path(file_path):
+        return None
+    return row
+
+
+def acquire_blob(db: Session, sha256: str | None, file_path: str | None) -> bool:
+    """为已在文件库中的文件增加一个引用；不是文件库文件（旧式 uuid_文件名）返回 False。"""
+    if _blob_row(db, sha256, file_path) is None:
+        return False
+    db.execute(text(f"UPDATE {BLOB_TABLE} SET ref_count = ref_count + 1 WHERE sha256 = :sha256"), {"sha256": sha256})
+    return True
+
+
+def release_blob(db: Session, sha256: str | None, file_path: str | None) -> bool:
+    """释放一个引用，归零时登记在提交后删除文件；不是文件库文件返回 False，由调用方按旧方式删除。"""
+    row = _blob_row(db, sha256, file_path)
+    if row is None:
+        return False
+    if int(row[1]) > 1:
+        db.execute(text(f"UPDATE {BLOB_TABLE} SET ref_count = ref_count - 1 WHERE sha256 = :sha256"), {"sha256": sha256})
+    else:
+        db.execute(text(f"DELETE FROM {BLOB_TABLE} WHERE sha256 = :sha256"), {"sha256": sha256})
+        db.info.setdefault(_PENDING_UNLINK, set()).add(str(row[0]))
+    return True
+
+
+@event.listens_for(Session, "after_commit")
+def _unlink_released_blobs(session: Session) -> None:
+    paths = set(session.info.pop(_PENDING_UNLINK, ()))
+    if not paths:
+        return
+    try:
+        with session.get_bind().begin() as conn:
+            # 空更新先拿写锁：正在收入同一内容的事务提交后，才能看到它重新登记的行
+            conn.execute(
+                text(f"UPDATE {BLOB_TABLE} SET ref_count = ref_count WHERE file_path IN :paths").bindparams(
+                    bindparam("paths", expanding=True)
+                ),
+                {"paths": sorted(paths)},
+            )
+            live = conn.execute(
+                text(f"SELECT file_path FROM {BLOB_TABLE} WHERE file_path IN :paths").bindparams(
+                    bindparam("paths", expanding=True)
+                ),
+                {"paths": sorted(paths)},
+            ).scalars()
+            for path_value in paths - set(live):
+                try:
+                    Path(path_value).unlink(missing_ok=True)
+                except OSError:
+                    logger.warning("删除无引用文件失败：%s", path_value, exc_info=True)
+    except Exception:
+        logger.warning("检查无引用文件失败，暂不删除：%s", sorted(paths), exc_info=True)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_released_blobs(session: Session, _previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_UNLINK, None)
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _rewrite_knowledge_snapshots(db: Session, document_id: int, old_path: str, new_path: str, sha256: str) -> None:
+    """版本快照里指向旧路径的记录同步改到文件库路径，回滚时仍能找到文件。"""
+    rows = db.execute(
+        text("SELECT id, snapshot FROM knowledge_document_versions WHERE document_id = :document_id"),
+        {"document_id": document_id},
+    ).all()
+    for version_id, snapshot in rows:
+        snap = json.loads(snapshot) if isinstance(snapshot, str) else dict(snapshot or {})
+        if snap.get("file_path") != old_path:
+            continue
+        snap.update(file_path=new_path, sha256=sha256)
+        db.execute(
+            text("UPDATE knowledge_document_versions SET snapshot = :snapshot WHERE id = :id"),
+            {"snapshot": json.dumps(snap, ensure_ascii=False), "id": version_id},
+        )
+
+
+def migrate_legacy_attachments(db: Session, root: Path) -> dict[str, int]:
+    """把旧式 uuid_文件名 附件与知识库文档收进文件库（重复内容合并为一份），返回迁移与释放的字节数。"""
+    migrated = 0
+    saved_bytes = 0
+    for table in ("attachments", "knowledge_documents"):
+        rows = db.execute(text(f"SELECT id, file_path FROM {table}")).all()
+        for row_id, file_path in rows:
+            source = Path(file_path or "")
+            if not source.is_file() or source.resolve().is_relative_to(root.resolve()):
+                continue
+            sha256 = _file_sha256(source)
+            size = source.stat().st_size
+            if blob_path(root, sha256).exists():
+                saved_bytes += size
+            target = store_blob(db, root, source, sha256, size)
+            db.execute(
+                text(f"UPDATE {table} SET file_path = :file_path, sha256 = :sha256 WHERE id = :id"),
+                {"file_path": str(target), "sha256": sha256, "id": row_id},
+            )
+            if table == "knowledge_documents":
+                _rewrite_knowledge_snapshots(db, row_id, file_path, str(target), sha256)
+            # 逐条提交：文件已移动，中途失败也不会留下指向旧路径的记录
+            db.commit()
+            migrated += 1
+    return {"migrated": migrated, "saved_bytes": saved_bytes}
+
+
+if __name__ == "__main__":
+    from ..db import SessionLocal, init_db
+    from ..main import BLOB_DIR, ensure_upload_hash_schema
+
+    init_db()
+    ensure_upload_hash_schema()
+    session = SessionLocal()
+    try:
+        print(migrate_legacy_attachments(session, BLOB_DIR))
+    finally:
+        session.close()
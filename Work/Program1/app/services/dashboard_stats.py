@@ -0,0 +1,212 @@
+# UTF-8
+"""看板聚合物化表（dashboard_buckets）的增量刷新与全量重建。
+
+按月分桶：单位、系统任一统计相关字段变化时，只重算受影响月份的桶。
+单位的地区/行业/删除状态会影响其下系统的分桶，因此同时重算这些系统所在月份。
+"""
+import logging
+import weakref
+from datetime import date, datetime
+from typing import Any
+
+from sqlalchemy import event, inspect as sa_inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+BUCKET_TABLE = "dashboard_buckets"
+
+_ORG_TRACKED = ("created_at", "filing_region", "industry", "created_by", "archived", "deleted_at")
+_SYSTEM_TRACKED = ("created_at", "organization_id", "proposed_level", "created_by", "archived", "deleted_at")
+# 单位的这些字段变化会改变其下系统的分桶
+_ORG_FIELDS_AFFECTING_SYSTEMS = ("filing_region", "industry", "deleted_at")
+
+_BUCKET_COLUMNS = "entity, month, filing_region, industry, level, created_by, archived, total"
+_ORG_BUCKET_SELECT = (
+    "SELECT 'organization', :month, COALESCE(filing_region, ''), COALESCE(industry, ''), 0, "
+    "COALESCE(created_by, ''), archived, COUNT(*) FROM organizations "
+    "WHERE deleted_at IS NULL AND created_at >= :start AND created_at < :end "
+    "GROUP BY COALESCE(filing_region, ''), COALESCE(industry, ''), COALESCE(created_by, ''), archived"
+)
+_SYSTEM_BUCKET_SELECT = (
+    "SELECT 'system', :month, COALESCE(o.filing_region, ''), COALESCE(o.industry, ''), s.proposed_level, "
+    "COALESCE(s.created_by, ''), s.archived, COUNT(*) FROM systems s "
+    "JOIN organizations o ON o.id = s.organization_id "
+    "WHERE s.deleted_at IS NULL AND o.deleted_at IS NULL AND s.created_at >= :start AND s.created_at < :end "
+    "GROUP BY COALESCE(o.filing_region, ''), COALESCE(o.industry, ''), s.proposed_level, "
+    "COALESCE(s.created_by, ''), s.archived"
+)
+_ENTITY_SOURCES = {"organization": ("organizations", _ORG_BUCKET_SELECT), "system": ("systems", _SYSTEM_BUCKET_SELECT)}
+
+_READY_ENGINES: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def month_label(value: Any) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m")
+    text_value = str(value).strip()
+    return text_value[:7] if len(text_value) >= 7 else None
+
+
+def _month_bounds(month: str) -> tuple[str, str]:
+    year, mon = int(month[:4]), int(month[5:7])
+    next_year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return f"{year:04d}-{mon:02d}-01", f"{next_year:04d}-{next_mon:02d}-01"
+
+
+def refresh_buckets(conn: Connection, entity: str, month: str) -> None:
+    """重算单个 (实体, 月份) 的全部分桶。"""
+    _, select_sql = _ENTITY_SOURCES[entity]
+    start, end = _month_bounds(month)
+    conn.execute(text(f"DELETE FROM {BUCKET_TABLE} WHERE entity = :entity AND month = :month"), {"entity": entity, "month": month})
+    conn.execute(
+        text(f"INSERT INTO {BUCKET_TABLE} ({_BUCKET_COLUMNS}) {select_sql}"),
+        {"month": month, "start": start, "end": end},
+    )
+
+
+def _month_range(first: str, last: str) -> list[str]:
+    months: list[str] = []
+    year, mon = int(first[:4]), int(first[5:7])
+    while f"{year:04d}-{mon:02d}" <= last:
+        months.append(f"{year:04d}-{mon:02d}")
+        year, mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return months
+
+
+def _snapshot(conn: Connection) -> dict[tuple[Any, ...], int]:
+    rows = conn.execute(
+        text(f"SELECT entity, month, filing_region, industry, level, created_by, archived, total FROM {BUCKET_TABLE}")
+    ).all()
+    return {tuple(row[:-1]): int(row[-1]) for row in rows}
+
+
+def rebuild_dashboard_buckets(conn: Connection) -> dict[str, int]:
+    """全量重建分桶，返回桶数量及与重建前不一致的桶数量（drift，用于一致性核对）。"""
+    before = _snapshot(conn)
+    conn.execute(text(f"DELETE FROM {BUCKET_TABLE}"))
+    for entity, (table, _) in _ENTITY_SOURCES.items():
+        first, last = conn.execute(text(f"SELECT MIN(created_at), MAX(created_at) FROM {table}")).one()
+        first_month, last_month = month_label(first), month_label(last)
+        if not first_month or not last_month:
+            continue
+        for month in _month_range(first_month, last_month):
+            refresh_buckets(conn, entity, month)
+    after = _snapshot(conn)
+    drift = sum(1 for key in before.keys() | after.keys() if before.get(key) != after.get(key))
+    return {"buckets": len(after), "drift": drift}
+
+
+def ensure_dashboard_buckets(engine: Engine) -> dict[str, int]:
+    """启动/恢复备份后全量重建一次，并启用增量刷新。"""
+    with engine.begin() as conn:
+        result = rebuild_dashboard_buckets(conn)
+    _READY_ENGINES.add(engine)
+    if result["drift"]:
+        logger.info("看板聚合已重建，%s 个分桶与重建前不一致。", result["drift"])
+    return result
+
+
+def dashboard_buckets_ready(bind: Any) -> bool:
+    return isinstance(bind, Engine) and bind in _READY_ENGINES
+
+
+def refresh_buckets_for_inserted(session: Session, entity: str, objects: list[Any]) -> None:
+    """批量 INSERT 不触发 flush 事件，由调用方在写入后重算涉及的月份。"""
+    try:
+        bind = session.get_bind()
+    except Exception:
+        return
+    if not objects or not dashboard_buckets_ready(bind):
+        return
+    months = {month_label(getattr(obj, "created_at", None)) for obj in objects}
+    months.discard(None)
+    conn = session.connection()
+    for month in sorted(months):
+        refresh_buckets(conn, entity, month)
+
+
+def _changed_months(obj: Any, tracked: tuple[str, ...], is_new: bool, is_deleted: bool) -> tuple[set[str], bool]:
+    """返回该对象涉及的月份集合及统计字段是否有变化。"""
+    state = sa_inspect(obj)
+    months: set[str] = set()
+    changed = is_new or is_deleted
+    current = state.dict.get("created_at")
+    if current is not None:
+        months.add(month_label(current) or "")
+    for name in tracked:
+        history = state.attrs[name].history
+        if not history.has_changes():
+            continue
+        changed = True
+        if name == "created_at":
+            months.update(month_label(value) or "" for value in history.deleted)
+    months.discard("")
+    return months, changed
+
+
+def _months_for_ids(conn: Connection, sql: str, ids: set[int]) -> set[str]:
+    if not ids:
+        return set()
+    params = {f"id{i}": value for i, value in enumerate(sorted(ids))}
+    placeholders = ", ".join(f":{key}" for key in params)
+    rows = conn.execute(text(sql.format(ids=placeholders)), params)
+    return {label for label in (month_label(row[0]) for row in rows) if label}
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_buckets_after_flush(session: Session, _flush_context: Any) -> None:
+    try:
+        bind = session.get_bind()
+    except Exception:
+        return
+    if not dashboard_buckets_ready(bind):
+        return
+    targets: set[tuple[str, str]] = set()
+    org_ids: set[int] = set()
+    org_ids_for_systems: set[int] = set()
+    system_ids: set[int] = set()
+    candidates = [(obj, True, False) for obj in session.new]
+    candidates += [(obj, False, False) for obj in session.dirty]
+    candidates += [(obj, False, True) for obj in session.deleted]
+    for obj, is_new, is_deleted in candidates:
+        table = getattr(obj, "__tablename__", None)
+        if table == "organizations":
+            months, changed = _changed_months(obj, _ORG_TRACKED, is_new, is_deleted)
+            if not changed:
+                continue
+            targets.update(("organization", m) for m in months)
+            if obj.id is not None:
+                org_ids.add(obj.id)
+                state = sa_inspect(obj)
+                if is_deleted or any(state.attrs[f].history.has_changes() for f in _ORG_FIELDS_AFFECTING_SYSTEMS):
+                    org_ids_for_systems.add(obj.id)
+        elif table == "systems":
+            months, changed = _changed_months(obj, _SYSTEM_TRACKED, is_new, is_deleted)
+            if not changed:
+                continue
+            targets.update(("system", m) for m in months)
+            if obj.id is not None:
+                system_ids.add(obj.id)
+    if not targets and not org_ids and not system_ids:
+        return
+    conn = session.connection()
+    # 新建对象的 created_at 由数据库默认值生成，需回查
+    targets.update(("organization", m) for m in _months_for_ids(conn, "SELECT created_at FROM organizations WHERE id IN ({ids})", org_ids))
+    targets.update(("system", m) for m in _months_for_ids(conn, "SELECT created_at FROM systems WHERE id IN ({ids})", system_ids))
+    targets.update(
+        ("system", m)
+        for m in _months_for_ids(conn, "SELECT created_at FROM systems WHERE organization_id IN ({ids})", org_ids_for_systems)
+    )
+    for entity, month in sorted(targets):
+        refresh_buckets(conn, entity, month)
+
+
+if __name__ == "__main__":
+    from ..db import engine as default_engine, init_db
+
+    init_db()
+    print(ensure_dashboard_buckets(default_engine))
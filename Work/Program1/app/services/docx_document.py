@@ -0,0 +1,233 @@
+# UTF-8
+"""上传 Word（.docx）的一次解析模型。
+
+document.xml 只解析一次，段落与表格文本展开为扁平数组，供键值提取、定级报告、
+专家评审意见表、备案表等各解析器共用；结果按内容 sha256 放入有界 LRU 缓存，
+同一文件先预览再导入时不再重复解析。
+
+解析用 iterparse 流式读取 document.xml，元素处理完即清空；
+python-docx 逐格读取（build_parsed_docx_python_docx）保留为对照实现与兜底。
+"""
+import hashlib
+import io
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+from docx import Document
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TAG_P = _WORD_NS + "p"
+_TAG_TBL = _WORD_NS + "tbl"
+_TAG_TR = _WORD_NS + "tr"
+_TAG_TC = _WORD_NS + "tc"
+_TAG_T = _WORD_NS + "t"
+_TAG_TAB = _WORD_NS + "tab"
+_TAG_BR = _WORD_NS + "br"
+_TAG_TCPR = _WORD_NS + "tcPr"
+_TAG_GRID_SPAN = _WORD_NS + "gridSpan"
+_TAG_VMERGE = _WORD_NS + "vMerge"
+_ATTR_VAL = _WORD_NS + "val"
+
+
+class ParsedDocx(NamedTuple):
+    # 正文段落（不含表格内段落）
+    paragraphs: tuple[str, ...]
+    # 全部表格（含嵌套表格，按文档顺序），每行为各 w:tc 的完整文本
+    tables: tuple[tuple[tuple[str, ...], ...], ...]
+    # 顶层表格逐行按网格展开：横向合并的单元格重复、纵向合并的续行取上方单元格（与 python-docx row.cells 一致）
+    grid_rows: tuple[tuple[str, ...], ...]
+    # 与 grid_rows 对齐：该行各单元格内的文本行
+    row_lines: tuple[tuple[str, ...], ...]
+
+
+_TEXT_TAGS = {_TAG_T, _TAG_TAB, _TAG_BR}
+
+
+def _cell_grid(tc_pr: Any) -> tuple[int, bool]:
+    """由 w:tcPr 返回 (横向跨列数, 是否为纵向合并的续行)。"""
+    span_el = tc_pr.find(_TAG_GRID_SPAN)
+    try:
+        span = max(1, int(span_el.get(_ATTR_VAL))) if span_el is not None else 1
+    except (TypeError, ValueError):
+        span = 1
+    vmerge = tc_pr.find(_TAG_VMERGE)
+    return span, vmerge is not None and vmerge.get(_ATTR_VAL, "continue") == "continue"
+
+
+class _Cell:
+    __slots__ = ("depth", "parts", "paras", "span", "continued")
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.parts: list[str] = []
+        self.paras: list[str] = []
+        self.span = 1
+        self.continued = False
+
+
+class _Table:
+    __slots__ = ("slot", "rows", "above")
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.rows: list[tuple[str, ...]] = []
+        # 顶层表格：网格列 -> 该列最近一个单元格的文本，供纵向合并的续行取值
+        self.above: dict[int, str] = {}
+
+
+def _iterparse_docx(stream: Any) -> ParsedDocx:
+    paragraphs: list[str] = []
+    tables: list[Any] = []
+    grid_rows: list[tuple[str, ...]] = []
+    row_lines: list[tuple[str, ...]] = []
+    table_stack: list[_Table] = []
+    row_stack: list[tuple[list[str], list[str], list[str]]] = []
+    cell_stack: list[_Cell] = []
+    para_stack: list[tuple[int, list[str]]] = []
+    depth = 0
+    for event, el in ET.iterparse(stream, events=("start", "end")):
+        tag = el.tag
+        if event == "start":
+            depth += 1
+            if tag == _TAG_P:
+                para_stack.append((depth, []))
+            elif tag == _TAG_TC:
+                cell_stack.append(_Cell(depth))
+            elif tag == _TAG_TR:
+                row_stack.append(([], [], []))
+            elif tag == _TAG_TBL:
+                # 先占位，保证嵌套表格排在外层表格之后
+                table_stack.append(_Table(len(tables)))
+                tables.append(None)
+            continue
+        depth -= 1
+        if tag in _TEXT_TAGS:
+            piece = (el.text or "") if tag == _TAG_T else ("\t" if tag == _TAG_TAB else "\n")
+            for _, parts in para_stack:
+                parts.append(piece)
+            for cell in cell_stack:
+                cell.parts.append(piece)
+        elif tag == _TAG_P:
+            p_depth, parts = para_stack.pop()
+            text = "".join(parts)
+            if cell_stack and p_depth == cell_stack[-1].depth + 1:
+                cell_stack[-1].paras.append(text)
+            elif not table_stack and not para_stack:
+                paragraphs.append(text.strip())
+        elif tag == _TAG_TCPR:
+            if cell_stack and depth == cell_stack[-1].depth:
+                cell_stack[-1].span, cell_stack[-1].continued = _cell_grid(el)
+        elif tag == _TAG_TC:
+            cell = cell_stack.pop()
+            if not row_stack:
+                continue
+            cells, grid, lines = row_stack[-1]
+            cells.append("".join(cell.parts).strip())
+            if len(table_stack) == 1:
+                above = table_stack[0].above
+                col = len(grid)
+                if cell.continued:
+                    text = above.get(col, "")
+                else:
+                    text = "\n".join(cell.paras)
+                    lines.extend(line.strip() for line in text.splitlines() if line.strip())
+                for offset in range(cell.span):
+                    above[col + offset] = text
+                grid.extend([text] * cell.span)
+        elif tag == _TAG_TR:
+            cells, grid, lines = row_stack.pop()
+            if not table_stack:
+                continue
+            table_stack[-1].rows.append(tuple(cells))
+            if len(table_stack) == 1:
+                grid_rows.append(tuple(grid))
+                row_lines.append(tuple(lines))
+        elif tag == _TAG_TBL:
+            table = table_stack.pop()
+            tables[table.slot] = tuple(table.rows)
+        else:
+            continue
+        el.clear()
+    return ParsedDocx(tuple(paragraphs), tuple(tables), tuple(grid_rows), tuple(row_lines))
+
+
+def build_parsed_docx(content: bytes) -> ParsedDocx:
+    with zipfile.ZipFile(io.BytesIO(content)) as z:
+        if "word/document.xml" not in z.namelist():
+            raise ValueError("上传的文件不是有效的 Word (.docx)。")
+        with z.open("word/document.xml") as stream:
+            return _iterparse_docx(stream)
+
+
+def build_parsed_docx_python_docx(content: bytes) -> ParsedDocx:
+    """python-docx 逐格读取的对照实现：只含顶层表格，合并单元格按 row.cells 展开。"""
+    doc = Document(io.BytesIO(content))
+    tables: list[tuple[tuple[str, ...], ...]] = []
+    grid_rows: list[tuple[str, ...]] = []
+    row_lines: list[tuple[str, ...]] = []
+    for table in doc.tables:
+        rows: list[tuple[str, ...]] = []
+        seen: dict[int, Any] = {}
+        for row in table.rows:
+            cells = row.cells
+            own: list[Any] = []
+            for cell in cells:
+                if not own or own[-1]._tc is not cell._tc:
+                    own.append(cell)
+            rows.append(tuple(cell.text.strip() for cell in own))
+            grid_rows.append(tuple(cell.text for cell in cells))
+            lines: list[str] = []
+            for cell in own:
+                if id(cell._tc) in seen:
+                    continue
+                seen[id(cell._tc)] = cell._tc
+                lines.extend(line.strip() for line in cell.text.splitlines() if line.strip())
+            row_lines.append(tuple(lines))
+        tables.append(tuple(rows))
+    paragraphs = tuple(para.text.strip() for para in doc.paragraphs)
+    return ParsedDocx(paragraphs, tuple(tables), tuple(grid_rows), tuple(row_lines))
+
+
+class DocxParseCache:
+    """按内容 sha256 缓存解析结果，超过 max_entries 时淘汰最久未用的条目。"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, ParsedDocx]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_parse(self, content: bytes) -> ParsedDocx:
+        key = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            parsed = self._items.get(key)
+            if parsed is not None:
+                self._items.move_to_end(key)
+                return parsed
+        try:
+            parsed = build_parsed_docx(content)
+        except ET.ParseError:
+            parsed = build_parsed_docx_python_docx(content)
+        with self._lock:
+            self._items[key] = parsed
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return parsed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+DOCX_PARSE_CACHE = DocxParseCache(max_entries=32)
+
+
+def parse_docx_document(content: bytes) -> ParsedDocx:
+    """解析（或从缓存取）上传的 docx；document.xml 无法流式解析时改用 python-docx，均失败时抛异常。"""
+    return DOCX_PARSE_CACHE.get_or_parse(content)
@@ -0,0 +1,336 @@
+# UTF-8
+"""进程内后台任务队列。
+
+耗时操作提交后立即返回任务 ID，由有界线程池执行；状态、进度与结果写入 background_jobs 表。
+每次落库都写完整状态（先 UPDATE，行不存在再 INSERT），恢复备份替换数据库后仍能记下任务结果。
+取消：排队中的任务直接出队；运行中的任务在下一次上报进度时中止。
+独占：恢复备份等替换数据库的操作要求没有其他活动任务，执行期间拒绝提交新任务。
+"""
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+JOB_TABLE = "background_jobs"
+ACTIVE_STATUSES = frozenset({"queued", "running"})
+_STATE_COLUMNS = (
+    "kind",
+    "status",
+    "progress",
+    "message",
+    "created_by",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "cancel_requested",
+    "result",
+    "result_path",
+    "result_name",
+    "error",
+)
+
+
+class JobCancelled(Exception):
+    """任务已被取消。"""
+
+
+class JobQueueFull(Exception):
+    """排队及运行中的任务数已达上限。"""
+
+
+class JobQueueBusy(Exception):
+    """独占操作进行中，或申请独占时仍有其他活动任务。"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def _describe_error(exc: BaseException) -> str:
+    return str(getattr(exc, "detail", "") or exc or exc.__class__.__name__)
+
+
+class JobContext:
+    """传给任务函数：上报进度、检查取消、登记结果文件。"""
+
+    def __init__(self, queue: "JobQueue", engine: Engine, job_id: str):
+        self._queue = queue
+        self._engine = engine
+        self.job_id = job_id
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._queue.is_cancel_requested(self.job_id)
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def progress(self, value: float, message: str | None = None) -> None:
+        """上报进度（0~1）；已请求取消时抛 JobCancelled。"""
+        self.check_cancelled()
+        self._queue.update(self._engine, self.job_id, progress=max(0.0, min(1.0, float(value))), message=message)
+
+    def set_result_file(self, path: Path, file_name: str) -> None:
+        self._queue.update(self._engine, self.job_id, result_path=str(path), result_name=file_name)
+
+
+class JobQueue:
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._futures: dict[str, Future] = {}
+        self._exclusive_owner: str | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _persist(self, engine: Engine, state: dict[str, Any]) -> None:
+        params = {name: state.get(name) for name in _STATE_COLUMNS}
+        params["id"] = state["id"]
+        params["cancel_requested"] = bool(state.get("cancel_requested"))
+        params["result"] = json.dumps(state["result"], ensure_ascii=False) if state.get("result") is not None else None
+        assignments = ", ".join(f"{name} = :{name}" for name in _STATE_COLUMNS)
+        try:
+            with engine.begin() as conn:
+                updated = conn.execute(text(f"UPDATE {JOB_TABLE} SET {assignments} WHERE id = :id"), params).rowcount
+                if not updated:
+                    conn.execute(
+                        text(
+                            f"INSERT INTO {JOB_TABLE} (id, {', '.join(_STATE_COLUMNS)}) "
+                            f"VALUES (:id, {', '.join(':' + name for name in _STATE_COLUMNS)})"
+                        ),
+                        params,
+                    )
+        except SQLAlchemyError:
+            logger.warning("后台任务状态写入失败 job_id=%s", state["id"], exc_info=True)
+
+    def update(self, engine: Engine, job_id: str, **changes: Any) -> None:
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                return
+            changes = {k: v for k, v in changes.items() if v is not None or k not in {"message", "progress"}}
+            # 进度按百分点落库，避免逐行上报时频繁写库
+            if set(changes) <= {"progress"} and int(changes.get("progress", 0) * 100) == int(state["progress"] * 100):
+                state.update(changes)
+                return
+            state.update(changes)
+            snapshot = dict(state)
+        self._persist(engine, snapshot)
+
+    def begin_exclusive(self, owner: str) -> None:
+        """申请独占：有其他活动任务或已有独占者时抛 JobQueueBusy。"""
+        with self._lock:
+            if self._exclusive_owner is not None or any(job_id != owner for job_id in self._jobs):
+                raise JobQueueBusy()
+            self._exclusive_owner = owner
+
+    def end_exclusive(self, owner: str) -> None:
+        with self._lock:
+            if self._exclusive_owner == owner:
+                self._exclusive_owner = None
+
+    def submit(
+        self,
+        engine: Engine,
+        kind: str,
+        created_by: str,
+        func: Callable[[JobContext], Any],
+        exclusive: bool = False,
+    ) -> str:
+        """登记任务并放入线程池，返回任务 ID；func(ctx) 的返回值（可 JSON 序列化）作为任务结果。
+
+        exclusive=True 时要求没有其他活动任务，并在该任务结束前拒绝提交新任务（JobQueueBusy）。
+        """
+        job_id = uuid.uuid4().hex
+        state = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "progress": 0.0,
+            "message": "排队中",
+            "created_by": created_by,
+            "created_at": _now(),
+            "cancel_requested": False,
+        }
+        with self._lock:
+            if self._exclusive_owner is not None or (exclusive and self._jobs):
+                raise JobQueueBusy()
+            if len(self._jobs) >= self.max_pending:
+                raise JobQueueFull()
+            self._jobs[job_id] = state
+            if exclusive:
+                self._exclusive_owner = job_id
+        self._persist(engine, dict(state))
+        future = self._get_executor().submit(self._run, engine, job_id, func)
+        with self._lock:
+            if job_id in self._jobs:
+                self._futures[job_id] = future
+        return job_id
+
+    def _run(self, engine: Engine, job_id: str, func: Callable[[JobContext], Any]) -> None:
+        ctx = JobContext(self, engine, job_id)
+        try:
+            ctx.check_cancelled()
+            self.update(engine, job_id, status="running", started_at=_now(), message="执行中")
+            result = func(ctx)
+        except JobCancelled:
+            final = {"status": "cancelled", "message": "已取消"}
+        except Exception as exc:
+            logger.exception("后台任务执行失败 job_id=%s", job_id)
+            final = {"status": "failed", "message": "执行失败", "error": _describe_error(exc)}
+        else:
+            final = {"status": "succeeded", "message": "已完成", "progress": 1.0, "result": result}
+        if final["status"] != "succeeded":
+            with self._lock:
+                result_path = (self._jobs.get(job_id) or {}).get("result_path")
+            if result_path:
+                Path(result_path).unlink(missing_ok=True)
+            final.update(result_path=None, result_name=None)
+        self._finish(engine, job_id, **final)
+
+    def _finish(self, engine: Engine, job_id: str, **changes: Any) -> None:
+        self.update(engine, job_id, finished_at=_now(), **changes)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._futures.pop(job_id, None)
+            if self._exclusive_owner == job_id:
+                self._exclusive_owner = None
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            return bool((self._jobs.get(job_id) or {}).get("cancel_requested"))
+
+    def cancel(self, engine: Engine, job_id: str) -> bool:
+        """请求取消；任务不在本进程队列中（已结束）时返回 False。"""
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                return False
+            state["cancel_requested"] = True
+            future = self._futures.get(job_id)
+            dequeued = future is not None and future.cancel()
+        if dequeued:
+            self._finish(engine, job_id, status="cancelled", message="已取消")
+        else:
+            self.update(engine, job_id, message="正在取消")
+        return True
+
+    def wait(self, job_id: str, timeout: float | None = None) -> bool:
+        """等待任务结束（命令行与测试用），超时返回 False。"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None:
+            return True
+        try:
+            future.result(timeout=timeout)
+        except TimeoutError:
+            return False
+        except Exception:
+            pass
+        return True
+
+    def get(self, engine: Engine, job_id: str) -> dict[str, Any] | None:
+        """本进程中的活动任务直接取内存状态，其余读库。"""
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is not None:
+                return {name: state.get(name) for name in ("id", *_STATE_COLUMNS)}
+        with engine.connect() as conn:
+            row = conn.execute(
+                text(f"SELECT id, {', '.join(_STATE_COLUMNS)} FROM {JOB_TABLE} WHERE id = :id"), {"id": job_id}
+            ).mappings().first()
+        return _row_to_state(row) if row else None
+
+    def list_jobs(self, engine: Engine, created_by: str | None, limit: int) -> list[dict[str, Any]]:
+        where = "WHERE created_by = :created_by" if created_by is not None else ""
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    f"SELECT id, {', '.join(_STATE_COLUMNS)} FROM {JOB_TABLE} {where} "
+                    "ORDER BY created_at DESC, id DESC LIMIT :limit"
+                ),
+                {"created_by": created_by, "limit": limit},
+            ).mappings().all()
+        items = [_row_to_state(row) for row in rows]
+        with self._lock:
+            return [
+                {name: self._jobs[item["id"]].get(name) for name in ("id", *_STATE_COLUMNS)}
+                if item["id"] in self._jobs
+                else item
+                for item in items
+            ]
+
+    def recover_interrupted(self, engine: Engine) -> int:
+        """启动时把上次进程遗留的排队/运行中任务标记为失败。"""
+        with self._lock:
+            active = set(self._jobs)
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(f"SELECT id FROM {JOB_TABLE} WHERE status IN ('queued', 'running')")
+            ).scalars().all()
+            stale = [job_id for job_id in rows if job_id not in active]
+            for job_id in stale:
+                conn.execute(
+                    text(
+                        f"UPDATE {JOB_TABLE} SET status = 'failed', message = '执行失败', "
+                        "error = '服务重启，任务未完成。', finished_at = :now WHERE id = :id"
+                    ),
+                    {"id": job_id, "now": _now()},
+                )
+        return len(stale)
+
+
+def _row_to_state(row: Any) -> dict[str, Any]:
+    state = dict(row)
+    state["cancel_requested"] = bool(state.get("cancel_requested"))
+    if isinstance(state.get("result"), str):
+        try:
+            state["result"] = json.loads(state["result"])
+        except ValueError:
+            state["result"] = None
+    for name in ("created_at", "started_at", "finished_at"):
+        if isinstance(state.get(name), datetime):
+            state[name] = state[name].isoformat(sep=" ", timespec="seconds")
+    return state
+
+
+def purge_finished_jobs(engine: Engine, ttl: timedelta) -> int:
+    """删除结束超过 ttl 的任务记录及其结果文件。"""
+    cutoff = (datetime.now() - ttl).isoformat(sep=" ", timespec="seconds")
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(
+                f"SELECT id, result_path FROM {JOB_TABLE} "
+                "WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < :cutoff"
+            ),
+            {"cutoff": cutoff},
+        ).all()
+        for job_id, result_path in rows:
+            if result_path:
+                Path(result_path).unlink(missing_ok=True)
+            conn.execute(text(f"DELETE FROM {JOB_TABLE} WHERE id = :id"), {"id": job_id})
+    return len(rows)
@@ -0,0 +1,82 @@
+# UTF-8
+"""JSON 快照之间的增量（RFC 6902 JSON Patch 子集：add / remove / replace）。
+
+对象逐键递归比较，列表与标量不同即整体替换；路径为 JSON Pointer。
+历史表只存相邻版本间的增量，按需从最近的完整快照（关键帧）重放还原。
+"""
+from typing import Any
+
+
+def _escape(key: str) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _same(a: Any, b: Any) -> bool:
+    # True == 1 在 Python 中成立，JSON 里却是不同的值，因此要比较类型
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _diff_into(old: dict[str, Any], new: dict[str, Any], prefix: str, ops: list[dict[str, Any]]) -> None:
+    for key, old_value in old.items():
+        path = f"{prefix}/{_escape(key)}"
+        if key not in new:
+            ops.append({"op": "remove", "path": path})
+            continue
+        new_value = new[key]
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            _diff_into(old_value, new_value, path, ops)
+        elif not _same(old_value, new_value):
+            ops.append({"op": "replace", "path": path, "value": new_value})
+    for key, new_value in new.items():
+        if key not in old:
+            ops.append({"op": "add", "path": f"{prefix}/{_escape(key)}", "value": new_value})
+
+
+def diff_json(old: Any, new: Any) -> list[dict[str, Any]]:
+    """返回把 old 变为 new 的操作列表；两者相同时为空列表。"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict[str, Any]] = []
+        _diff_into(old, new, "", ops)
+        return ops
+    return [] if _same(old, new) else [{"op": "replace", "path": "", "value": new}]
+
+
+def changed_top_level_keys(ops: list[dict[str, Any]]) -> list[str]:
+    keys: list[str] = []
+    for op in ops:
+        tokens = op["path"].split("/")
+        key = _unescape(tokens[1]) if len(tokens) > 1 else ""
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def apply_delta(document: Any, ops: list[dict[str, Any]]) -> Any:
+    """按顺序应用操作，返回新文档；只复制路径上的容器，不修改传入的 document。"""
+    for op in ops:
+        tokens = [_unescape(token) for token in op["path"].split("/")[1:]]
+        if not tokens:
+            document = op.get("value")
+            continue
+        root = dict(document) if isinstance(document, dict) else {}
+        parent = root
+        for token in tokens[:-1]:
+            child = parent.get(token)
+            parent[token] = dict(child) if isinstance(child, dict) else {}
+            parent = parent[token]
+        if op["op"] == "remove":
+            parent.pop(tokens[-1], None)
+        else:
+            parent[tokens[-1]] = op.get("value")
+        document = root
+    return document
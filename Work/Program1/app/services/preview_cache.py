@@ -0,0 +1,52 @@
+# UTF-8
+"""短期令牌缓存：预检结果存于服务端，客户端只持有令牌。
+
+条目写入 ttl_seconds 后过期；条目数超过 max_entries 时先清过期项，再淘汰最早写入的条目。
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+class TokenCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float) -> None:
+        while self._items:
+            token, (expires_at, _) = next(iter(self._items.items()))
+            if expires_at > now:
+                break
+            del self._items[token]
+
+    def put(self, value: Any) -> str:
+        token = secrets.token_urlsafe(24)
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            self._items[token] = (now + self.ttl_seconds, value)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> Any | None:
+        with self._lock:
+            item = self._items.get(token)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._items[token]
+                return None
+            return item[1]
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._items.pop(token, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
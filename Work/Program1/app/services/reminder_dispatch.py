@@ -0,0 +1,231 @@
+# UTF-8
+"""流程提醒的批量投递：按收件人合并为摘要邮件、复用 SMTP 连接、批量写提醒日志。
+
+提醒条目（entry）为 dict：instance_id、step_name、system_name、status、message、owner、recipient。
+定时任务（ReminderScheduler）在后台线程中周期执行，不占用请求线程。
+"""
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.mime.text import MIMEText
+from typing import Any, Callable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TABLE = "workflow_reminders"
+NO_RECIPIENT_ERROR = "无可用邮箱地址"
+
+SendFunc = Callable[[str, str, str], tuple[bool, str]]
+
+
+class SmtpConnectionPool:
+    """单条长连接：空闲超过 idle_seconds 或探活失败时重连，发送失败重连后重试一次。"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str = "",
+        password: str = "",
+        sender: str = "",
+        use_ssl: bool = False,
+        use_tls: bool = False,
+        timeout: float = 10,
+        idle_seconds: float = 60,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender or user
+        self.use_ssl = use_ssl
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._server: smtplib.SMTP | None = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls and not self.use_ssl:
+                server.starttls()
+            if self.user:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _close_server(self) -> None:
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _ensure_server(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            try:
+                if self._server.noop()[0] != 250:
+                    self._close_server()
+            except Exception:
+                self._close_server()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def config_error(self) -> str | None:
+        if not self.host:
+            return "SMTP_HOST 未配置"
+        if not self.sender:
+            return "SMTP_FROM/SMTP_USER 未配置"
+        return None
+
+    def send(self, to_email: str, subject: str, body: str) -> tuple[bool, str]:
+        config_error = self.config_error()
+        if config_error:
+            return False, config_error
+        msg = MIMEText(body, _subtype="plain", _charset="utf-8")
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = to_email
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    self._ensure_server().sendmail(self.sender, [to_email], msg.as_string())
+                    self._last_used = time.monotonic()
+                    return True, "ok"
+                except smtplib.SMTPRecipientsRefused as exc:
+                    self._last_used = time.monotonic()
+                    return False, str(exc)
+                except Exception as exc:
+                    # 服务端断开等连接级错误：丢弃连接，重连后再试一次
+                    self._close_server()
+                    if attempt:
+                        return False, str(exc)
+        return False, "发送失败"
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_server()
+
+
+def group_by_recipient(entries: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    groups: dict[str, list[dict[str, Any]]] = {}
+    for entry in entries:
+        groups.setdefault(entry.get("recipient") or "", []).append(entry)
+    return groups
+
+
+def build_digest(entries: list[dict[str, Any]]) -> tuple[str, str]:
+    """一位收件人的全部提醒合并成一封邮件，超时项排在前面。"""
+    if len(entries) == 1:
+        entry = entries[0]
+        return f"[流程提醒]{entry['system_name']}-{entry['step_name'] or '未知节点'}", entry["message"]
+    ordered = sorted(entries, key=lambda e: e["status"] != "overdue")
+    overdue = sum(1 for e in entries if e["status"] == "overdue")
+    subject = f"[流程提醒]{len(entries)}项流程待处理" + (f"（{overdue}项已超时）" if overdue else "")
+    lines = [f"您有 {len(entries)} 项流程节点需要处理：", ""]
+    lines += [f"{n}. {entry['message']}" for n, entry in enumerate(ordered, start=1)]
+    return subject, "\n".join(lines)
+
+
+def _log_row(entry: dict[str, Any], channel: str, receiver: str, content: str) -> dict[str, Any]:
+    return {
+        "instance_id": entry["instance_id"],
+        "step_name": entry["step_name"] or "未知节点",
+        "receiver": receiver,
+        "reminder_type": entry["status"],
+        "channel": channel,
+        "content": content,
+    }
+
+
+def in_app_log_rows(entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return [_log_row(e, "in_app", e.get("owner") or "system", e["message"]) for e in entries]
+
+
+def unsendable_log_rows(entries: list[dict[str, Any]], error: str = NO_RECIPIENT_ERROR) -> list[dict[str, Any]]:
+    """无收件人或邮件未配置时直接记失败日志，不建立连接。"""
+    rows = []
+    for entry in entries:
+        reason = error if entry.get("recipient") else NO_RECIPIENT_ERROR
+        receiver = entry.get("recipient") or entry.get("owner") or "system"
+        rows.append(_log_row(entry, "email", receiver, f"{entry['message']} (邮件发送失败: {reason})"))
+    return rows
+
+
+def send_reminder_digests(send: SendFunc, entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """按收件人发送摘要邮件，返回每条提醒对应的 email 日志行。"""
+    rows: list[dict[str, Any]] = []
+    for recipient, group in group_by_recipient(entries).items():
+        if not recipient:
+            rows += unsendable_log_rows(group)
+            continue
+        subject, body = build_digest(group)
+        ok, err = send(recipient, subject, body)
+        for entry in group:
+            content = entry["message"] if ok else f"{entry['message']} (邮件发送失败: {err})"
+            rows.append(_log_row(entry, "email", recipient, content))
+    return rows
+
+
+def insert_reminder_logs(db: Session, rows: list[dict[str, Any]], created_at: datetime | None = None) -> int:
+    """一次 executemany 写入提醒日志；由调用方提交。
+
+    created_at 由应用写入本地时间，不用数据库默认值：SQLite 的 CURRENT_TIMESTAMP 是 UTC，
+    MySQL 的 NOW() 是服务器本地时间，按时间窗口去重时两者无法统一比较。
+    """
+    if rows:
+        created_at = created_at or datetime.now()
+        db.execute(
+            text(
+                f"INSERT INTO {REMINDER_TABLE} "
+                "(instance_id, step_name, receiver, reminder_type, channel, content, created_at) "
+                "VALUES (:instance_id, :step_name, :receiver, :reminder_type, :channel, :content, :created_at)"
+            ),
+            [{**row, "created_at": created_at} for row in rows],
+        )
+    return len(rows)
+
+
+class ReminderScheduler:
+    """后台线程按固定间隔调用 callback；callback 的异常只记日志，不中断调度。"""
+
+    def __init__(self, interval_seconds: float, callback: Callable[[], Any]):
+        self.interval_seconds = interval_seconds
+        self.callback = callback
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.callback()
+            except Exception:
+                logger.exception("定时流程提醒执行失败")
@@ -0,0 +1,66 @@
+# UTF-8
+"""报告章节内容的内容寻址存储。
+
+章节内容按 sha256 存一份，report_section_blocks 表记录引用数；
+各版本报告只保存章节内容的哈希，未改动的章节在版本之间共享，最后一个引用释放时删除。
+"""
+import json
+from collections import Counter
+from typing import Any, Iterable
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from .sql_upsert import upsert_add_counter
+
+BLOCK_TABLE = "report_section_blocks"
+
+
+def acquire_blocks(db: Session, blocks: Iterable[tuple[str, Any]]) -> None:
+    """每个 (哈希, 内容) 记一次引用；内容已存在时只加引用数。"""
+    counts: Counter[str] = Counter()
+    bodies: dict[str, Any] = {}
+    for sha256, body in blocks:
+        counts[sha256] += 1
+        bodies.setdefault(sha256, body)
+    if not counts:
+        return
+    upsert_add_counter(
+        db,
+        BLOCK_TABLE,
+        "sha256",
+        "ref_count",
+        [
+            {"sha256": sha256, "content": json.dumps(bodies[sha256], ensure_ascii=False), "ref_count": refs}
+            for sha256, refs in counts.items()
+        ],
+    )
+
+
+def release_blocks(db: Session, hashes: Iterable[str]) -> None:
+    counts = Counter(hashes)
+    if not counts:
+        return
+    db.execute(
+        text(f"UPDATE {BLOCK_TABLE} SET ref_count = ref_count - :refs WHERE sha256 = :sha256"),
+        [{"sha256": sha256, "refs": refs} for sha256, refs in counts.items()],
+    )
+    db.execute(
+        text(f"DELETE FROM {BLOCK_TABLE} WHERE ref_count <= 0 AND sha256 IN :hashes").bindparams(
+            bindparam("hashes", expanding=True)
+        ),
+        {"hashes": list(counts)},
+    )
+
+
+def load_blocks(db: Session, hashes: Iterable[str]) -> dict[str, Any]:
+    wanted = sorted(set(hashes))
+    if not wanted:
+        return {}
+    rows = db.execute(
+        text(f"SELECT sha256, content FROM {BLOCK_TABLE} WHERE sha256 IN :hashes").bindparams(
+            bindparam("hashes", expanding=True)
+        ),
+        {"hashes": wanted},
+    ).all()
+    return {sha256: json.loads(content) if isinstance(content, str) else content for sha256, content in rows}
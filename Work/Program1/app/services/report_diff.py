@@ -0,0 +1,72 @@
+# UTF-8
+"""报告内容的结构化哈希与版本差异。
+
+保存时为每个顶层字段与每个章节内容计算 sha256（内容清单），对比两个版本时
+先比哈希，只有哈希不同的章节才展开比较；长文本按词（中文逐字、英文数字按词）给出差异片段。
+"""
+import difflib
+import hashlib
+import json
+import re
+from typing import Any
+
+# 超过该长度的文本按词比较，否则直接给出前后值
+WORD_DIFF_MIN_CHARS = 40
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_.\-]+|\s+|[^\sA-Za-z0-9_.\-]")
+
+
+def content_hash(value: Any) -> str:
+    raw = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def section_key(row: Any, index: int) -> str:
+    if not isinstance(row, dict):
+        return f"#{index}"
+    return str(row.get("名称") or f"#{index}")
+
+
+def build_content_manifest(content: dict[str, Any]) -> dict[str, Any]:
+    """{"fields": {字段: 哈希}, "sections": {章节名: 章节内容哈希}}；同名章节以后出现者为准。"""
+    sections: dict[str, str] = {}
+    for index, row in enumerate(content.get("章节") or []):
+        body = row.get("内容") if isinstance(row, dict) else row
+        sections[section_key(row, index)] = content_hash(body)
+    return {
+        "fields": {key: content_hash(value) for key, value in content.items()},
+        "sections": sections,
+    }
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def word_diff(old: str, new: str) -> list[dict[str, str]]:
+    """按词比较两段文本，返回 [{op, from, to}]，op 为 equal/insert/delete/replace。"""
+    left, right = _tokens(old), _tokens(new)
+    matcher = difflib.SequenceMatcher(None, left, right, autojunk=False)
+    return [
+        {"op": op, "from": "".join(left[i1:i2]), "to": "".join(right[j1:j2])}
+        for op, i1, i2, j1, j2 in matcher.get_opcodes()
+    ]
+
+
+def _value_diff(path: str, old: Any, new: Any, out: list[dict[str, Any]]) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in list(old) + [key for key in new if key not in old]:
+            _value_diff(f"{path}.{key}" if path else str(key), old.get(key), new.get(key), out)
+        return
+    if content_hash(old) == content_hash(new):
+        return
+    if isinstance(old, str) and isinstance(new, str) and max(len(old), len(new)) >= WORD_DIFF_MIN_CHARS:
+        out.append({"path": path, "words": word_diff(old, new)})
+    else:
+        out.append({"path": path, "from": old, "to": new})
+
+
+def diff_section(old: Any, new: Any) -> list[dict[str, Any]]:
+    """章节内容逐键比较；长文本给出词级差异，其余给出前后值。"""
+    out: list[dict[str, Any]] = []
+    _value_diff("", old, new, out)
+    return out
@@ -1,7 +1,12 @@
+import contextlib
+import copy
 import io
 import json
 import logging
+import os
 import re
+import struct
+import sys
 import zipfile
 from datetime import datetime, date
 from pathlib import Path
@@ -14,6 +19,8 @@ from docx.oxml.ns import qn
 from docx.shared import Pt
 from openpyxl import load_workbook
 
+from .docx_document import parse_docx_document
+
 try:
     from reportlab.pdfbase import pdfmetrics
     from reportlab.pdfbase.cidfonts import UnicodeCIDFont
@@ -748,20 +755,94 @@ def _today_short() -> str:
     return f"{today.year}年{today.month}月{today.day}日"
 
 
-def _read_docx_xml(template_path: Path) -> tuple[str, list[tuple[str, bytes]]]:
-    """读取 .docx，返回 (document.xml 文本, 其余文件列表)。"""
+# 导出时会改写的包内部件：其余成员（图片、字体、样式等）按原压缩数据直接拷贝
+def _is_editable_docx_part(name: str) -> bool:
+    return name in ("word/document.xml", "[Content_Types].xml") or name.endswith(".rels")
+
+
+def _read_docx_xml(template_path: Path) -> tuple[str, list[tuple[str, bytes | None]]]:
+    """读取 .docx，返回 (document.xml 文本, 其余文件列表)。
+
+    只解压 document.xml、[Content_Types].xml 与 .rels；其余成员数据为 None，
+    由 _write_docx_xml 从 source 原样拷贝压缩数据。
+    """
     with zipfile.ZipFile(template_path, "r") as zin:
         xml_content = zin.read("word/document.xml").decode("utf-8")
-        others = [(n, zin.read(n)) for n in zin.namelist() if n != "word/document.xml"]
+        others = [
+            (n, zin.read(n) if _is_editable_docx_part(n) else None)
+            for n in zin.namelist()
+            if n != "word/document.xml"
+        ]
     return xml_content, others
 
 
-def _write_docx_xml(output_path: Path, xml_content: str, others: list[tuple[str, bytes]]) -> None:
+# 原样拷贝压缩数据要直接操作 ZipFile 的内部状态（fp/start_dir/filelist/_lock 等），
+# 只在核对过实现的 Python 版本上启用，其余版本回退为解压后重新压缩
+_RAW_ZIP_COPY = sys.version_info[:2] in {(3, 10), (3, 11), (3, 12), (3, 13)} and hasattr(zipfile.ZipFile, "_writecheck")
+
+
+def _copy_zip_member_raw(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """把 zin 的成员按原压缩数据写入 zout，不解压、不重新压缩。"""
+    with zin._lock:
+        zin.fp.seek(info.header_offset)
+        header = zin.fp.read(zipfile.sizeFileHeader)
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        zin.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+        raw = zin.fp.read(info.compress_size)
+    if len(raw) != info.compress_size:
+        raise zipfile.BadZipFile(f"成员数据不完整：{info.filename}")
+
+    out = copy.copy(info)
+    out.flag_bits &= ~0x08  # 大小与 CRC 已知，写入本地文件头而非数据描述符
+    with zout._lock:
+        if zout._writing:
+            raise ValueError("zout 有未关闭的写入句柄")
+        zout._writecheck(out)
+        zout._didModify = True
+        zout.fp.seek(zout.start_dir)
+        out.header_offset = zout.fp.tell()
+        zout.fp.write(out.FileHeader())
+        zout.fp.write(raw)
+        zout.filelist.append(out)
+        zout.NameToInfo[out.filename] = out
+        zout.start_dir = zout.fp.tell()
+
+
+def _copy_zip_member(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    if _RAW_ZIP_COPY:
+        _copy_zip_member_raw(zin, zout, info)
+    else:
+        zout.writestr(info, zin.read(info))
+
+
+def _write_docx_xml(
+    output_path: Path,
+    xml_content: str,
+    others: list[tuple[str, bytes | None]],
+    source: Path | None = None,
+) -> None:
+    """写出 .docx：有数据的成员重新压缩，数据为 None 的成员从 source 原样拷贝。
+
+    先写临时文件再替换，source 与 output_path 可以是同一文件。
+    """
+    output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zout:
-        zout.writestr("word/document.xml", xml_content.encode("utf-8"))
-        for name, data in others:
-            zout.writestr(name, data)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    try:
+        with contextlib.ExitStack() as stack:
+            zin = stack.enter_context(zipfile.ZipFile(source, "r")) if source is not None else None
+            zout = stack.enter_context(zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED))
+            zout.writestr("word/document.xml", xml_content.encode("utf-8"))
+            for name, data in others:
+                if data is not None:
+                    zout.writestr(name, data)
+                elif zin is not None:
+                    _copy_zip_member(zin, zout, zin.getinfo(name))
+                else:
+                    raise ValueError(f"缺少 {name} 的数据且未指定来源文件")
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def _xml_replace(xml: str, replacements: dict[str, str]) -> str:
@@ -773,18 +854,6 @@ def _xml_replace(xml: str, replacements: dict[str, str]) -> str:
     return xml
 
 
-def _replace_last_n(xml: str, needle: str, replacement: str, n: int) -> str:
-    """将 xml 中最后 n 个 needle（xml 转义后）替换为 replacement。"""
-    escaped_needle = xml_escape(needle)
-    escaped_repl = xml_escape(replacement)
-    positions = [m.start() for m in re.finditer(re.escape(escaped_needle), xml)]
-    if not positions:
-        return xml
-    for pos in reversed(positions[-n:]):
-        xml = xml[:pos] + escaped_repl + xml[pos + len(escaped_needle):]
-    return xml
-
-
 def export_grading_report_docx(
     template_path: Path,
     org: Any,
@@ -812,57 +881,160 @@ def export_grading_report_docx(
 
     xml, others = _read_docx_xml(template_path)
 
+    # 拓扑图：先登记媒体资源，段落随其余改写一次性插入
+    topology_xml = None
+    if topology_path and Path(topology_path).exists():
+        others, topology_xml = _register_topology_image(others, Path(topology_path))
+
+    xml = _render_grading_report_xml(
+        xml,
+        org_name=org_name,
+        sys_name=sys_name,
+        cn=cn,
+        content=content,
+        business_matrix=business_matrix,
+        service_matrix=service_matrix,
+        topology_xml=topology_xml,
+    )
+
+    _write_docx_xml(output_path, xml, others, source=template_path)
+    logger.info("定级报告已生成：%s", output_path)
+
+
+# 定级报告样例段落：content 键 -> 样例段落中的定位文本（跨 run 合并后匹配）
+GRADING_PARAGRAPH_MAP = {
+    "responsible_subject": "定级对象于2025年12月",
+    "object_composition": "部署于山西省政务云",
+    "carried_business": "该系统包含信息采集",
+    "carried_data": "该定级对象承载的数据主要包括",
+    "security_responsibility": "按照网络安全法的相关要求",
+    "business_info_description": "该定级对象承载的数据主要为采购",
+    "business_info_damage_object": "该业务信息遭到破坏后",
+    "business_info_damage_degree": "侵害的客观方面表现为",
+    "service_description": "该系统主要负责省属企业",
+    "service_damage_object": "该系统服务遭到破坏后",
+    "service_damage_degree": "对客体的侵害结果为",
+}
+
+# 段落（含自闭合空段落）与表格起止标签；段落内不会出现 <w:tbl>，一次扫描即可切分
+_BODY_TOKEN_RE = re.compile(
+    r"(?P<p><w:p(?:\s[^>]*)?/>|<w:p\b[^>]*>.*?</w:p>)|(?P<tbl><w:tbl(?:\s[^>]*)?>)|(?P<tbl_end></w:tbl>)",
+    re.DOTALL,
+)
+
+
+def _index_document_xml(xml: str) -> tuple[list[str], list[int], list[tuple[int, int]]]:
+    """一次扫描把 document.xml 切成片段列表。
+
+    返回 (片段, 段落片段下标, 顶层表格 (起始标签下标, 结束标签下标))。
+    改写时只替换对应片段（被合并的片段置空串，下标保持不变），最后 join 一次。
+    """
+    segments: list[str] = []
+    paragraphs: list[int] = []
+    tables: list[tuple[int, int]] = []
+    depth = 0
+    table_start = -1
+    pos = 0
+    for m in _BODY_TOKEN_RE.finditer(xml):
+        if m.start() > pos:
+            segments.append(xml[pos:m.start()])
+        kind = m.lastgroup
+        if kind == "p":
+            paragraphs.append(len(segments))
+        elif kind == "tbl":
+            if depth == 0:
+                table_start = len(segments)
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                tables.append((table_start, len(segments)))
+        segments.append(m.group(0))
+        pos = m.end()
+    if pos < len(xml):
+        segments.append(xml[pos:])
+    return segments, paragraphs, tables
+
+
+def _render_grading_report_xml(
+    xml: str,
+    *,
+    org_name: str,
+    sys_name: str,
+    cn: str,
+    content: dict[str, Any],
+    business_matrix: list[list[int]] | None = None,
+    service_matrix: list[list[int]] | None = None,
+    topology_xml: str | None = None,
+) -> str:
+    """对 02 定级报告的 document.xml 做全部改写：建一次段落/表格索引，按原顺序逐项改写片段，最后拼接一次。"""
     # 基础替换：单位/系统名
     xml = _xml_replace(xml, {SAMPLE_ORG_NAME: org_name, SAMPLE_SYSTEM_NAME: sys_name})
-
-    # 用户填写的段落内容替换整段（定位到原样例段落；跨 run 合并后匹配）
-    paragraph_map = {
-        "responsible_subject": "定级对象于2025年12月",
-        "object_composition": "部署于山西省政务云",
-        "carried_business": "该系统包含信息采集",
-        "carried_data": "该定级对象承载的数据主要包括",
-        "security_responsibility": "按照网络安全法的相关要求",
-        "business_info_description": "该定级对象承载的数据主要为采购",
-        "business_info_damage_object": "该业务信息遭到破坏后",
-        "business_info_damage_degree": "侵害的客观方面表现为",
-        "service_description": "该系统主要负责省属企业",
-        "service_damage_object": "该系统服务遭到破坏后",
-        "service_damage_degree": "对客体的侵害结果为",
-    }
-    for key, match_prefix in paragraph_map.items():
+    segments, paragraphs, tables = _index_document_xml(xml)
+    plains: dict[int, str] = {}
+
+    def replace_paragraph(match_text: str, new_text: str) -> None:
+        escaped = xml_escape(match_text)
+        for idx in paragraphs:
+            plain = plains.get(idx)
+            if plain is None:
+                plain = plains[idx] = _paragraph_plain_text(segments[idx])
+            if escaped in plain:
+                segments[idx] = _rewrite_paragraph(segments[idx], new_text)
+                plains.pop(idx, None)
+                return
+
+    # 用户填写的段落内容替换整段（定位到原样例段落）
+    for key, match_prefix in GRADING_PARAGRAPH_MAP.items():
         new_text = str(content.get(key, "") or "").strip()
         if new_text:
-            xml = _replace_paragraph_starts_with(xml, match_prefix, new_text)
+            replace_paragraph(match_prefix, new_text)
 
-    # 填表日期（签章行） - 跨 run 合并匹配
+    # 填表日期（签章行）
     fill_date = str(content.get("fill_date") or "").strip() or _today_cn()
-    xml = _replace_paragraph_starts_with(xml, "2026年 1 月 20 日", fill_date)
+    replace_paragraph(SAMPLE_GRADING_DATE_LINE, fill_date)
 
-    # 结论句（这些在单段内连续，用 _xml_replace 即可）
+    # 结论句及汇总表"第三级"：只可能出现在含"第三级"的段落里
     cn_label = f"第{cn}级"
-    xml = _xml_replace(
-        xml,
-        {
-            "业务信息安全保护等级为第三级": f"业务信息安全保护等级为{cn_label}",
-            "系统服务安全保护等级为第三级": f"系统服务安全保护等级为{cn_label}",
-            "网络安全保护等级为第三级": f"网络安全保护等级为{cn_label}",
-        },
-    )
+    conclusions = {
+        "业务信息安全保护等级为第三级": f"业务信息安全保护等级为{cn_label}",
+        "系统服务安全保护等级为第三级": f"系统服务安全保护等级为{cn_label}",
+        "网络安全保护等级为第三级": f"网络安全保护等级为{cn_label}",
+    }
+    level_hits = [idx for idx in paragraphs if "第三级" in segments[idx]]
+    for idx in level_hits:
+        segments[idx] = _xml_replace(segments[idx], conclusions)
 
     # 汇总表最后 3 个"第三级"单元格
     if cn != "三":
-        xml = _replace_last_n(xml, "第三级", cn_label, 3)
+        remaining = 3
+        for idx in reversed(level_hits):
+            if remaining <= 0:
+                break
+            seg = segments[idx]
+            cut = len(seg)
+            while remaining > 0:
+                pos = seg.rfind("第三级", 0, cut)
+                if pos == -1:
+                    break
+                seg = seg[:pos] + cn_label + seg[pos + len("第三级"):]
+                cut = pos
+                remaining -= 1
+            segments[idx] = seg
 
     # 矩阵涂灰（业务信息矩阵 = 第一张表；系统服务矩阵 = 第二张表）
-    if business_matrix or service_matrix:
-        xml = _shade_matrix_cells(xml, business_matrix, service_matrix)
+    if (business_matrix or service_matrix) and len(tables) >= 2:
+        _shade_indexed_tables(segments, tables, business_matrix, service_matrix)
 
     # 拓扑图插入：在"定级对象构成"段落之后
-    if topology_path and Path(topology_path).exists():
-        xml, others = _insert_topology_image(xml, others, Path(topology_path))
+    if topology_xml:
+        anchor_title = xml_escape("（二）定级对象构成")
+        for idx in paragraphs:
+            if anchor_title in segments[idx]:
+                segments[idx] += topology_xml
+                break
 
-    _write_docx_xml(output_path, xml, others)
-    logger.info("定级报告已生成：%s", output_path)
+    return "".join(segments)
 
 
 def _paragraph_plain_text(p_seg: str) -> str:
@@ -878,29 +1050,30 @@ def _replace_paragraph_starts_with(xml: str, match_substring: str, new_text: str
     done = [False]
 
     def repl(m: re.Match) -> str:
-        if done[0]:
+        if done[0] or escaped_sub not in _paragraph_plain_text(m.group(0)):
             return m.group(0)
-        seg = m.group(0)
-        plain = _paragraph_plain_text(seg)
-        if escaped_sub not in plain:
-            return seg
         done[0] = True
-        first_run_match = re.search(r"<w:r\b[^>]*>(.*?)</w:r>", seg, re.DOTALL)
-        rpr = ""
-        if first_run_match:
-            rpr_match = re.search(r"<w:rPr\b[^>]*>.*?</w:rPr>", first_run_match.group(1), re.DOTALL)
-            if rpr_match:
-                rpr = rpr_match.group(0)
-        ppr_match = re.search(r"<w:pPr\b[^>]*>.*?</w:pPr>", seg, re.DOTALL)
-        ppr = ppr_match.group(0) if ppr_match else ""
-        new_run = f"<w:r>{rpr}<w:t xml:space=\"preserve\">{xml_escape(new_text)}</w:t></w:r>"
-        open_match = re.match(r"<w:p\b[^>]*>", seg)
-        open_tag = open_match.group(0) if open_match else "<w:p>"
-        return f"{open_tag}{ppr}{new_run}</w:p>"
+        return _rewrite_paragraph(m.group(0), new_text)
 
     return p_pattern.sub(repl, xml)
 
 
+def _rewrite_paragraph(seg: str, new_text: str) -> str:
+    """保留段落属性与首 run 属性，把整段文本替换为 new_text。"""
+    first_run_match = re.search(r"<w:r\b[^>]*>(.*?)</w:r>", seg, re.DOTALL)
+    rpr = ""
+    if first_run_match:
+        rpr_match = re.search(r"<w:rPr\b[^>]*>.*?</w:rPr>", first_run_match.group(1), re.DOTALL)
+        if rpr_match:
+            rpr = rpr_match.group(0)
+    ppr_match = re.search(r"<w:pPr\b[^>]*>.*?</w:pPr>", seg, re.DOTALL)
+    ppr = ppr_match.group(0) if ppr_match else ""
+    new_run = f"<w:r>{rpr}<w:t xml:space=\"preserve\">{xml_escape(new_text)}</w:t></w:r>"
+    open_match = re.match(r"<w:p\b[^>]*>", seg)
+    open_tag = open_match.group(0) if open_match else "<w:p>"
+    return f"{open_tag}{ppr}{new_run}</w:p>"
+
+
 def _replace_paragraph_contains(xml: str, match_substring: str, new_text: str) -> str:
     """同 _replace_paragraph_starts_with 语义（保留以兼容之前命名）。"""
     return _replace_paragraph_starts_with(xml, match_substring, new_text)
@@ -937,75 +1110,47 @@ def _shade_matrix_cells(
       row 2~4: 数据行（对应行索引 0/1/2）
       col 1~3: 数据列（对应列索引 0/1/2）
     """
-    shade_xml = '<w:shd w:val="clear" w:color="auto" w:fill="BFBFBF"/>'
-
-    tbls = _find_top_level_tables(xml)
-    if len(tbls) < 2:
+    segments, _paragraphs, tables = _index_document_xml(xml)
+    if len(tables) < 2:
         return xml
+    _shade_indexed_tables(segments, tables, business_matrix, service_matrix)
+    return "".join(segments)
+
 
-    def apply_shade(table_seg: str, matrix: list[list[int]] | None) -> str:
+def _shade_indexed_tables(
+    segments: list[str],
+    tables: list[tuple[int, int]],
+    business_matrix: list[list[int]] | None,
+    service_matrix: list[list[int]] | None,
+) -> None:
+    """就地给索引中前两张顶层表涂灰；整表合并到起始片段，其余片段置空。"""
+    for (start, end), matrix in zip(tables[:2], (business_matrix, service_matrix)):
         if not matrix:
-            return table_seg
-        rows = _split_rows(table_seg)
-        if len(rows) < 5:
-            return table_seg
-        for ri in range(3):
-            if any(matrix[ri][ci] for ci in range(3)):
-                rows[2 + ri] = _shade_row_cell(rows[2 + ri], 0, shade_xml)
-            for ci in range(3):
-                if not matrix[ri][ci]:
-                    continue
-                row_idx = 2 + ri
-                col_idx = 1 + ci
-                rows[row_idx] = _shade_row_cell(rows[row_idx], col_idx, shade_xml)
-        return _assemble_table(table_seg, rows)
-
-    # 第一张矩阵 = 业务信息
-    start, end = tbls[0]
-    new_seg = apply_shade(xml[start:end], business_matrix)
-    xml = xml[:start] + new_seg + xml[end:]
-    # 第二张矩阵 = 系统服务（重新定位）
-    tbls2 = _find_top_level_tables(xml)
-    if len(tbls2) >= 2:
-        start, end = tbls2[1]
-        new_seg = apply_shade(xml[start:end], service_matrix)
-        xml = xml[:start] + new_seg + xml[end:]
-    return xml
+            continue
+        table_seg = "".join(segments[start:end + 1])
+        shaded = _shade_matrix_table(table_seg, matrix)
+        if shaded == table_seg:
+            continue
+        segments[start] = shaded
+        for idx in range(start + 1, end + 1):
+            segments[idx] = ""
 
 
-def _find_top_level_tables(xml: str) -> list[tuple[int, int]]:
-    """返回所有顶层 <w:tbl>...</w:tbl> 的 (start, end) 偏移列表。"""
-    result = []
-    idx = 0
-    while True:
-        start = xml.find("<w:tbl>", idx)
-        if start == -1:
-            start2 = re.search(r"<w:tbl[\s>]", xml[idx:])
-            if not start2:
-                break
-            start = idx + start2.start()
-        # 找到匹配的 </w:tbl>
-        depth = 1
-        scan = start + len("<w:tbl")
-        end = -1
-        while depth > 0:
-            next_open = xml.find("<w:tbl", scan)
-            next_close = xml.find("</w:tbl>", scan)
-            if next_close == -1:
-                return result
-            # 只计算 <w:tbl 后紧跟空白或 > 的（避免匹配到 <w:tblPr 等）
-            if next_open != -1 and next_open < next_close:
-                ch = xml[next_open + len("<w:tbl"):next_open + len("<w:tbl") + 1]
-                if ch in (" ", ">", "\n", "\t", "\r"):
-                    depth += 1
-                scan = next_open + len("<w:tbl")
+def _shade_matrix_table(table_seg: str, matrix: list[list[int]]) -> str:
+    shade_xml = '<w:shd w:val="clear" w:color="auto" w:fill="BFBFBF"/>'
+    rows = _split_rows(table_seg)
+    if len(rows) < 5:
+        return table_seg
+    for ri in range(3):
+        if any(matrix[ri][ci] for ci in range(3)):
+            rows[2 + ri] = _shade_row_cell(rows[2 + ri], 0, shade_xml)
+        for ci in range(3):
+            if not matrix[ri][ci]:
                 continue
-            depth -= 1
-            end = next_close + len("</w:tbl>")
-            scan = end
-        result.append((start, end))
-        idx = end
-    return result
+            row_idx = 2 + ri
+            col_idx = 1 + ci
+            rows[row_idx] = _shade_row_cell(rows[row_idx], col_idx, shade_xml)
+    return _assemble_table(table_seg, rows)
 
 
 def _split_rows(table_seg: str) -> list[str]:
@@ -1068,12 +1213,11 @@ def _shade_row_cell(row_xml: str, col_idx: int, shade_xml: str) -> str:
     return row_xml[:start] + cell_seg + row_xml[end:]
 
 
-def _insert_topology_image(
-    xml: str,
+def _register_topology_image(
     others: list[tuple[str, bytes]],
     image_path: Path,
-) -> tuple[str, list[tuple[str, bytes]]]:
-    """将图片作为媒体资源加入 .docx 并在"定级对象构成"段落后插入一个图片段落。"""
+) -> tuple[list[tuple[str, bytes]], str]:
+    """将图片作为媒体资源加入 .docx，返回 (新 others, 待插入"定级对象构成"段落后的图片段落 XML)。"""
     ext = image_path.suffix.lower().lstrip(".") or "png"
     if ext == "jpg":
         ext = "jpeg"
@@ -1107,19 +1251,7 @@ def _insert_topology_image(
             others[i] = (n, rels_xml.encode("utf-8"))
             break
 
-    # 构造 drawing 段落，插到"定级对象构成"段落之后
-    drawing_xml = _make_drawing_paragraph(rel_id, image_path.name)
-    anchor_prefix = xml_escape("山西省省属企业采购与供应链信息管理系统部署于")  # 原样例
-    # 无论样例是否还在，都尝试找到"定级对象构成"标题段落后插入
-    anchor_title = xml_escape("（二）定级对象构成")
-    anchor_pos = xml.find(anchor_title)
-    if anchor_pos != -1:
-        # 插到该段落后
-        p_close = xml.find("</w:p>", anchor_pos)
-        if p_close != -1:
-            insert_at = p_close + len("</w:p>")
-            xml = xml[:insert_at] + drawing_xml + xml[insert_at:]
-    return xml, others
+    return others, _make_drawing_paragraph(rel_id, image_path.name)
 
 
 def _make_drawing_paragraph(rel_id: str, name: str) -> str:
@@ -1149,59 +1281,6 @@ def _make_drawing_paragraph(rel_id: str, name: str) -> str:
 # Word 导入解析（XML 级，保留方框/符号等 python-docx 会略过的内容）
 # ──────────────────────────────────────────────────────────────────────────────
 
-_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
-
-
-def _parse_docx_structure(content: bytes) -> dict[str, Any]:
-    """返回 {'paragraphs': [text,...], 'tables': [[[cell_text]]...]}。"""
-    import xml.etree.ElementTree as ET
-
-    with zipfile.ZipFile(io.BytesIO(content)) as z:
-        if "word/document.xml" not in z.namelist():
-            raise ValueError("上传的文件不是有效的 Word (.docx)。")
-        raw = z.read("word/document.xml")
-
-    root = ET.fromstring(raw)
-
-    def element_text(el: Any) -> str:
-        parts: list[str] = []
-        for node in el.iter():
-            tag = node.tag
-            if tag == _WORD_NS + "t":
-                parts.append(node.text or "")
-            elif tag == _WORD_NS + "tab":
-                parts.append("\t")
-            elif tag == _WORD_NS + "br":
-                parts.append("\n")
-        return "".join(parts)
-
-    paragraphs: list[str] = []
-    tables: list[list[list[str]]] = []
-
-    def walk(el: Any, in_table: bool = False) -> None:
-        for child in list(el):
-            tag = child.tag
-            if tag == _WORD_NS + "p":
-                if not in_table:
-                    paragraphs.append(element_text(child).strip())
-            elif tag == _WORD_NS + "tbl":
-                rows: list[list[str]] = []
-                for tr in child.findall(_WORD_NS + "tr"):
-                    cells: list[str] = []
-                    for tc in tr.findall(_WORD_NS + "tc"):
-                        cells.append(element_text(tc).strip())
-                    rows.append(cells)
-                tables.append(rows)
-                walk(child, in_table=True)
-            else:
-                walk(child, in_table)
-
-    body = root.find(_WORD_NS + "body")
-    if body is not None:
-        walk(body)
-
-    return {"paragraphs": paragraphs, "tables": tables}
-
 
 # 定级报告段落标题 → 字段 key 的映射
 _GRADING_HEADINGS = [
@@ -1221,8 +1300,8 @@ _GRADING_HEADINGS = [
 
 def parse_grading_report_docx(content: bytes) -> dict[str, Any]:
     """从已填写的定级报告 Word 提取段落内容 → {字段 key: 文本}。"""
-    struct = _parse_docx_structure(content)
-    paragraphs = [p for p in struct["paragraphs"] if p]
+    doc = parse_docx_document(content)
+    paragraphs = [p for p in doc.paragraphs if p]
 
     result: dict[str, str] = {}
     # 识别段落，标题段落的下一个（非空、非表格数据）段落即为内容
@@ -1276,9 +1355,9 @@ def parse_grading_report_docx(content: bytes) -> dict[str, Any]:
 
 def parse_expert_review_city_docx(content: bytes) -> dict[str, Any]:
     """从市级专家评审意见表 Word 提取字段。"""
-    struct = _parse_docx_structure(content)
+    doc = parse_docx_document(content)
     result: dict[str, Any] = {}
-    for table in struct["tables"]:
+    for table in doc.tables:
         for row in table:
             if not row:
                 continue
@@ -1322,7 +1401,7 @@ def parse_expert_review_city_docx(content: bytes) -> dict[str, Any]:
 
 def parse_expert_review_department_docx(content: bytes) -> dict[str, Any]:
     """从厅级专家评审意见表 Word 提取字段。"""
-    struct = _parse_docx_structure(content)
+    doc = parse_docx_document(content)
     result: dict[str, Any] = {}
     labels = [
         ("信息系统运营、使用单位名称", "unit_name"),
@@ -1333,7 +1412,7 @@ def parse_expert_review_department_docx(content: bytes) -> dict[str, Any]:
         ("信息系统名称", "system_name"),
         ("系统自定安全级别", "self_level"),
     ]
-    for table in struct["tables"]:
+    for table in doc.tables:
         for row in table:
             for cell in row:
                 for label, key in labels:
@@ -1349,7 +1428,7 @@ def parse_expert_review_department_docx(content: bytes) -> dict[str, Any]:
                     if rest:
                         result["review_opinion"] = rest
     # 填表时间
-    for p in struct["paragraphs"]:
+    for p in doc.paragraphs:
         m = re.search(r"填表时间[：:]\s*(.+)", p)
         if m:
             value = m.group(1).strip()
@@ -1361,7 +1440,7 @@ def parse_expert_review_department_docx(content: bytes) -> dict[str, Any]:
 
 def parse_filing_form_docx(content: bytes) -> dict[str, Any]:
     """从备案表 Word 提取核心文本字段（仅文本，选项/附件不处理）。"""
-    struct = _parse_docx_structure(content)
+    doc = parse_docx_document(content)
     result: dict[str, Any] = {}
 
     exact_labels = {
@@ -1379,7 +1458,7 @@ def parse_filing_form_docx(content: bytes) -> dict[str, Any]:
         "何时投入运行使用": "go_live_date",
     }
 
-    for table in struct["tables"]:
+    for table in doc.tables:
         for row in table:
             for idx, cell in enumerate(row):
                 cell_n = re.sub(r"\s+", "", cell)
@@ -1501,7 +1580,7 @@ def export_expert_review_docx(
         if opinion:
             xml = _append_label_value(xml, "评审专家组意见：", opinion)
 
-    _write_docx_xml(output_path, xml, others)
+    _write_docx_xml(output_path, xml, others, source=template_path)
     logger.info("专家评审意见表已生成（%s）：%s", variant, output_path)
 
 
@@ -1540,5 +1619,5 @@ def export_expert_review_merged_docx(
     cn_primary = _cn_level(getattr(primary, "proposed_level", 3))
     if len({_cn_level(getattr(s, "proposed_level", 3)) for s in systems}) > 1:
         xml = xml.replace(xml_escape(f"第{cn_primary}级"), xml_escape(levels))
-    _write_docx_xml(output_path, xml, others)
+    _write_docx_xml(output_path, xml, others, source=output_path)
     logger.info("合并专家评审意见表已生成：%s", output_path)
@@ -0,0 +1,284 @@
+# UTF-8
+"""单位、系统、知识库文档的 SQLite FTS5 全文检索索引。
+
+中文按字做 unigram + bigram 切分后写入 unicode61 分词的 FTS5 表，
+查询时连续汉字转成 bigram 短语匹配，英文数字按前缀匹配。
+索引随 ORM flush 同步（after_flush 事件），不依赖 SQLite 触发器。
+"""
+import logging
+import re
+import weakref
+from typing import Any, Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "search_index"
+SEARCH_ENTITY_TYPES = ("organization", "system", "knowledge")
+
+_TOKEN_RE = re.compile(r"([㐀-䶿一-鿿豈-﫿]+)|([0-9A-Za-z]+)")
+
+# 表名 -> (实体类型, rowid 类型码, 标题字段, 正文字段)；rowid = id * 4 + 类型码，便于按主键增删。
+_INDEX_SPECS: dict[str, tuple[str, int, str, tuple[str, ...]]] = {
+    "organizations": (
+        "organization",
+        1,
+        "name",
+        ("credit_code", "legal_representative", "industry", "filing_region", "address"),
+    ),
+    "systems": (
+        "system",
+        2,
+        "system_name",
+        ("system_code", "system_type", "deployment_mode", "business_description"),
+    ),
+    "knowledge_documents": (
+        "knowledge",
+        3,
+        "title",
+        ("keywords", "doc_type", "city", "district"),
+    ),
+}
+_TYPE_CODES = {spec[0]: spec[1] for spec in _INDEX_SPECS.values()}
+_CODE_TYPES = {code: entity_type for entity_type, code in _TYPE_CODES.items()}
+
+_READY_ENGINES: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def segment_text(value: Any) -> str:
+    """把文本切成 FTS5 可索引的词序列：汉字串输出 bigram 再输出单字，英文数字小写原样输出。"""
+    parts: list[str] = []
+    for cjk, word in _TOKEN_RE.findall(str(value or "")):
+        if word:
+            parts.append(word.lower())
+            continue
+        if len(cjk) > 1:
+            parts.extend(cjk[i : i + 2] for i in range(len(cjk) - 1))
+        parts.extend(cjk)
+    return " ".join(parts)
+
+
+def build_match_query(keyword: str) -> str:
+    """关键字转 FTS5 MATCH 表达式；各片段之间为 AND。"""
+    terms: list[str] = []
+    for cjk, word in _TOKEN_RE.findall(str(keyword or "")):
+        if word:
+            terms.append(f'"{word.lower()}"*')
+        elif len(cjk) == 1:
+            terms.append(f'"{cjk}"')
+        else:
+            terms.append('"' + " ".join(cjk[i : i + 2] for i in range(len(cjk) - 1)) + '"')
+    return " ".join(terms)
+
+
+def _is_indexable(table: str, get: Callable[[str], Any]) -> bool:
+    if table == "knowledge_documents":
+        return (get("status") or "") == "enabled"
+    return get("deleted_at") is None
+
+
+def _document(table: str, get: Callable[[str], Any]) -> tuple[str, str] | None:
+    _, _, title_field, body_fields = _INDEX_SPECS[table]
+    if not _is_indexable(table, get):
+        return None
+    title = segment_text(get(title_field))
+    body = segment_text(" ".join(str(get(f) or "") for f in body_fields))
+    return title, body
+
+
+def _write_entry(conn: Connection, table: str, entity_id: int, doc: tuple[str, str] | None) -> None:
+    rowid = int(entity_id) * 4 + _INDEX_SPECS[table][1]
+    conn.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"), {"rowid": rowid})
+    if doc is not None:
+        conn.execute(
+            text(f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) VALUES (:rowid, :title, :body)"),
+            {"rowid": rowid, "title": doc[0], "body": doc[1]},
+        )
+
+
+def rebuild_search_index(conn: Connection) -> int:
+    """清空并按业务表全量重建索引，返回写入条数。"""
+    conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    total = 0
+    for table, (_, code, title_field, body_fields) in _INDEX_SPECS.items():
+        extra = "status" if table == "knowledge_documents" else "deleted_at"
+        columns = ", ".join(("id", title_field, *body_fields, extra))
+        batch: list[dict[str, Any]] = []
+        for row in conn.execute(text(f"SELECT {columns} FROM {table}")).mappings():
+            doc = _document(table, row.get)
+            if doc is None:
+                continue
+            batch.append({"rowid": int(row["id"]) * 4 + code, "title": doc[0], "body": doc[1]})
+            if len(batch) >= 1000:
+                conn.execute(text(f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) VALUES (:rowid, :title, :body)"), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            conn.execute(text(f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) VALUES (:rowid, :title, :body)"), batch)
+            total += len(batch)
+    return total
+
+
+def ensure_search_index(engine: Engine, rebuild: bool = False) -> bool:
+    """建表（首次建表时全量灌入）；非 SQLite 或未编译 FTS5 时返回 False，检索回退为子串匹配。"""
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": SEARCH_TABLE},
+            ).first()
+            if not exists:
+                conn.execute(
+                    text(f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(title, body, tokenize = 'unicode61')")
+                )
+            if rebuild or not exists:
+                count = rebuild_search_index(conn)
+                logger.info("全文检索索引已重建，共 %s 条。", count)
+    except OperationalError:
+        logger.warning("当前 SQLite 不支持 FTS5，全文检索回退为子串匹配。", exc_info=True)
+        _READY_ENGINES.discard(engine)
+        return False
+    _READY_ENGINES.add(engine)
+    return True
+
+
+def search_index_ready(bind: Any) -> bool:
+    return isinstance(bind, Engine) and bind in _READY_ENGINES
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_index_after_flush(session: Session, _flush_context: Any) -> None:
+    try:
+        bind = session.get_bind()
+    except Exception:
+        return
+    if not search_index_ready(bind):
+        return
+    changes: list[tuple[str, Any, bool]] = []
+    for obj in list(session.new) + list(session.dirty):
+        table = getattr(obj, "__tablename__", None)
+        if table in _INDEX_SPECS:
+            changes.append((table, obj, False))
+    for obj in session.deleted:
+        table = getattr(obj, "__tablename__", None)
+        if table in _INDEX_SPECS:
+            changes.append((table, obj, True))
+    if not changes:
+        return
+    conn = session.connection()
+    for table, obj, deleted in changes:
+        if obj.id is None:
+            continue
+        doc = None if deleted else _document(table, lambda name, o=obj: getattr(o, name, None))
+        _write_entry(conn, table, obj.id, doc)
+
+
+def index_inserted_rows(session: Session, table: str, objects: list[Any]) -> None:
+    """批量 INSERT 不触发 flush 事件，由调用方在写入后补登索引。"""
+    try:
+        bind = session.get_bind()
+    except Exception:
+        return
+    if not objects or not search_index_ready(bind):
+        return
+    code = _INDEX_SPECS[table][1]
+    batch = []
+    for obj in objects:
+        doc = _document(table, lambda name, o=obj: getattr(o, name, None))
+        if doc is not None:
+            batch.append({"rowid": int(obj.id) * 4 + code, "title": doc[0], "body": doc[1]})
+    if batch:
+        conn = session.connection()
+        # 走 ORM flush 写入时 after_flush 已登记过，先删后插保持幂等
+        conn.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"), [{"rowid": row["rowid"]} for row in batch])
+        conn.execute(text(f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) VALUES (:rowid, :title, :body)"), batch)
+
+
+def _hydrate(conn: Connection, entity_type: str, ids: list[int]) -> dict[int, dict[str, Any]]:
+    if not ids:
+        return {}
+    params = {f"id{i}": value for i, value in enumerate(ids)}
+    placeholders = ", ".join(f":{key}" for key in params)
+    if entity_type == "organization":
+        sql = (
+            "SELECT id, name AS title, credit_code AS subtitle, filing_region AS extra "
+            f"FROM organizations WHERE id IN ({placeholders}) AND deleted_at IS NULL"
+        )
+    elif entity_type == "system":
+        sql = (
+            "SELECT s.id, s.system_name AS title, s.system_code AS subtitle, o.name AS extra, "
+            "s.organization_id AS organization_id FROM systems s "
+            "LEFT JOIN organizations o ON o.id = s.organization_id "
+            f"WHERE s.id IN ({placeholders}) AND s.deleted_at IS NULL"
+        )
+    else:
+        sql = (
+            "SELECT id, title, doc_type AS subtitle, city AS extra "
+            f"FROM knowledge_documents WHERE id IN ({placeholders}) AND status = 'enabled'"
+        )
+    return {int(row["id"]): dict(row) for row in conn.execute(text(sql), params).mappings()}
+
+
+def _fallback_hits(conn: Connection, keyword: str, entity_types: set[str], limit: int) -> list[tuple[str, int, float]]:
+    hits: list[tuple[str, int, float]] = []
+    for table, (entity_type, _, title_field, _) in _INDEX_SPECS.items():
+        if entity_type not in entity_types:
+            continue
+        where = "status = 'enabled'" if table == "knowledge_documents" else "deleted_at IS NULL"
+        rows = conn.execute(
+            text(f"SELECT id FROM {table} WHERE {where} AND instr({title_field}, :kw) > 0 ORDER BY id DESC LIMIT :limit"),
+            {"kw": keyword, "limit": limit},
+        )
+        hits.extend((entity_type, int(row[0]), 0.0) for row in rows)
+    return hits[:limit]
+
+
+def search_entities(db: Session, keyword: str, entity_types: set[str], limit: int = 20) -> list[dict[str, Any]]:
+    """跨实体检索，按 bm25 相关度（标题权重高于正文）排序返回。"""
+    keyword = str(keyword or "").strip()
+    if not keyword or not entity_types:
+        return []
+    conn = db.connection()
+    if search_index_ready(db.get_bind()):
+        match = build_match_query(keyword)
+        if not match:
+            return []
+        codes = sorted(_TYPE_CODES[t] for t in entity_types)
+        rows = conn.execute(
+            text(
+                f"SELECT rowid, bm25({SEARCH_TABLE}, 10.0, 1.0) AS rank FROM {SEARCH_TABLE} "
+                f"WHERE {SEARCH_TABLE} MATCH :match AND (rowid % 4) IN ({', '.join(str(c) for c in codes)}) "
+                "ORDER BY rank LIMIT :limit"
+            ),
+            {"match": match, "limit": limit},
+        ).all()
+        hits = [(_CODE_TYPES[int(rowid) % 4], int(rowid) // 4, -float(rank)) for rowid, rank in rows]
+    else:
+        hits = _fallback_hits(conn, keyword, entity_types, limit)
+
+    details: dict[str, dict[int, dict[str, Any]]] = {}
+    for entity_type in entity_types:
+        details[entity_type] = _hydrate(conn, entity_type, [i for t, i, _ in hits if t == entity_type])
+    items: list[dict[str, Any]] = []
+    for entity_type, entity_id, score in hits:
+        row = details[entity_type].get(entity_id)
+        if not row:
+            continue
+        item = {
+            "entity_type": entity_type,
+            "id": entity_id,
+            "title": row["title"],
+            "subtitle": row["subtitle"],
+            "extra": row["extra"],
+            "score": round(score, 4),
+        }
+        if entity_type == "system":
+            item["organization_id"] = row["organization_id"]
+        items.append(item)
+    return items
@@ -0,0 +1,23 @@
+# UTF-8
+"""引用计数表的"插入或累加"。
+
+同一主键已存在时把计数列加上本次的值；SQLite/PostgreSQL 用 ON CONFLICT，
+MySQL/MariaDB 用 ON DUPLICATE KEY UPDATE。
+"""
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+def upsert_add_counter(db: Session, table: str, key: str, counter: str, rows: list[dict[str, Any]]) -> None:
+    """rows 为列名到值的字典（列相同）；key 冲突时 counter += 本行的 counter 值。"""
+    if not rows:
+        return
+    columns = list(rows[0])
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(f':{c}' for c in columns)})"
+    if db.get_bind().dialect.name in {"mysql", "mariadb"}:
+        sql = f"{insert} ON DUPLICATE KEY UPDATE {counter} = {counter} + VALUES({counter})"
+    else:
+        sql = f"{insert} ON CONFLICT({key}) DO UPDATE SET {counter} = {table}.{counter} + excluded.{counter}"
+    db.execute(text(sql), rows)
@@ -0,0 +1,146 @@
+# UTF-8
+"""表格导出的流式写出：XLSX（仅含单个工作表、内联字符串）与 CSV。
+
+行数据来自迭代器，每累积 flush_rows 行就把已压缩的字节交给调用方，
+内存占用与总行数无关。
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator
+from xml.sax.saxutils import escape as xml_escape
+
+# XML 1.0 不允许的控制字符，写入前剔除
+_ILLEGAL_XML_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+class ZipChunkSink:
+    """只写流：ZipFile 写入的字节先暂存，由生成器分段取走后推给客户端。"""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        return None
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell_text(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _cell_xml(ref: str, value: Any) -> str:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = xml_escape(_ILLEGAL_XML_RE.sub("", _cell_text(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row_xml(row_no: int, values: Iterable[Any], letters: list[str]) -> str:
+    cells = []
+    for col, value in enumerate(values):
+        while col >= len(letters):
+            letters.append(_column_letter(len(letters)))
+        cells.append(_cell_xml(f"{letters[col]}{row_no}", value))
+    return f'<row r="{row_no}">{"".join(cells)}</row>'
+
+
+def iter_xlsx(
+    sheet_title: str, headers: list[str], rows: Iterable[Iterable[Any]], flush_rows: int = 500
+) -> Iterator[bytes]:
+    sink = ZipChunkSink()
+    letters: list[str] = []
+    workbook_xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{xml_escape(sheet_title[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    )
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            zf.writestr(name, content)
+        zf.writestr("xl/workbook.xml", workbook_xml)
+        with zf.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            buffer = [_SHEET_HEAD, _row_xml(1, headers, letters)]
+            for row_no, values in enumerate(rows, start=2):
+                buffer.append(_row_xml(row_no, values, letters))
+                if len(buffer) >= flush_rows:
+                    sheet.write("".join(buffer).encode("utf-8"))
+                    buffer.clear()
+                    yield sink.drain()
+            buffer.append(_SHEET_TAIL)
+            sheet.write("".join(buffer).encode("utf-8"))
+    yield sink.drain()
+
+
+def iter_csv(headers: list[str], rows: Iterable[Iterable[Any]], flush_rows: int = 500) -> Iterator[bytes]:
+    """UTF-8 带 BOM，Excel 直接打开不乱码。"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    for count, values in enumerate(rows, start=1):
+        writer.writerow(["" if value is None else _cell_text(value) for value in values])
+        if count % flush_rows == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
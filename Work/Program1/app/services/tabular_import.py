@@ -0,0 +1,55 @@
+# UTF-8
+"""Excel 导入的流式读取与逐行错误报告。
+
+工作表以只读模式逐行解析，按 chunk_rows 分批交给调用方校验、批量写入，
+内存占用与总行数无关。
+"""
+import io
+from typing import Any, Iterator
+
+from openpyxl import load_workbook
+
+SheetChunk = list[tuple[int, tuple[Any, ...]]]
+
+
+def iter_sheet_chunks(content: bytes, chunk_rows: int, min_row: int = 2) -> Iterator[tuple[SheetChunk, float]]:
+    """逐批产出 [(行号, 单元格值)] 及已读比例（0~1，用于上报进度）。"""
+    wb = load_workbook(io.BytesIO(content), read_only=True)
+    try:
+        ws = wb.active
+        total = max(1, ws.max_row or 1)
+        chunk: SheetChunk = []
+        for row_no, values in enumerate(ws.iter_rows(min_row=min_row, values_only=True), start=min_row):
+            chunk.append((row_no, values))
+            if len(chunk) >= chunk_rows:
+                yield chunk, min(1.0, row_no / total)
+                chunk = []
+        if chunk:
+            yield chunk, 1.0
+    finally:
+        wb.close()
+
+
+def describe_row_error(exc: BaseException) -> str:
+    return str(getattr(exc, "detail", "") or exc or exc.__class__.__name__)
+
+
+class ImportReport:
+    """汇总导入结果：成功行数与逐行错误（行号 + 原因）。"""
+
+    def __init__(self) -> None:
+        self.imported = 0
+        self.errors: list[dict[str, Any]] = []
+
+    def fail(self, row_no: int, error: BaseException | str) -> None:
+        message = error if isinstance(error, str) else describe_row_error(error)
+        self.errors.append({"row": row_no, "message": message})
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "message": "导入完成",
+            "imported": self.imported,
+            "failed": len(self.errors),
+            "skipped": [f"第{item['row']}行：{item['message']}" for item in self.errors],
+            "errors": self.errors,
+        }
@@ -1762,7 +1762,7 @@
     if (!$('workspaceList')) return;
     state.includeArchived = Boolean($('workspaceIncludeArchived')?.checked);
     const keyword = getValue('workspaceKeyword');
-    const params = new URLSearchParams();
+    const params = new URLSearchParams({ view: 'summary' });
     if (keyword) params.set('keyword', keyword);
     if (state.includeArchived) params.set('include_archived', 'true');
     const res = await fetch(`/api/filing-workspace/overview?${params.toString()}`, { headers: authHeaders() });
@@ -2103,10 +2103,11 @@
     const res = await fetch(`/api/filing-workspace/systems/${state.currentSystemId}/import-excel/apply`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json', ...authHeaders() },
-      body: JSON.stringify({
-        candidate: previewData.candidate || {},
-        override_keys: Array.isArray(overrideKeys) ? overrideKeys : [],
-      }),
+      body: JSON.stringify(
+        previewData.preview_token
+          ? { preview_token: previewData.preview_token, override_keys: Array.isArray(overrideKeys) ? overrideKeys : [] }
+          : { candidate: previewData.candidate || {}, override_keys: Array.isArray(overrideKeys) ? overrideKeys : [] },
+      ),
     });
     const data = await res.json().catch(() => ({}));
     if (!res.ok) {
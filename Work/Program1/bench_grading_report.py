@@ -0,0 +1,155 @@
+"""定级报告 document.xml 改写基准：逐遍替换（旧实现） vs 一次索引改写（现实现）。
+
+用法：python bench_grading_report.py [模板路径] [轮数]
+未指定模板时优先使用 template_docs/02-*.docx，不存在则生成一份同结构的合成文档。
+"""
+import re
+import sys
+import time
+from pathlib import Path
+from xml.sax.saxutils import escape as xml_escape
+
+# 添加 app 目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.reporting import (
+    GRADING_PARAGRAPH_MAP,
+    SAMPLE_GRADING_DATE_LINE,
+    SAMPLE_ORG_NAME,
+    SAMPLE_SYSTEM_NAME,
+    _make_drawing_paragraph,
+    _read_docx_xml,
+    _render_grading_report_xml,
+    _replace_paragraph_starts_with,
+    _shade_matrix_table,
+    _xml_replace,
+)
+
+
+def legacy_find_top_level_tables(xml):
+    result = []
+    idx = 0
+    while True:
+        found = re.search(r"<w:tbl[\s>]", xml[idx:])
+        if not found:
+            break
+        start = idx + found.start()
+        depth, scan, end = 1, start + len("<w:tbl"), -1
+        while depth > 0:
+            next_open = xml.find("<w:tbl", scan)
+            next_close = xml.find("</w:tbl>", scan)
+            if next_close == -1:
+                return result
+            if next_open != -1 and next_open < next_close:
+                if xml[next_open + 6:next_open + 7] in (" ", ">", "\n", "\t", "\r"):
+                    depth += 1
+                scan = next_open + 6
+                continue
+            depth -= 1
+            end = next_close + len("</w:tbl>")
+            scan = end
+        result.append((start, end))
+        idx = end
+    return result
+
+
+def legacy_render(xml, org_name, sys_name, cn, content, business, service, topology_xml):
+    """改造前 export_grading_report_docx 的逐遍改写流程。"""
+    xml = _xml_replace(xml, {SAMPLE_ORG_NAME: org_name, SAMPLE_SYSTEM_NAME: sys_name})
+    for key, prefix in GRADING_PARAGRAPH_MAP.items():
+        new_text = str(content.get(key, "") or "").strip()
+        if new_text:
+            xml = _replace_paragraph_starts_with(xml, prefix, new_text)
+    xml = _replace_paragraph_starts_with(xml, SAMPLE_GRADING_DATE_LINE, content["fill_date"])
+    label = f"第{cn}级"
+    xml = _xml_replace(xml, {
+        "业务信息安全保护等级为第三级": f"业务信息安全保护等级为{label}",
+        "系统服务安全保护等级为第三级": f"系统服务安全保护等级为{label}",
+        "网络安全保护等级为第三级": f"网络安全保护等级为{label}",
+    })
+    if cn != "三":
+        positions = [m.start() for m in re.finditer("第三级", xml)]
+        for pos in reversed(positions[-3:]):
+            xml = xml[:pos] + label + xml[pos + 3:]
+    for n, matrix in enumerate((business, service)):
+        tables = legacy_find_top_level_tables(xml)
+        if matrix and len(tables) >= 2:
+            start, end = tables[n]
+            xml = xml[:start] + _shade_matrix_table(xml[start:end], matrix) + xml[end:]
+    anchor_pos = xml.find(xml_escape("（二）定级对象构成"))
+    if topology_xml and anchor_pos != -1:
+        insert_at = xml.find("</w:p>", anchor_pos) + len("</w:p>")
+        xml = xml[:insert_at] + topology_xml + xml[insert_at:]
+    return xml
+
+
+def _para(text, runs=3):
+    step = max(1, len(text) // runs)
+    parts = [text[i:i + step] for i in range(0, len(text), step)]
+    body = "".join(
+        f'<w:r><w:rPr><w:rFonts w:hint="eastAsia"/><w:sz w:val="24"/></w:rPr><w:t>{xml_escape(p)}</w:t></w:r>'
+        for p in parts
+    )
+    return f'<w:p w:rsidR="00A1"><w:pPr><w:ind w:firstLine="480"/></w:pPr>{body}</w:p>'
+
+
+def _table(rows, cols, text="第三级"):
+    cell = f"<w:tc><w:tcPr><w:tcW w:w=\"1000\"/></w:tcPr>{_para(text, 1)}</w:tc>"
+    return "<w:tbl><w:tblPr/>" + "".join(f"<w:tr>{cell * cols}</w:tr>" for _ in range(rows)) + "</w:tbl>"
+
+
+def synthetic_document_xml(filler_paragraphs=2000):
+    """按 02 模板结构生成：样例段落、两张 5x4 矩阵、汇总表、大量正文段落。"""
+    body = [_para(f"{SAMPLE_ORG_NAME}{SAMPLE_SYSTEM_NAME}（二）定级对象构成", 2)]
+    body += [_para(prefix + "样例正文。" * 20) for prefix in GRADING_PARAGRAPH_MAP.values()]
+    body.append(_table(5, 4, "一般损害"))
+    body += [_para(f"第{i}段正文：{SAMPLE_SYSTEM_NAME}的业务信息说明。" * 4) for i in range(filler_paragraphs // 2)]
+    body.append(_table(5, 4, "严重损害"))
+    body += [_para(f"第{i}段正文：系统服务说明，业务信息安全保护等级为第三级。") for i in range(filler_paragraphs // 2)]
+    body.append(_table(3, 4))
+    body.append(_para(SAMPLE_GRADING_DATE_LINE, 4))
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        + "".join(body) + "<w:sectPr/></w:body></w:document>"
+    )
+
+
+def main():
+    args = sys.argv[1:]
+    rounds = int(args[1]) if len(args) > 1 else 20
+    template = Path(args[0]) if args else next(Path("template_docs").glob("02-*.docx"), None)
+    if template and template.exists():
+        xml, _others = _read_docx_xml(template)
+        source = str(template)
+    else:
+        xml = synthetic_document_xml()
+        source = "合成文档"
+    content = {key: f"{key} 的填写内容" for key in GRADING_PARAGRAPH_MAP}
+    content["fill_date"] = "2026年 3 月 1 日"
+    kwargs = dict(
+        org_name="测试单位",
+        sys_name="测试系统",
+        cn="二",
+        content=content,
+        business_matrix=[[0, 1, 0], [0, 1, 0], [0, 0, 0]],
+        service_matrix=[[1, 0, 0], [0, 0, 0], [0, 0, 1]],
+        topology_xml=_make_drawing_paragraph("rIdTopology", "topology.png"),
+    )
+    legacy_args = [kwargs[k] for k in ("org_name", "sys_name", "cn", "content", "business_matrix", "service_matrix", "topology_xml")]
+
+    old = legacy_render(xml, *legacy_args)
+    new = _render_grading_report_xml(xml, **kwargs)
+    print(f"来源：{source}，document.xml {len(xml) / 1024:.0f} KB，输出一致：{old == new}")
+
+    for name, func in (("逐遍替换", lambda: legacy_render(xml, *legacy_args)),
+                       ("一次索引", lambda: _render_grading_report_xml(xml, **kwargs))):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        print(f"{name}：{(time.perf_counter() - started) / rounds * 1000:.2f} ms/次")
+    return 0 if old == new else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
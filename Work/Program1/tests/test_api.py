@@ -1,18 +1,22 @@
 ﻿import asyncio
+import csv
 import importlib
 import hashlib
 import io
 import json
 import os
+import tempfile
+import threading
 import unittest
 import zipfile
 from datetime import datetime
 from pathlib import Path
+from types import SimpleNamespace
 
 from docx import Document
 import httpx
 from fastapi.testclient import TestClient as FastAPITestClient
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
 
 
 class CompatibleTestClient:
@@ -2562,8 +2566,8 @@ class ApiFlowTests(unittest.TestCase):
         wb.save(bio)
         bio.seek(0)
 
-        original_generate_code = self.__class__.main_module.generate_system_code
-        self.__class__.main_module.generate_system_code = lambda _db: 'DUP-SYSTEM-CODE-001'
+        original_generate_codes = self.__class__.main_module.generate_system_codes
+        self.__class__.main_module.generate_system_codes = lambda _db, count: ['DUP-SYSTEM-CODE-001'] * count
         try:
             resp = self.client.post(
                 '/api/systems/import/excel',
@@ -2571,7 +2575,7 @@ class ApiFlowTests(unittest.TestCase):
                 headers=self.admin_headers,
             )
         finally:
-            self.__class__.main_module.generate_system_code = original_generate_code
+            self.__class__.main_module.generate_system_codes = original_generate_codes
 
         self.assertEqual(resp.status_code, 200, resp.text)
         self.assertEqual(resp.json().get('imported'), 0)
@@ -3107,5 +3111,1716 @@ class ApiFlowTests(unittest.TestCase):
         self.assertIn('自动结案', item.get('review_comment') or '')
 
 
+    def test_58_auth_principal_cache_should_hit_and_invalidate_on_toggle_and_logout(self):
+        main_module = self.__class__.main_module
+        create_resp = self.client.post(
+            '/api/auth/users',
+            json={
+                'username': 'cache_admin_user',
+                'password': 'cacheAdmin123',
+                'role': 'admin',
+                'require_password_change': False,
+            },
+            headers=self.admin_headers,
+        )
+        self.assertEqual(create_resp.status_code, 200, create_resp.text)
+        user_id = create_resp.json()['data']['id']
+
+        def login():
+            resp = self.client.post('/api/auth/login', json={'username': 'cache_admin_user', 'password': 'cacheAdmin123'})
+            self.assertEqual(resp.status_code, 200, resp.text)
+            return resp.json()['token']
+
+        token = login()
+        headers = {'X-Auth-Token': token}
+        first = self.client.get('/api/auth/users', headers=headers)
+        self.assertEqual(first.status_code, 200, first.text)
+        cached = main_module.AUTH_PRINCIPAL_CACHE.get(token)
+        self.assertIsNotNone(cached)
+        self.assertEqual(cached['username'], 'cache_admin_user')
+
+        calls = {'db': 0}
+        original_query = main_module.Session.query
+
+        def counting_query(session, *entities, **kwargs):
+            if any(getattr(entity, 'class_', None) is main_module.AuthSession for entity in entities):
+                calls['db'] += 1
+            return original_query(session, *entities, **kwargs)
+
+        main_module.Session.query = counting_query
+        try:
+            second = self.client.get('/api/auth/users', headers=headers)
+        finally:
+            main_module.Session.query = original_query
+        self.assertEqual(second.status_code, 200, second.text)
+        self.assertEqual(calls['db'], 0)
+
+        disable_resp = self.client.post(f'/api/auth/users/{user_id}/toggle?enabled=false', headers=self.admin_headers)
+        self.assertEqual(disable_resp.status_code, 200, disable_resp.text)
+        self.assertNotIn(token, main_module.AUTH_PRINCIPAL_CACHE)
+        blocked = self.client.get('/api/auth/users', headers=headers)
+        self.assertEqual(blocked.status_code, 401, blocked.text)
+
+        enable_resp = self.client.post(f'/api/auth/users/{user_id}/toggle?enabled=true', headers=self.admin_headers)
+        self.assertEqual(enable_resp.status_code, 200, enable_resp.text)
+        token = login()
+        headers = {'X-Auth-Token': token}
+        self.assertEqual(self.client.get('/api/auth/users', headers=headers).status_code, 200)
+        self.assertIn(token, main_module.AUTH_PRINCIPAL_CACHE)
+        logout_resp = self.client.post('/api/auth/logout', headers=headers)
+        self.assertEqual(logout_resp.status_code, 200, logout_resp.text)
+        self.assertNotIn(token, main_module.AUTH_PRINCIPAL_CACHE)
+        after_logout = self.client.get('/api/auth/users', headers=headers)
+        self.assertEqual(after_logout.status_code, 401, after_logout.text)
+
+
+    def test_59_list_endpoints_should_support_keyset_cursor_projection_and_total_modes(self):
+        created_ids = []
+        for idx in range(3):
+            resp = self.client.post(
+                '/api/organizations',
+                json={
+                    'name': f'游标分页单位{idx}',
+                    'credit_code': f'91350100M000200K1{idx}',
+                    'legal_representative': '分页人',
+                    'address': '分页城',
+                    'mobile_phone': f'1310013120{idx}',
+                    'email': f'cursor{idx}@example.com',
+                    'industry': '企业',
+                    'organization_type': '企业',
+                    'filing_region': '分页城',
+                    'created_by': 'tester',
+                },
+                headers=self.admin_headers,
+            )
+            self.assertEqual(resp.status_code, 200, resp.text)
+            created_ids.append(resp.json()['data']['id'])
+
+        first = self.client.get('/api/organizations?name=游标分页单位&limit=2&fields=name', headers=self.admin_headers)
+        self.assertEqual(first.status_code, 200, first.text)
+        body = first.json()
+        self.assertEqual(body['total'], 3)
+        self.assertEqual(len(body['items']), 2)
+        self.assertEqual(set(body['items'][0].keys()), {'id', 'created_at', 'name'})
+        self.assertTrue(body['next_cursor'])
+
+        second = self.client.get(
+            f"/api/organizations?name=游标分页单位&limit=2&fields=name&cursor={body['next_cursor']}&total_mode=none",
+            headers=self.admin_headers,
+        )
+        self.assertEqual(second.status_code, 200, second.text)
+        self.assertIsNone(second.json()['total'])
+        self.assertIsNone(second.json()['next_cursor'])
+        paged_ids = [row['id'] for row in body['items'] + second.json()['items']]
+        self.assertEqual(paged_ids, sorted(created_ids, reverse=True))
+
+        approx = self.client.get('/api/organizations?name=游标分页单位&limit=1&total_mode=approx', headers=self.admin_headers)
+        self.assertEqual(approx.status_code, 200, approx.text)
+        self.assertEqual(approx.json()['total'], 3)
+
+        bad_field = self.client.get('/api/organizations?fields=password_hash', headers=self.admin_headers)
+        self.assertEqual(bad_field.status_code, 400, bad_field.text)
+        bad_cursor = self.client.get('/api/organizations?limit=2&cursor=not-a-cursor', headers=self.admin_headers)
+        self.assertEqual(bad_cursor.status_code, 400, bad_cursor.text)
+
+        systems = self.client.get('/api/systems?limit=1&fields=system_name,organization_name', headers=self.admin_headers)
+        self.assertEqual(systems.status_code, 200, systems.text)
+        for row in systems.json()['items']:
+            self.assertEqual(set(row.keys()), {'id', 'created_at', 'system_name', 'organization_name'})
+
+
+    def test_60_search_endpoint_should_use_fts_index_and_follow_soft_delete(self):
+        main_module = self.__class__.main_module
+        self.assertTrue(main_module.ensure_search_index(main_module.engine, rebuild=True))
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '晋阳全文检索测试单位',
+                'credit_code': '91350100M000300S01',
+                'legal_representative': '检索人',
+                'address': '晋阳城',
+                'mobile_phone': '13100131301',
+                'email': 'fts@example.com',
+                'industry': '企业',
+                'organization_type': '企业',
+                'filing_region': '晋阳',
+                'created_by': 'tester',
+            },
+            headers=self.admin_headers,
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+
+        for keyword in ('全文检索', '检', '91350100M0003'):
+            resp = self.client.get('/api/search', params={'q': keyword}, headers=self.admin_headers)
+            self.assertEqual(resp.status_code, 200, resp.text)
+            hits = [(row['entity_type'], row['id']) for row in resp.json()['items']]
+            self.assertIn(('organization', org_id), hits, keyword)
+
+        miss = self.client.get('/api/search', params={'q': '检索单位测试'}, headers=self.admin_headers)
+        self.assertNotIn(('organization', org_id), [(r['entity_type'], r['id']) for r in miss.json()['items']])
+        only_systems = self.client.get('/api/search', params={'q': '全文检索', 'types': 'system'}, headers=self.admin_headers)
+        self.assertEqual(only_systems.status_code, 200, only_systems.text)
+        self.assertTrue(all(row['entity_type'] == 'system' for row in only_systems.json()['items']))
+        bad_type = self.client.get('/api/search', params={'q': '全文检索', 'types': 'user'}, headers=self.admin_headers)
+        self.assertEqual(bad_type.status_code, 400, bad_type.text)
+
+        delete_resp = self.client.delete(f'/api/organizations/{org_id}', headers=self.admin_headers)
+        self.assertEqual(delete_resp.status_code, 200, delete_resp.text)
+        after = self.client.get('/api/search', params={'q': '全文检索'}, headers=self.admin_headers)
+        self.assertNotIn(('organization', org_id), [(r['entity_type'], r['id']) for r in after.json()['items']])
+
+
+    def test_61_dashboard_buckets_should_match_live_queries_and_refresh_incrementally(self):
+        main_module = self.__class__.main_module
+        main_module.ensure_dashboard_buckets(main_module.engine)
+
+        def summary(live: bool):
+            original_ready = main_module.dashboard_buckets_ready
+            if live:
+                main_module.dashboard_buckets_ready = lambda bind: False
+            try:
+                resp = self.client.get('/api/dashboard/summary', params={'city': '聚合城'}, headers=self.admin_headers)
+            finally:
+                main_module.dashboard_buckets_ready = original_ready
+            self.assertEqual(resp.status_code, 200, resp.text)
+            body = resp.json()
+            return (
+                body['totals'],
+                {row['name']: row['value'] for row in body['industry_distribution']},
+                {row['name']: row['value'] for row in body['level_distribution']},
+            )
+
+        self.assertEqual(summary(live=False)[0]['organization_count'], 0)
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '看板聚合单位',
+                'credit_code': '91350100M000400D01',
+                'legal_representative': '聚合人',
+                'address': '聚合城',
+                'mobile_phone': '13100131401',
+                'email': 'bucket@example.com',
+                'industry': '能源',
+                'organization_type': '企业',
+                'filing_region': '聚合城',
+                'created_by': 'tester',
+            },
+            headers=self.admin_headers,
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+        totals, industries, _ = summary(live=False)
+        self.assertEqual(totals['organization_count'], 1)
+        self.assertEqual(industries, {'能源': 1})
+
+        archive_resp = self.client.post(f'/api/organizations/{org_id}/archive', headers=self.admin_headers)
+        self.assertEqual(archive_resp.status_code, 200, archive_resp.text)
+        self.assertEqual(summary(live=False)[0]['archived_organization_count'], 1)
+        self.assertEqual(summary(live=False), summary(live=True))
+
+        trend = self.client.get('/api/dashboard/trend', params={'months': 1, 'city': '聚合城'}, headers=self.admin_headers)
+        self.assertEqual(trend.status_code, 200, trend.text)
+        self.assertEqual(trend.json()['trend'][-1]['organization_count'], 1)
+
+        rebuild = self.client.post('/api/dashboard/rebuild', headers=self.admin_headers)
+        self.assertEqual(rebuild.status_code, 200, rebuild.text)
+        self.assertEqual(rebuild.json()['data']['drift'], 0)
+
+
+    def test_62_filing_template_cache_should_reuse_compiled_template_and_resolve_merged_cells(self):
+        main_module = self.__class__.main_module
+        template_path = main_module.EXPORT_DIR / f'filing_template_cache_{datetime.now():%Y%m%d%H%M%S%f}.docx'
+        doc = Document()
+        for index in range(7):
+            table = doc.add_table(rows=4, cols=4)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f'T{index}R{r}C{c}'
+            table.cell(1, 1).merge(table.cell(1, 3))
+            table.cell(2, 0).merge(table.cell(3, 0))
+        main_module.EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        doc.save(template_path)
+        try:
+            compiled = main_module.compile_filing_template(template_path)
+            self.assertIs(main_module.compile_filing_template(template_path), compiled)
+
+            clone, cells = main_module.instantiate_filing_template(compiled)
+            for index in range(1, 7):
+                expected = [[cell.text for cell in row.cells] for row in clone.tables[index].rows]
+                self.assertEqual([[cell.text for cell in row] for row in cells[index]], expected)
+            cells[1][1][2].text = '已填写'
+            self.assertEqual(clone.tables[1].rows[1].cells[1].text, '已填写')
+            self.assertNotEqual(compiled['doc'].tables[1].rows[1].cells[1].text, '已填写')
+
+            stat = template_path.stat()
+            os.utime(template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.assertIsNot(main_module.compile_filing_template(template_path), compiled)
+        finally:
+            main_module.FILING_TEMPLATE_CACHE.pop(str(template_path.resolve()), None)
+            template_path.unlink(missing_ok=True)
+
+
+    def test_63_batch_word_export_should_stream_zip_with_failure_list(self):
+        main_module = self.__class__.main_module
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '批量导出单位',
+                'credit_code': '91350100M000500B01',
+                'legal_representative': '导出人',
+                'address': '导出城',
+                'mobile_phone': '13100131501',
+                'email': 'batch-export@example.com',
+                'industry': '企业',
+                'organization_type': '企业',
+                'filing_region': '导出城',
+                'created_by': 'tester',
+            },
+            headers=self.admin_headers,
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+        system_ids = []
+        for idx, name in enumerate(('批量导出系统甲', '批量导出系统乙')):
+            sys_resp = self.client.post(
+                '/api/systems',
+                json={
+                    'organization_id': org_id,
+                    'system_name': name,
+                    'system_code': f'BATCH-EXPORT-{idx}',
+                    'proposed_level': 2,
+                    'created_by': 'tester',
+                },
+                headers=self.admin_headers,
+            )
+            self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+            system_ids.append(sys_resp.json()['data']['id'])
+
+        def fake_render(template_path, org_data, system_data):
+            if system_data['system_name'].endswith('乙'):
+                raise main_module.HTTPException(status_code=500, detail='备案模板结构不完整。')
+            return f"{org_data['name']}|{system_data['system_name']}".encode('utf-8')
+
+        original_render = main_module.render_filing_form_bytes
+        original_resolve = main_module.resolve_filing_template_path
+        main_module.render_filing_form_bytes = fake_render
+        main_module.resolve_filing_template_path = lambda: Path('dummy.docx')
+        try:
+            resp = self.client.post(
+                '/api/systems/export/word-batch',
+                json={'organization_id': org_id},
+                headers=self.admin_headers,
+            )
+            missing = self.client.post(
+                '/api/systems/export/word-batch',
+                json={'system_ids': [system_ids[0], 99999999]},
+                headers=self.admin_headers,
+            )
+        finally:
+            main_module.render_filing_form_bytes = original_render
+            main_module.resolve_filing_template_path = original_resolve
+
+        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertEqual(resp.headers['content-type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+            names = zf.namelist()
+            self.assertIn('批量导出单位-批量导出系统甲-网络安全等级保护定级备案表.docx', names)
+            self.assertEqual(
+                zf.read('批量导出单位-批量导出系统甲-网络安全等级保护定级备案表.docx').decode('utf-8'),
+                '批量导出单位|批量导出系统甲',
+            )
+            self.assertIn('备案模板结构不完整', zf.read('导出失败清单.txt').decode('utf-8'))
+        self.assertEqual(missing.status_code, 404, missing.text)
+        empty = self.client.post('/api/systems/export/word-batch', json={}, headers=self.admin_headers)
+        self.assertEqual(empty.status_code, 400, empty.text)
+
+    def test_64_attachment_upload_should_stream_to_disk_with_hash_and_size_limit(self):
+        main_module = self.__class__.main_module
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '流式上传单位',
+                'credit_code': '91350100M000640B01',
+                'legal_representative': '上传人',
+                'address': '上传城',
+                'mobile_phone': '13100131641',
+                'email': 'stream-upload@example.com',
+                'industry': '企业',
+                'organization_type': '企业',
+                'filing_region': '上传城',
+                'created_by': 'tester',
+            },
+            headers=self.admin_headers,
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+        payload = b'%PDF-1.4 ' + b'x' * 5000
+        target_dir = main_module.BLOB_DIR
+
+        original_limit = main_module.MAX_ORG_ATTACHMENT
+        original_chunk = main_module.UPLOAD_CHUNK_SIZE
+        main_module.MAX_ORG_ATTACHMENT = 4096
+        main_module.UPLOAD_CHUNK_SIZE = 1024
+        try:
+            too_large = self.client.post(
+                f'/api/attachments/organization/{org_id}',
+                files={'file': ('big.pdf', payload, 'application/pdf')},
+                headers=self.admin_headers,
+            )
+            batch = self.client.post(
+                f'/api/attachments/organization/{org_id}/batch',
+                files=[
+                    ('files', ('big.pdf', payload, 'application/pdf')),
+                    ('files', ('small.pdf', payload[:2000], 'application/pdf')),
+                ],
+                headers=self.admin_headers,
+            )
+            with self.assertRaises(main_module.HTTPException):
+                main_module._stage_upload_stream(io.BytesIO(payload), target_dir, 4096, '文件过大。')
+        finally:
+            main_module.MAX_ORG_ATTACHMENT = original_limit
+            main_module.UPLOAD_CHUNK_SIZE = original_chunk
+
+        self.assertEqual(too_large.status_code, 400, too_large.text)
+        self.assertIn('文件大小超过限制', too_large.json()['detail'])
+        self.assertEqual(batch.status_code, 200, batch.text)
+        self.assertEqual(batch.json()['uploaded'], 1)
+        self.assertIn('big.pdf: 文件大小超过限制', batch.json()['skipped'][0])
+        self.assertEqual(list(target_dir.glob('*.part')), [])
+
+        db = main_module.SessionLocal()
+        try:
+            row = db.query(main_module.Attachment).filter(main_module.Attachment.entity_id == org_id).one()
+            self.assertEqual(row.file_size, 2000)
+            self.assertEqual(row.sha256, hashlib.sha256(payload[:2000]).hexdigest())
+            self.assertEqual(Path(row.file_path).read_bytes(), payload[:2000])
+        finally:
+            db.close()
+
+    def test_65_attachments_should_share_content_addressed_blobs_with_ref_counting(self):
+        main_module = self.__class__.main_module
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '去重附件单位',
+                'credit_code': '91350100M000650B01',
+                'legal_representative': '去重人',
+                'address': '去重城',
+                'mobile_phone': '13100131651',
+                'email': 'blob-dedup@example.com',
+                'industry': '企业',
+                'organization_type': '企业',
+                'filing_region': '去重城',
+                'created_by': 'tester',
+            },
+            headers=self.admin_headers,
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+        sys_resp = self.client.post(
+            '/api/systems',
+            json={
+                'organization_id': org_id,
+                'system_name': '去重附件系统',
+                'system_code': 'BLOB-DEDUP-1',
+                'proposed_level': 2,
+                'created_by': 'tester',
+            },
+            headers=self.admin_headers,
+        )
+        self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+        system_id = sys_resp.json()['data']['id']
+        payload = b'%PDF-1.4 licence ' + os.urandom(256)
+        sha256 = hashlib.sha256(payload).hexdigest()
+
+        org_upload = self.client.post(
+            f'/api/attachments/organization/{org_id}',
+            files={'file': ('licence.pdf', payload, 'application/pdf')},
+            headers=self.admin_headers,
+        )
+        slot_upload = self.client.post(
+            f'/api/filing-workspace/systems/{system_id}/attachments/table4.topology',
+            files={'file': ('topology.pdf', payload, 'application/pdf')},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(org_upload.status_code, 200, org_upload.text)
+        self.assertEqual(slot_upload.status_code, 200, slot_upload.text)
+        copy_resp = self.client.post(f'/api/systems/{system_id}/copy', headers=self.admin_headers)
+        self.assertEqual(copy_resp.status_code, 200, copy_resp.text)
+        copied_id = copy_resp.json()['data']['id']
+
+        def blob_state():
+            db = main_module.SessionLocal()
+            try:
+                rows = db.query(main_module.Attachment).filter(main_module.Attachment.sha256 == sha256).all()
+                ref_count = db.execute(
+                    main_module.text('SELECT ref_count FROM file_blobs WHERE sha256 = :sha256'),
+                    {'sha256': sha256},
+                ).scalar()
+                return rows, (ref_count or 0)
+            finally:
+                db.close()
+
+        rows, ref_count = blob_state()
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len({row.file_path for row in rows}), 1)
+        self.assertEqual(ref_count, 3)
+        blob_file = Path(rows[0].file_path)
+        self.assertTrue(blob_file.is_relative_to(main_module.BLOB_DIR))
+        copied_slots = copy_resp.json()['data']['filing_detail']['_attachment_slots']
+        copied_row = next(row for row in rows if row.entity_type == 'system' and row.entity_id == copied_id)
+        self.assertEqual(copied_slots['table4.topology']['attachment_ids'], [copied_row.id])
+
+        for row in rows[:2]:
+            resp = self.client.delete(f'/api/attachments/{row.id}', headers=self.admin_headers)
+            self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertTrue(blob_file.exists())
+        self.assertEqual(blob_state()[1], 1)
+        # 提交后删除前会复查：仍有引用登记的文件不删
+        db = main_module.SessionLocal()
+        try:
+            db.info['blob_store_pending_unlink'] = {str(blob_file)}
+            db.commit()
+        finally:
+            db.close()
+        self.assertTrue(blob_file.exists())
+        resp = self.client.delete(f'/api/attachments/{rows[2].id}', headers=self.admin_headers)
+        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertFalse(blob_file.exists())
+        self.assertEqual(blob_state(), ([], 0))
+
+    def test_66_incremental_backup_should_store_only_new_content_and_restore_full_snapshot(self):
+        main_module = self.__class__.main_module
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            uploads = root / 'uploads'
+            backups = root / 'backups'
+            backups.mkdir()
+            db_snapshot = root / 'app.db'
+            db_snapshot.write_bytes(b'sqlite snapshot')
+            png = b'\x89PNG\r\n\x1a\n' + os.urandom(2048)
+            (uploads / 'attachments').mkdir(parents=True)
+            (uploads / 'attachments' / 'a.png').write_bytes(png)
+            (uploads / 'attachments' / 'a-copy.png').write_bytes(png)
+            (uploads / 'knowledge').mkdir()
+            (uploads / 'knowledge' / 'note.txt').write_bytes(b'note ' * 500)
+            (uploads / 'knowledge' / '.pending.part').write_bytes(b'partial')
+
+            full_path = backups / 'backup_1.zip'
+            self.assertIsNone(main_module.pick_backup_base(backups, 7))
+            full = main_module.write_backup(full_path, db_snapshot, uploads, {'trigger': 'manual'}, None)
+            self.assertEqual(full['kind'], 'full')
+            self.assertEqual(len(full['files']), 3)
+            self.assertEqual(len(full['objects']), 2)
+            with zipfile.ZipFile(full_path) as zf:
+                png_info = zf.getinfo(f"objects/{hashlib.sha256(png).hexdigest()}")
+                self.assertEqual(png_info.compress_type, zipfile.ZIP_STORED)
+
+            (uploads / 'attachments' / 'b.pdf').write_bytes(b'%PDF-1.4 new')
+            (uploads / 'knowledge' / 'note.txt').unlink()
+            base = main_module.pick_backup_base(backups, 7)
+            self.assertEqual(base, full_path)
+            inc_path = backups / 'backup_2.zip'
+            inc = main_module.write_backup(inc_path, db_snapshot, uploads, {'trigger': 'manual'}, base)
+            self.assertEqual((inc['kind'], inc['base'], inc['chain_depth']), ('incremental', 'backup_1.zip', 1))
+            self.assertEqual(inc['objects'], [hashlib.sha256(b'%PDF-1.4 new').hexdigest()])
+            self.assertEqual(main_module.pick_backup_base(backups, 2), None)
+
+            chain = [inc_path, *main_module.resolve_base_chain(inc, backups)]
+            restored = root / 'restored'
+            self.assertEqual(main_module.materialize_uploads(chain, restored), 3)
+            self.assertEqual((restored / 'uploads' / 'attachments' / 'a-copy.png').read_bytes(), png)
+            self.assertEqual((restored / 'uploads' / 'attachments' / 'b.pdf').read_bytes(), b'%PDF-1.4 new')
+            self.assertFalse((restored / 'uploads' / 'knowledge' / 'note.txt').exists())
+
+            standalone = root / 'standalone.zip'
+            main_module.consolidate_backup(chain, standalone)
+            self.assertEqual(main_module.read_manifest(standalone)['base'], None)
+            self.assertEqual(main_module.materialize_uploads([standalone], root / 'standalone'), 3)
+
+            full_path.unlink()
+            with self.assertRaises(main_module.BackupChainError):
+                main_module.resolve_base_chain(inc, backups)
+
+
+    def test_67_async_jobs_report_progress_results_and_cancellation(self):
+        main_module = self.__class__.main_module
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['name', 'credit_code', 'legal_representative', 'address', 'office_phone', 'mobile_phone', 'email', 'industry', 'organization_type', 'filing_region'])
+        ws.append(['异步导入单位', '91350100M000100Y67', '张三', 'A市', '', '13100131067', 'a67@example.com', '教育', '事业单位', 'A市'])
+        bio = io.BytesIO()
+        wb.save(bio)
+        resp = self.client.post(
+            '/api/organizations/import/excel?async=true',
+            files={'file': ('orgs.xlsx', bio.getvalue(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(resp.status_code, 200, resp.text)
+        job_id = resp.json()['job_id']
+        self.assertTrue(main_module.JOB_QUEUE.wait(job_id, timeout=30))
+        status = self.client.get(f'/api/jobs/{job_id}', headers=self.admin_headers).json()
+        self.assertEqual((status['status'], status['progress'], status['kind']), ('succeeded', 1.0, 'organization_import'))
+        self.assertEqual(status['result']['imported'], 1)
+        self.assertIsNone(status['download_url'])
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/download', headers=self.admin_headers).status_code, 404)
+        self.assertEqual(self.client.post(f'/api/jobs/{job_id}/cancel', headers=self.admin_headers).status_code, 409)
+
+        def write_result(job):
+            path = main_module.job_result_file(job, '.txt')
+            path.write_text('job result', encoding='utf-8')
+            job.set_result_file(path, '结果.txt')
+            return {'ok': True}
+
+        file_job = main_module.JOB_QUEUE.submit(main_module.engine, 'test', 'admin', write_result)
+        self.assertTrue(main_module.JOB_QUEUE.wait(file_job, timeout=30))
+        download = self.client.get(f'/api/jobs/{file_job}/download', headers=self.admin_headers)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download.content, b'job result')
+
+        started, release = threading.Event(), threading.Event()
+
+        def slow(job):
+            job.progress(0.5)
+            started.set()
+            release.wait(10)
+            job.progress(0.6)
+            return {'ok': True}
+
+        slow_job = main_module.JOB_QUEUE.submit(main_module.engine, 'test', 'admin', slow)
+        self.assertTrue(started.wait(10))
+        cancel = self.client.post(f'/api/jobs/{slow_job}/cancel', headers=self.admin_headers)
+        self.assertEqual(cancel.status_code, 200, cancel.text)
+        self.assertTrue(cancel.json()['cancel_requested'])
+        release.set()
+        self.assertTrue(main_module.JOB_QUEUE.wait(slow_job, timeout=30))
+        status = self.client.get(f'/api/jobs/{slow_job}', headers=self.admin_headers).json()
+        self.assertEqual((status['status'], status['progress']), ('cancelled', 0.5))
+        listed = self.client.get('/api/jobs', headers=self.admin_headers).json()['items']
+        self.assertIn(slow_job, [item['id'] for item in listed])
+        self.assertEqual(self.client.get('/api/jobs/missing', headers=self.admin_headers).status_code, 404)
+
+
+    def test_68_email_reminders_are_digested_per_recipient_over_one_smtp_connection(self):
+        main_module = self.__class__.main_module
+        import app.services.reminder_dispatch as dispatch_module
+
+        connections = []
+
+        class FakeSMTP:
+            def __init__(self, host, port, timeout=None):
+                self.sent = []
+                connections.append(self)
+
+            def sendmail(self, sender, to_addrs, message):
+                self.sent.append((sender, tuple(to_addrs)))
+
+            def noop(self):
+                return (250, b'ok')
+
+            def quit(self):
+                pass
+
+            def close(self):
+                pass
+
+        db = self.__class__.db_module.SessionLocal()
+        try:
+            org = main_module.Organization(
+                name='摘要提醒单位',
+                credit_code=f'DIGEST{datetime.now():%y%m%d%H%M%S%f}'[:18],
+                legal_representative='癸',
+                address='摘要城',
+                mobile_phone='13100131068',
+                email='digest@example.com',
+                industry='互联网',
+                organization_type='企业',
+                filing_region='摘要城',
+                created_by='tester',
+            )
+            db.add(org)
+            db.commit()
+            org_id = org.id
+        finally:
+            db.close()
+        for idx in range(3):
+            resp = self.client.post(
+                '/api/systems',
+                json={'organization_id': org_id, 'system_name': f'摘要提醒系统{idx}', 'proposed_level': 2, 'created_by': 'tester'},
+            )
+            self.assertEqual(resp.status_code, 200, resp.text)
+        rule_resp = self.client.put(
+            '/api/workflow/rules',
+            json={'updated_by': 'admin', 'rules': [{'step_name': '信息收集', 'owner': 'owner@example.com', 'time_limit_hours': 24, 'enabled': True}]},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(rule_resp.status_code, 200, rule_resp.text)
+
+        original_smtp, original_pool = dispatch_module.smtplib.SMTP, main_module.SMTP_POOL
+        dispatch_module.smtplib.SMTP = FakeSMTP
+        main_module.SMTP_POOL = dispatch_module.SmtpConnectionPool('smtp.test', 25, sender='noreply@example.com')
+        try:
+            resp = self.client.get('/api/workflow/reminders?mode=all&send=true&channel=email')
+            self.assertEqual(resp.status_code, 200, resp.text)
+            job_id = resp.json()['email_job_id']
+            self.assertTrue(job_id)
+            self.assertTrue(main_module.JOB_QUEUE.wait(job_id, timeout=30))
+            status = self.client.get(f'/api/jobs/{job_id}', headers=self.admin_headers).json()
+            self.assertEqual(status['status'], 'succeeded', status)
+            self.assertEqual(main_module.send_workflow_email('other@example.com', '主题', '正文'), (True, 'ok'))
+        finally:
+            dispatch_module.smtplib.SMTP = original_smtp
+            main_module.SMTP_POOL = original_pool
+
+        self.assertEqual(len(connections), 1)
+        recipients = [to for _, to in connections[0].sent]
+        self.assertEqual(recipients.count(('owner@example.com',)), 1)
+        self.assertEqual(recipients[-1], ('other@example.com',))
+        logs = self.client.get('/api/workflow/reminder-logs').json()['items']
+        owner_logs = [item for item in logs if item['receiver'] == 'owner@example.com' and item['channel'] == 'email']
+        self.assertGreaterEqual(len(owner_logs), 3)
+        self.assertTrue(all('邮件发送失败' not in item['content'] for item in owner_logs))
+        main_module.run_scheduled_workflow_reminders()
+        self.assertEqual(main_module.run_scheduled_workflow_reminders(), 0)
+        # created_at 与去重窗口使用同一时钟（应用本地时间）
+        db = main_module.SessionLocal()
+        try:
+            latest = db.query(main_module.func.max(main_module.WorkflowReminder.created_at)).scalar()
+            self.assertLess(abs((datetime.now() - latest).total_seconds()), 120)
+            stale = datetime.now() - main_module.timedelta(hours=main_module.WORKFLOW_REMINDER_RESEND_HOURS, minutes=5)
+            db.query(main_module.WorkflowReminder).update({main_module.WorkflowReminder.created_at: stale})
+            db.commit()
+        finally:
+            db.close()
+        self.assertGreater(main_module.run_scheduled_workflow_reminders(), 0)
+
+        subject, body = dispatch_module.build_digest([
+            {'system_name': 'A', 'step_name': '信息收集', 'status': 'due_soon', 'message': 'A将到期'},
+            {'system_name': 'B', 'step_name': '信息审核', 'status': 'overdue', 'message': 'B已超时'},
+        ])
+        self.assertIn('1项已超时', subject)
+        self.assertLess(body.index('B已超时'), body.index('A将到期'))
+
+
+    def test_69_workflow_snapshot_serves_read_paths_and_reloads_after_rule_update(self):
+        main_module = self.__class__.main_module
+        from sqlalchemy import event
+
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '流程快照单位',
+                'credit_code': '91350100M000100Y69',
+                'legal_representative': '子',
+                'address': '快照城',
+                'mobile_phone': '13100131069',
+                'email': 'wf69@example.com',
+                'industry': '能源',
+                'organization_type': '企业',
+                'filing_region': '快照城',
+                'created_by': 'tester',
+            },
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        sys_resp = self.client.post(
+            '/api/systems',
+            json={'organization_id': org_resp.json()['data']['id'], 'system_name': '流程快照系统', 'proposed_level': 2, 'created_by': 'tester'},
+        )
+        self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+        system_id = sys_resp.json()['data']['id']
+        self.client.get(f'/api/workflow/instances/{system_id}')
+        before = main_module.get_workflow_config(None)
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = main_module.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            self.assertEqual(self.client.get(f'/api/workflow/instances/{system_id}').status_code, 200)
+            self.assertEqual(self.client.get('/api/workflow/reminders?mode=all').status_code, 200)
+            advance = self.client.post(f'/api/workflow/instances/{system_id}/advance?action=complete', headers=self.admin_headers)
+            self.assertEqual(advance.status_code, 200, advance.text)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        workflow_sql = [sql for sql in statements if 'workflow_step_rules' in sql or 'workflow_configs' in sql]
+        self.assertEqual(workflow_sql, [])
+        self.assertIs(main_module.get_workflow_config(None), before)
+        with self.assertRaises(TypeError):
+            before.rules['信息收集'] = None
+
+        rule_resp = self.client.put(
+            '/api/workflow/rules',
+            json={'updated_by': 'admin', 'rules': [{'step_name': '信息审核', 'owner': 'snapshot_owner', 'time_limit_hours': 6, 'enabled': True}]},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(rule_resp.status_code, 200, rule_resp.text)
+        after = main_module.get_workflow_config(None)
+        self.assertGreater(after.version, before.version)
+        self.assertEqual(after.rules['信息审核'].owner, 'snapshot_owner')
+        instance = self.client.get(f'/api/workflow/instances/{system_id}').json()
+        self.assertEqual(instance['current_owner'], 'snapshot_owner')
+        self.assertLessEqual(instance['remaining_seconds'], 6 * 3600)
+
+
+    def test_70_batch_workflow_advance_applies_all_transitions_in_one_commit(self):
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '批量流转单位',
+                'credit_code': '91350100M000100Y75',
+                'legal_representative': '丑',
+                'address': '批量城',
+                'mobile_phone': '13100131070',
+                'email': 'wf70@example.com',
+                'industry': '能源',
+                'organization_type': '企业',
+                'filing_region': '批量城',
+                'created_by': 'tester',
+            },
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        system_ids = []
+        for idx in range(3):
+            sys_resp = self.client.post(
+                '/api/systems',
+                json={'organization_id': org_resp.json()['data']['id'], 'system_name': f'批量流转系统{idx}', 'proposed_level': 2, 'created_by': 'tester'},
+            )
+            self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+            system_ids.append(sys_resp.json()['data']['id'])
+
+        session_cls = self.__class__.main_module.Session
+        original_commit = session_cls.commit
+        commits = {'value': 0}
+
+        def counting_commit(session_self):
+            commits['value'] += 1
+            return original_commit(session_self)
+
+        session_cls.commit = counting_commit
+        try:
+            resp = self.client.post(
+                '/api/workflow/instances/batch-advance',
+                json={'system_ids': system_ids + [system_ids[0], 99999999], 'action': 'approve', 'comment': '批量通过'},
+                headers=self.admin_headers,
+            )
+        finally:
+            session_cls.commit = original_commit
+        self.assertEqual(resp.status_code, 200, resp.text)
+        data = resp.json()
+        self.assertEqual((data['succeeded'], data['failed']), (3, 1))
+        self.assertEqual(commits['value'], 1)
+        by_id = {item['system_id']: item for item in data['items']}
+        self.assertFalse(by_id[99999999]['ok'])
+        for system_id in system_ids:
+            self.assertEqual(by_id[system_id]['current_step_index'], 1)
+            instance = self.client.get(f'/api/workflow/instances/{system_id}').json()
+            self.assertEqual(instance['current_step_index'], 1)
+            self.assertEqual(instance['logs'][0]['comment'], '批量通过')
+            self.assertEqual(instance['logs'][0]['action'], 'approve')
+            self.assertIsNotNone(instance['due_at'])
+
+        bad = self.client.post(
+            '/api/workflow/instances/batch-advance',
+            json={'system_ids': system_ids, 'action': 'skip'},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(bad.status_code, 400)
+
+
+    def test_71_organization_and_system_exports_stream_xlsx_and_csv(self):
+        org_resp = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '流式导出单位',
+                'credit_code': '91350100M000100Y76',
+                'legal_representative': '寅',
+                'address': '导出城<&>',
+                'mobile_phone': '13100131071',
+                'email': 'exp71@example.com',
+                'industry': '能源',
+                'organization_type': '企业',
+                'filing_region': '导出城',
+                'created_by': 'tester',
+            },
+        )
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+        sys_resp = self.client.post(
+            '/api/systems',
+            json={'organization_id': org_id, 'system_name': '流式导出系统', 'proposed_level': 2, 'go_live_date': '2025-06-01', 'created_by': 'tester'},
+        )
+        self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+
+        main = self.__class__.main_module
+        original_chunk = main.EXPORT_CHUNK_ROWS
+        main.EXPORT_CHUNK_ROWS = 1
+        try:
+            org_xlsx = self.client.get('/api/organizations/export/excel', headers=self.admin_headers)
+            sys_xlsx = self.client.get('/api/systems/export/excel', headers=self.admin_headers)
+            org_csv = self.client.get('/api/organizations/export/excel?format=csv', headers=self.admin_headers)
+        finally:
+            main.EXPORT_CHUNK_ROWS = original_chunk
+        self.assertEqual(org_xlsx.status_code, 200, org_xlsx.text)
+        self.assertIn('spreadsheetml', org_xlsx.headers['content-type'])
+        ws = load_workbook(io.BytesIO(org_xlsx.content)).active
+        self.assertEqual(ws.title, '单位信息')
+        rows = list(ws.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:2], ('单位名称', '统一社会信用代码'))
+        org_row = next(row for row in rows[1:] if row[1] == '91350100M000100Y76')
+        self.assertEqual(org_row[3], '导出城<&>')
+
+        sys_rows = list(load_workbook(io.BytesIO(sys_xlsx.content)).active.iter_rows(values_only=True))
+        sys_row = next(row for row in sys_rows[1:] if row[0] == '流式导出系统')
+        self.assertEqual((sys_row[2], sys_row[6]), (org_id, '2025-06-01'))
+
+        self.assertEqual(org_csv.status_code, 200, org_csv.text)
+        self.assertTrue(org_csv.headers['content-type'].startswith('text/csv'))
+        self.assertTrue(org_csv.content.startswith('\ufeff'.encode('utf-8')))
+        csv_rows = list(csv.reader(io.StringIO(org_csv.content.decode('utf-8-sig'))))
+        self.assertEqual(len(csv_rows), len(rows))
+        self.assertIn('91350100M000100Y76', [row[1] for row in csv_rows])
+
+        bad = self.client.get('/api/systems/export/excel?format=pdf', headers=self.admin_headers)
+        self.assertEqual(bad.status_code, 400)
+
+    def test_72_excel_import_writes_in_batches_and_reports_row_errors(self):
+        main = self.__class__.main_module
+        self.assertTrue(main.ensure_search_index(main.engine, rebuild=True))
+        existing = self.client.post(
+            '/api/organizations',
+            json={
+                'name': '批量导入已有单位',
+                'credit_code': '91350100M000100Y77',
+                'legal_representative': '卯',
+                'address': '导入城',
+                'mobile_phone': '13100131072',
+                'email': 'imp72@example.com',
+                'industry': '能源',
+                'organization_type': '企业',
+                'filing_region': '导入城',
+                'created_by': 'tester',
+            },
+        )
+        self.assertEqual(existing.status_code, 200, existing.text)
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['单位名称', '统一社会信用代码', '单位负责人', '单位地址', '办公电话', '移动电话', '邮箱', '所属行业', '单位类型', '备案地区'])
+        ws.append(['批量导入甲', '91350100M000100Y78', '甲', '甲城', '', '13100131073', 'a72@example.com', '教育', '事业单位', '甲城'])
+        ws.append(['批量导入重复', '91350100M000100Y77', '乙', '乙城', '', '13100131074', 'b72@example.com', '教育', '事业单位', '乙城'])
+        ws.append(['批量导入文件内重复', '91350100m000100y78', '丙', '丙城', '', '13100131075', 'c72@example.com', '教育', '事业单位', '丙城'])
+        ws.append(['批量导入手机号错误', '91350100M000100Y79', '丁', '丁城', '', '123', 'd72@example.com', '教育', '事业单位', '丁城'])
+        ws.append(['批量导入乙', '91350100M000100Y80', '戊', '戊城', '', '13100131076', 'e72@example.com', '教育', '事业单位', '戊城'])
+        bio = io.BytesIO()
+        wb.save(bio)
+
+        original_chunk = main.IMPORT_CHUNK_ROWS
+        main.IMPORT_CHUNK_ROWS = 2
+        try:
+            resp = self.client.post(
+                '/api/organizations/import/excel',
+                files={'file': ('orgs72.xlsx', bio.getvalue(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')},
+                headers=self.admin_headers,
+            )
+        finally:
+            main.IMPORT_CHUNK_ROWS = original_chunk
+        self.assertEqual(resp.status_code, 200, resp.text)
+        data = resp.json()
+        self.assertEqual((data['imported'], data['failed']), (2, 3))
+        self.assertEqual([item['row'] for item in data['errors']], [3, 4, 5])
+        self.assertIn('已存在', data['errors'][0]['message'])
+        self.assertIn('已存在', data['errors'][1]['message'])
+        self.assertIn('手机号', data['errors'][2]['message'])
+        self.assertTrue(data['skipped'][0].startswith('第3行：'))
+
+        db = self.__class__.db_module.SessionLocal()
+        try:
+            org = db.query(main.Organization).filter(main.Organization.credit_code == '91350100M000100Y78').one()
+            history = db.query(main.OrganizationHistory).filter(main.OrganizationHistory.organization_id == org.id).all()
+            self.assertEqual([(h.change_type, h.after_data['credit_code']) for h in history], [('import', '91350100M000100Y78')])
+            org_id = org.id
+        finally:
+            db.close()
+        hits = self.client.get('/api/search', params={'q': '91350100M000100Y80'}, headers=self.admin_headers).json()['items']
+        self.assertTrue(any(row['entity_type'] == 'organization' for row in hits))
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['系统名称', '系统编号', '单位ID', '拟定等级', '部署方式', '系统类型', '上线时间', '录入人'])
+        ws.append(['批量导入系统甲', '', org_id, 2, '本地部署', '业务系统', '2025-01-02', 'tester'])
+        ws.append(['批量导入系统乙', '', 99999999, 2, '本地部署', '业务系统', '', 'tester'])
+        ws.append(['批量导入系统丙', '', org_id, 3, '云部署', '业务系统', '', 'tester'])
+        bio = io.BytesIO()
+        wb.save(bio)
+        code_calls = []
+        original_codes = main.generate_system_codes
+
+        def spy_codes(db, count):
+            code_calls.append(count)
+            return original_codes(db, count)
+
+        main.generate_system_codes = spy_codes
+        try:
+            resp = self.client.post(
+                '/api/systems/import/excel',
+                files={'file': ('systems72.xlsx', bio.getvalue(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')},
+                headers=self.admin_headers,
+            )
+        finally:
+            main.generate_system_codes = original_codes
+        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertEqual(code_calls, [2])
+        data = resp.json()
+        self.assertEqual((data['imported'], data['errors']), (2, [{'row': 3, 'message': '单位不存在。'}]))
+        db = self.__class__.db_module.SessionLocal()
+        try:
+            systems = db.query(main.SystemInfo).filter(main.SystemInfo.organization_id == org_id).order_by(main.SystemInfo.id).all()
+            self.assertEqual([row.system_name for row in systems], ['批量导入系统甲', '批量导入系统丙'])
+            self.assertEqual(len({row.system_code for row in systems}), 2)
+            self.assertEqual(systems[0].go_live_date.isoformat(), '2025-01-02')
+            for system in systems:
+                instance = db.query(main.WorkflowInstance).filter(main.WorkflowInstance.system_id == system.id).one()
+                self.assertEqual((instance.current_step_index, instance.status), (0, 'in_progress'))
+                self.assertIsNotNone(instance.due_at)
+        finally:
+            db.close()
+
+    def test_73_uploaded_docx_is_parsed_once_and_shared_by_parsers(self):
+        import app.services.docx_document as docx_module
+
+        doc = Document()
+        doc.add_paragraph('备案单位：解析缓存单位')
+        table = doc.add_table(rows=3, cols=4)
+        table.cell(0, 0).text = '单位名称'
+        table.cell(0, 1).merge(table.cell(0, 3)).text = '解析缓存单位'
+        table.cell(1, 0).merge(table.cell(2, 0)).text = '单位负责人'
+        table.cell(1, 1).text = '姓名'
+        table.cell(1, 2).text = '张三'
+        table.cell(2, 1).text = '移动电话'
+        table.cell(2, 2).text = '13100131073'
+        table.cell(2, 3).text = '邮编：350000'
+        bio = io.BytesIO()
+        doc.save(bio)
+        content = bio.getvalue()
+
+        main = self.__class__.main_module
+        calls = {'value': 0}
+        original_build = docx_module.build_parsed_docx
+
+        def counting_build(data):
+            calls['value'] += 1
+            return original_build(data)
+
+        docx_module.DOCX_PARSE_CACHE.clear()
+        docx_module.build_parsed_docx = counting_build
+        try:
+            kv = main.parse_docx_key_values(content)
+            filing = main.parse_filing_form_docx(content)
+            self.assertEqual(main.parse_docx_key_values(content), kv)
+        finally:
+            docx_module.build_parsed_docx = original_build
+        self.assertEqual(calls['value'], 1)
+        self.assertEqual(kv['备案单位'], '解析缓存单位')
+        self.assertEqual(kv['单位名称'], '解析缓存单位')
+        self.assertEqual(kv['单位负责人移动电话'], '13100131073')
+        self.assertEqual(kv['邮编'], '350000')
+        self.assertEqual(filing['org_name'], '解析缓存单位')
+        self.assertEqual(filing['legal_representative'], '张三')
+
+        # 共享模型与 python-docx 逐格读取的结果一致
+        parsed = docx_module.parse_docx_document(content)
+        expected = [tuple(cell.text for cell in row.cells) for row in Document(io.BytesIO(content)).tables[0].rows]
+        self.assertEqual(list(parsed.grid_rows), expected)
+
+    def test_74_streaming_docx_extractor_matches_python_docx_on_merged_tables(self):
+        import app.services.docx_document as docx_module
+
+        doc = Document()
+        doc.add_paragraph('定级备案表')
+        table = doc.add_table(rows=4, cols=5)
+        table.cell(0, 0).merge(table.cell(3, 0)).text = '网络安全责任部门联系人'
+        for r in range(4):
+            table.cell(r, 1).text = '姓名' if r % 2 == 0 else '移动电话'
+            table.cell(r, 2).merge(table.cell(r, 3)).text = f'值{r}'
+            table.cell(r, 4).text = f'备注{r}：第一行\n第二行'
+        nested = table.cell(0, 4).add_table(rows=1, cols=2)
+        nested.cell(0, 0).text = '嵌套键'
+        nested.cell(0, 1).text = '嵌套值'
+        doc.add_paragraph('填表日期：2026年1月2日')
+        bio = io.BytesIO()
+        doc.save(bio)
+        content = bio.getvalue()
+
+        fast = docx_module.build_parsed_docx(content)
+        slow = docx_module.build_parsed_docx_python_docx(content)
+        self.assertEqual(fast.paragraphs, slow.paragraphs)
+        self.assertEqual(fast.grid_rows, slow.grid_rows)
+        self.assertEqual(fast.row_lines, slow.row_lines)
+        self.assertEqual(fast.grid_rows[1][:4], ('网络安全责任部门联系人', '移动电话', '值1', '值1'))
+        # 嵌套表格排在外层表格之后
+        self.assertEqual(len(fast.tables), 2)
+        self.assertEqual(fast.tables[1], (('嵌套键', '嵌套值'),))
+        self.assertIn('嵌套值', fast.tables[0][0][-1])
+
+    def test_75_excel_import_apply_reuses_cached_preview_diff(self):
+        org_resp = self.client.post('/api/organizations', json={
+            'name': 'Excel预检缓存单位',
+            'credit_code': '91350100M000100Y82',
+            'legal_representative': '辰',
+            'address': '太原市',
+            'mobile_phone': '13900139075',
+            'email': 'excel-preview@example.com',
+            'industry': '能源',
+            'organization_type': '企业',
+            'filing_region': '太原',
+            'created_by': 'tester',
+        })
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        system_resp = self.client.post('/api/systems', json={
+            'organization_id': org_resp.json()['data']['id'],
+            'system_name': 'Excel预检缓存系统',
+            'proposed_level': 2,
+            'created_by': 'tester',
+        })
+        self.assertEqual(system_resp.status_code, 200, system_resp.text)
+        system_id = system_resp.json()['data']['id']
+        workspace = {
+            'organization': {'name': 'Excel预检缓存单位', 'credit_code': '91350100M000100Y82', 'cybersecurity_dept': '旧网安部门'},
+            'system': {'system_name': 'Excel预检缓存系统'},
+        }
+        save_resp = self.client.put(f'/api/filing-workspace/systems/{system_id}', json=workspace, headers=self.admin_headers)
+        self.assertEqual(save_resp.status_code, 200, save_resp.text)
+        excel_bytes = self.build_customer_filing_excel(
+            org_name='Excel预检缓存单位',
+            credit_code='91350100M000100Y82',
+            system_name='Excel预检缓存系统',
+            level=2,
+            cybersecurity_dept='新网安部门',
+        )
+
+        def preview():
+            resp = self.client.post(
+                f'/api/filing-workspace/systems/{system_id}/import-excel/preview',
+                files={'file': ('customer.xlsx', excel_bytes, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')},
+                headers=self.admin_headers,
+            )
+            self.assertEqual(resp.status_code, 200, resp.text)
+            return resp.json()['data']
+
+        preview_data = preview()
+        self.assertTrue(preview_data['preview_token'])
+        self.assertIn('organization.cybersecurity_dept', {item['key'] for item in preview_data['conflicts']})
+
+        main = self.__class__.main_module
+        original_flatten = main._flatten_import_candidate
+
+        def fail_flatten(*args, **kwargs):
+            raise AssertionError('apply 不应重新展开候选数据')
+
+        main._flatten_import_candidate = fail_flatten
+        try:
+            apply_resp = self.client.post(
+                f'/api/filing-workspace/systems/{system_id}/import-excel/apply',
+                json={'preview_token': preview_data['preview_token'], 'override_keys': ['organization.cybersecurity_dept']},
+                headers=self.admin_headers,
+            )
+        finally:
+            main._flatten_import_candidate = original_flatten
+        self.assertEqual(apply_resp.status_code, 200, apply_resp.text)
+        applied = set(apply_resp.json()['data']['applied_keys'])
+        self.assertIn('organization.cybersecurity_dept', applied)
+        self.assertTrue(set(preview_data['direct_update_keys']) <= applied)
+        detail = self.client.get(f'/api/filing-workspace/systems/{system_id}', headers=self.admin_headers).json()
+        self.assertEqual(detail['organization']['cybersecurity_dept'], '新网安部门')
+
+        reused = self.client.post(
+            f'/api/filing-workspace/systems/{system_id}/import-excel/apply',
+            json={'preview_token': preview_data['preview_token']},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(reused.status_code, 404, reused.text)
+
+        workspace['organization']['cybersecurity_dept'] = '旧网安部门'
+        self.client.put(f'/api/filing-workspace/systems/{system_id}', json=workspace, headers=self.admin_headers)
+        stale_token = preview()['preview_token']
+        workspace['organization']['cybersecurity_dept'] = '预检后改动'
+        self.client.put(f'/api/filing-workspace/systems/{system_id}', json=workspace, headers=self.admin_headers)
+        stale = self.client.post(
+            f'/api/filing-workspace/systems/{system_id}/import-excel/apply',
+            json={'preview_token': stale_token, 'override_keys': ['organization.cybersecurity_dept']},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(stale.status_code, 409, stale.text)
+
+    def test_76_filing_overview_summary_view_pages_and_revalidates_with_etag(self):
+        main_module = self.__class__.main_module
+        from sqlalchemy import event
+
+        org_ids = []
+        for idx, suffix in enumerate(('Y83', 'Y84', 'Y85')):
+            org_resp = self.client.post('/api/organizations', json={
+                'name': f'轻量总览单位{idx}',
+                'credit_code': f'91350100M000100{suffix}',
+                'legal_representative': '丑',
+                'address': '总览城',
+                'mobile_phone': f'1310013107{idx}',
+                'email': f'overview{idx}@example.com',
+                'industry': '教育',
+                'organization_type': '事业单位',
+                'filing_region': '总览城',
+                'created_by': 'tester',
+            })
+            self.assertEqual(org_resp.status_code, 200, org_resp.text)
+            org_ids.append(org_resp.json()['data']['id'])
+        sys_resp = self.client.post('/api/systems', json={
+            'organization_id': org_ids[0], 'system_name': '轻量总览系统', 'proposed_level': 2, 'created_by': 'tester',
+        })
+        self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+
+        full = self.client.get('/api/filing-workspace/overview', params={'keyword': '轻量总览单位'}, headers=self.admin_headers)
+        self.assertEqual(full.status_code, 200, full.text)
+        self.assertIn('filing_detail', full.json()['items'][0]['organization'])
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        params = {'keyword': '轻量总览单位', 'view': 'summary'}
+        event.listen(main_module.engine, 'before_cursor_execute', capture)
+        try:
+            summary = self.client.get('/api/filing-workspace/overview', params=params, headers=self.admin_headers)
+        finally:
+            event.remove(main_module.engine, 'before_cursor_execute', capture)
+        self.assertEqual(summary.status_code, 200, summary.text)
+        data = summary.json()
+        self.assertEqual(data['total'], 3)
+        self.assertNotIn('filing_detail', data['items'][0]['organization'])
+        self.assertEqual(
+            [item['organization']['name'] for item in data['items']],
+            [item['organization']['name'] for item in full.json()['items']],
+        )
+        systems = next(item['systems'] for item in data['items'] if item['organization']['id'] == org_ids[0])
+        self.assertEqual([row['system_name'] for row in systems], ['轻量总览系统'])
+        self.assertFalse([sql for sql in statements if 'filing_detail' in sql])
+
+        first_page = self.client.get('/api/filing-workspace/overview', params={**params, 'page': 1, 'page_size': 2}, headers=self.admin_headers).json()
+        second_page = self.client.get('/api/filing-workspace/overview', params={**params, 'page': 2, 'page_size': 2}, headers=self.admin_headers).json()
+        self.assertEqual((first_page['total'], len(first_page['items'])), (3, 2))
+        self.assertEqual((second_page['total'], len(second_page['items'])), (3, 1))
+        paged_ids = {item['organization']['id'] for item in first_page['items'] + second_page['items']}
+        self.assertEqual(paged_ids, set(org_ids))
+
+        etag = summary.headers.get('etag')
+        self.assertTrue(etag)
+        cached = self.client.get('/api/filing-workspace/overview', params=params, headers={**self.admin_headers, 'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+        update_resp = self.client.put(f'/api/organizations/{org_ids[1]}', json={
+            'name': '轻量总览单位1-改', 'credit_code': '91350100M000100Y84', 'filing_region': '总览城',
+        }, headers=self.admin_headers)
+        self.assertEqual(update_resp.status_code, 200, update_resp.text)
+        changed = self.client.get('/api/filing-workspace/overview', params=params, headers={**self.admin_headers, 'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200, changed.text)
+        self.assertNotEqual(changed.headers.get('etag'), etag)
+
+        bad_view = self.client.get('/api/filing-workspace/overview', params={'view': 'detail'}, headers=self.admin_headers)
+        self.assertEqual(bad_view.status_code, 400, bad_view.text)
+
+    def test_77_filing_detail_merge_returns_independent_trees(self):
+        main = self.__class__.main_module
+        override = {
+            'table2': {'running_status': '已运行', 'object_types': ['通信网络'], 'extra': {'k': 1}},
+            'table6': {'items': [{'data_name': '客户数据'}]},
+            'custom': ['x'],
+        }
+        merged = main.deep_merge_dicts(main.SYSTEM_FILING_DETAIL_DEFAULTS, override)
+        legacy = json.loads(json.dumps(main.default_system_filing_detail()))
+        legacy['table2'].update({'running_status': '已运行', 'object_types': ['通信网络'], 'extra': {'k': 1}})
+        legacy['table6']['items'] = [{'data_name': '客户数据'}]
+        legacy['custom'] = ['x']
+        self.assertEqual(merged, legacy)
+        self.assertEqual(list(merged), ['table2', 'table3', 'table4', 'table5', 'table6', 'custom'])
+
+        merged['table2']['object_types'].append('大数据')
+        merged['table6']['items'][0]['data_name'] = '已改'
+        merged['table3']['grading_report']['attachment_ids'].append(9)
+        self.assertEqual(override['table2']['object_types'], ['通信网络'])
+        self.assertEqual(override['table6']['items'][0]['data_name'], '客户数据')
+        self.assertEqual(main.SYSTEM_FILING_DETAIL_DEFAULTS, main.default_system_filing_detail())
+        self.assertEqual(main.merged_system_filing_detail(None), main.default_system_filing_detail())
+        self.assertEqual(main.merged_org_filing_detail(None), main.default_org_filing_detail())
+
+    def test_78_history_stores_deltas_between_keyframes_and_reconstructs_versions(self):
+        main = self.__class__.main_module
+        org_resp = self.client.post('/api/organizations', json={
+            'name': '增量历史单位v0',
+            'credit_code': '91350100M000100Y86',
+            'legal_representative': '寅',
+            'address': '历史城',
+            'mobile_phone': '13100131078',
+            'email': 'history78@example.com',
+            'industry': '能源',
+            'organization_type': '企业',
+            'filing_region': '历史城',
+            'created_by': 'tester',
+        })
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+
+        original_interval = main.HISTORY_KEYFRAME_INTERVAL
+        main.HISTORY_KEYFRAME_INTERVAL = 3
+        try:
+            for version in range(1, 5):
+                update = self.client.put(f'/api/organizations/{org_id}', json={
+                    'name': f'增量历史单位v{version}',
+                    'credit_code': '91350100M000100Y86',
+                    'filing_region': '历史城',
+                }, headers=self.admin_headers)
+                self.assertEqual(update.status_code, 200, update.text)
+        finally:
+            main.HISTORY_KEYFRAME_INTERVAL = original_interval
+
+        db = self.db_module.SessionLocal()
+        try:
+            rows = (
+                db.query(main.OrganizationHistory)
+                .filter(main.OrganizationHistory.organization_id == org_id)
+                .order_by(main.OrganizationHistory.id.asc())
+                .all()
+            )
+            self.assertEqual([row.delta is None for row in rows], [True, False, False, True, False])
+            for row in rows:
+                if row.delta is not None:
+                    self.assertIsNone(row.after_data)
+                    self.assertIn('name', row.changed_fields)
+                    self.assertLess(len(json.dumps(row.delta)), len(json.dumps(rows[0].after_data)))
+            history_ids = [row.id for row in rows]
+        finally:
+            db.close()
+
+        summary = self.client.get(f'/api/organizations/{org_id}/history', params={'page': 1, 'page_size': 2})
+        self.assertEqual(summary.status_code, 200, summary.text)
+        data = summary.json()
+        self.assertEqual((data['total'], len(data['items'])), (5, 2))
+        self.assertNotIn('after_data', data['items'][0])
+        self.assertEqual(data['items'][0]['id'], history_ids[-1])
+        self.assertFalse(data['items'][0]['keyframe'])
+
+        for version, history_id in enumerate(history_ids):
+            detail = self.client.get(f'/api/organizations/{org_id}/history/{history_id}')
+            self.assertEqual(detail.status_code, 200, detail.text)
+            self.assertEqual(detail.json()['after_data']['name'], f'增量历史单位v{version}')
+            if version:
+                self.assertEqual(detail.json()['before_data']['name'], f'增量历史单位v{version - 1}')
+
+        missing = self.client.get(f'/api/organizations/{org_id}/history/{history_ids[-1] + 1000}')
+        self.assertEqual(missing.status_code, 404, missing.text)
+
+        # 未记历史的写入之后，下一条历史仍要给出真实的修改前快照
+        db = self.db_module.SessionLocal()
+        try:
+            db.get(main.Organization, org_id).address = '导入改写城'
+            db.commit()
+        finally:
+            db.close()
+        update = self.client.put(f'/api/organizations/{org_id}', json={'name': '增量历史单位v5'}, headers=self.admin_headers)
+        self.assertEqual(update.status_code, 200, update.text)
+        latest = self.client.get(f'/api/organizations/{org_id}/history', params={'page': 1, 'page_size': 1}).json()['items'][0]
+        self.assertIn('name', latest['changed_fields'])
+        self.assertNotIn('address', latest['changed_fields'])
+        detail = self.client.get(f"/api/organizations/{org_id}/history/{latest['id']}").json()
+        self.assertEqual(detail['before_data']['address'], '导入改写城')
+        self.assertEqual(detail['before_data']['name'], '增量历史单位v4')
+        self.assertEqual(detail['after_data']['name'], '增量历史单位v5')
+
+    def test_79_report_versions_share_unchanged_sections_and_diff_by_hash(self):
+        main = self.__class__.main_module
+        org_resp = self.client.post('/api/organizations', json={
+            'name': '章节哈希单位',
+            'credit_code': '91350100M000100Y87',
+            'legal_representative': '卯',
+            'address': '章节城',
+            'mobile_phone': '13100131079',
+            'email': 'sections79@example.com',
+            'industry': '能源',
+            'organization_type': '企业',
+            'filing_region': '章节城',
+            'created_by': 'tester',
+        })
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        sys_resp = self.client.post('/api/systems', json={
+            'organization_id': org_resp.json()['data']['id'], 'system_name': '章节哈希系统', 'proposed_level': 2, 'created_by': 'tester',
+        })
+        self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+        system_id = sys_resp.json()['data']['id']
+
+        gen = self.client.post(f'/api/reports/generate?system_id={system_id}&report_type=grading_report', headers=self.admin_headers)
+        self.assertEqual(gen.status_code, 200, gen.text)
+        report1_id = gen.json()['data']['id']
+        content = self.client.get(f'/api/reports/{report1_id}').json()['content']
+        self.assertGreaterEqual(len(content['章节']), 2)
+        section_name = content['章节'][0]['名称']
+        base_text = '本系统承载单位核心业务，面向全省用户提供 online service 与数据查询功能，日均访问量约 5000 次。'
+        content['章节'][0]['内容'] = {'正文': base_text, '备注': '无'}
+        edit1 = self.client.put(f'/api/reports/{report1_id}', json={'content': content}, headers=self.admin_headers)
+        self.assertEqual(edit1.status_code, 200, edit1.text)
+
+        def block_stats():
+            db = self.db_module.SessionLocal()
+            try:
+                return db.execute(main.text('SELECT COUNT(*), COALESCE(SUM(ref_count), 0) FROM report_section_blocks')).one()
+            finally:
+                db.close()
+
+        blocks_before, refs_before = block_stats()
+        restore = self.client.post(f'/api/reports/{report1_id}/restore/{report1_id}', headers=self.admin_headers)
+        self.assertEqual(restore.status_code, 200, restore.text)
+        report2_id = restore.json()['new_report_id']
+        blocks_after, refs_after = block_stats()
+        self.assertEqual(blocks_after, blocks_before)
+        self.assertEqual(refs_after - refs_before, len(content['章节']))
+
+        edited = self.client.get(f'/api/reports/{report2_id}').json()['content']
+        self.assertEqual(edited['章节'], content['章节'])
+        edited['章节'][0]['内容']['正文'] = base_text.replace('5000', '8000')
+        edit2 = self.client.put(f'/api/reports/{report2_id}', json={'content': edited}, headers=self.admin_headers)
+        self.assertEqual(edit2.status_code, 200, edit2.text)
+        self.assertEqual(self.client.get(f'/api/reports/{report2_id}').json()['content'], edited)
+
+        db = self.db_module.SessionLocal()
+        try:
+            stored = db.get(main.Report, report2_id)
+            self.assertNotIn('内容', stored.content['章节'][0])
+            self.assertIn(main.REPORT_SECTION_REF, stored.content['章节'][0])
+        finally:
+            db.close()
+
+        requested = []
+        original_load_blocks = main.load_blocks
+
+        def spy_load_blocks(db, hashes):
+            hashes = list(hashes)
+            requested.extend(hashes)
+            return original_load_blocks(db, hashes)
+
+        main.load_blocks = spy_load_blocks
+        try:
+            compare = self.client.get(f'/api/reports/{report1_id}/compare/{report2_id}')
+        finally:
+            main.load_blocks = original_load_blocks
+        self.assertEqual(compare.status_code, 200, compare.text)
+        data = compare.json()
+        self.assertEqual(data['section_changed'], [section_name])
+        self.assertEqual(len(requested), 2)
+        diff = data['section_diffs'][section_name]
+        self.assertEqual([item['path'] for item in diff], ['正文'])
+        changed_words = [w for w in diff[0]['words'] if w['op'] != 'equal']
+        self.assertEqual(changed_words, [{'op': 'replace', 'from': '5000', 'to': '8000'}])
+
+    def test_80_generate_reports_batch_for_organization(self):
+        main = self.__class__.main_module
+        org_resp = self.client.post('/api/organizations', json={
+            'name': '批量报告单位',
+            'credit_code': '91350100M000100Y88',
+            'legal_representative': '辰',
+            'address': '批量城',
+            'mobile_phone': '13100131080',
+            'email': 'batch80@example.com',
+            'industry': '能源',
+            'organization_type': '企业',
+            'filing_region': '批量城',
+            'created_by': 'tester',
+        })
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        org_id = org_resp.json()['data']['id']
+        system_ids = []
+        for name in ('批量系统甲', '批量系统乙', '批量系统丙'):
+            sys_resp = self.client.post('/api/systems', json={
+                'organization_id': org_id, 'system_name': name, 'proposed_level': 2, 'created_by': 'tester',
+            })
+            self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+            system_ids.append(sys_resp.json()['data']['id'])
+        db = self.db_module.SessionLocal()
+        try:
+            db.get(main.SystemInfo, system_ids[2]).system_code = ''
+            db.commit()
+        finally:
+            db.close()
+        first = self.client.post(f'/api/reports/generate?system_id={system_ids[0]}&report_type=grading_report', headers=self.admin_headers)
+        self.assertEqual(first.status_code, 200, first.text)
+
+        bad = self.client.post('/api/reports/generate-batch', json={'organization_id': org_id, 'render': 'xls'}, headers=self.admin_headers)
+        self.assertEqual(bad.status_code, 400)
+
+        calls = []
+        original_choose = main.choose_report_template
+
+        def spy_choose(*args, **kwargs):
+            calls.append(args[1:])
+            return original_choose(*args, **kwargs)
+
+        main.choose_report_template = spy_choose
+        try:
+            resp = self.client.post('/api/reports/generate-batch', json={'organization_id': org_id, 'render': 'word'}, headers=self.admin_headers)
+        finally:
+            main.choose_report_template = original_choose
+        self.assertEqual(resp.status_code, 200, resp.text)
+        data = resp.json()
+        self.assertEqual((data['succeeded'], data['failed']), (2, 1))
+        self.assertEqual(len(calls), 1)
+        items = {item['system_id']: item for item in data['items']}
+        self.assertEqual(items[system_ids[0]]['version_no'], 2)
+        self.assertEqual(items[system_ids[1]]['version_no'], 1)
+        self.assertFalse(items[system_ids[2]]['ok'])
+        self.assertIn('system_code', items[system_ids[2]]['error'])
+        report = self.client.get(f"/api/reports/{items[system_ids[1]]['report_id']}").json()
+        self.assertIn('章节', report['content'])
+
+        job_id = data['render_job']['job_id']
+        self.assertTrue(main.JOB_QUEUE.wait(job_id, timeout=60))
+        status = self.client.get(f'/api/jobs/{job_id}', headers=self.admin_headers).json()
+        self.assertEqual((status['status'], status['kind'], status['progress']), ('succeeded', 'report_batch_render', 1.0))
+        download = self.client.get(f'/api/jobs/{job_id}/download', headers=self.admin_headers)
+        self.assertEqual(download.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(download.content)) as zf:
+            names = zf.namelist()
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(name.endswith('.docx') for name in names))
+
+    def test_81_schema_upgrades_should_restore_columns_missing_from_old_databases(self):
+        main = self.__class__.main_module
+        with main.engine.begin() as conn:
+            for table in ('organization_histories', 'system_histories'):
+                conn.execute(main.text(f'ALTER TABLE {table} DROP COLUMN delta'))
+                conn.execute(main.text(f'ALTER TABLE {table} DROP COLUMN changed_fields'))
+            conn.execute(main.text('ALTER TABLE reports DROP COLUMN content_manifest'))
+            conn.execute(main.text('DROP INDEX ix_attachments_sha256'))
+            conn.execute(main.text('DROP INDEX ix_knowledge_documents_sha256'))
+        main.ensure_schema_upgrades()
+        insp = main.inspect(main.engine)
+        for table in ('attachments', 'knowledge_documents'):
+            self.assertIn(f'ix_{table}_sha256', {ix['name'] for ix in insp.get_indexes(table)})
+        # 重复执行不应报错（启动与恢复备份都会调用）
+        main.ensure_schema_upgrades()
+        for table in ('organization_histories', 'system_histories'):
+            cols = {c['name'] for c in insp.get_columns(table)}
+            self.assertTrue({'delta', 'changed_fields'} <= cols)
+        self.assertIn('content_manifest', {c['name'] for c in insp.get_columns('reports')})
+
+    def test_82_word_exports_can_run_as_background_jobs(self):
+        main = self.__class__.main_module
+        org_resp = self.client.post('/api/organizations', json={
+            'name': '异步导出单位',
+            'credit_code': '91350100M000100Y89',
+            'legal_representative': '巳',
+            'address': '导出城',
+            'mobile_phone': '13100131082',
+            'email': 'export82@example.com',
+            'industry': '能源',
+            'organization_type': '企业',
+            'filing_region': '导出城',
+            'created_by': 'tester',
+        })
+        self.assertEqual(org_resp.status_code, 200, org_resp.text)
+        sys_resp = self.client.post('/api/systems', json={
+            'organization_id': org_resp.json()['data']['id'], 'system_name': '异步导出系统', 'proposed_level': 2, 'created_by': 'tester',
+        })
+        self.assertEqual(sys_resp.status_code, 200, sys_resp.text)
+        system_id = sys_resp.json()['data']['id']
+        gen = self.client.post(f'/api/reports/generate?system_id={system_id}&report_type=grading_report', headers=self.admin_headers)
+        self.assertEqual(gen.status_code, 200, gen.text)
+
+        original_render = main.render_filing_form_bytes
+        original_resolve = main.resolve_filing_template_path
+        main.render_filing_form_bytes = lambda template_path, org_data, system_data: b'PK-filing-form'
+        main.resolve_filing_template_path = lambda: Path('dummy.docx')
+        try:
+            jobs = []
+            for url, kind in (
+                (f"/api/reports/{gen.json()['data']['id']}/export/word?async=true", 'report_word_export'),
+                (f'/api/systems/{system_id}/export/word?async=true', 'filing_form_export'),
+            ):
+                resp = self.client.get(url, headers=self.admin_headers)
+                self.assertEqual(resp.status_code, 200, resp.text)
+                jobs.append((resp.json()['job_id'], kind))
+                self.assertTrue(main.JOB_QUEUE.wait(jobs[-1][0], timeout=30))
+        finally:
+            main.render_filing_form_bytes = original_render
+            main.resolve_filing_template_path = original_resolve
+        for job_id, kind in jobs:
+            status = self.client.get(f'/api/jobs/{job_id}', headers=self.admin_headers).json()
+            self.assertEqual((status['status'], status['kind']), ('succeeded', kind), status)
+            download = self.client.get(f'/api/jobs/{job_id}/download', headers=self.admin_headers)
+            self.assertEqual(download.status_code, 200)
+            self.assertTrue(download.content.startswith(b'PK'))
+
+    def test_83_knowledge_versions_release_every_blob_on_delete(self):
+        main = self.__class__.main_module
+        v1, v2 = b'knowledge-83-version-one', b'knowledge-83-version-two'
+        upload = self.client.post(
+            '/api/knowledge/upload',
+            data={'title': '多版本文档', 'doc_type': '政策文件', 'actor': 'admin'},
+            files={'file': ('v1.docx', v1, 'application/octet-stream')},
+            headers=self.admin_headers,
+        )
+        self.assertEqual(upload.status_code, 200, upload.text)
+        doc_id = upload.json()['data']['id']
+        for content in (v2, v1):
+            resp = self.client.post(
+                f'/api/knowledge/{doc_id}/new-version',
+                files={'file': ('next.docx', content, 'application/octet-stream')},
+                headers=self.admin_headers,
+            )
+            self.assertEqual(resp.status_code, 200, resp.text)
+        versions = self.client.get(f'/api/knowledge/{doc_id}/versions').json()['items']
+        v2_version = next(v for v in versions if v['snapshot']['sha256'] == hashlib.sha256(v2).hexdigest())
+        rollback = self.client.post(f"/api/knowledge/{doc_id}/rollback/{v2_version['id']}", headers=self.admin_headers)
+        self.assertEqual(rollback.status_code, 200, rollback.text)
+
+        hashes = [hashlib.sha256(v1).hexdigest(), hashlib.sha256(v2).hexdigest()]
+
+        def ref_counts():
+            db = self.db_module.SessionLocal()
+            try:
+                return [
+                    db.execute(main.text('SELECT ref_count FROM file_blobs WHERE sha256 = :sha256'), {'sha256': h}).scalar()
+                    for h in hashes
+                ]
+            finally:
+                db.close()
+
+        self.assertEqual(ref_counts(), [1, 1])
+        from app.services.blob_store import blob_path
+
+        paths = [blob_path(main.BLOB_DIR, h) for h in hashes]
+        self.assertTrue(all(path.exists() for path in paths))
+        delete = self.client.delete(f'/api/knowledge/{doc_id}', headers=self.admin_headers)
+        self.assertEqual(delete.status_code, 200, delete.text)
+        self.assertEqual(ref_counts(), [None, None])
+        self.assertFalse(any(path.exists() for path in paths))
+
+    def test_84_ref_count_upsert_uses_dialect_specific_sql(self):
+        from app.services.sql_upsert import upsert_add_counter
+
+        class FakeDb:
+            def __init__(self, dialect):
+                self.dialect = dialect
+                self.sql = None
+
+            def get_bind(self):
+                return SimpleNamespace(dialect=SimpleNamespace(name=self.dialect))
+
+            def execute(self, clause, params):
+                self.sql = str(clause)
+
+        rows = [{'sha256': 'abc', 'ref_count': 1}]
+        mysql_db, sqlite_db = FakeDb('mysql'), FakeDb('sqlite')
+        upsert_add_counter(mysql_db, 'file_blobs', 'sha256', 'ref_count', rows)
+        upsert_add_counter(sqlite_db, 'file_blobs', 'sha256', 'ref_count', rows)
+        self.assertIn('ON DUPLICATE KEY UPDATE ref_count = ref_count + VALUES(ref_count)', mysql_db.sql)
+        self.assertNotIn('ON CONFLICT', mysql_db.sql)
+        self.assertIn('ON CONFLICT(sha256) DO UPDATE', sqlite_db.sql)
+
+        from app.services.report_blocks import acquire_blocks
+
+        blocks_db = FakeDb('mysql')
+        acquire_blocks(blocks_db, [('h1', {'正文': 'a'}), ('h1', {'正文': 'a'})])
+        self.assertIn('INSERT INTO report_section_blocks', blocks_db.sql)
+        self.assertIn('ON DUPLICATE KEY UPDATE', blocks_db.sql)
+
+    def test_85_excel_import_without_executemany_returning(self):
+        main = self.__class__.main_module
+        self.assertTrue(main.ensure_search_index(main.engine, rebuild=True))
+        dialect = main.engine.dialect
+        self.assertTrue(dialect.insert_executemany_returning_sort_by_parameter_order)
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['单位名称', '统一社会信用代码', '单位负责人', '单位地址', '办公电话', '移动电话', '邮箱', '所属行业', '单位类型', '备案地区'])
+        ws.append(['无RETURNING导入甲', '91350100M000100Y65', '甲', '甲城', '', '13100131085', 'a85@example.com', '教育', '事业单位', '甲城'])
+        ws.append(['无RETURNING导入乙', '91350100M000100Y66', '乙', '乙城', '', '13100131086', 'b85@example.com', '教育', '事业单位', '乙城'])
+        org_bio = io.BytesIO()
+        wb.save(org_bio)
+
+        # 模拟 MySQL：方言不支持 executemany RETURNING
+        dialect.insert_executemany_returning_sort_by_parameter_order = False
+        try:
+            resp = self.client.post(
+                '/api/organizations/import/excel',
+                files={'file': ('orgs85.xlsx', org_bio.getvalue(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')},
+                headers=self.admin_headers,
+            )
+            self.assertEqual(resp.status_code, 200, resp.text)
+            self.assertEqual((resp.json()['imported'], resp.json()['failed']), (2, 0), resp.text)
+            db = self.db_module.SessionLocal()
+            try:
+                org = db.query(main.Organization).filter(main.Organization.credit_code == '91350100M000100Y65').one()
+                org_id = org.id
+                history = db.query(main.OrganizationHistory).filter(main.OrganizationHistory.organization_id == org_id).one()
+                self.assertEqual(history.after_data['id'], org_id)
+                self.assertIsNotNone(history.after_data['created_at'])
+            finally:
+                db.close()
+
+            wb = Workbook()
+            ws = wb.active
+            ws.append(['系统名称', '系统编号', '单位ID', '拟定等级', '部署方式', '系统类型', '上线时间', '录入人'])
+            ws.append(['无RETURNING系统甲', '', org_id, 2, '本地部署', '业务系统', '', 'tester'])
+            ws.append(['无RETURNING系统乙', '', 99999999, 2, '本地部署', '业务系统', '', 'tester'])
+            ws.append(['无RETURNING系统丙', '', org_id, 3, '云部署', '业务系统', '', 'tester'])
+            sys_bio = io.BytesIO()
+            wb.save(sys_bio)
+            resp = self.client.post(
+                '/api/systems/import/excel',
+                files={'file': ('systems85.xlsx', sys_bio.getvalue(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')},
+                headers=self.admin_headers,
+            )
+        finally:
+            dialect.insert_executemany_returning_sort_by_parameter_order = True
+        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertEqual(resp.json()['imported'], 2)
+        db = self.db_module.SessionLocal()
+        try:
+            systems = db.query(main.SystemInfo).filter(main.SystemInfo.organization_id == org_id).order_by(main.SystemInfo.id).all()
+            self.assertEqual([row.system_name for row in systems], ['无RETURNING系统甲', '无RETURNING系统丙'])
+            for system in systems:
+                self.assertEqual(db.query(main.WorkflowInstance).filter(main.WorkflowInstance.system_id == system.id).count(), 1)
+                self.assertEqual(db.query(main.SystemHistory).filter(main.SystemHistory.system_id == system.id).count(), 1)
+        finally:
+            db.close()
+
+    def test_86_backup_restore_requires_an_idle_job_queue(self):
+        main = self.__class__.main_module
+        release = threading.Event()
+        busy_job = main.JOB_QUEUE.submit(main.engine, 'test', 'admin', lambda job: release.wait(30))
+        try:
+            for async_flag in ('true', 'false'):
+                resp = self.client.post(
+                    f'/api/backup/restore?async={async_flag}',
+                    data={'confirm': 'true'},
+                    files={'file': ('backup.zip', b'not-a-real-backup', 'application/zip')},
+                    headers=self.admin_headers,
+                )
+                self.assertEqual(resp.status_code, 409, resp.text)
+        finally:
+            release.set()
+        self.assertTrue(main.JOB_QUEUE.wait(busy_job, timeout=30))
+
+        gate = threading.Event()
+        exclusive_job = main.JOB_QUEUE.submit(main.engine, 'test', 'admin', lambda job: gate.wait(30), exclusive=True)
+        try:
+            with self.assertRaises(main.JobQueueBusy):
+                main.JOB_QUEUE.submit(main.engine, 'test', 'admin', lambda job: None)
+        finally:
+            gate.set()
+        self.assertTrue(main.JOB_QUEUE.wait(exclusive_job, timeout=30))
+        follow_up = main.JOB_QUEUE.submit(main.engine, 'test', 'admin', lambda job: None)
+        self.assertTrue(main.JOB_QUEUE.wait(follow_up, timeout=30))
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,16 @@
+import io
+import os
+import struct
+import tempfile
 import unittest
+import zipfile
+import zlib
 from pathlib import Path
+from types import SimpleNamespace
 
 from app.main import _matrix_cells_from_labels
-from app.services.reporting import _read_docx_xml, _shade_matrix_cells
-from app.services.reporting import parse_grading_report_docx
+from app.services.reporting import _read_docx_xml, _render_grading_report_xml, _shade_matrix_cells
+from app.services.reporting import export_expert_review_merged_docx, parse_grading_report_docx
 
 
 class GradingReportImportTests(unittest.TestCase):
@@ -33,6 +40,105 @@ class GradingReportImportTests(unittest.TestCase):
 
         self.assertGreaterEqual(shaded.count('w:fill="BFBFBF"'), 4)
 
+    def test_render_grading_report_xml_applies_all_edits_in_one_pass(self):
+        def para(*texts):
+            runs = "".join(f'<w:r><w:rPr><w:b/></w:rPr><w:t>{t}</w:t></w:r>' for t in texts)
+            return f"<w:p><w:pPr><w:jc w:val=\"left\"/></w:pPr>{runs}</w:p>"
+
+        def table(text):
+            row = "<w:tr>" + f"<w:tc>{para(text)}</w:tc>" * 4 + "</w:tr>"
+            return f"<w:tbl><w:tblPr/>{row * 5}</w:tbl>"
+
+        xml = (
+            "<w:body>"
+            + para("（二）定级对象构成")
+            + para("山西省省属企业采购与供应链信息管理系统", "部署于山西省", "政务云，样例")
+            + "<w:p/>"
+            + table("a")
+            + table("b")
+            + para("业务信息安全保护等级为第三级")
+            + para("第三级") * 3
+            + para("2026年 1 月 20 日")
+            + "</w:body>"
+        )
+        rendered = _render_grading_report_xml(
+            xml,
+            org_name="单位",
+            sys_name="测试系统",
+            cn="二",
+            content={"object_composition": "新的构成说明", "fill_date": "2026年 3 月 1 日"},
+            business_matrix=[[1, 0, 0], [0, 0, 0], [0, 0, 0]],
+            service_matrix=[[0, 0, 0], [0, 0, 0], [0, 0, 1]],
+            topology_xml="<w:p>TOPO</w:p>",
+        )
+
+        self.assertIn('<w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">新的构成说明</w:t></w:r>', rendered)
+        self.assertNotIn("政务云，样例", rendered)
+        self.assertIn("2026年 3 月 1 日", rendered)
+        self.assertIn("业务信息安全保护等级为第二级", rendered)
+        self.assertNotIn("第三级", rendered)
+        self.assertEqual(rendered.count('w:fill="BFBFBF"'), 4)
+        self.assertIn("构成</w:t></w:r></w:p><w:p>TOPO</w:p>", rendered)
+
+    def test_expert_review_export_copies_unchanged_members_raw(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            template = Path(tmp) / "03-专家评审意见表.docx"
+            media = os.urandom(64 * 1024)
+            with zipfile.ZipFile(template, "w", zipfile.ZIP_DEFLATED) as z:
+                z.writestr("[Content_Types].xml", "<Types></Types>")
+                z.writestr("word/_rels/document.xml.rels", "<Relationships></Relationships>")
+                z.writestr("word/document.xml", "<w:body><w:p><w:r><w:t>山西省省属企业采购与供应链信息管理系统</w:t></w:r></w:p></w:body>")
+                z.writestr("word/media/image1.png", media)
+            org = SimpleNamespace(name="单位")
+            systems = [SimpleNamespace(system_name="系统甲", proposed_level=2), SimpleNamespace(system_name="系统乙", proposed_level=3)]
+            output = Path(tmp) / "out" / "merged.docx"
+
+            export_expert_review_merged_docx(template, org, systems, output, "city")
+
+            with zipfile.ZipFile(template) as src, zipfile.ZipFile(output) as out:
+                self.assertIsNone(out.testzip())
+                self.assertEqual(out.read("word/media/image1.png"), media)
+                self.assertEqual(out.getinfo("word/media/image1.png").compress_size, src.getinfo("word/media/image1.png").compress_size)
+                self.assertIn("系统甲、系统乙", out.read("word/document.xml").decode("utf-8"))
+            self.assertEqual(sorted(p.name for p in output.parent.iterdir()), ["merged.docx"])
+
+
+    def test_docx_rewrite_opens_in_python_docx_with_raw_copy_and_fallback(self):
+        from docx import Document
+
+        from app.services import reporting
+
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        png = (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\x00\xff\x00\x00"))
+            + chunk(b"IEND", b"")
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "source.docx"
+            doc = Document()
+            doc.add_paragraph("原始段落")
+            doc.add_picture(io.BytesIO(png))
+            doc.save(source)
+            xml, others = _read_docx_xml(source)
+            for raw_copy in (True, False):
+                output = Path(tmp) / f"out_{raw_copy}.docx"
+                original = reporting._RAW_ZIP_COPY
+                reporting._RAW_ZIP_COPY = raw_copy and original
+                try:
+                    reporting._write_docx_xml(output, xml.replace("原始段落", "改写段落"), others, source)
+                finally:
+                    reporting._RAW_ZIP_COPY = original
+                with zipfile.ZipFile(output) as out, zipfile.ZipFile(source) as src:
+                    self.assertIsNone(out.testzip())
+                    self.assertEqual(sorted(out.namelist()), sorted(src.namelist()))
+                reopened = Document(str(output))
+                self.assertEqual(reopened.paragraphs[0].text, "改写段落")
+                self.assertEqual(len(reopened.inline_shapes), 1)
+
 
 if __name__ == "__main__":
     unittest.main()